@@ -4,10 +4,12 @@ from app.routes import (ec2, s3, iam, lambda_bp, rds, vpc, cloudformation, cloud
                        apigateway, ecs, ecr, eks, sagemaker, config, elasticache, neptune, documentdb,
                        autoscaling, ebs, efs, fsx, security_groups, secretsmanager, batch, acm_bp, cost_explorer,
                        bedrock, rekognition, polly_bp, athena, glue, emr, chat, eventbridge, systems_manager, cloudtrail, 
-                       setup, configuracion)
+                       setup, configuracion, inventory)
 import os
 import logging
 from dotenv import load_dotenv
+from app.utils import inventory as inventory_service
+from app.utils.aws_client import get_client_factory
 from app.mcp_server.Contenedores.ecs_mcp_tools import ECS_MCP_TOOLS
 from app.mcp_server.Seguridad.secretsmanager_mcp_tools import SecretsManagerMCPTools
 from app.mcp_server.Seguridad.acm_mcp_tools import AcmMCPTools
@@ -113,10 +115,21 @@ def create_app():
     app.register_blueprint(emr, url_prefix='/emr')
     app.register_blueprint(systems_manager, url_prefix='/systems-manager')
     app.register_blueprint(cloudtrail, url_prefix='/cloudtrail')
+    app.register_blueprint(inventory, url_prefix='/inventory')
+
+    # Refresco periódico del inventario con las credenciales del entorno (opcional)
+    inventory_interval = os.environ.get('INVENTORY_REFRESH_INTERVAL')
+    if inventory_interval:
+        inventory_service.start_scheduler(float(inventory_interval), get_client_factory)
 
     @app.route('/')
     def index():
-        return render_template('index.html')
+        # Recuentos desde el inventario (O(1)). Solo con INVENTORY_REFRESH_INTERVAL activado
+        # lanza además la comprobación de cambios (Config/CloudTrail) en segundo plano
+        factory = get_client_factory()
+        if inventory_interval:
+            inventory_service.ensure_fresh(factory)
+        return render_template('index.html', inventory=inventory_service.store.summary(factory.scope))
 
     # MCP Server routes
     @app.route('/mcp/tools')
@@ -158,6 +171,14 @@ def create_app():
                 },
                 'function': secretsmanager_tools.get_secret_value
             },
+            'secretsmanager_batch_get_secret_values': {
+                'description': 'Obtener el valor actual de varios secretos en bloque',
+                'parameters': {
+                    'secret_names': {'type': 'array', 'description': 'Nombres o ARNs de los secretos', 'required': True},
+                    'refresh': {'type': 'boolean', 'description': 'Ignorar la caché de valores', 'required': False}
+                },
+                'function': secretsmanager_tools.batch_get_secret_values
+            },
             'secretsmanager_update_secret': {
                 'description': 'Actualizar un secreto existente',
                 'parameters': {
@@ -278,6 +299,14 @@ def create_app():
                 },
                 'function': secretsmanager_tools.get_secret_value
             },
+            'secretsmanager_batch_get_secret_values': {
+                'description': 'Obtener el valor actual de varios secretos en bloque',
+                'parameters': {
+                    'secret_names': {'type': 'array', 'description': 'Nombres o ARNs de los secretos', 'required': True},
+                    'refresh': {'type': 'boolean', 'description': 'Ignorar la caché de valores', 'required': False}
+                },
+                'function': secretsmanager_tools.batch_get_secret_values
+            },
             'secretsmanager_update_secret': {
                 'description': 'Actualizar un secreto existente',
                 'parameters': {
@@ -475,6 +504,18 @@ def create_app():
                     'image_bytes': {'type': 'string', 'description': 'Bytes de la imagen en base64', 'required': True}
                 },
                 'function': rekognition_tools.detect_text
+            },
+            'rekognition_batch_analyze': {
+                'description': 'Analizar todas las imágenes de un prefijo de S3 con Amazon Rekognition',
+                'parameters': {
+                    'bucket': {'type': 'string', 'description': 'Bucket S3 con las imágenes', 'required': True},
+                    'prefix': {'type': 'string', 'description': 'Prefijo de las claves', 'required': False},
+                    'analysis': {'type': 'string', 'description': 'labels, faces, text o moderation', 'required': False},
+                    'region': {'type': 'string', 'description': 'Región de AWS', 'required': False},
+                    'max_images': {'type': 'integer', 'description': 'Máximo de imágenes', 'required': False},
+                    'tps': {'type': 'number', 'description': 'Llamadas por segundo a Rekognition', 'required': False}
+                },
+                'function': rekognition_tools.batch_analyze
             }
         }
         
@@ -507,13 +548,30 @@ def create_app():
                 },
                 'function': kinesis_tools.put_record
             },
-            'kinesis_get_records': {
-                'description': 'Obtener registros de un shard específico en un stream de Kinesis',
+            'kinesis_put_records': {
+                'description': 'Enviar muchos registros a un stream de Kinesis con PutRecords en lotes concurrentes, reintentando solo los fallidos',
                 'parameters': {
                     'stream_name': {'type': 'string', 'description': 'Nombre del stream', 'required': True},
-                    'shard_id': {'type': 'string', 'description': 'ID del shard', 'required': True},
+                    'records': {'type': 'array', 'description': 'Registros (objetos JSON o texto)', 'required': True},
+                    'partition_key_field': {'type': 'string', 'description': 'Campo del registro usado como clave de partición', 'required': False},
+                    'strategy': {'type': 'string', 'description': 'field, random (default) o round_robin', 'required': False},
+                    'aggregate': {'type': 'boolean', 'description': 'Agregar registros pequeños en formato KPL (default: false)', 'required': False},
                     'region': {'type': 'string', 'description': 'Región de AWS (default: us-east-1)', 'required': False}
                 },
+                'function': kinesis_tools.put_records
+            },
+            'kinesis_get_records': {
+                'description': 'Obtener registros de uno o todos los shards de un stream de Kinesis, continuando desde el último checkpoint',
+                'parameters': {
+                    'stream_name': {'type': 'string', 'description': 'Nombre del stream', 'required': True},
+                    'shard_id': {'type': 'string', 'description': 'ID del shard (vacío = todos los shards)', 'required': False},
+                    'region': {'type': 'string', 'description': 'Región de AWS (default: us-east-1)', 'required': False},
+                    'iterator_type': {'type': 'string', 'description': 'AFTER_SEQUENCE_NUMBER (checkpoint, default), LATEST, AT_TIMESTAMP o TRIM_HORIZON', 'required': False},
+                    'timestamp': {'type': 'string', 'description': 'Fecha ISO 8601 para AT_TIMESTAMP', 'required': False},
+                    'sequence_number': {'type': 'string', 'description': 'Número de secuencia de inicio (solo con shard_id)', 'required': False},
+                    'max_records': {'type': 'integer', 'description': 'Máximo de registros (default: 100)', 'required': False},
+                    'save_checkpoint': {'type': 'boolean', 'description': 'Guardar la posición alcanzada (default: true)', 'required': False}
+                },
                 'function': kinesis_tools.get_records
             }
         }
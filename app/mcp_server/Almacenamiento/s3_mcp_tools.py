@@ -4,7 +4,8 @@ Herramientas para gestión de buckets, objetos, políticas, etc.
 """
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_client_factory
+from app.utils import inventory
 
 
 class S3MCPTools:
@@ -223,13 +224,12 @@ class S3MCPTools:
 
     def _list_buckets(self) -> Dict[str, Any]:
         """Lista todos los buckets"""
-        client = self._get_client()
-        response = client.list_buckets()
+        entry = inventory.get_items(get_client_factory(), 's3')
 
         buckets = [{
-            'name': bucket['Name'],
-            'creation_date': bucket['CreationDate'].strftime('%Y-%m-%d %H:%M:%S')
-        } for bucket in response['Buckets']]
+            'name': bucket['name'],
+            'creation_date': bucket['creation_date']
+        } for bucket in entry['items']]
 
         return {
             'buckets': buckets,
@@ -262,6 +262,7 @@ class S3MCPTools:
                 **bucket_config
             )
 
+        inventory.mark_dirty(get_client_factory().scope, 's3')
         return {
             'message': f'Bucket {kwargs.get("bucket_name")} creado exitosamente',
             'bucket_name': kwargs.get('bucket_name'),
@@ -273,6 +274,7 @@ class S3MCPTools:
         client = self._get_client()
 
         client.delete_bucket(Bucket=kwargs.get('bucket_name'))
+        inventory.mark_dirty(get_client_factory().scope, 's3')
 
         return {
             'message': f'Bucket {kwargs.get("bucket_name")} eliminado exitosamente'
@@ -4,7 +4,10 @@ Herramientas para gestión de bases de datos NoSQL
 """
 import boto3
 from typing import Dict, List, Any, Optional
+from botocore.config import Config
 from app.utils.aws_client import get_aws_client
+from app.utils.dynamodb_scan import parallel_scan, ScanStats, MAX_SEGMENTS
+from app.utils.dynamodb_bulk import batch_write, batch_get
 
 
 class DynamoDBMCPTools:
@@ -192,7 +195,26 @@ class DynamoDBMCPTools:
                         'projection_expression': {'type': 'string', 'description': self.DESC_PROJECTION_EXPRESSION},
                         'limit': {'type': 'integer', 'description': self.DESC_MAX_ITEMS, 'default': 100},
                         'exclusive_start_key': {'type': 'object', 'description': 'Clave exclusiva de inicio'},
-                        'consistent_read': {'type': 'boolean', 'description': 'Lectura consistente', 'default': False}
+                        'consistent_read': {'type': 'boolean', 'description': 'Lectura consistente', 'default': False},
+                        'expression_attribute_values': {'type': 'object', 'description': 'Valores para los placeholders de las expresiones'},
+                        'segment': {'type': 'integer', 'description': 'Segmento a escanear (scan paralelo)'},
+                        'total_segments': {'type': 'integer', 'description': 'Número total de segmentos (scan paralelo)'}
+                    },
+                    'required': ['table_name']
+                }
+            },
+            {
+                'name': 'dynamodb_parallel_scan',
+                'description': 'Escanea una tabla completa en paralelo por segmentos y reporta la capacidad consumida',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'table_name': {'type': 'string', 'description': self.DESC_TABLE_NAME},
+                        'filter_expression': {'type': 'string', 'description': self.DESC_FILTER_EXPRESSION},
+                        'projection_expression': {'type': 'string', 'description': self.DESC_PROJECTION_EXPRESSION},
+                        'expression_attribute_values': {'type': 'object', 'description': 'Valores para los placeholders de las expresiones'},
+                        'total_segments': {'type': 'integer', 'description': f'Número de segmentos (1-{MAX_SEGMENTS})', 'default': 4},
+                        'max_items': {'type': 'integer', 'description': self.DESC_MAX_ITEMS, 'default': 1000}
                     },
                     'required': ['table_name']
                 }
@@ -211,14 +233,15 @@ class DynamoDBMCPTools:
                         'limit': {'type': 'integer', 'description': self.DESC_MAX_ITEMS, 'default': 100},
                         'exclusive_start_key': {'type': 'object', 'description': 'Clave exclusiva de inicio'},
                         'scan_index_forward': {'type': 'boolean', 'description': 'Orden ascendente', 'default': True},
-                        'consistent_read': {'type': 'boolean', 'description': 'Lectura consistente', 'default': False}
+                        'consistent_read': {'type': 'boolean', 'description': 'Lectura consistente', 'default': False},
+                        'expression_attribute_values': {'type': 'object', 'description': 'Valores para los placeholders de las expresiones'}
                     },
                     'required': ['table_name', 'key_condition_expression']
                 }
             },
             {
                 'name': 'dynamodb_batch_write_item',
-                'description': 'Escribe múltiples items en lote',
+                'description': 'Escribe múltiples items en lote (se trocea en lotes de 25 y reintenta los no procesados)',
                 'parameters': {
                     'type': 'object',
                     'properties': {
@@ -242,7 +265,7 @@ class DynamoDBMCPTools:
             },
             {
                 'name': 'dynamodb_batch_get_item',
-                'description': 'Obtiene múltiples items en lote',
+                'description': 'Obtiene múltiples items en lote (se trocea en lotes de 100 claves y reintenta las no procesadas)',
                 'parameters': {
                     'type': 'object',
                     'properties': {
@@ -378,6 +401,8 @@ class DynamoDBMCPTools:
                 return self._delete_item(**parameters)
             elif tool_name == 'dynamodb_scan':
                 return self._scan(**parameters)
+            elif tool_name == 'dynamodb_parallel_scan':
+                return self._parallel_scan(**parameters)
             elif tool_name == 'dynamodb_query':
                 return self._query(**parameters)
             elif tool_name == 'dynamodb_batch_write_item':
@@ -408,9 +433,9 @@ class DynamoDBMCPTools:
 
         dynamo_params = {}
         if kwargs.get('limit'):
-            dynamo_kwargs['Limit'] = kwargs.get('limit')
+            dynamo_params['Limit'] = kwargs.get('limit')
         if kwargs.get('exclusive_start_table_name'):
-            dynamo_kwargs['ExclusiveStartTableName'] = kwargs.get('exclusive_start_table_name')
+            dynamo_params['ExclusiveStartTableName'] = kwargs.get('exclusive_start_table_name')
 
         response = client.list_tables(**dynamo_params)
 
@@ -460,22 +485,22 @@ class DynamoDBMCPTools:
         }
 
         if kwargs.get('billing_mode'):
-            dynamo_kwargs['BillingMode'] = kwargs.get('billing_mode')
+            dynamo_params['BillingMode'] = kwargs.get('billing_mode')
 
         if kwargs.get('provisioned_throughput'):
-            dynamo_kwargs['ProvisionedThroughput'] = {
+            dynamo_params['ProvisionedThroughput'] = {
                 'ReadCapacityUnits': kwargs.get('provisioned_throughput')['read_capacity_units'],
                 'WriteCapacityUnits': kwargs.get('provisioned_throughput')['write_capacity_units']
             }
 
         if kwargs.get('stream_view_type'):
-            dynamo_kwargs['StreamSpecification'] = {
+            dynamo_params['StreamSpecification'] = {
                 'StreamEnabled': True,
                 'StreamViewType': kwargs.get('stream_view_type')
             }
 
         if kwargs.get('tags'):
-            dynamo_kwargs['Tags'] = kwargs.get('tags')
+            dynamo_params['Tags'] = kwargs.get('tags')
 
         response = client.create_table(**dynamo_params)
 
@@ -515,9 +540,9 @@ class DynamoDBMCPTools:
         }
 
         if kwargs.get('condition_expression'):
-            dynamo_kwargs['ConditionExpression'] = kwargs.get('condition_expression')
+            dynamo_params['ConditionExpression'] = kwargs.get('condition_expression')
         if kwargs.get('return_values'):
-            dynamo_kwargs['ReturnValues'] = kwargs.get('return_values')
+            dynamo_params['ReturnValues'] = kwargs.get('return_values')
 
         response = client.put_item(**dynamo_params)
 
@@ -541,9 +566,9 @@ class DynamoDBMCPTools:
         }
 
         if kwargs.get('projection_expression'):
-            dynamo_kwargs['ProjectionExpression'] = kwargs.get('projection_expression')
+            dynamo_params['ProjectionExpression'] = kwargs.get('projection_expression')
         if kwargs.get('consistent_read'):
-            dynamo_kwargs['ConsistentRead'] = kwargs.get('consistent_read')
+            dynamo_params['ConsistentRead'] = kwargs.get('consistent_read')
 
         response = client.get_item(**dynamo_params)
 
@@ -568,9 +593,9 @@ class DynamoDBMCPTools:
         }
 
         if kwargs.get('condition_expression'):
-            dynamo_kwargs['ConditionExpression'] = kwargs.get('condition_expression')
+            dynamo_params['ConditionExpression'] = kwargs.get('condition_expression')
         if kwargs.get('return_values'):
-            dynamo_kwargs['ReturnValues'] = kwargs.get('return_values')
+            dynamo_params['ReturnValues'] = kwargs.get('return_values')
 
         response = client.update_item(**dynamo_params)
 
@@ -594,9 +619,9 @@ class DynamoDBMCPTools:
         }
 
         if kwargs.get('condition_expression'):
-            dynamo_kwargs['ConditionExpression'] = kwargs.get('condition_expression')
+            dynamo_params['ConditionExpression'] = kwargs.get('condition_expression')
         if kwargs.get('return_values'):
-            dynamo_kwargs['ReturnValues'] = kwargs.get('return_values')
+            dynamo_params['ReturnValues'] = kwargs.get('return_values')
 
         response = client.delete_item(**dynamo_params)
 
@@ -614,18 +639,23 @@ class DynamoDBMCPTools:
         """Escanea una tabla"""
         client = self._get_client()
 
-        dynamo_params = {'TableName': kwargs.get('table_name')}
+        dynamo_params = {'TableName': kwargs.get('table_name'), 'ReturnConsumedCapacity': 'TOTAL'}
 
         if kwargs.get('filter_expression'):
-            dynamo_kwargs['FilterExpression'] = kwargs.get('filter_expression')
+            dynamo_params['FilterExpression'] = kwargs.get('filter_expression')
         if kwargs.get('projection_expression'):
-            dynamo_kwargs['ProjectionExpression'] = kwargs.get('projection_expression')
+            dynamo_params['ProjectionExpression'] = kwargs.get('projection_expression')
+        if kwargs.get('expression_attribute_values'):
+            dynamo_params['ExpressionAttributeValues'] = kwargs.get('expression_attribute_values')
         if kwargs.get('limit'):
-            dynamo_kwargs['Limit'] = kwargs.get('limit')
+            dynamo_params['Limit'] = kwargs.get('limit')
         if kwargs.get('exclusive_start_key'):
-            dynamo_kwargs['ExclusiveStartKey'] = kwargs.get('exclusive_start_key')
+            dynamo_params['ExclusiveStartKey'] = kwargs.get('exclusive_start_key')
         if kwargs.get('consistent_read'):
-            dynamo_kwargs['ConsistentRead'] = kwargs.get('consistent_read')
+            dynamo_params['ConsistentRead'] = kwargs.get('consistent_read')
+        if kwargs.get('total_segments'):
+            dynamo_params['TotalSegments'] = kwargs.get('total_segments')
+            dynamo_params['Segment'] = kwargs.get('segment', 0)
 
         response = client.scan(**dynamo_params)
 
@@ -641,29 +671,69 @@ class DynamoDBMCPTools:
 
         return result
 
+    def _parallel_scan(self, **kwargs) -> Dict[str, Any]:
+        """Escanea una tabla completa en paralelo por segmentos"""
+        total_segments = max(1, min(int(kwargs.get('total_segments') or 4), MAX_SEGMENTS))
+        max_items = int(kwargs.get('max_items') or 1000)
+        # Cliente propio con pool de conexiones suficiente para todos los segmentos
+        client = get_aws_client('dynamodb', client_config=Config(max_pool_connections=max(10, total_segments)))
+
+        dynamo_params = {'TableName': kwargs.get('table_name')}
+        if kwargs.get('filter_expression'):
+            dynamo_params['FilterExpression'] = kwargs.get('filter_expression')
+        if kwargs.get('projection_expression'):
+            dynamo_params['ProjectionExpression'] = kwargs.get('projection_expression')
+        if kwargs.get('expression_attribute_values'):
+            dynamo_params['ExpressionAttributeValues'] = kwargs.get('expression_attribute_values')
+
+        stats = ScanStats()
+        items = []
+        truncated = False
+        scanner = parallel_scan(client, dynamo_params, total_segments=total_segments, stats=stats)
+        try:
+            for item in scanner:
+                items.append(item)
+                if len(items) >= max_items:
+                    # El scan solo termina cuando ningún segmento tiene LastEvaluatedKey:
+                    # hay más datos si todavía entrega otro item
+                    truncated = next(scanner, None) is not None
+                    break
+        finally:
+            scanner.close()
+
+        return {
+            'items': items,
+            'count': len(items),
+            'truncated': truncated,
+            'stats': stats.to_dict()
+        }
+
     def _query(self, **kwargs) -> Dict[str, Any]:
         """Consulta una tabla"""
         client = self._get_client()
 
         dynamo_params = {
             'TableName': kwargs.get('table_name'),
-            'KeyConditionExpression': kwargs.get('key_condition_expression')
+            'KeyConditionExpression': kwargs.get('key_condition_expression'),
+            'ReturnConsumedCapacity': 'TOTAL'
         }
 
         if kwargs.get('filter_expression'):
-            dynamo_kwargs['FilterExpression'] = kwargs.get('filter_expression')
+            dynamo_params['FilterExpression'] = kwargs.get('filter_expression')
         if kwargs.get('projection_expression'):
-            dynamo_kwargs['ProjectionExpression'] = kwargs.get('projection_expression')
+            dynamo_params['ProjectionExpression'] = kwargs.get('projection_expression')
+        if kwargs.get('expression_attribute_values'):
+            dynamo_params['ExpressionAttributeValues'] = kwargs.get('expression_attribute_values')
         if kwargs.get('index_name'):
-            dynamo_kwargs['IndexName'] = kwargs.get('index_name')
+            dynamo_params['IndexName'] = kwargs.get('index_name')
         if kwargs.get('limit'):
-            dynamo_kwargs['Limit'] = kwargs.get('limit')
+            dynamo_params['Limit'] = kwargs.get('limit')
         if kwargs.get('exclusive_start_key'):
-            dynamo_kwargs['ExclusiveStartKey'] = kwargs.get('exclusive_start_key')
-        if kwargs.get('scan_index_forward'):
-            dynamo_kwargs['ScanIndexForward'] = kwargs.get('scan_index_forward')
+            dynamo_params['ExclusiveStartKey'] = kwargs.get('exclusive_start_key')
+        if kwargs.get('scan_index_forward') is not None:
+            dynamo_params['ScanIndexForward'] = kwargs.get('scan_index_forward')
         if kwargs.get('consistent_read'):
-            dynamo_kwargs['ConsistentRead'] = kwargs.get('consistent_read')
+            dynamo_params['ConsistentRead'] = kwargs.get('consistent_read')
 
         response = client.query(**dynamo_params)
 
@@ -680,37 +750,30 @@ class DynamoDBMCPTools:
         return result
 
     def _batch_write_item(self, **kwargs) -> Dict[str, Any]:
-        """Escribe múltiples items en lote"""
+        """Escribe múltiples items en lote (troceado a 25 y con reintento de no procesados)"""
         client = self._get_client()
 
-        response = client.batch_write_item(RequestItems=kwargs.get('request_items'))
+        result = batch_write(client, kwargs.get('request_items') or {})
+        summary = result.to_dict()
 
-        result = {
-            'message': 'Items escritos en lote exitosamente',
-            'unprocessed_items': response.get('UnprocessedItems', {})
+        return {
+            'message': f'{summary["processed"]} escrituras completadas en {summary["batches"]} lotes',
+            'summary': summary,
+            'unprocessed_items': result.unprocessed
         }
 
-        if 'ConsumedCapacity' in response:
-            result['consumed_capacity'] = response['ConsumedCapacity']
-
-        return result
-
     def _batch_get_item(self, **kwargs) -> Dict[str, Any]:
-        """Obtiene múltiples items en lote"""
+        """Obtiene múltiples items en lote (troceado a 100 claves y con reintento)"""
         client = self._get_client()
 
-        response = client.batch_get_item(RequestItems=kwargs.get('request_items'))
+        responses, result = batch_get(client, kwargs.get('request_items') or {})
 
-        result = {
-            'responses': response.get('Responses', {}),
-            'unprocessed_keys': response.get('UnprocessedKeys', {})
+        return {
+            'responses': responses,
+            'summary': result.to_dict(),
+            'unprocessed_keys': {table: {'Keys': keys} for table, keys in result.unprocessed.items()}
         }
 
-        if 'ConsumedCapacity' in response:
-            result['consumed_capacity'] = response['ConsumedCapacity']
-
-        return result
-
     def _update_table(self, **kwargs) -> Dict[str, Any]:
         """Actualiza la configuración de una tabla"""
         client = self._get_client()
@@ -718,16 +781,16 @@ class DynamoDBMCPTools:
         dynamo_params = {'TableName': kwargs.get('table_name')}
 
         if kwargs.get('billing_mode'):
-            dynamo_kwargs['BillingMode'] = kwargs.get('billing_mode')
+            dynamo_params['BillingMode'] = kwargs.get('billing_mode')
 
         if kwargs.get('provisioned_throughput'):
-            dynamo_kwargs['ProvisionedThroughput'] = {
+            dynamo_params['ProvisionedThroughput'] = {
                 'ReadCapacityUnits': kwargs.get('provisioned_throughput')['read_capacity_units'],
                 'WriteCapacityUnits': kwargs.get('provisioned_throughput')['write_capacity_units']
             }
 
         if kwargs.get('stream_specification'):
-            dynamo_kwargs['StreamSpecification'] = kwargs.get('stream_specification')
+            dynamo_params['StreamSpecification'] = kwargs.get('stream_specification')
 
         response = client.update_table(**dynamo_params)
 
@@ -770,13 +833,13 @@ class DynamoDBMCPTools:
 
         dynamo_params = {}
         if kwargs.get('table_name'):
-            dynamo_kwargs['TableName'] = kwargs.get('table_name')
+            dynamo_params['TableName'] = kwargs.get('table_name')
         if kwargs.get('backup_type'):
-            dynamo_kwargs['BackupType'] = kwargs.get('backup_type')
+            dynamo_params['BackupType'] = kwargs.get('backup_type')
         if kwargs.get('limit'):
-            dynamo_kwargs['Limit'] = kwargs.get('limit')
+            dynamo_params['Limit'] = kwargs.get('limit')
         if kwargs.get('exclusive_start_backup_arn'):
-            dynamo_kwargs['ExclusiveStartBackupArn'] = kwargs.get('exclusive_start_backup_arn')
+            dynamo_params['ExclusiveStartBackupArn'] = kwargs.get('exclusive_start_backup_arn')
 
         response = client.list_backups(**dynamo_params)
 
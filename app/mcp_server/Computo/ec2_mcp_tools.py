@@ -4,7 +4,8 @@ Herramientas para gestión de instancias EC2, AMIs, snapshots, security groups,
 """
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import security_group_index
 
 
 class EC2MCPTools:
@@ -594,6 +595,7 @@ class EC2MCPTools:
                 params['VpcId'] = vpc_id
 
             response = ec2.create_security_group(**params)
+            security_group_index.invalidate(get_cache_scope())
 
             return {
                 'success': True,
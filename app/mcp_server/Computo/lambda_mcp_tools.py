@@ -4,7 +4,9 @@ Herramientas para gestión de funciones serverless
 """
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_client_factory, get_cache_scope
+from app.utils import inventory, lambda_deploy, lambda_load, lambda_inventory
+from app.utils.fanout import fanout_client_config
 
 
 class LambdaMCPTools:
@@ -21,6 +23,7 @@ class LambdaMCPTools:
     DESC_MEMORY_SIZE = 'Tamaño de memoria en MB (128-3008)'
     DESC_ENVIRONMENT = 'Variables de entorno'
     DESC_MAX_ITEMS = 'Número máximo de elementos a retornar'
+    DESC_STAGING_BUCKET = 'Bucket S3 donde subir (multipart) los paquetes de más de 10 MB'
 
     def __init__(self):
         self.lambda_client = None
@@ -31,6 +34,12 @@ class LambdaMCPTools:
             self.lambda_client = get_aws_client('lambda')
         return self.lambda_client
 
+    def _invalidate(self, function_name: Optional[str] = None):
+        """Invalida inventario y enriquecimiento tras crear o modificar una función"""
+        scope = get_cache_scope()
+        inventory.mark_dirty(scope, 'lambda')
+        lambda_inventory.invalidate(scope, function_name)
+
     def get_tools(self) -> List[Dict[str, Any]]:
         """Retorna la lista de herramientas disponibles para Lambda"""
         return [
@@ -41,8 +50,9 @@ class LambdaMCPTools:
                     'type': 'object',
                     'properties': {
                         'function_version': {'type': 'string', 'description': 'Versión específica ($LATEST, etc.)', 'default': 'ALL'},
-                        'marker': {'type': 'string', 'description': 'Marcador para paginación'},
-                        'max_items': {'type': 'integer', 'description': self.DESC_MAX_ITEMS, 'default': 50}
+                        'marker': {'type': 'string', 'description': 'Marcador para pedir una sola página (sin él se recorren todas)'},
+                        'max_items': {'type': 'integer', 'description': self.DESC_MAX_ITEMS},
+                        'enrich': {'type': 'boolean', 'description': 'Añadir concurrencia reservada, aliases y event source mappings'}
                     }
                 }
             },
@@ -73,6 +83,7 @@ class LambdaMCPTools:
                             'description': self.DESC_CODE,
                             'properties': {
                                 'zip_file': {'type': 'string', 'description': 'Código ZIP en base64'},
+                                'staging_bucket': {'type': 'string', 'description': self.DESC_STAGING_BUCKET},
                                 's3_bucket': {'type': 'string', 'description': 'Bucket S3'},
                                 's3_key': {'type': 'string', 'description': 'Key S3'},
                                 's3_object_version': {'type': 'string', 'description': 'Versión del objeto S3'}
@@ -97,16 +108,19 @@ class LambdaMCPTools:
             },
             {
                 'name': 'lambda_update_function_code',
-                'description': 'Actualiza el código de una función Lambda',
+                'description': 'Actualiza el código de una función Lambda (se omite si el SHA-256 del ZIP coincide con CodeSha256)',
                 'parameters': {
                     'type': 'object',
                     'properties': {
                         'function_name': {'type': 'string', 'description': self.DESC_FUNCTION_NAME},
                         'zip_file': {'type': 'string', 'description': 'Código ZIP en base64'},
+                        'staging_bucket': {'type': 'string', 'description': self.DESC_STAGING_BUCKET},
                         's3_bucket': {'type': 'string', 'description': 'Bucket S3'},
                         's3_key': {'type': 'string', 'description': 'Key S3'},
                         's3_object_version': {'type': 'string', 'description': 'Versión del objeto S3'},
-                        'architectures': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Arquitecturas (x86_64, arm64)'}
+                        'architectures': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Arquitecturas (x86_64, arm64)'},
+                        'publish': {'type': 'boolean', 'description': 'Publicar una nueva versión'},
+                        'force': {'type': 'boolean', 'description': 'Desplegar aunque el SHA-256 no haya cambiado'}
                     },
                     'required': ['function_name']
                 }
@@ -150,6 +164,23 @@ class LambdaMCPTools:
                     'required': ['function_name']
                 }
             },
+            {
+                'name': 'lambda_load_test',
+                'description': 'Prueba de carga: N invocaciones con concurrencia C; devuelve p50/p95/p99, histograma, throughput y arranques en frío',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'function_name': {'type': 'string', 'description': self.DESC_FUNCTION_NAME},
+                        'invocations': {'type': 'integer', 'description': 'Número de invocaciones (máx. 10000)', 'default': 20},
+                        'concurrency': {'type': 'integer', 'description': 'Invocaciones en paralelo (máx. 100)', 'default': 5},
+                        'payload_template': {'type': 'string', 'description': 'Plantilla JSON con marcadores {{i}}, {{uuid}}, {{timestamp}}, {{random}}'},
+                        'qualifier': {'type': 'string', 'description': 'Calificador ($LATEST, versión, alias)'},
+                        'max_seconds': {'type': 'number', 'description': 'Tiempo máximo de la prueba'},
+                        'include_invocations': {'type': 'boolean', 'description': 'Incluir el detalle de cada invocación'}
+                    },
+                    'required': ['function_name']
+                }
+            },
             {
                 'name': 'lambda_delete_function',
                 'description': 'Elimina una función Lambda',
@@ -280,6 +311,22 @@ class LambdaMCPTools:
                     }
                 }
             },
+            {
+                'name': 'lambda_deploy_functions',
+                'description': 'Despliega un mismo ZIP en varias funciones en paralelo, omitiendo las que ya tienen ese código',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'function_names': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Funciones a desplegar'},
+                        'zip_file': {'type': 'string', 'description': 'Código ZIP en base64'},
+                        'staging_bucket': {'type': 'string', 'description': self.DESC_STAGING_BUCKET},
+                        'max_workers': {'type': 'integer', 'description': 'Despliegues en paralelo', 'default': 4},
+                        'publish': {'type': 'boolean', 'description': 'Publicar una nueva versión en cada función'},
+                        'force': {'type': 'boolean', 'description': 'Desplegar aunque el SHA-256 no haya cambiado'}
+                    },
+                    'required': ['function_names']
+                }
+            },
             {
                 'name': 'lambda_publish_layer_version',
                 'description': 'Publica una nueva versión de una capa Lambda',
@@ -319,6 +366,8 @@ class LambdaMCPTools:
                 return self._update_function_configuration(**parameters)
             elif tool_name == 'lambda_invoke_function':
                 return self._invoke_function(**parameters)
+            elif tool_name == 'lambda_load_test':
+                return self._load_test(**parameters)
             elif tool_name == 'lambda_delete_function':
                 return self._delete_function(**parameters)
             elif tool_name == 'lambda_publish_version':
@@ -341,6 +390,8 @@ class LambdaMCPTools:
                 return self._list_layers(**parameters)
             elif tool_name == 'lambda_publish_layer_version':
                 return self._publish_layer_version(**parameters)
+            elif tool_name == 'lambda_deploy_functions':
+                return self._deploy_functions(**parameters)
             else:
                 return {'error': f'Herramienta Lambda no encontrada: {tool_name}'}
 
@@ -348,21 +399,35 @@ class LambdaMCPTools:
             return {'error': f'Error ejecutando herramienta Lambda {tool_name}: {str(e)}'}
 
     def _list_functions(self, **kwargs) -> Dict[str, Any]:
-        """Lista funciones Lambda"""
+        """
+        Lista funciones Lambda. Sin marker recorre todas las páginas (hasta max_items);
+        con marker devuelve solo esa página. Con enrich añade concurrencia reservada, aliases y event source mappings.
+        """
         client = self._get_client()
 
+        # Se pagina con Marker (no con el paginador) para que next_marker sea válido en otra llamada
         lambda_params = {}
         if kwargs.get('function_version'):
-            lambda_kwargs['FunctionVersion'] = kwargs.get('function_version')
+            lambda_params['FunctionVersion'] = kwargs.get('function_version')
         if kwargs.get('marker'):
-            lambda_kwargs['Marker'] = kwargs.get('marker')
-        if kwargs.get('max_items'):
-            lambda_kwargs['MaxItems'] = kwargs.get('max_items')
-
-        response = client.list_functions(**lambda_params)
+            lambda_params['Marker'] = kwargs.get('marker')
+        single_page = bool(kwargs.get('marker'))
+        max_items = int(kwargs['max_items']) if kwargs.get('max_items') else None
+
+        raw_functions = []
+        while True:
+            remaining = None if max_items is None else max_items - len(raw_functions)
+            if remaining is not None:
+                lambda_params['MaxItems'] = min(remaining, 50)
+            response = client.list_functions(**lambda_params)
+            raw_functions.extend(response['Functions'])
+            next_marker = response.get('NextMarker')
+            if single_page or not next_marker or (max_items is not None and len(raw_functions) >= max_items):
+                break
+            lambda_params['Marker'] = next_marker
 
         functions = []
-        for func in response['Functions']:
+        for func in raw_functions:
             functions.append({
                 'function_name': func['FunctionName'],
                 'function_arn': func['FunctionArn'],
@@ -380,22 +445,38 @@ class LambdaMCPTools:
                 'vpc_config': func.get('VpcConfig'),
                 'state': func.get('State'),
                 'state_reason': func.get('StateReason'),
-                'state_reason_code': func.get('StateReasonCode')
+                'state_reason_code': func.get('StateReasonCode'),
+                'layers': [layer['Arn'] for layer in func.get('Layers', [])]
             })
 
-        return {
+        result = {
             'functions': functions,
             'total_count': len(functions),
-            'next_marker': response.get('NextMarker')
+            'next_marker': next_marker
         }
 
+        if kwargs.get('enrich') and functions:
+            enrich_client = get_aws_client('lambda', client_config=fanout_client_config(
+                lambda_inventory.ENRICH_MAX_WORKERS, lambda_inventory.ENRICH_CALL_TIMEOUT))
+            enriched = lambda_inventory.enrich(
+                enrich_client, get_cache_scope(),
+                [{'name': f['function_name'], 'arn': f['function_arn']} for f in functions])
+            for function, extra in zip(functions, enriched['functions']):
+                function['reserved_concurrency'] = extra['reserved_concurrency']
+                function['aliases'] = extra['aliases']
+                function['event_source_mappings'] = extra['event_source_mappings']
+            result['enrich_errors'] = enriched['errors']
+            result['enrich_seconds'] = enriched['seconds']
+
+        return result
+
     def _get_function(self, **kwargs) -> Dict[str, Any]:
         """Obtiene detalles completos de una función"""
         client = self._get_client()
 
         lambda_params = {'FunctionName': kwargs.get('function_name')}
         if kwargs.get('qualifier'):
-            lambda_kwargs['Qualifier'] = kwargs.get('qualifier')
+            lambda_params['Qualifier'] = kwargs.get('qualifier')
 
         response = client.get_function(**lambda_params)
 
@@ -445,22 +526,23 @@ class LambdaMCPTools:
         }
 
         if kwargs.get('description'):
-            lambda_kwargs['Description'] = kwargs.get('description')
+            lambda_params['Description'] = kwargs.get('description')
         if kwargs.get('timeout'):
-            lambda_kwargs['Timeout'] = kwargs.get('timeout')
+            lambda_params['Timeout'] = kwargs.get('timeout')
         if kwargs.get('memory_size'):
-            lambda_kwargs['MemorySize'] = kwargs.get('memory_size')
+            lambda_params['MemorySize'] = kwargs.get('memory_size')
         if kwargs.get('environment'):
-            lambda_kwargs['Environment'] = {'Variables': kwargs.get('environment')}
+            lambda_params['Environment'] = {'Variables': kwargs.get('environment')}
         if kwargs.get('vpc_config'):
-            lambda_kwargs['VpcConfig'] = {
+            lambda_params['VpcConfig'] = {
                 'SubnetIds': kwargs.get('vpc_config').get('subnet_ids', []),
                 'SecurityGroupIds': kwargs.get('vpc_config').get('security_group_ids', [])
             }
         if kwargs.get('tags'):
-            lambda_kwargs['Tags'] = kwargs.get('tags')
+            lambda_params['Tags'] = kwargs.get('tags')
 
         response = client.create_function(**lambda_params)
+        self._invalidate(kwargs.get('function_name'))
 
         return {
             'message': f'Función Lambda {kwargs.get("function_name")} creada exitosamente',
@@ -470,11 +552,30 @@ class LambdaMCPTools:
             'code_sha256': response['CodeSha256']
         }
 
+    def _load_package(self, params: Dict[str, Any]) -> 'lambda_deploy.CodePackage':
+        """
+        Paquete desde zip_file (base64, decodificado por bloques). Las herramientas MCP no
+        aceptan rutas locales: permitirían leer cualquier fichero del servidor y subirlo.
+        """
+        if params.get('zip_file'):
+            return lambda_deploy.CodePackage.from_base64(params['zip_file'])
+        raise ValueError('Se debe proporcionar zip_file')
+
     def _prepare_code(self, code_params: Dict[str, Any]) -> Dict[str, Any]:
-        """Prepara el código para la función Lambda"""
-        if 'zip_file' in code_params:
-            import base64
-            return {'ZipFile': base64.b64decode(code_params['zip_file'])}
+        """
+        Prepara el código para la función Lambda. Un ZIP mayor que el umbral de staging
+        se sube a S3 (multipart) si hay bucket configurado, en lugar de enviarse en la petición.
+        """
+        if code_params.get('zip_file'):
+            package = self._load_package(code_params)
+            try:
+                staging_bucket = code_params.get('staging_bucket') or lambda_deploy.STAGING_BUCKET
+                if staging_bucket and package.size > lambda_deploy.DEFAULT_S3_THRESHOLD:
+                    staged = lambda_deploy.stage_to_s3(get_aws_client('s3'), package, staging_bucket)
+                    return {'S3Bucket': staged['bucket'], 'S3Key': staged['key']}
+                return {'ZipFile': package.read()}
+            finally:
+                package.close()
         elif 's3_bucket' in code_params and 's3_key' in code_params:
             s3_config = {
                 'S3Bucket': code_params['s3_bucket'],
@@ -482,29 +583,50 @@ class LambdaMCPTools:
             }
             if 's3_object_version' in code_params:
                 s3_config['S3ObjectVersion'] = code_params['s3_object_version']
-            return {'S3Bucket': s3_config['S3Bucket'], 'S3Key': s3_config['S3Key']}
+            return s3_config
         else:
             raise ValueError('Se debe proporcionar zip_file o configuración S3')
 
     def _update_function_code(self, **kwargs) -> Dict[str, Any]:
-        """Actualiza el código de una función"""
+        """Actualiza el código de una función (omitido si el SHA-256 del ZIP no cambia)"""
         client = self._get_client()
 
-        lambda_params = {'FunctionName': kwargs.get('function_name')}
-
         if kwargs.get('zip_file'):
-            import base64
-            lambda_kwargs['ZipFile'] = base64.b64decode(kwargs.get('zip_file'))
-        elif kwargs.get('s3_bucket') and kwargs.get('s3_key'):
-            lambda_kwargs['S3Bucket'] = kwargs.get('s3_bucket')
-            lambda_kwargs['S3Key'] = kwargs.get('s3_key')
+            package = self._load_package(kwargs)
+            try:
+                staging_bucket = kwargs.get('staging_bucket') or lambda_deploy.STAGING_BUCKET
+                result = lambda_deploy.deploy_function(
+                    client, kwargs.get('function_name'), package,
+                    s3=get_aws_client('s3') if staging_bucket else None, staging_bucket=staging_bucket,
+                    force=bool(kwargs.get('force')), publish=bool(kwargs.get('publish')),
+                    architectures=kwargs.get('architectures'))
+            finally:
+                package.close()
+            if result['status'] == 'failed':
+                return {'error': result['error'], 'function_name': kwargs.get('function_name')}
+            if result['status'] == 'deployed':
+                self._invalidate(kwargs.get('function_name'))
+            result['message'] = (f'Código de función {kwargs.get("function_name")} sin cambios; despliegue omitido'
+                                 if result['status'] == 'skipped'
+                                 else f'Código de función {kwargs.get("function_name")} actualizado')
+            return result
+
+        lambda_params = {'FunctionName': kwargs.get('function_name')}
+        if kwargs.get('s3_bucket') and kwargs.get('s3_key'):
+            lambda_params['S3Bucket'] = kwargs.get('s3_bucket')
+            lambda_params['S3Key'] = kwargs.get('s3_key')
             if kwargs.get('s3_object_version'):
-                lambda_kwargs['S3ObjectVersion'] = kwargs.get('s3_object_version')
+                lambda_params['S3ObjectVersion'] = kwargs.get('s3_object_version')
+        else:
+            raise ValueError('Se debe proporcionar zip_file o s3_bucket y s3_key')
 
         if kwargs.get('architectures'):
-            lambda_kwargs['Architectures'] = kwargs.get('architectures')
+            lambda_params['Architectures'] = kwargs.get('architectures')
+        if kwargs.get('publish'):
+            lambda_params['Publish'] = True
 
         response = client.update_function_code(**lambda_params)
+        self._invalidate(kwargs.get('function_name'))
 
         return {
             'message': f'Código de función {kwargs.get("function_name")} actualizado',
@@ -514,6 +636,23 @@ class LambdaMCPTools:
             'last_modified': response['LastModified']
         }
 
+    def _deploy_functions(self, **kwargs) -> Dict[str, Any]:
+        """Despliega un paquete en varias funciones con concurrencia acotada"""
+        function_names = kwargs.get('function_names') or []
+        if not function_names:
+            raise ValueError('Se debe indicar al menos una función')
+        max_workers = max(1, min(int(kwargs.get('max_workers') or lambda_deploy.DEFAULT_WORKERS),
+                                 lambda_deploy.MAX_WORKERS))
+        package = self._load_package(kwargs)
+        try:
+            run = lambda_deploy.deploy_many(
+                get_client_factory(client_config=fanout_client_config(max_workers)), function_names, package,
+                staging_bucket=kwargs.get('staging_bucket') or lambda_deploy.STAGING_BUCKET,
+                max_workers=max_workers, force=bool(kwargs.get('force')), publish=bool(kwargs.get('publish')))
+        finally:
+            package.close()
+        return run.to_dict()
+
     def _update_function_configuration(self, **kwargs) -> Dict[str, Any]:
         """Actualiza la configuración de una función"""
         client = self._get_client()
@@ -521,24 +660,25 @@ class LambdaMCPTools:
         lambda_params = {'FunctionName': kwargs.get('function_name')}
 
         if kwargs.get('description'):
-            lambda_kwargs['Description'] = kwargs.get('description')
+            lambda_params['Description'] = kwargs.get('description')
         if kwargs.get('role'):
-            lambda_kwargs['Role'] = kwargs.get('role')
+            lambda_params['Role'] = kwargs.get('role')
         if kwargs.get('handler'):
-            lambda_kwargs['Handler'] = kwargs.get('handler')
+            lambda_params['Handler'] = kwargs.get('handler')
         if kwargs.get('timeout'):
-            lambda_kwargs['Timeout'] = kwargs.get('timeout')
+            lambda_params['Timeout'] = kwargs.get('timeout')
         if kwargs.get('memory_size'):
-            lambda_kwargs['MemorySize'] = kwargs.get('memory_size')
+            lambda_params['MemorySize'] = kwargs.get('memory_size')
         if kwargs.get('environment'):
-            lambda_kwargs['Environment'] = {'Variables': kwargs.get('environment')}
+            lambda_params['Environment'] = {'Variables': kwargs.get('environment')}
         if kwargs.get('vpc_config'):
-            lambda_kwargs['VpcConfig'] = {
+            lambda_params['VpcConfig'] = {
                 'SubnetIds': kwargs.get('vpc_config').get('subnet_ids', []),
                 'SecurityGroupIds': kwargs.get('vpc_config').get('security_group_ids', [])
             }
 
         response = client.update_function_configuration(**lambda_params)
+        self._invalidate(kwargs.get('function_name'))
 
         return {
             'message': f'Configuración de función {kwargs.get("function_name")} actualizada',
@@ -557,9 +697,11 @@ class LambdaMCPTools:
         }
 
         if kwargs.get('payload'):
-            lambda_kwargs['Payload'] = kwargs.get('payload')
+            lambda_params['Payload'] = kwargs.get('payload')
         if kwargs.get('qualifier'):
-            lambda_kwargs['Qualifier'] = kwargs.get('qualifier')
+            lambda_params['Qualifier'] = kwargs.get('qualifier')
+        if lambda_params['InvocationType'] == 'RequestResponse':
+            lambda_params['LogType'] = 'Tail'
 
         response = client.invoke(**lambda_params)
 
@@ -573,7 +715,21 @@ class LambdaMCPTools:
         if 'LogResult' in response:
             import base64
             result['log_result'] = base64.b64decode(response['LogResult']).decode('utf-8')
+            result['report'] = lambda_load.parse_report(response['LogResult'])
+
+        return result
 
+    def _load_test(self, **kwargs) -> Dict[str, Any]:
+        """Lanza N invocaciones con concurrencia C y devuelve percentiles y throughput"""
+        concurrency = kwargs.get('concurrency') or lambda_load.DEFAULT_CONCURRENCY
+        client = get_aws_client('lambda', client_config=lambda_load.load_client_config(concurrency))
+        result = lambda_load.run_load(
+            client, kwargs.get('function_name'),
+            invocations=kwargs.get('invocations') or lambda_load.DEFAULT_INVOCATIONS,
+            concurrency=concurrency, payload_template=kwargs.get('payload_template') or '{}',
+            qualifier=kwargs.get('qualifier'), max_seconds=kwargs.get('max_seconds'))
+        if not kwargs.get('include_invocations'):
+            result.pop('invocations')
         return result
 
     def _delete_function(self, **kwargs) -> Dict[str, Any]:
@@ -582,9 +738,10 @@ class LambdaMCPTools:
 
         lambda_params = {'FunctionName': kwargs.get('function_name')}
         if kwargs.get('qualifier'):
-            lambda_kwargs['Qualifier'] = kwargs.get('qualifier')
+            lambda_params['Qualifier'] = kwargs.get('qualifier')
 
         client.delete_function(**lambda_params)
+        self._invalidate(kwargs.get('function_name'))
 
         return {
             'message': f'Función Lambda {kwargs.get("function_name")} eliminada exitosamente',
@@ -598,9 +755,9 @@ class LambdaMCPTools:
         lambda_params = {'FunctionName': kwargs.get('function_name')}
 
         if kwargs.get('code_sha256'):
-            lambda_kwargs['CodeSha256'] = kwargs.get('code_sha256')
+            lambda_params['CodeSha256'] = kwargs.get('code_sha256')
         if kwargs.get('description'):
-            lambda_kwargs['Description'] = kwargs.get('description')
+            lambda_params['Description'] = kwargs.get('description')
 
         response = client.publish_version(**lambda_params)
 
@@ -619,9 +776,9 @@ class LambdaMCPTools:
         lambda_params = {'FunctionName': kwargs.get('function_name')}
 
         if kwargs.get('marker'):
-            lambda_kwargs['Marker'] = kwargs.get('marker')
+            lambda_params['Marker'] = kwargs.get('marker')
         if kwargs.get('max_items'):
-            lambda_kwargs['MaxItems'] = kwargs.get('max_items')
+            lambda_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_versions_by_function(**lambda_params)
 
@@ -652,9 +809,10 @@ class LambdaMCPTools:
         }
 
         if kwargs.get('description'):
-            lambda_kwargs['Description'] = kwargs.get('description')
+            lambda_params['Description'] = kwargs.get('description')
 
         response = client.create_alias(**lambda_params)
+        self._invalidate(kwargs.get('function_name'))
 
         return {
             'message': f'Alias {kwargs.get("name")} creado para función {kwargs.get("function_name")}',
@@ -671,11 +829,11 @@ class LambdaMCPTools:
         lambda_params = {'FunctionName': kwargs.get('function_name')}
 
         if kwargs.get('function_version'):
-            lambda_kwargs['FunctionVersion'] = kwargs.get('function_version')
+            lambda_params['FunctionVersion'] = kwargs.get('function_version')
         if kwargs.get('marker'):
-            lambda_kwargs['Marker'] = kwargs.get('marker')
+            lambda_params['Marker'] = kwargs.get('marker')
         if kwargs.get('max_items'):
-            lambda_kwargs['MaxItems'] = kwargs.get('max_items')
+            lambda_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_aliases(**lambda_params)
 
@@ -701,13 +859,13 @@ class LambdaMCPTools:
 
         lambda_params = {}
         if kwargs.get('event_source_arn'):
-            lambda_kwargs['EventSourceArn'] = kwargs.get('event_source_arn')
+            lambda_params['EventSourceArn'] = kwargs.get('event_source_arn')
         if kwargs.get('function_name'):
-            lambda_kwargs['FunctionName'] = kwargs.get('function_name')
+            lambda_params['FunctionName'] = kwargs.get('function_name')
         if kwargs.get('marker'):
-            lambda_kwargs['Marker'] = kwargs.get('marker')
+            lambda_params['Marker'] = kwargs.get('marker')
         if kwargs.get('max_items'):
-            lambda_kwargs['MaxItems'] = kwargs.get('max_items')
+            lambda_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_event_source_mappings(**lambda_params)
 
@@ -741,15 +899,16 @@ class LambdaMCPTools:
         }
 
         if kwargs.get('enabled'):
-            lambda_kwargs['Enabled'] = kwargs.get('enabled')
+            lambda_params['Enabled'] = kwargs.get('enabled')
         if kwargs.get('batch_size'):
-            lambda_kwargs['BatchSize'] = kwargs.get('batch_size')
+            lambda_params['BatchSize'] = kwargs.get('batch_size')
         if kwargs.get('starting_position'):
-            lambda_kwargs['StartingPosition'] = kwargs.get('starting_position')
+            lambda_params['StartingPosition'] = kwargs.get('starting_position')
         if kwargs.get('starting_position_timestamp'):
-            lambda_kwargs['StartingPositionTimestamp'] = kwargs.get('starting_position_timestamp')
+            lambda_params['StartingPositionTimestamp'] = kwargs.get('starting_position_timestamp')
 
         response = client.create_event_source_mapping(**lambda_params)
+        self._invalidate(kwargs.get('function_name'))
 
         return {
             'message': f'Mapeo de fuente de eventos creado para función {kwargs.get("function_name")}',
@@ -763,7 +922,9 @@ class LambdaMCPTools:
         """Elimina un mapeo de fuente de eventos"""
         client = self._get_client()
 
-        client.delete_event_source_mapping(UUID=kwargs.get('uuid'))
+        response = client.delete_event_source_mapping(UUID=kwargs.get('uuid'))
+        function_arn = response.get('FunctionArn', '').split(':')
+        self._invalidate(function_arn[6] if len(function_arn) > 6 else None)
 
         return {
             'message': f'Mapeo de fuente de eventos {kwargs.get("uuid")} eliminado',
@@ -776,7 +937,7 @@ class LambdaMCPTools:
 
         lambda_params = {'FunctionName': kwargs.get('function_name')}
         if kwargs.get('qualifier'):
-            lambda_kwargs['Qualifier'] = kwargs.get('qualifier')
+            lambda_params['Qualifier'] = kwargs.get('qualifier')
 
         response = client.get_function_configuration(**lambda_params)
 
@@ -810,11 +971,11 @@ class LambdaMCPTools:
 
         lambda_params = {}
         if kwargs.get('compatible_runtime'):
-            lambda_kwargs['CompatibleRuntime'] = kwargs.get('compatible_runtime')
+            lambda_params['CompatibleRuntime'] = kwargs.get('compatible_runtime')
         if kwargs.get('marker'):
-            lambda_kwargs['Marker'] = kwargs.get('marker')
+            lambda_params['Marker'] = kwargs.get('marker')
         if kwargs.get('max_items'):
-            lambda_kwargs['MaxItems'] = kwargs.get('max_items')
+            lambda_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_layers(**lambda_params)
 
@@ -852,9 +1013,9 @@ class LambdaMCPTools:
         }
 
         if kwargs.get('compatible_runtimes'):
-            lambda_kwargs['CompatibleRuntimes'] = kwargs.get('compatible_runtimes')
+            lambda_params['CompatibleRuntimes'] = kwargs.get('compatible_runtimes')
         if kwargs.get('description'):
-            lambda_kwargs['Description'] = kwargs.get('description')
+            lambda_params['Description'] = kwargs.get('description')
 
         response = client.publish_layer_version(**lambda_params)
 
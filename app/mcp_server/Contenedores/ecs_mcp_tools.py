@@ -8,6 +8,8 @@ import json
 from typing import Dict, List, Any, Optional
 from botocore.exceptions import ClientError, BotoCoreError
 import os
+from app.utils import ecs_batch
+from app.utils.fanout import fan_out
 
 
 class ECSTools:
@@ -25,31 +27,30 @@ class ECSTools:
             print(f"Error initializing ECS client: {e}")
             self.ecs_client = None
 
+    def _cache_scope(self):
+        """Cache scope for shared ECS results (client credentials come from the environment)"""
+        return ('ecs-mcp', self.ecs_client.meta.region_name)
+
     def list_clusters(self) -> Dict[str, Any]:
         """List all ECS clusters"""
         try:
             if not self.ecs_client:
                 return {"error": "ECS client not initialized"}
 
-            response = self.ecs_client.list_clusters()
+            # Paginated list + describe_clusters in batches of 100
+            described = ecs_batch.describe_clusters(self.ecs_client, scope=self._cache_scope())
             clusters = []
 
-            if response.get('clusterArns'):
-                # Get detailed cluster information
-                describe_response = self.ecs_client.describe_clusters(
-                    clusters=response['clusterArns']
-                )
-
-                for cluster in describe_response.get('clusters', []):
-                    clusters.append({
-                        'clusterName': cluster.get('clusterName'),
-                        'clusterArn': cluster.get('clusterArn'),
-                        'status': cluster.get('status'),
-                        'registeredContainerInstancesCount': cluster.get('registeredContainerInstancesCount', 0),
-                        'runningTasksCount': cluster.get('runningTasksCount', 0),
-                        'pendingTasksCount': cluster.get('pendingTasksCount', 0),
-                        'activeServicesCount': cluster.get('activeServicesCount', 0)
-                    })
+            for cluster in described['clusters']:
+                clusters.append({
+                    'clusterName': cluster.get('clusterName'),
+                    'clusterArn': cluster.get('clusterArn'),
+                    'status': cluster.get('status'),
+                    'registeredContainerInstancesCount': cluster.get('registeredContainerInstancesCount', 0),
+                    'runningTasksCount': cluster.get('runningTasksCount', 0),
+                    'pendingTasksCount': cluster.get('pendingTasksCount', 0),
+                    'activeServicesCount': cluster.get('activeServicesCount', 0)
+                })
 
             return {
                 "success": True,
@@ -75,6 +76,8 @@ class ECSTools:
                 clusterName=cluster_name.strip()
             )
 
+            ecs_batch.invalidate(self._cache_scope())
+
             cluster = response.get('cluster', {})
             return {
                 "success": True,
@@ -116,6 +119,8 @@ class ECSTools:
                 cluster=cluster_name.strip()
             )
 
+            ecs_batch.invalidate(self._cache_scope())
+
             return {
                 "success": True,
                 "message": f"Cluster '{cluster_name}' deleted successfully"
@@ -135,41 +140,37 @@ class ECSTools:
             services = []
 
             if cluster_name:
-                # List services in specific cluster
-                response = self.ecs_client.list_services(
-                    cluster=cluster_name
-                )
-
-                if response.get('serviceArns'):
-                    describe_response = self.ecs_client.describe_services(
-                        cluster=cluster_name,
-                        services=response['serviceArns']
-                    )
-
-                    for service in describe_response.get('services', []):
-                        services.append({
-                            'serviceName': service.get('serviceName'),
-                            'serviceArn': service.get('serviceArn'),
-                            'clusterArn': service.get('clusterArn'),
-                            'status': service.get('status'),
-                            'desiredCount': service.get('desiredCount', 0),
-                            'runningCount': service.get('runningCount', 0),
-                            'pendingCount': service.get('pendingCount', 0),
-                            'taskDefinition': service.get('taskDefinition'),
-                            'createdAt': service.get('createdAt').isoformat() if service.get('createdAt') else None
-                        })
+                # List services in specific cluster (paginated, described 10 at a time)
+                cluster_results = {cluster_name: ecs_batch.cluster_services(
+                    self.ecs_client, cluster_name, scope=self._cache_scope())}
+                errors = []
             else:
-                # List services across all clusters
-                clusters_response = self.ecs_client.list_clusters()
-                for cluster_arn in clusters_response.get('clusterArns', []):
-                    cluster_services = self.list_services(cluster_arn.split('/')[-1])
-                    if cluster_services.get('success'):
-                        services.extend(cluster_services.get('services', []))
+                # List services across all clusters concurrently
+                outcome = ecs_batch.across_clusters(
+                    self.ecs_client, ecs_batch.cluster_services, scope=self._cache_scope())
+                cluster_results = outcome['results']
+                errors = [f'{cluster}: {error}' for cluster, error in outcome['errors'].items()]
+
+            for described in cluster_results.values():
+                errors.extend(described['errors'])
+                for service in described['services']:
+                    services.append({
+                        'serviceName': service.get('serviceName'),
+                        'serviceArn': service.get('serviceArn'),
+                        'clusterArn': service.get('clusterArn'),
+                        'status': service.get('status'),
+                        'desiredCount': service.get('desiredCount', 0),
+                        'runningCount': service.get('runningCount', 0),
+                        'pendingCount': service.get('pendingCount', 0),
+                        'taskDefinition': service.get('taskDefinition'),
+                        'createdAt': service.get('createdAt').isoformat() if service.get('createdAt') else None
+                    })
 
             return {
                 "success": True,
                 "services": services,
-                "count": len(services)
+                "count": len(services),
+                "errors": errors
             }
 
         except ClientError as e:
@@ -196,6 +197,8 @@ class ECSTools:
                 desiredCount=desired_count
             )
 
+            ecs_batch.invalidate(self._cache_scope())
+
             service = response.get('service', {})
             return {
                 "success": True,
@@ -237,6 +240,8 @@ class ECSTools:
 
             response = self.ecs_client.update_service(**update_params)
 
+            ecs_batch.invalidate(self._cache_scope())
+
             service = response.get('service', {})
             return {
                 "success": True,
@@ -275,6 +280,7 @@ class ECSTools:
                 cluster=cluster_name,
                 service=service_name
             )
+            ecs_batch.invalidate(self._cache_scope())
 
             return {
                 "success": True,
@@ -295,39 +301,36 @@ class ECSTools:
             tasks = []
 
             if cluster_name:
-                response = self.ecs_client.list_tasks(
-                    cluster=cluster_name
-                )
-
-                if response.get('taskArns'):
-                    describe_response = self.ecs_client.describe_tasks(
-                        cluster=cluster_name,
-                        tasks=response['taskArns']
-                    )
-
-                    for task in describe_response.get('tasks', []):
-                        tasks.append({
-                            'taskArn': task.get('taskArn'),
-                            'clusterArn': task.get('clusterArn'),
-                            'taskDefinitionArn': task.get('taskDefinitionArn'),
-                            'lastStatus': task.get('lastStatus'),
-                            'desiredStatus': task.get('desiredStatus'),
-                            'createdAt': task.get('createdAt').isoformat() if task.get('createdAt') else None,
-                            'startedAt': task.get('startedAt').isoformat() if task.get('startedAt') else None,
-                            'stoppedAt': task.get('stoppedAt').isoformat() if task.get('stoppedAt') else None
-                        })
+                # List tasks in specific cluster (paginated, described 100 at a time)
+                cluster_results = {cluster_name: ecs_batch.cluster_tasks(
+                    self.ecs_client, cluster_name, scope=self._cache_scope())}
+                errors = []
             else:
-                # List tasks across all clusters
-                clusters_response = self.ecs_client.list_clusters()
-                for cluster_arn in clusters_response.get('clusterArns', []):
-                    cluster_tasks = self.list_tasks(cluster_arn.split('/')[-1])
-                    if cluster_tasks.get('success'):
-                        tasks.extend(cluster_tasks.get('tasks', []))
+                # List tasks across all clusters concurrently
+                outcome = ecs_batch.across_clusters(
+                    self.ecs_client, ecs_batch.cluster_tasks, scope=self._cache_scope())
+                cluster_results = outcome['results']
+                errors = [f'{cluster}: {error}' for cluster, error in outcome['errors'].items()]
+
+            for described in cluster_results.values():
+                errors.extend(described['errors'])
+                for task in described['tasks']:
+                    tasks.append({
+                        'taskArn': task.get('taskArn'),
+                        'clusterArn': task.get('clusterArn'),
+                        'taskDefinitionArn': task.get('taskDefinitionArn'),
+                        'lastStatus': task.get('lastStatus'),
+                        'desiredStatus': task.get('desiredStatus'),
+                        'createdAt': task.get('createdAt').isoformat() if task.get('createdAt') else None,
+                        'startedAt': task.get('startedAt').isoformat() if task.get('startedAt') else None,
+                        'stoppedAt': task.get('stoppedAt').isoformat() if task.get('stoppedAt') else None
+                    })
 
             return {
                 "success": True,
                 "tasks": tasks,
-                "count": len(tasks)
+                "count": len(tasks),
+                "errors": errors
             }
 
         except ClientError as e:
@@ -354,6 +357,8 @@ class ECSTools:
                 launchType=launch_type
             )
 
+            ecs_batch.invalidate(self._cache_scope())
+
             tasks = response.get('tasks', [])
             failures = response.get('failures', [])
 
@@ -387,6 +392,8 @@ class ECSTools:
                 task=task_arn
             )
 
+            ecs_batch.invalidate(self._cache_scope())
+
             task = response.get('task', {})
             return {
                 "success": True,
@@ -409,18 +416,17 @@ class ECSTools:
             if not self.ecs_client:
                 return {"error": "ECS client not initialized"}
 
-            response = self.ecs_client.list_task_definitions()
+            # Latest 10 revisions in a single call, described concurrently
+            response = self.ecs_client.list_task_definitions(sort='DESC', maxResults=10)
+            described = fan_out(
+                lambda arn: self.ecs_client.describe_task_definition(taskDefinition=arn).get('taskDefinition', {}),
+                response.get('taskDefinitionArns', []))
 
             task_definitions = []
 
-            if response.get('taskDefinitionArns'):
+            if described.results:
                 # Get detailed task definition information
-                for arn in response['taskDefinitionArns'][:10]:  # Limit to latest 10
-                    describe_response = self.ecs_client.describe_task_definition(
-                        taskDefinition=arn
-                    )
-
-                    task_def = describe_response.get('taskDefinition', {})
+                for task_def in described.values():
                     task_definitions.append({
                         'taskDefinitionArn': task_def.get('taskDefinitionArn'),
                         'family': task_def.get('family'),
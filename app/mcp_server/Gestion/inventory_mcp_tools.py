@@ -0,0 +1,84 @@
+"""
+MCP Tools para el inventario de recursos
+Lecturas desde la instantánea local en lugar de consultar cada servicio de AWS
+"""
+from typing import Dict, List, Any
+from app.utils.aws_client import get_client_factory
+from app.utils import inventory
+
+
+class InventoryMCPTools:
+    """Herramientas MCP sobre el inventario de recursos de la cuenta"""
+
+    def get_tools(self) -> List[Dict[str, Any]]:
+        """Retorna la lista de herramientas disponibles para el inventario"""
+        services = sorted(inventory.INVENTORY_SERVICES)
+        return [
+            {
+                'name': 'inventory_summary',
+                'description': 'Resumen del inventario: número de recursos por servicio (EC2, S3, RDS, Lambda, DynamoDB, VPC, ECS, EKS, SQS, SNS...) sin consultar AWS',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {}
+                },
+                'function': self._summary
+            },
+            {
+                'name': 'inventory_list_resources',
+                'description': 'Lista los recursos de un servicio desde el inventario (se recolecta solo si la instantánea no es válida)',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'service': {'type': 'string', 'description': f'Servicio: {", ".join(services)}'},
+                        'refresh': {'type': 'boolean', 'description': 'Forzar la recolección del servicio', 'default': False}
+                    },
+                    'required': ['service']
+                },
+                'function': self._list_resources
+            },
+            {
+                'name': 'inventory_refresh',
+                'description': 'Refresca el inventario: incremental (cambios detectados por AWS Config/CloudTrail) o completo',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'full': {'type': 'boolean', 'description': 'Recolectar todos los servicios', 'default': False}
+                    }
+                },
+                'function': self._refresh
+            }
+        ]
+
+    def _summary(self, **kwargs) -> Dict[str, Any]:
+        factory = get_client_factory()
+        inventory.ensure_fresh(factory)
+        summary = inventory.store.summary(factory.scope)
+        return {
+            'region': factory.region,
+            'checked_at': summary['checked_at'],
+            'refreshing': summary['refreshing'],
+            'counts': {name: service['count'] for name, service in summary['services'].items()},
+            'errors': {name: service['error'] for name, service in summary['services'].items() if service['error']}
+        }
+
+    def _list_resources(self, **kwargs) -> Dict[str, Any]:
+        service = kwargs.get('service')
+        if service not in inventory.INVENTORY_SERVICES:
+            return {'error': f'Servicio no inventariado: {service}',
+                    'available_services': sorted(inventory.INVENTORY_SERVICES)}
+        factory = get_client_factory()
+        if kwargs.get('refresh'):
+            inventory.mark_dirty(factory.scope, service)
+        entry = inventory.get_items(factory, service)
+        return {
+            'service': service,
+            'resources': entry['items'],
+            'total_count': entry['count'],
+            'refreshed_at': entry['refreshed_at']
+        }
+
+    def _refresh(self, **kwargs) -> Dict[str, Any]:
+        report = inventory.refresh_now(get_client_factory(), full=bool(kwargs.get('full')))
+        if report is None:
+            return {'message': 'Ya hay un refresco del inventario en curso'}
+        return report
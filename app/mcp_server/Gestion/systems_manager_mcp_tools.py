@@ -4,7 +4,8 @@ Gestión de parámetros, comandos y sesiones
 """
 import boto3
 from typing import List, Dict, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import secret_values
 
 
 class SystemsManagerMCPTools:
@@ -24,10 +25,14 @@ class SystemsManagerMCPTools:
                     "properties": {
                         "max_results": {
                             "type": "integer",
-                            "description": "Número máximo de resultados (1-10)",
+                            "description": "Número máximo de resultados (1-50)",
                             "default": 10,
                             "minimum": 1,
-                            "maximum": 10
+                            "maximum": 50
+                        },
+                        "next_token": {
+                            "type": "string",
+                            "description": "Token de la página anterior"
                         },
                         "parameter_filters": {
                             "type": "array",
@@ -36,7 +41,7 @@ class SystemsManagerMCPTools:
                                 "type": "object",
                                 "properties": {
                                     "key": {"type": "string", "enum": ["Name", "Type", "KeyId", "Path", "Tier"]},
-                                    "option": {"type": "string", "enum": ["Equal", "BeginsWith"]},
+                                    "option": {"type": "string", "enum": ["Equals", "BeginsWith", "Recursive", "OneLevel"]},
                                     "values": {"type": "array", "items": {"type": "string"}}
                                 },
                                 "required": ["key", "option", "values"]
@@ -64,6 +69,50 @@ class SystemsManagerMCPTools:
                     "required": ["name"]
                 }
             },
+            {
+                "name": "ssm_get_parameters",
+                "description": "Obtiene varios parámetros en bloque (10 por llamada, con caché)",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "names": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Nombres de los parámetros (admite nombre:versión)"
+                        },
+                        "with_decryption": {
+                            "type": "boolean",
+                            "description": "Si es True, desencripta parámetros SecureString",
+                            "default": True
+                        }
+                    },
+                    "required": ["names"]
+                }
+            },
+            {
+                "name": "ssm_get_parameters_by_path",
+                "description": "Obtiene todos los parámetros de una jerarquía (paginado, con caché)",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "Jerarquía, p. ej. /app/prod"
+                        },
+                        "recursive": {
+                            "type": "boolean",
+                            "description": "Incluir todos los niveles por debajo de path",
+                            "default": True
+                        },
+                        "with_decryption": {
+                            "type": "boolean",
+                            "description": "Si es True, desencripta parámetros SecureString",
+                            "default": True
+                        }
+                    },
+                    "required": ["path"]
+                }
+            },
             {
                 "name": "ssm_put_parameter",
                 "description": "Crea o actualiza un parámetro en Parameter Store",
@@ -272,6 +321,10 @@ class SystemsManagerMCPTools:
                 return self._list_parameters(**parameters)
             elif tool_name == "ssm_get_parameter":
                 return self._get_parameter(**parameters)
+            elif tool_name == "ssm_get_parameters":
+                return self._get_parameters(**parameters)
+            elif tool_name == "ssm_get_parameters_by_path":
+                return self._get_parameters_by_path(**parameters)
             elif tool_name == "ssm_put_parameter":
                 return self._put_parameter(**parameters)
             elif tool_name == "ssm_delete_parameter":
@@ -297,14 +350,20 @@ class SystemsManagerMCPTools:
     def _list_parameters(self, **kwargs) -> Dict[str, Any]:
         """Lista parámetros de Parameter Store"""
         try:
-            kwargs = {
-                "MaxResults": min(kwargs.get("max_results", 10), 10)
+            params = {
+                "MaxResults": max(1, min(kwargs.get("max_results", 10), secret_values.DESCRIBE_PAGE_SIZE))
             }
 
+            if kwargs.get("next_token"):
+                params["NextToken"] = kwargs.get('next_token')
+
             if kwargs.get("parameter_filters"):
-                kwargs["ParameterFilters"] = kwargs.get('parameter_filters')
+                params["ParameterFilters"] = [
+                    {"Key": f.get("key"), "Option": f.get("option"), "Values": f.get("values", [])}
+                    for f in kwargs.get('parameter_filters')
+                ]
 
-            response = self.ssm.describe_parameters(**kwargs)
+            response = self.ssm.describe_parameters(**params)
 
             parameters = []
             for param in response.get("Parameters", []):
@@ -328,28 +387,56 @@ class SystemsManagerMCPTools:
     def _get_parameter(self, **kwargs) -> Dict[str, Any]:
         """Obtiene un parámetro específico"""
         try:
-            response = self.ssm.get_parameter(
-                Name=kwargs.get('name'),
-                WithDecryption=kwargs.get("with_decryption", True)
-            )
+            parameter = secret_values.get_parameter(self.ssm, get_cache_scope(), kwargs.get('name'),
+                                                    decrypt=kwargs.get("with_decryption", True),
+                                                    refresh=kwargs.get("refresh", False))
+            return self._format_parameter(parameter)
 
-            parameter = response.get("Parameter", {})
+        except Exception as e:
+            return {"error": f"Error obteniendo parámetro: {str(e)}"}
+
+    @staticmethod
+    def _format_parameter(parameter: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": parameter.get("Name"),
+            "value": parameter.get("Value"),
+            "type": parameter.get("Type"),
+            "version": parameter.get("Version"),
+            "last_modified_date": parameter.get("LastModifiedDate").isoformat() if parameter.get("LastModifiedDate") else None,
+            "tier": parameter.get("Tier", "Standard")
+        }
+
+    def _get_parameters(self, **kwargs) -> Dict[str, Any]:
+        """Obtiene varios parámetros en bloque"""
+        try:
+            found, invalid = secret_values.get_parameters(self.ssm, get_cache_scope(), kwargs.get('names', []),
+                                                          decrypt=kwargs.get("with_decryption", True))
             return {
-                "name": parameter.get("Name"),
-                "value": parameter.get("Value"),
-                "type": parameter.get("Type"),
-                "version": parameter.get("Version"),
-                "last_modified_date": parameter.get("LastModifiedDate").isoformat() if parameter.get("LastModifiedDate") else None,
-                "tier": parameter.get("Tier", "Standard")
+                "parameters": {name: self._format_parameter(p) for name, p in found.items()},
+                "invalid_parameters": invalid
             }
 
         except Exception as e:
-            return {"error": f"Error obteniendo parámetro: {str(e)}"}
+            return {"error": f"Error obteniendo parámetros: {str(e)}"}
+
+    def _get_parameters_by_path(self, **kwargs) -> Dict[str, Any]:
+        """Obtiene todos los parámetros de una jerarquía"""
+        try:
+            found = secret_values.get_parameters_by_path(self.ssm, get_cache_scope(), kwargs.get('path'),
+                                                         recursive=kwargs.get("recursive", True),
+                                                         decrypt=kwargs.get("with_decryption", True))
+            return {
+                "parameters": [self._format_parameter(p) for p in found],
+                "count": len(found)
+            }
+
+        except Exception as e:
+            return {"error": f"Error obteniendo parámetros por jerarquía: {str(e)}"}
 
     def _put_parameter(self, **kwargs) -> Dict[str, Any]:
         """Crea o actualiza un parámetro"""
         try:
-            kwargs = {
+            params = {
                 "Name": kwargs.get('name'),
                 "Value": kwargs.get('value'),
                 "Type": kwargs.get('type'),
@@ -357,15 +444,16 @@ class SystemsManagerMCPTools:
             }
 
             if kwargs.get("description"):
-                kwargs["Description"] = kwargs.get('description')
+                params["Description"] = kwargs.get('description')
 
             if kwargs.get("tier"):
-                kwargs["Tier"] = kwargs.get('tier')
+                params["Tier"] = kwargs.get('tier')
 
             if kwargs.get("type") == "SecureString" and kwargs.get("key_id"):
-                kwargs["KeyId"] = kwargs.get('key_id')
+                params["KeyId"] = kwargs.get('key_id')
 
-            response = self.ssm.put_parameter(**kwargs)
+            response = self.ssm.put_parameter(**params)
+            secret_values.invalidate_parameter(get_cache_scope(), kwargs.get('name'))
 
             return {
                 "version": response.get("Version"),
@@ -379,6 +467,7 @@ class SystemsManagerMCPTools:
         """Elimina un parámetro"""
         try:
             self.ssm.delete_parameter(Name=kwargs.get('name'))
+            secret_values.invalidate_parameter(get_cache_scope(), kwargs.get('name'))
             return {"message": f"Parámetro {kwargs.get('name')} eliminado exitosamente"}
 
         except Exception as e:
@@ -6,6 +6,8 @@ import logging
 import base64
 from datetime import datetime
 
+from app.utils import polly_synthesis
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,7 +31,7 @@ class PollyMCPTools:
                     'properties': {
                         'text': {
                             'type': 'string',
-                            'description': 'Texto a convertir en voz (máximo 3000 caracteres para voz estándar, 6000 para neural)'
+                            'description': 'Texto a convertir en voz (hasta 100.000 caracteres; los textos largos se sintetizan por fragmentos)'
                         },
                         'voice_id': {
                             'type': 'string',
@@ -253,7 +255,9 @@ class PollyMCPTools:
                          sample_rate: Optional[str] = None, text_type: str = 'text',
                          **kwargs) -> Dict[str, Any]:
         """
-        Sintetiza texto a voz y retorna el audio codificado en base64
+        Sintetiza texto a voz y retorna el audio codificado en base64. Los textos largos se
+        dividen por frases y se sintetizan en paralelo; el resultado se reutiliza desde la
+        caché en disco.
         
         Args:
             text: Texto a sintetizar
@@ -265,39 +269,31 @@ class PollyMCPTools:
             text_type: text o ssml
         """
         try:
-            params = {
-                'Text': text,
-                'VoiceId': voice_id,
-                'OutputFormat': output_format,
-                'Engine': engine,
-                'TextType': text_type
-            }
-            
-            if language_code:
-                params['LanguageCode'] = language_code
-            if sample_rate:
-                params['SampleRate'] = sample_rate
-            
-            response = self.client.synthesize_speech(**params)
+            params = polly_synthesis.synthesis_params(
+                voice_id=voice_id, engine=engine, output_format=output_format, text_type=text_type,
+                sample_rate=sample_rate, language_code=language_code)
             
-            # Leer el audio stream
-            audio_stream = response['AudioStream'].read()
-            
-            # Codificar en base64 para retornar como JSON
-            audio_base64 = base64.b64encode(audio_stream).decode('utf-8')
+            result = polly_synthesis.synthesize_to_bytes(self.client, text, params)
+            audio_stream = result['audio']
             
-            return {
+            response = {
                 'success': True,
                 'message': f'Audio sintetizado exitosamente con voz {voice_id}',
-                'audio_base64': audio_base64,
-                'content_type': response.get('ContentType', f'audio/{output_format}'),
+                'content_type': result['content_type'],
                 'size_bytes': len(audio_stream),
-                'request_characters': response.get('RequestCharacters', len(text)),
+                'request_characters': len(text),
+                'chunks': result['chunks'],
+                'cached': result['cached'],
                 'voice_id': voice_id,
                 'engine': engine,
                 'format': output_format
             }
             
+            # Codificar en base64 para retornar como JSON
+            response['audio_base64'] = base64.b64encode(audio_stream).decode('utf-8')
+            
+            return response
+            
         except ClientError as e:
             error_code = e.response['Error']['Code']
             error_msg = e.response['Error']['Message']
@@ -5,6 +5,10 @@ import base64
 import logging
 from io import BytesIO
 
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils.fanout import fanout_client_config
+from app.utils import rekognition_batch
+
 logger = logging.getLogger(__name__)
 
 class RekognitionMCPTools:
@@ -206,6 +210,35 @@ class RekognitionMCPTools:
                 'message': f"Error al detectar texto: {str(e)}"
             }
 
+    def batch_analyze(self, params: Dict[str, Any] = None, **kwargs) -> Dict[str, Any]:
+        """Analiza las imágenes de un prefijo de S3 (S3Object, TPS limitado, caché por ETag)"""
+        params = params or kwargs
+        try:
+            region = params.get('region', self.region)
+            max_workers = int(params.get('max_workers', rekognition_batch.DEFAULT_WORKERS))
+            client_config = fanout_client_config(max_workers, 30)
+            records = list(rekognition_batch.run_batch(
+                get_aws_client('rekognition', region, client_config=client_config),
+                get_aws_client('s3', region, client_config=client_config),
+                get_cache_scope(region), params['bucket'], params.get('prefix', ''),
+                params.get('analysis', 'labels'),
+                {'max_labels': int(params.get('max_labels', 10)),
+                 'min_confidence': float(params.get('min_confidence', 70.0))},
+                max_images=int(params.get('max_images', rekognition_batch.DEFAULT_MAX_IMAGES)),
+                max_workers=max_workers,
+                tps=float(params.get('tps', rekognition_batch.DEFAULT_TPS))))
+            summary = records.pop()
+            images = sorted(records, key=lambda record: record['key'])
+            return {'summary': summary, 'images': images}
+
+        except Exception as e:
+            logger.exception(f"Error en el análisis por lotes: {e}")
+            return {
+                'error': str(e),
+                'images': [],
+                'message': f"Error en el análisis por lotes: {str(e)}"
+            }
+
 # Instancia global
 rekognition_tools = RekognitionMCPTools()
 
@@ -305,5 +338,53 @@ REKOGNITION_MCP_TOOLS = [
             },
             'required': ['image_base64']
         }
+    },
+    {
+        'name': 'batch_analyze',
+        'description': 'Analiza todas las imágenes JPEG/PNG de un prefijo de S3 con Amazon Rekognition (en paralelo, con límite de TPS y caché por ETag)',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'bucket': {
+                    'type': 'string',
+                    'description': 'Bucket S3 con las imágenes'
+                },
+                'prefix': {
+                    'type': 'string',
+                    'description': 'Prefijo de las claves a analizar'
+                },
+                'analysis': {
+                    'type': 'string',
+                    'description': 'Tipo de análisis: labels, faces, text o moderation',
+                    'default': 'labels'
+                },
+                'region': {
+                    'type': 'string',
+                    'description': 'Región de AWS (por defecto us-east-1)',
+                    'default': 'us-east-1'
+                },
+                'max_images': {
+                    'type': 'integer',
+                    'description': 'Número máximo de imágenes a analizar',
+                    'default': 500
+                },
+                'max_workers': {
+                    'type': 'integer',
+                    'description': 'Llamadas concurrentes',
+                    'default': 8
+                },
+                'tps': {
+                    'type': 'number',
+                    'description': 'Llamadas por segundo permitidas a Rekognition para la cuenta',
+                    'default': 5
+                },
+                'min_confidence': {
+                    'type': 'number',
+                    'description': 'Confianza mínima (0-100)',
+                    'default': 70.0
+                }
+            },
+            'required': ['bucket']
+        }
     }
-]
\ No newline at end of file
+]
@@ -3,7 +3,10 @@ Herramientas MCP para AWS EventBridge
 """
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import eventbridge_events
+from app.utils.event_patterns import normalize_event
+from app.utils.fanout import fanout_client_config
 
 
 class EventBridgeMCPTools:
@@ -99,14 +102,8 @@ class EventBridgeMCPTools:
         try:
             client = self._get_client()
 
-            list_params = {}
-            if event_bus_name:
-                list_params['EventBusName'] = event_bus_name
-
-            response = client.list_rules(**list_params)
-
             rules = []
-            for rule in response['Rules']:
+            for rule in eventbridge_events.list_rules(client, event_bus_name or 'default'):
                 rule_info = {
                     'name': rule['Name'],
                     'arn': rule['Arn'],
@@ -176,6 +173,7 @@ class EventBridgeMCPTools:
                 put_params['RoleArn'] = role_arn
 
             response = client.put_rule(**put_params)
+            eventbridge_events.invalidate(get_cache_scope(), event_bus_name)
 
             return {
                 'success': True,
@@ -342,47 +340,67 @@ class EventBridgeMCPTools:
                 'error': str(e)
             }
 
-    def put_events(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def put_events(self, events: List[Dict[str, Any]], event_bus_name: Optional[str] = None,
+                   max_workers: int = eventbridge_events.DEFAULT_WORKERS) -> Dict[str, Any]:
         """
-        Envía eventos personalizados al Event Bus
+        Envía eventos personalizados al Event Bus en lotes de 10 entradas / 256 KB,
+        con varios lotes en paralelo y reintento de las entradas fallidas
 
         Args:
-            events: Lista de eventos a enviar
+            events: Lista de eventos a enviar ({'source', 'detail_type', 'detail'[, 'event_bus_name', 'resources']})
+            event_bus_name: Event bus por defecto para los eventos que no lo indican
+            max_workers: Lotes enviados en paralelo
 
         Returns:
-            Dict con resultado de la operación
+            Dict con estadísticas agregadas del envío
         """
         try:
-            client = self._get_client()
+            entries = [eventbridge_events.entry_from_object(event, event_bus_name) for event in events]
+            max_workers = max(1, min(int(max_workers), 32))
+            client = get_aws_client('events', client_config=fanout_client_config(max_workers))
+            result = eventbridge_events.put_events(client, entries, max_workers=max_workers).to_dict()
 
-            # Formatear eventos para la API
-            formatted_events = []
-            for event in events:
-                formatted_event = {
-                    'Source': event['source'],
-                    'DetailType': event['detail_type'],
-                    'Detail': event['detail']
-                }
+            if result['failed'] == 0:
+                return dict(result, success=True,
+                            message=f'{result["sent"]} eventos enviados exitosamente')
+            return dict(result, success=False,
+                        error=f'{result["failed"]} eventos fallaron al enviarse')
 
-                if 'event_bus_name' in event and event['event_bus_name']:
-                    formatted_event['EventBusName'] = event['event_bus_name']
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
 
-                formatted_events.append(formatted_event)
+    def match_event(self, event: Dict[str, Any], event_bus_name: str = 'default',
+                    include_disabled: bool = False, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Indica qué reglas de un bus dispararía un evento, evaluando localmente los
+        patrones compilados (sin llamar a test_event_pattern por regla)
 
-            response = client.put_events(Entries=formatted_events)
+        Args:
+            event: Evento completo (source, detail-type, detail...) o entrada de put_events
+            event_bus_name: Nombre del event bus
+            include_disabled: Incluir reglas deshabilitadas
+            refresh: Recargar las reglas en lugar de usar la caché
 
-            failed_count = response.get('FailedEntryCount', 0)
-            if failed_count == 0:
-                return {
-                    'success': True,
-                    'message': f'{len(events)} eventos enviados exitosamente'
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': f'{failed_count} eventos fallaron al enviarse',
-                    'failed_entries': response.get('Entries', [])
-                }
+        Returns:
+            Dict con las reglas coincidentes
+        """
+        try:
+            normalized = normalize_event(event)
+            index = eventbridge_events.rule_index(self._get_client(), get_cache_scope(),
+                                                  event_bus_name, refresh=refresh)
+            matched = index.match(normalized, include_disabled=include_disabled)
+            return {
+                'success': True,
+                'event_bus_name': event_bus_name,
+                'matched_rules': [{'name': rule['Name'], 'arn': rule['Arn'], 'state': rule.get('State'),
+                                   'event_pattern': rule.get('EventPattern')} for rule in matched],
+                'matched_count': len(matched),
+                'rules_evaluated': index.count,
+                'pattern_errors': index.errors
+            }
 
         except Exception as e:
             return {
@@ -560,7 +578,7 @@ class EventBridgeMCPTools:
             },
             {
                 'name': 'eventbridge_put_events',
-                'description': 'Envía eventos personalizados al Event Bus',
+                'description': 'Envía eventos personalizados al Event Bus en lotes de 10 con reintento de los fallidos',
                 'parameters': {
                     'type': 'object',
                     'required': ['events'],
@@ -578,9 +596,35 @@ class EventBridgeMCPTools:
                                     'event_bus_name': {'type': 'string', 'description': 'Nombre del event bus'}
                                 }
                             }
+                        },
+                        'event_bus_name': {
+                            'type': 'string',
+                            'description': 'Event bus por defecto para los eventos que no lo indican'
+                        },
+                        'max_workers': {
+                            'type': 'integer',
+                            'description': 'Lotes de 10 eventos enviados en paralelo (por defecto 4)'
                         }
                     }
                 },
                 'function': self.put_events
+            },
+            {
+                'name': 'eventbridge_match_event',
+                'description': 'Indica qué reglas de un event bus dispararía un evento, evaluando los patrones localmente',
+                'parameters': {
+                    'type': 'object',
+                    'required': ['event'],
+                    'properties': {
+                        'event': {
+                            'type': 'object',
+                            'description': 'Evento con source, detail-type y detail (u otra entrada de put_events)'
+                        },
+                        'event_bus_name': {'type': 'string', 'description': 'Nombre del event bus (por defecto default)'},
+                        'include_disabled': {'type': 'boolean', 'description': 'Incluir reglas deshabilitadas'},
+                        'refresh': {'type': 'boolean', 'description': 'Recargar las reglas en lugar de usar la caché'}
+                    }
+                },
+                'function': self.match_event
             }
         ]
\ No newline at end of file
@@ -4,8 +4,12 @@ Gestión de streams de datos en tiempo real
 """
 import boto3
 import json
-from typing import Dict, Any, List
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 from ...utils.aws_client import get_aws_client
+from ...utils.fanout import fanout_client_config
+from ...utils.kinesis_consumer import MultiShardReader, MAX_SHARD_WORKERS
+from ...utils import kinesis_producer
 
 
 class KinesisMCPTools:
@@ -115,41 +119,91 @@ class KinesisMCPTools:
                 'region': region
             }
 
-    def get_records(self, stream_name: str, shard_id: str, region: str = 'us-east-1') -> Dict[str, Any]:
+    def put_records(self, stream_name: str, records: List[Any], partition_key_field: Optional[str] = None,
+                    strategy: Optional[str] = None, aggregate: bool = False,
+                    region: str = 'us-east-1') -> Dict[str, Any]:
         """
-        Obtiene registros de un shard específico en un stream de Kinesis
+        Envía muchos registros a un stream de Kinesis con PutRecords
 
         Args:
             stream_name: Nombre del stream
-            shard_id: ID del shard
+            records: Registros (los objetos se serializan como JSON)
+            partition_key_field: Campo usado como clave de partición
+            strategy: field, random o round_robin (por defecto field si hay campo, si no random)
+            aggregate: Agregar registros pequeños en formato KPL
             region: Región de AWS
 
         Returns:
-            Dict con los registros obtenidos
+            Dict con el resultado del envío
         """
         try:
-            kinesis = get_aws_client('kinesis', region)
-
-            # Obtener iterador de shard
-            iterator_response = kinesis.get_shard_iterator(
-                StreamName=stream_name,
-                ShardId=shard_id,
-                ShardIteratorType='TRIM_HORIZON'
+            strategy = strategy or ('field' if partition_key_field else 'random')
+            kinesis = get_aws_client('kinesis', region,
+                                     client_config=fanout_client_config(kinesis_producer.DEFAULT_WORKERS))
+            shard_map = None
+            if strategy == 'round_robin' or aggregate:
+                shard_map = kinesis_producer.ShardMap.load(kinesis, stream_name)
+            payloads = (
+                (record.encode('utf-8') if isinstance(record, str) else json.dumps(record, default=str).encode('utf-8'),
+                 record if isinstance(record, dict) else None)
+                for record in records
             )
+            entries = kinesis_producer.build_entries(payloads, strategy=strategy,
+                                                     key_field=partition_key_field, shard_map=shard_map)
+            result = kinesis_producer.put_records(kinesis, stream_name, entries,
+                                                  aggregate=aggregate, shard_map=shard_map).to_dict()
 
-            shard_iterator = iterator_response['ShardIterator']
+            return {
+                'success': result['failed_count'] == 0,
+                'message': f'Enviados {result["records"]} registro(s), {result["failed_count"]} fallido(s)',
+                'stream_name': stream_name,
+                **result,
+                'region': region
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error enviando registros: {str(e)}',
+                'stream_name': stream_name,
+                'region': region
+            }
+
+    def get_records(self, stream_name: str, shard_id: Optional[str] = None, region: str = 'us-east-1',
+                    iterator_type: str = 'AFTER_SEQUENCE_NUMBER', timestamp: Optional[str] = None,
+                    sequence_number: Optional[str] = None, max_records: int = 100,
+                    max_seconds: float = 5.0, save_checkpoint: bool = True) -> Dict[str, Any]:
+        """
+        Obtiene registros de uno o todos los shards de un stream de Kinesis
 
-            # Obtener registros
-            records_response = kinesis.get_records(ShardIterator=shard_iterator)
+        Args:
+            stream_name: Nombre del stream
+            shard_id: ID del shard (vacío = todos los shards, leídos en paralelo)
+            region: Región de AWS
+            iterator_type: AFTER_SEQUENCE_NUMBER (continúa desde el checkpoint local),
+                LATEST, AT_TIMESTAMP o TRIM_HORIZON
+            timestamp: Fecha ISO 8601 para AT_TIMESTAMP
+            sequence_number: Número de secuencia de inicio (solo con un shard)
+            max_records: Máximo de registros a devolver
+            max_seconds: Tiempo máximo de lectura
+            save_checkpoint: Guardar la posición alcanzada para la próxima lectura
 
-            records = []
-            for record in records_response.get('Records', []):
-                records.append({
-                    'sequence_number': record['SequenceNumber'],
-                    'partition_key': record['PartitionKey'],
-                    'data': record['Data'].decode('utf-8') if isinstance(record['Data'], bytes) else str(record['Data']),
-                    'approximate_arrival_timestamp': record.get('ApproximateArrivalTimestamp', '').isoformat() if record.get('ApproximateArrivalTimestamp') else ''
-                })
+        Returns:
+            Dict con los registros obtenidos
+        """
+        try:
+            kinesis = get_aws_client('kinesis', region,
+                                     client_config=fanout_client_config(MAX_SHARD_WORKERS))
+            reader = MultiShardReader(
+                kinesis, stream_name, region,
+                iterator_type=iterator_type,
+                timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+                sequence_number=sequence_number,
+                shard_ids=[shard_id] if shard_id else None,
+                max_records=max(1, min(int(max_records), 10000)),
+                max_seconds=max(1.0, min(float(max_seconds), 60.0)),
+                save_checkpoints=save_checkpoint
+            )
+            records = list(reader.records())
 
             return {
                 'success': True,
@@ -158,6 +212,9 @@ class KinesisMCPTools:
                 'shard_id': shard_id,
                 'records': records,
                 'record_count': len(records),
+                'shards_read': reader.stats['shards_read'],
+                'stopped_by': reader.stats['stopped_by'],
+                'errors': reader.stats['errors'],
                 'region': region
             }
         except Exception as e:
@@ -167,4 +224,4 @@ class KinesisMCPTools:
                 'stream_name': stream_name,
                 'shard_id': shard_id,
                 'region': region
-            }
\ No newline at end of file
+            }
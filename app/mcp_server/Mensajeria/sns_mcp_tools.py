@@ -6,6 +6,8 @@ Herramientas para gestión completa de tópicos SNS, suscripciones y mensajes
 import boto3
 from typing import Dict, List, Any, Optional
 from app.utils.aws_client import get_aws_client
+from app.utils.fanout import fanout_client_config
+from app.utils import sns_publisher
 
 
 class SNSMCPTools:
@@ -340,4 +342,113 @@ class SNSMCPTools:
                 'success': False,
                 'error': str(e),
                 'topic_arn': topic_arn
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def publish_batch(
+        topic_arns: List[str],
+        messages: List[Any],
+        subject: str = None,
+        message_group_id: str = None,
+        region: str = None,
+        max_workers: int = sns_publisher.DEFAULT_WORKERS,
+        messages_per_second: float = None
+    ) -> Dict[str, Any]:
+        """
+        Publica muchos mensajes en uno o varios tópicos SNS con PublishBatch
+
+        Args:
+            topic_arns: ARNs de los tópicos (cada mensaje se publica en todos)
+            messages: Mensajes (texto u objetos {'message', 'subject', 'message_group_id',
+                'message_deduplication_id', 'attributes'})
+            subject: Asunto por defecto (opcional, para email)
+            message_group_id: ID de grupo por defecto (tópicos FIFO)
+            region: Región de AWS
+            max_workers: Lotes publicados en paralelo
+            messages_per_second: Límite de ritmo total (opcional)
+
+        Returns:
+            Dict con estadísticas agregadas de la publicación
+        """
+        try:
+            if isinstance(topic_arns, str):
+                topic_arns = [topic_arns]
+            entries = []
+            for message in messages:
+                entry = sns_publisher.entry_from_object(message) if isinstance(message, dict) \
+                    else {'Message': str(message)}
+                if not entry.get('Message'):
+                    continue
+                if subject:
+                    entry.setdefault('Subject', subject)
+                if message_group_id:
+                    entry.setdefault('MessageGroupId', message_group_id)
+                entries.append(entry)
+
+            max_workers = max(1, min(int(max_workers), 32))
+            sns = get_aws_client('sns', region, client_config=fanout_client_config(max_workers))
+            result = sns_publisher.publish(sns, topic_arns, entries, max_workers=max_workers,
+                                           messages_per_second=messages_per_second).to_dict()
+
+            return {
+                'success': result['failed'] == 0,
+                'topic_count': len(topic_arns),
+                'message_count': len(entries),
+                **result,
+                'region': region or 'default'
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'topic_arns': topic_arns
+            }
+
+    def get_tools(self) -> List[Dict[str, Any]]:
+        """Retorna la lista de herramientas disponibles para SNS"""
+        region = {'type': 'string', 'description': 'Región de AWS (opcional)'}
+        return [
+            {
+                'name': 'sns_list_topics',
+                'description': 'Lista los tópicos SNS con sus atributos principales',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {'region': region}
+                },
+                'function': self.list_sns_topics
+            },
+            {
+                'name': 'sns_publish_message',
+                'description': 'Publica un mensaje en un tópico SNS',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'topic_arn': {'type': 'string', 'description': 'ARN del tópico'},
+                        'message': {'type': 'string', 'description': 'Contenido del mensaje'},
+                        'subject': {'type': 'string', 'description': 'Asunto (opcional, para email)'},
+                        'region': region
+                    },
+                    'required': ['topic_arn', 'message']
+                },
+                'function': self.publish_message
+            },
+            {
+                'name': 'sns_publish_batch',
+                'description': 'Publica muchos mensajes en uno o varios tópicos SNS con PublishBatch (10 por llamada), en paralelo y con límite de ritmo opcional; devuelve estadísticas agregadas',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'topic_arns': {'type': 'array', 'items': {'type': 'string'}, 'description': 'ARNs de los tópicos'},
+                        'messages': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Mensajes a publicar'},
+                        'subject': {'type': 'string', 'description': 'Asunto por defecto (opcional)'},
+                        'message_group_id': {'type': 'string', 'description': 'ID de grupo (tópicos FIFO)'},
+                        'region': region,
+                        'max_workers': {'type': 'integer', 'description': 'Lotes en paralelo', 'default': sns_publisher.DEFAULT_WORKERS},
+                        'messages_per_second': {'type': 'number', 'description': 'Límite de mensajes por segundo (opcional)'}
+                    },
+                    'required': ['topic_arns', 'messages']
+                },
+                'function': self.publish_batch
+            }
+        ]
@@ -6,6 +6,8 @@ Herramientas para gestión completa de colas SQS, mensajes y atributos
 import boto3
 from typing import Dict, List, Any, Optional
 from app.utils.aws_client import get_aws_client
+from app.utils.fanout import fanout_client_config
+from app.utils import sqs_bulk
 
 
 class SQSMCPTools:
@@ -250,7 +252,7 @@ class SQSMCPTools:
     def receive_message(
         queue_url: str,
         region: str = None,
-        max_number_of_messages: int = 1,
+        max_number_of_messages: int = 10,
         visibility_timeout: int = None,
         wait_time_seconds: int = None
     ) -> Dict[str, Any]:
@@ -427,4 +429,391 @@ class SQSMCPTools:
                 'error': str(e),
                 'queue_url': queue_url,
                 'attributes': attributes
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def send_message_batch(
+        queue_url: str,
+        messages: List[Any],
+        region: str = None,
+        message_group_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Envía muchos mensajes con send_message_batch en lotes de 10
+
+        Args:
+            queue_url: URL de la cola SQS
+            messages: Lista de cuerpos de mensaje (texto u objetos {'body', 'group_id',
+                'deduplication_id', 'delay_seconds'})
+            region: Región de AWS
+            message_group_id: ID del grupo por defecto (para colas FIFO)
+
+        Returns:
+            Dict con el resultado del envío
+        """
+        try:
+            sqs = get_aws_client('sqs', region, client_config=fanout_client_config(sqs_bulk.DEFAULT_WORKERS))
+
+            def _entries():
+                for message in messages:
+                    if isinstance(message, dict):
+                        entry = {'MessageBody': str(message.get('body', ''))}
+                        group_id = message.get('group_id') or message_group_id
+                        if message.get('deduplication_id'):
+                            entry['MessageDeduplicationId'] = message['deduplication_id']
+                        if message.get('delay_seconds') is not None:
+                            entry['DelaySeconds'] = int(message['delay_seconds'])
+                    else:
+                        entry = {'MessageBody': str(message)}
+                        group_id = message_group_id
+                    if group_id:
+                        entry['MessageGroupId'] = group_id
+                    yield entry
+
+            result = sqs_bulk.send_messages(sqs, queue_url, _entries()).to_dict()
+            result['failed'] = [{'code': f['code'], 'message': f['message'],
+                                 'body': f['entry']['MessageBody'][:100]} for f in result['failed']]
+
+            return {
+                'success': result['failed_count'] == 0,
+                'queue_url': queue_url,
+                **result,
+                'region': region or 'default'
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'queue_url': queue_url
+            }
+
+    @staticmethod
+    def delete_message_batch(queue_url: str, receipt_handles: List[str], region: str = None) -> Dict[str, Any]:
+        """
+        Elimina mensajes con delete_message_batch en lotes de 10
+
+        Args:
+            queue_url: URL de la cola SQS
+            receipt_handles: Receipt handles de los mensajes recibidos
+            region: Región de AWS
+
+        Returns:
+            Dict con resultado de la operación
+        """
+        try:
+            sqs = get_aws_client('sqs', region, client_config=fanout_client_config(sqs_bulk.DEFAULT_WORKERS))
+            result = sqs_bulk.delete_messages(sqs, queue_url, receipt_handles).to_dict()
+            result['failed'] = [{'code': f['code'], 'message': f['message']} for f in result['failed']]
+
+            return {
+                'success': result['failed_count'] == 0,
+                'queue_url': queue_url,
+                **result
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'queue_url': queue_url
+            }
+
+    @staticmethod
+    def receive_messages_bulk(
+        queue_url: str,
+        region: str = None,
+        max_messages: int = 100,
+        max_seconds: float = 20.0,
+        pollers: int = sqs_bulk.DEFAULT_POLLERS,
+        delete: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Recibe muchos mensajes con receptores concurrentes y long polling de 20 s
+
+        Args:
+            queue_url: URL de la cola SQS
+            region: Región de AWS
+            max_messages: Máximo de mensajes a recibir
+            max_seconds: Tiempo máximo de recepción
+            pollers: Receptores concurrentes
+            delete: Eliminar cada lote al recibirlo (drenar la cola)
+
+        Returns:
+            Dict con mensajes recibidos y estadísticas
+        """
+        try:
+            pollers = max(1, min(int(pollers), 16))
+            sqs = get_aws_client('sqs', region, client_config=fanout_client_config(pollers))
+            messages, stats = sqs_bulk.receive_messages(
+                sqs, queue_url, max_messages=max(1, min(int(max_messages), 10000)),
+                max_seconds=max(1.0, min(float(max_seconds), 120.0)), pollers=pollers, delete=delete
+            )
+
+            return {
+                'success': not stats['errors'],
+                'messages': [{
+                    'MessageId': msg.get('MessageId', ''),
+                    'ReceiptHandle': msg.get('ReceiptHandle', ''),
+                    'Body': msg.get('Body', ''),
+                    'Attributes': msg.get('Attributes', {}),
+                    'MessageAttributes': msg.get('MessageAttributes', {})
+                } for msg in messages],
+                'count': len(messages),
+                'stats': stats,
+                'queue_url': queue_url,
+                'region': region or 'default'
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'messages': [],
+                'count': 0,
+                'queue_url': queue_url
+            }
+
+    @staticmethod
+    def move_messages(
+        source_queue_url: str,
+        target_queue_url: str = None,
+        region: str = None,
+        max_messages: int = 1000,
+        max_seconds: float = 60.0,
+        max_in_flight: int = sqs_bulk.DEFAULT_MAX_IN_FLIGHT
+    ) -> Dict[str, Any]:
+        """
+        Mueve mensajes entre colas (redrive de una DLQ)
+
+        Args:
+            source_queue_url: URL de la cola de origen (normalmente la DLQ)
+            target_queue_url: URL de destino (por defecto la única cola que usa la DLQ)
+            region: Región de AWS
+            max_messages: Máximo de mensajes a mover
+            max_seconds: Tiempo máximo de la operación
+            max_in_flight: Mensajes recibidos y aún sin confirmar como máximo
+
+        Returns:
+            Dict con resultado de la operación
+        """
+        try:
+            max_in_flight = max(sqs_bulk.SQS_BATCH_LIMIT, min(int(max_in_flight), 1000))
+            sqs = get_aws_client('sqs', region, client_config=fanout_client_config(
+                max_in_flight // sqs_bulk.SQS_BATCH_LIMIT))
+            if not target_queue_url:
+                sources = sqs_bulk.dead_letter_sources(sqs, source_queue_url)
+                if len(sources) != 1:
+                    return {
+                        'success': False,
+                        'error': 'Indica target_queue_url: la cola no es DLQ de exactamente una cola',
+                        'dead_letter_sources': sources,
+                        'source_queue_url': source_queue_url
+                    }
+                target_queue_url = sources[0]
+            stats = sqs_bulk.move_messages(
+                sqs, source_queue_url, target_queue_url,
+                max_messages=max(1, min(int(max_messages), 100000)),
+                max_seconds=max(1.0, min(float(max_seconds), 300.0)),
+                max_in_flight=max_in_flight
+            )
+
+            return {
+                'success': not (stats['send_failed'] or stats['delete_failed'] or stats['errors']),
+                'source_queue_url': source_queue_url,
+                'target_queue_url': target_queue_url,
+                **stats
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'source_queue_url': source_queue_url
+            }
+
+    @staticmethod
+    def get_bulk_metrics() -> Dict[str, Any]:
+        """
+        Mensajes/segundo y totales de las operaciones masivas hechas desde la aplicación
+
+        Returns:
+            Dict con métricas por cola
+        """
+        return {
+            'success': True,
+            'queues': sqs_bulk.metrics.snapshot()
+        }
+
+    def get_tools(self) -> List[Dict[str, Any]]:
+        """Retorna la lista de herramientas disponibles para SQS"""
+        queue_url = {'type': 'string', 'description': 'URL de la cola SQS'}
+        region = {'type': 'string', 'description': 'Región de AWS (opcional)'}
+        return [
+            {
+                'name': 'sqs_list_queues',
+                'description': 'Lista las colas SQS con sus atributos principales',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'region': region,
+                        'queue_name_prefix': {'type': 'string', 'description': 'Prefijo del nombre de cola'}
+                    }
+                },
+                'function': self.list_sqs_queues
+            },
+            {
+                'name': 'sqs_create_queue',
+                'description': 'Crea una cola SQS estándar o FIFO',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_name': {'type': 'string', 'description': 'Nombre de la cola'},
+                        'region': region,
+                        'attributes': {'type': 'object', 'description': 'Atributos de la cola'},
+                        'fifo_queue': {'type': 'boolean', 'description': 'Crear cola FIFO', 'default': False}
+                    },
+                    'required': ['queue_name']
+                },
+                'function': self.create_sqs_queue
+            },
+            {
+                'name': 'sqs_delete_queue',
+                'description': 'Elimina una cola SQS',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {'queue_url': queue_url, 'region': region},
+                    'required': ['queue_url']
+                },
+                'function': self.delete_sqs_queue
+            },
+            {
+                'name': 'sqs_send_message',
+                'description': 'Envía un mensaje a una cola SQS',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_url': queue_url,
+                        'message_body': {'type': 'string', 'description': 'Contenido del mensaje'},
+                        'region': region,
+                        'message_group_id': {'type': 'string', 'description': 'ID de grupo (colas FIFO)'},
+                        'message_deduplication_id': {'type': 'string', 'description': 'ID de deduplicación (colas FIFO)'},
+                        'delay_seconds': {'type': 'integer', 'description': 'Retraso de entrega en segundos'}
+                    },
+                    'required': ['queue_url', 'message_body']
+                },
+                'function': self.send_message
+            },
+            {
+                'name': 'sqs_send_message_batch',
+                'description': 'Envía muchos mensajes con send_message_batch en lotes de 10, reintentando solo los fallidos',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_url': queue_url,
+                        'messages': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Cuerpos de mensaje o objetos {body, group_id, deduplication_id, delay_seconds}'},
+                        'region': region,
+                        'message_group_id': {'type': 'string', 'description': 'ID de grupo por defecto (colas FIFO)'}
+                    },
+                    'required': ['queue_url', 'messages']
+                },
+                'function': self.send_message_batch
+            },
+            {
+                'name': 'sqs_receive_message',
+                'description': 'Recibe hasta 10 mensajes de una cola SQS con una sola llamada',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_url': queue_url,
+                        'region': region,
+                        'max_number_of_messages': {'type': 'integer', 'description': 'Mensajes a recibir (1-10)', 'default': 10},
+                        'visibility_timeout': {'type': 'integer', 'description': 'Timeout de visibilidad en segundos'},
+                        'wait_time_seconds': {'type': 'integer', 'description': 'Long polling en segundos (0-20)'}
+                    },
+                    'required': ['queue_url']
+                },
+                'function': self.receive_message
+            },
+            {
+                'name': 'sqs_receive_messages_bulk',
+                'description': 'Recibe muchos mensajes con receptores concurrentes y long polling de 20 s; opcionalmente los elimina (drenar cola)',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_url': queue_url,
+                        'region': region,
+                        'max_messages': {'type': 'integer', 'description': 'Máximo de mensajes', 'default': 100},
+                        'max_seconds': {'type': 'number', 'description': 'Tiempo máximo de recepción', 'default': 20},
+                        'pollers': {'type': 'integer', 'description': 'Receptores concurrentes', 'default': sqs_bulk.DEFAULT_POLLERS},
+                        'delete': {'type': 'boolean', 'description': 'Eliminar los mensajes al recibirlos', 'default': False}
+                    },
+                    'required': ['queue_url']
+                },
+                'function': self.receive_messages_bulk
+            },
+            {
+                'name': 'sqs_delete_message_batch',
+                'description': 'Elimina mensajes recibidos con delete_message_batch en lotes de 10',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_url': queue_url,
+                        'receipt_handles': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Receipt handles de los mensajes'},
+                        'region': region
+                    },
+                    'required': ['queue_url', 'receipt_handles']
+                },
+                'function': self.delete_message_batch
+            },
+            {
+                'name': 'sqs_move_messages',
+                'description': 'Mueve mensajes entre colas (redrive de una DLQ a su cola de origen) con un máximo de mensajes en vuelo',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'source_queue_url': {'type': 'string', 'description': 'URL de la cola de origen (DLQ)'},
+                        'target_queue_url': {'type': 'string', 'description': 'URL de destino (por defecto la cola que usa la DLQ)'},
+                        'region': region,
+                        'max_messages': {'type': 'integer', 'description': 'Máximo de mensajes a mover', 'default': 1000},
+                        'max_seconds': {'type': 'number', 'description': 'Tiempo máximo', 'default': 60},
+                        'max_in_flight': {'type': 'integer', 'description': 'Mensajes en vuelo como máximo', 'default': sqs_bulk.DEFAULT_MAX_IN_FLIGHT}
+                    },
+                    'required': ['source_queue_url']
+                },
+                'function': self.move_messages
+            },
+            {
+                'name': 'sqs_purge_queue',
+                'description': 'Purga todos los mensajes de una cola SQS',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {'queue_url': queue_url, 'region': region},
+                    'required': ['queue_url']
+                },
+                'function': self.purge_queue
+            },
+            {
+                'name': 'sqs_get_queue_attributes',
+                'description': 'Obtiene los atributos de una cola SQS',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'queue_url': queue_url,
+                        'region': region,
+                        'attribute_names': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Atributos a obtener (todos por defecto)'}
+                    },
+                    'required': ['queue_url']
+                },
+                'function': self.get_queue_attributes
+            },
+            {
+                'name': 'sqs_get_bulk_metrics',
+                'description': 'Mensajes/segundo y totales de las operaciones masivas sobre SQS hechas desde la aplicación',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {}
+                },
+                'function': self.get_bulk_metrics
+            }
+        ]
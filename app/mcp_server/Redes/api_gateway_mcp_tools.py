@@ -2,9 +2,12 @@
 MCP Tools para AWS API Gateway
 Herramientas para gestión de APIs REST, HTTP y WebSocket
 """
+import json
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope, get_client_factory
+from app.utils.fanout import fanout_client_config
+from app.utils import apigateway_walker
 
 
 class APIGatewayMCPTools:
@@ -102,6 +105,46 @@ class APIGatewayMCPTools:
                     'required': ['rest_api_id']
                 }
             },
+            {
+                'name': 'apigateway_walk_api',
+                'description': 'Lista todas las rutas (método y path) de una API con su integración, recorriendo los recursos con los métodos embebidos',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'rest_api_id': {'type': 'string', 'description': self.DESC_REST_API_ID},
+                        'path_prefix': {'type': 'string', 'description': 'Solo rutas que empiezan por este path'},
+                        'refresh': {'type': 'boolean', 'description': 'Ignorar la caché', 'default': False}
+                    },
+                    'required': ['rest_api_id']
+                }
+            },
+            {
+                'name': 'apigateway_export_api',
+                'description': 'Exporta la definición OpenAPI/Swagger desplegada en un stage',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'rest_api_id': {'type': 'string', 'description': self.DESC_REST_API_ID},
+                        'stage_name': {'type': 'string', 'description': self.DESC_STAGE_NAME},
+                        'export_type': {'type': 'string', 'description': 'Formato de exportación', 'enum': ['oas30', 'swagger'], 'default': 'oas30'},
+                        'extensions': {'type': 'string', 'description': 'Extensiones de API Gateway a incluir', 'enum': ['integrations', 'apigateway', 'authorizers', 'postman'], 'default': 'integrations'}
+                    },
+                    'required': ['rest_api_id', 'stage_name']
+                }
+            },
+            {
+                'name': 'apigateway_diff_stages',
+                'description': 'Compara las rutas y ajustes desplegados en dos stages de una API',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'rest_api_id': {'type': 'string', 'description': self.DESC_REST_API_ID},
+                        'base_stage': {'type': 'string', 'description': 'Stage de referencia'},
+                        'target_stage': {'type': 'string', 'description': 'Stage a comparar'}
+                    },
+                    'required': ['rest_api_id', 'base_stage', 'target_stage']
+                }
+            },
             {
                 'name': 'apigateway_create_resource',
                 'description': 'Crea un recurso en una API',
@@ -407,6 +450,12 @@ class APIGatewayMCPTools:
                 return self._delete_rest_api(**parameters)
             elif tool_name == 'apigateway_get_resources':
                 return self._get_resources(**parameters)
+            elif tool_name == 'apigateway_walk_api':
+                return self._walk_api(**parameters)
+            elif tool_name == 'apigateway_export_api':
+                return self._export_api(**parameters)
+            elif tool_name == 'apigateway_diff_stages':
+                return self._diff_stages(**parameters)
             elif tool_name == 'apigateway_create_resource':
                 return self._create_resource(**parameters)
             elif tool_name == 'apigateway_delete_resource':
@@ -524,19 +573,21 @@ class APIGatewayMCPTools:
 
         client.delete_rest_api(restApiId=kwargs.get('rest_api_id'))
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'API REST {kwargs.get("rest_api_id")} eliminada exitosamente'
         }
 
     def _get_resources(self, **kwargs) -> Dict[str, Any]:
-        """Lista recursos de una API"""
+        """Lista recursos de una API, con sus métodos embebidos"""
         client = self._get_client()
 
-        api_params = {'restApiId': kwargs.get('rest_api_id')}
+        api_params = {'restApiId': kwargs.get('rest_api_id'), 'embed': ['methods']}
         if kwargs.get('limit'):
-            api_kwargs['limit'] = kwargs.get('limit')
+            api_params['limit'] = kwargs.get('limit')
         if kwargs.get('position'):
-            api_kwargs['position'] = kwargs.get('position')
+            api_params['position'] = kwargs.get('position')
 
         response = client.get_resources(**api_params)
 
@@ -556,6 +607,46 @@ class APIGatewayMCPTools:
             'position': response.get('position')
         }
 
+    def _walk_api(self, **kwargs) -> Dict[str, Any]:
+        """Todas las rutas de una API con su integración"""
+        factory = get_client_factory(client_config=fanout_client_config(
+            apigateway_walker.WALK_WORKERS, apigateway_walker.WALK_TIMEOUT))
+        walk = apigateway_walker.get_walk(factory, factory.scope, kwargs.get('rest_api_id'),
+                                          refresh=bool(kwargs.get('refresh')))
+        routes = walk['routes']
+        if kwargs.get('path_prefix'):
+            routes = [route for route in routes if route['path'].startswith(kwargs['path_prefix'])]
+
+        return {
+            'routes': routes,
+            'total_count': len(routes),
+            'resources': walk['resources'],
+            'integrations_fetched': walk['fetched'],
+            'errors': walk['errors'],
+            'seconds': walk['seconds']
+        }
+
+    def _export_api(self, **kwargs) -> Dict[str, Any]:
+        """Exporta la definición desplegada en un stage"""
+        client = self._get_client()
+
+        body = apigateway_walker.export(client, kwargs.get('rest_api_id'), kwargs.get('stage_name'),
+                                        kwargs.get('export_type', 'oas30'), kwargs.get('extensions', 'integrations'))
+
+        return {
+            'rest_api_id': kwargs.get('rest_api_id'),
+            'stage_name': kwargs.get('stage_name'),
+            'export_type': kwargs.get('export_type', 'oas30'),
+            'definition': json.loads(body)
+        }
+
+    def _diff_stages(self, **kwargs) -> Dict[str, Any]:
+        """Compara rutas y ajustes de dos stages"""
+        client = self._get_client()
+
+        return apigateway_walker.diff_stages(client, get_cache_scope(), kwargs.get('rest_api_id'),
+                                             kwargs.get('base_stage'), kwargs.get('target_stage'))
+
     def _create_resource(self, **kwargs) -> Dict[str, Any]:
         """Crea un recurso en una API"""
         client = self._get_client()
@@ -566,6 +657,8 @@ class APIGatewayMCPTools:
             pathPart=kwargs.get('path_part')
         )
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'Recurso {kwargs.get("path_part")} creado en API {kwargs.get("rest_api_id")}',
             'resource_id': response.get('id'),
@@ -581,6 +674,8 @@ class APIGatewayMCPTools:
             resourceId=kwargs.get('resource_id')
         )
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'Recurso {kwargs.get("resource_id")} eliminado de API {kwargs.get("rest_api_id")}'
         }
@@ -633,6 +728,8 @@ class APIGatewayMCPTools:
 
         response = client.put_method(**api_params)
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'Método {kwargs.get("method")} configurado en recurso {kwargs.get("resource_id")}',
             'method': response.get('httpMethod')
@@ -666,6 +763,8 @@ class APIGatewayMCPTools:
 
         response = client.put_integration(**api_params)
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'Integración configurada para método {kwargs.get("method")} en recurso {kwargs.get("resource_id")}',
             'integration_type': response.get('type'),
@@ -690,6 +789,8 @@ class APIGatewayMCPTools:
 
         response = client.put_method_response(**api_params)
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'Respuesta de método {kwargs.get("status_code")} configurada',
             'status_code': response.get('statusCode')
@@ -715,6 +816,8 @@ class APIGatewayMCPTools:
 
         response = client.put_integration_response(**api_params)
 
+        apigateway_walker.invalidate(get_cache_scope(), kwargs.get('rest_api_id'))
+
         return {
             'message': f'Respuesta de integración {kwargs.get("status_code")} configurada',
             'status_code': response.get('statusCode')
@@ -756,7 +859,7 @@ class APIGatewayMCPTools:
 
         api_params = {'restApiId': kwargs.get('rest_api_id')}
         if kwargs.get('deployment_id'):
-            api_kwargs['deploymentId'] = kwargs.get('deployment_id')
+            api_params['deploymentId'] = kwargs.get('deployment_id')
 
         response = client.get_stages(**api_params)
 
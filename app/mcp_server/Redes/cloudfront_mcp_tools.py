@@ -2,6 +2,9 @@ import boto3
 import os
 from typing import Dict, List, Any, Optional
 
+from app.utils.aws_client import get_client_factory
+from app.utils import cloudfront_invalidations
+
 class CloudFrontMCPTools:
     """Herramientas MCP para gestión de CloudFront Distributions"""
 
@@ -15,32 +18,37 @@ class CloudFrontMCPTools:
             region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
         )
 
+    def _invalidate_listing(self):
+        """Descarta el listado cacheado de distribuciones tras un cambio"""
+        cloudfront_invalidations.invalidate(get_client_factory().scope)
+
     def list_distributions(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Lista todas las distribuciones de CloudFront
+        Lista todas las distribuciones de CloudFront (paginando con Marker, cacheado por cuenta)
 
         Args:
-            params: Parámetros opcionales (no requeridos para este método)
+            params: Parámetros opcionales
+                - refresh (bool): Ignorar la caché
 
         Returns:
             Dict con lista de distribuciones
         """
         try:
-            cf = self._get_client()
-            response = cf.list_distributions()
-
-            distributions = []
-            if 'DistributionList' in response and 'Items' in response['DistributionList']:
-                for dist in response['DistributionList']['Items']:
-                    distributions.append({
-                        'id': dist['Id'],
-                        'domain_name': dist['DomainName'],
-                        'status': dist['Status'],
-                        'enabled': dist['Enabled'],
-                        'comment': dist.get('Comment', ''),
-                        'origins_count': len(dist.get('Origins', {}).get('Items', [])),
-                        'last_modified_time': dist.get('LastModifiedTime', '').isoformat() if dist.get('LastModifiedTime') else None
-                    })
+            params = params or {}
+            factory = get_client_factory()
+            summaries = cloudfront_invalidations.list_distributions(
+                factory('cloudfront'), factory.scope, refresh=bool(params.get('refresh')))
+
+            distributions = [{
+                'id': dist['id'],
+                'domain_name': dist['domain'],
+                'status': dist['status'],
+                'enabled': dist['enabled'],
+                'comment': dist['comment'],
+                'aliases': dist['aliases'],
+                'origins_count': dist['origins'],
+                'last_modified_time': dist['last_modified']
+            } for dist in summaries]
 
             return {
                 'success': True,
@@ -112,6 +120,7 @@ class CloudFrontMCPTools:
             }
 
             response = cf.create_distribution(DistributionConfig=distribution_config)
+            self._invalidate_listing()
 
             return {
                 'success': True,
@@ -169,6 +178,7 @@ class CloudFrontMCPTools:
                 DistributionConfig=config,
                 IfMatch=dist_config['ETag']
             )
+            self._invalidate_listing()
 
             return {
                 'success': True,
@@ -231,6 +241,7 @@ class CloudFrontMCPTools:
                 Id=params['distribution_id'],
                 IfMatch=dist_config['ETag']
             )
+            self._invalidate_listing()
 
             return {
                 'success': True,
@@ -245,15 +256,18 @@ class CloudFrontMCPTools:
 
     def create_invalidation(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Crea una invalidación para una distribución de CloudFront
+        Invalida rutas de una distribución de CloudFront. Las rutas se encolan y se
+        agrupan con las de otras llamadas durante unos segundos (deduplicadas y
+        colapsadas en wildcards); el envío respeta el límite de invalidaciones en curso.
 
         Args:
             params: Parámetros de invalidación
                 - distribution_id (str): ID de la distribución
                 - paths (list): Lista de rutas a invalidar (ej: ['/*', '/index.html'])
+                - immediate (bool, opcional): Enviar ya en lugar de esperar a la ventana de agrupación
 
         Returns:
-            Dict con resultado de la invalidación
+            Dict con resultado de la invalidación o del encolado
         """
         try:
             required_params = ['distribution_id', 'paths']
@@ -264,30 +278,106 @@ class CloudFrontMCPTools:
                         'error': f'Parámetro requerido faltante: {param}'
                     }
 
-            cf = self._get_client()
+            paths = params['paths']
+            if isinstance(paths, str):
+                paths = [paths]
+
+            result = cloudfront_invalidations.get_queue().enqueue(
+                get_client_factory(), params['distribution_id'], paths,
+                immediate=bool(params.get('immediate')))
+
+            if not params.get('immediate'):
+                return {
+                    'success': True,
+                    'distribution_id': params['distribution_id'],
+                    'queued': result['queued'],
+                    'pending': result['pending'],
+                    'flush_in_seconds': result['flush_in']
+                }
+            return self._flush_response(result)
 
-            # Crear invalidación
-            invalidation_response = cf.create_invalidation(
-                DistributionId=params['distribution_id'],
-                InvalidationBatch={
-                    'CallerReference': str(os.urandom(16).hex()),
-                    'Paths': {
-                        'Quantity': len(params['paths']),
-                        'Items': params['paths']
-                    }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def flush_invalidations(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Envía ya las rutas pendientes en la cola de una distribución
+
+        Args:
+            params: Parámetros
+                - distribution_id (str): ID de la distribución
+
+        Returns:
+            Dict con la invalidación creada y las rutas aplazadas
+        """
+        try:
+            if 'distribution_id' not in params:
+                return {
+                    'success': False,
+                    'error': 'Parámetro requerido faltante: distribution_id'
                 }
-            )
+            result = cloudfront_invalidations.get_queue().flush(
+                get_client_factory().scope, params['distribution_id'])
+            return self._flush_response(result)
 
+        except Exception as e:
             return {
-                'success': True,
-                'invalidation_id': invalidation_response['Invalidation']['Id'],
-                'distribution_id': params['distribution_id'],
-                'status': invalidation_response['Invalidation']['Status'],
-                'paths_invalidated': params['paths']
+                'success': False,
+                'error': str(e)
+            }
+
+    def invalidation_status(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Estado de la cola de invalidaciones y capacidad en curso de una distribución
+
+        Args:
+            params: Parámetros
+                - distribution_id (str): ID de la distribución
+
+        Returns:
+            Dict con rutas pendientes, envíos recientes y uso del límite en curso
+        """
+        try:
+            if 'distribution_id' not in params:
+                return {
+                    'success': False,
+                    'error': 'Parámetro requerido faltante: distribution_id'
+                }
+            factory = get_client_factory()
+            status = cloudfront_invalidations.get_queue().status(factory.scope, params['distribution_id'])
+            usage = cloudfront_invalidations.in_progress_usage(factory('cloudfront'), params['distribution_id'])
+            status['in_progress'] = {
+                'invalidations': usage['invalidations'],
+                'files': usage['files'],
+                'wildcards': usage['wildcards'],
+                'max_files': cloudfront_invalidations.MAX_FILES_IN_PROGRESS,
+                'max_wildcards': cloudfront_invalidations.MAX_WILDCARDS_IN_PROGRESS
             }
+            return dict(status, success=True)
 
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e)
             }
+
+    def _flush_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if result['error']:
+            return {
+                'success': False,
+                'error': result['error'],
+                'deferred_paths': result['deferred']
+            }
+        invalidation = result['invalidation'] or {}
+        return {
+            'success': True,
+            'invalidation_id': invalidation.get('id'),
+            'distribution_id': result['distribution_id'],
+            'status': invalidation.get('status'),
+            'paths_requested': result['requested'],
+            'paths_invalidated': result['paths'],
+            'deferred_paths': result['deferred']
+        }
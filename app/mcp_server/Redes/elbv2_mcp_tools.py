@@ -2,6 +2,10 @@ import boto3
 import os
 from typing import Dict, List, Any, Optional
 
+from app.utils.aws_client import get_client_factory
+from app.utils.fanout import fanout_client_config
+from app.utils import elbv2_health
+
 class ELBv2MCPTools:
     """Herramientas MCP para gestión de ELBv2 Load Balancers"""
 
@@ -97,6 +101,7 @@ class ELBv2MCPTools:
                 lb_config['SecurityGroups'] = params['security_groups']
 
             response = elbv2.create_load_balancer(**lb_config)
+            elbv2_health.invalidate(get_client_factory().scope)
 
             return {
                 'success': True,
@@ -134,6 +139,7 @@ class ELBv2MCPTools:
 
             elbv2 = self._get_client()
             elbv2.delete_load_balancer(LoadBalancerArn=params['load_balancer_arn'])
+            elbv2_health.invalidate(get_client_factory().scope)
 
             return {
                 'success': True,
@@ -233,6 +239,7 @@ class ELBv2MCPTools:
                 tg_config['HealthCheckPath'] = params['health_check_path']
 
             response = elbv2.create_target_group(**tg_config)
+            elbv2_health.invalidate(get_client_factory().scope)
 
             return {
                 'success': True,
@@ -270,6 +277,7 @@ class ELBv2MCPTools:
 
             elbv2 = self._get_client()
             elbv2.delete_target_group(TargetGroupArn=params['target_group_arn'])
+            elbv2_health.invalidate(get_client_factory().scope)
 
             return {
                 'success': True,
@@ -280,4 +288,47 @@ class ELBv2MCPTools:
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+
+    def target_health(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Salud de los targets de todos los target groups (consultados en paralelo),
+        con el nombre de las instancias EC2
+
+        Args:
+            params: Parámetros opcionales
+                - load_balancer_arn (str): Solo los target groups de este load balancer
+                - state (str): Filtrar por estado (healthy, unhealthy, draining...)
+                - since (str): Versión anterior; devuelve solo los cambios desde ella
+                - refresh (bool): Ignorar la caché
+
+        Returns:
+            Dict con los targets, el resumen por estado y la versión del snapshot
+        """
+        try:
+            params = params or {}
+            factory = get_client_factory(client_config=fanout_client_config(
+                elbv2_health.HEALTH_WORKERS, elbv2_health.HEALTH_TIMEOUT))
+            snapshot = elbv2_health.get_snapshot(factory, factory.scope, params.get('load_balancer_arn'),
+                                                 refresh=bool(params.get('refresh')))
+            if params.get('since'):
+                return dict(elbv2_health.diff(snapshot, factory.scope, params['since']), success=True)
+
+            targets = snapshot['rows']
+            if params.get('state'):
+                targets = [row for row in targets if row['state'] == params['state']]
+            return {
+                'success': True,
+                'version': snapshot['version'],
+                'summary': snapshot['summary'],
+                'targets': targets,
+                'total_count': len(targets),
+                'target_groups': snapshot['target_groups'],
+                'errors': snapshot['errors']
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
@@ -5,7 +5,8 @@ Herramientas para gestión completa de DNS, zonas hospedadas y registros DNS
 
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import route53_records
 
 
 class Route53MCPTools:
@@ -147,6 +148,7 @@ class Route53MCPTools:
             r53 = get_aws_client('route53', region)
 
             response = r53.delete_hosted_zone(Id=hosted_zone_id)
+            route53_records.invalidate(get_cache_scope(), hosted_zone_id)
 
             return {
                 'success': True,
@@ -171,6 +173,7 @@ class Route53MCPTools:
         start_record_name: str = None,
         start_record_type: str = None,
         max_items: int = None,
+        fetch_all: bool = False,
         region: str = None
     ) -> Dict[str, Any]:
         """
@@ -181,6 +184,7 @@ class Route53MCPTools:
             start_record_name: Nombre del registro para empezar la lista
             start_record_type: Tipo de registro para empezar la lista
             max_items: Número máximo de registros a devolver
+            fetch_all: Recorrer todas las páginas en lugar de devolver solo la primera
             region: Región de AWS
 
         Returns:
@@ -198,7 +202,11 @@ class Route53MCPTools:
             if max_items:
                 params['MaxItems'] = str(max_items)
 
-            response = r53.list_resource_record_sets(**params)
+            if fetch_all:
+                response = {'ResourceRecordSets': list(route53_records.iter_record_sets(
+                    r53, hosted_zone_id, start_record_name, start_record_type))}
+            else:
+                response = r53.list_resource_record_sets(**params)
 
             records = []
             for record in response.get('ResourceRecordSets', []):
@@ -281,6 +289,7 @@ class Route53MCPTools:
                 HostedZoneId=hosted_zone_id,
                 ChangeBatch=change_batch
             )
+            route53_records.invalidate(get_cache_scope(), hosted_zone_id)
 
             return {
                 'success': True,
@@ -353,6 +362,7 @@ class Route53MCPTools:
                 HostedZoneId=hosted_zone_id,
                 ChangeBatch=change_batch
             )
+            route53_records.invalidate(get_cache_scope(), hosted_zone_id)
 
             return {
                 'success': True,
@@ -440,6 +450,7 @@ class Route53MCPTools:
                 HostedZoneId=hosted_zone_id,
                 ChangeBatch=change_batch
             )
+            route53_records.invalidate(get_cache_scope(), hosted_zone_id)
 
             return {
                 'success': True,
@@ -508,4 +519,225 @@ class Route53MCPTools:
                 'success': False,
                 'error': str(e),
                 'change_id': change_id
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def search_records(
+        hosted_zone_id: str,
+        query: str = '',
+        record_type: str = None,
+        refresh: bool = False,
+        region: str = None
+    ) -> Dict[str, Any]:
+        """
+        Busca registros por nombre, valor o destino de alias en el índice de la zona
+
+        Args:
+            hosted_zone_id: ID de la zona hospedada
+            query: Texto a buscar (varias palabras deben aparecer todas)
+            record_type: Filtrar por tipo de registro
+            refresh: Volver a leer la zona en lugar de usar la caché
+            region: Región de AWS
+
+        Returns:
+            Dict con los record sets que coinciden
+        """
+        try:
+            r53 = get_aws_client('route53', region)
+            index = route53_records.get_index(r53, get_cache_scope(region), hosted_zone_id, refresh=refresh)
+            matches = index.search(query, record_type)
+
+            return {
+                'success': True,
+                'zone': index.zone_name,
+                'total': len(index.records),
+                'count': len(matches),
+                'resource_record_sets': matches
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'hosted_zone_id': hosted_zone_id
+            }
+
+    @staticmethod
+    def change_records(
+        hosted_zone_id: str,
+        changes: List[Dict[str, Any]],
+        comment: str = None,
+        wait: bool = False,
+        timeout: int = 300,
+        region: str = None
+    ) -> Dict[str, Any]:
+        """
+        Aplica muchos cambios de registros en el menor número de lotes posible
+
+        Args:
+            hosted_zone_id: ID de la zona hospedada
+            changes: Lista de cambios, cada uno con action (CREATE, UPSERT, DELETE), name,
+                type, ttl y values; también se aceptan Changes con el formato de la API
+            comment: Comentario de los lotes
+            wait: Esperar a que todos los lotes estén INSYNC
+            timeout: Segundos máximos de espera
+            region: Región de AWS
+
+        Returns:
+            Dict con los ChangeInfo de cada lote
+        """
+        try:
+            r53 = get_aws_client('route53', region)
+
+            api_changes = []
+            for change in changes:
+                if 'ResourceRecordSet' in change:
+                    api_changes.append(change)
+                    continue
+                values = change.get('values') or [change['value']]
+                api_changes.append({
+                    'Action': change.get('action', 'UPSERT').upper(),
+                    'ResourceRecordSet': {
+                        'Name': change['name'],
+                        'Type': change['type'],
+                        'TTL': int(change.get('ttl', 300)),
+                        'ResourceRecords': [{'Value': value} for value in values]
+                    }
+                })
+
+            try:
+                submitted = route53_records.submit_changes(r53, hosted_zone_id, api_changes, comment or '')
+            finally:
+                route53_records.invalidate(get_cache_scope(region), hosted_zone_id)
+
+            statuses = {}
+            if wait:
+                statuses = route53_records.wait_insync(r53, [c['id'] for c in submitted], timeout=timeout)
+
+            return {
+                'success': True,
+                'hosted_zone_id': hosted_zone_id,
+                'changes': len(api_changes),
+                'batches': [dict(batch, status=statuses.get(batch['id'], batch['status'])) for batch in submitted],
+                'insync': bool(statuses) and all(status == 'INSYNC' for status in statuses.values())
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'hosted_zone_id': hosted_zone_id,
+                'batches_submitted': getattr(e, 'submitted', [])
+            }
+
+    @staticmethod
+    def export_zone_file(hosted_zone_id: str, region: str = None) -> Dict[str, Any]:
+        """
+        Exporta una zona hospedada en formato BIND
+
+        Args:
+            hosted_zone_id: ID de la zona hospedada
+            region: Región de AWS
+
+        Returns:
+            Dict con el contenido del fichero de zona
+        """
+        try:
+            r53 = get_aws_client('route53', region)
+            index = route53_records.get_index(r53, get_cache_scope(region), hosted_zone_id, refresh=True)
+
+            return {
+                'success': True,
+                'zone': index.zone_name,
+                'record_sets': len(index.records),
+                'zone_file': route53_records.to_bind(index.zone_name, index.records)
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'hosted_zone_id': hosted_zone_id
+            }
+
+    @staticmethod
+    def import_zone_file(
+        hosted_zone_id: str,
+        zone_file: str,
+        action: str = 'UPSERT',
+        dry_run: bool = False,
+        wait: bool = False,
+        region: str = None
+    ) -> Dict[str, Any]:
+        """
+        Importa un fichero de zona BIND en lotes de cambios
+
+        Args:
+            hosted_zone_id: ID de la zona hospedada
+            zone_file: Contenido del fichero de zona
+            action: UPSERT o CREATE
+            dry_run: Solo analizar y calcular los lotes
+            wait: Esperar a que los lotes estén INSYNC
+            region: Región de AWS
+
+        Returns:
+            Dict con los record sets analizados y los lotes enviados
+        """
+        try:
+            r53 = get_aws_client('route53', region)
+            zone = r53.get_hosted_zone(Id=route53_records.short_zone_id(hosted_zone_id))['HostedZone']
+            parsed = route53_records.parse_bind(zone_file, zone['Name'])
+            result = {
+                'success': True,
+                'zone': zone['Name'],
+                'record_sets': len(parsed['record_sets']),
+                'skipped': parsed['skipped'],
+                'batches': len(route53_records.pack_batches(
+                    route53_records.changes_for(action.upper(), parsed['record_sets'])))
+            }
+            if dry_run:
+                return dict(result, dry_run=True)
+
+            applied = Route53MCPTools.change_records(hosted_zone_id, route53_records.changes_for(
+                action.upper(), parsed['record_sets']), f'Importación de {zone["Name"]}', wait=wait, region=region)
+            return dict(applied, **{key: value for key, value in result.items() if key != 'batches'})
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'hosted_zone_id': hosted_zone_id
+            }
+
+    @staticmethod
+    def wait_for_change(change_id: str, timeout: int = 300, region: str = None) -> Dict[str, Any]:
+        """
+        Espera a que un cambio de Route53 esté INSYNC consultando get_change
+
+        Args:
+            change_id: ID del cambio (con o sin el prefijo /change/)
+            timeout: Segundos máximos de espera
+            region: Región de AWS
+
+        Returns:
+            Dict con el estado final del cambio
+        """
+        try:
+            r53 = get_aws_client('route53', region)
+            if not change_id.startswith('/change/'):
+                change_id = f'/change/{change_id}'
+            status = route53_records.wait_insync(r53, [change_id], timeout=timeout)[change_id]
+
+            return {
+                'success': True,
+                'change_id': change_id,
+                'status': status,
+                'insync': status == 'INSYNC'
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'change_id': change_id
+            }
@@ -4,7 +4,9 @@ Herramientas para gestión de redes virtuales y componentes de red
 """
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_client_factory, get_cache_scope
+from app.utils.fanout import fanout_client_config
+from app.utils import security_group_index, vpc_topology
 
 
 class VPCMCPTools:
@@ -372,6 +374,61 @@ class VPCMCPTools:
                     }
                 },
                 'function': self._describe_nat_gateways
+            },
+            {
+                'name': 'vpc_topology',
+                'description': 'Grafo de red (VPCs, subnets, route tables, gateways, peerings, ENIs, security groups e instancias) con nodos y aristas',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'vpc_id': {'type': 'string', 'description': 'Limitar el grafo a una VPC'},
+                        'refresh': {'type': 'boolean', 'description': 'Volver a recolectar en lugar de usar la caché', 'default': False}
+                    }
+                },
+                'function': self._topology
+            },
+            {
+                'name': 'vpc_reachability',
+                'description': 'Comprueba si el tráfico llega de un origen a un destino siguiendo tablas de rutas, NAT gateways y peerings (sin evaluar security groups ni NACLs)',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'source': {'type': 'string', 'description': 'Subnet, ENI o instancia de origen'},
+                        'destination': {'type': 'string', 'description': 'IP, CIDR, subnet, ENI, instancia o "internet"'}
+                    },
+                    'required': ['source', 'destination']
+                },
+                'function': self._reachability
+            },
+            {
+                'name': 'vpc_security_group_exposure',
+                'description': 'Reglas de security groups que abren un puerto o rango a un CIDR (por defecto a internet)',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'from_port': {'type': 'integer', 'description': 'Puerto (o inicio del rango)'},
+                        'to_port': {'type': 'integer', 'description': 'Fin del rango (por defecto igual a from_port)'},
+                        'protocol': {'type': 'string', 'description': 'tcp, udp, icmp o -1 (todos)', 'default': 'tcp'},
+                        'cidr': {'type': 'string', 'description': 'Red de origen/destino; por defecto 0.0.0.0/0 y ::/0'},
+                        'direction': {'type': 'string', 'enum': ['ingress', 'egress'], 'default': 'ingress'},
+                        'vpc_id': {'type': 'string', 'description': 'Limitar a una VPC'},
+                        'partial': {'type': 'boolean', 'description': 'Incluir reglas que abren solo parte del CIDR', 'default': False}
+                    },
+                    'required': ['from_port']
+                },
+                'function': self._security_group_exposure
+            },
+            {
+                'name': 'vpc_security_group_overlaps',
+                'description': 'Reglas de security groups redundantes (cubiertas por otra regla) o solapadas y referencias entre grupos',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'group_id': {'type': 'string', 'description': 'Analizar solo este grupo'},
+                        'vpc_id': {'type': 'string', 'description': 'Limitar a una VPC'}
+                    }
+                },
+                'function': self._security_group_overlaps
             }
         ]
 
@@ -408,6 +465,14 @@ class VPCMCPTools:
                 return self._attach_internet_gateway(**parameters)
             elif tool_name == 'vpc_describe_nat_gateways':
                 return self._describe_nat_gateways(**parameters)
+            elif tool_name == 'vpc_topology':
+                return self._topology(**parameters)
+            elif tool_name == 'vpc_reachability':
+                return self._reachability(**parameters)
+            elif tool_name == 'vpc_security_group_exposure':
+                return self._security_group_exposure(**parameters)
+            elif tool_name == 'vpc_security_group_overlaps':
+                return self._security_group_overlaps(**parameters)
             else:
                 return {'error': f'Herramienta VPC no encontrada: {tool_name}'}
 
@@ -461,6 +526,7 @@ class VPCMCPTools:
             vpc_params['InstanceTenancy'] = kwargs['instance_tenancy']
 
         response = client.create_vpc(**vpc_params)
+        vpc_topology.invalidate(get_cache_scope())
 
         vpc_id = response['Vpc']['VpcId']
 
@@ -489,6 +555,7 @@ class VPCMCPTools:
         client = self._get_client()
 
         client.delete_vpc(VpcId=vpc_id)
+        vpc_topology.invalidate(get_cache_scope())
 
         return {
             'message': f'VPC {vpc_id} eliminada exitosamente',
@@ -551,6 +618,7 @@ class VPCMCPTools:
             subnet_params['Ipv6CidrBlock'] = kwargs['ipv6_cidr_block']
 
         response = client.create_subnet(**subnet_params)
+        vpc_topology.invalidate(get_cache_scope())
 
         subnet_id = response['Subnet']['SubnetId']
 
@@ -580,6 +648,7 @@ class VPCMCPTools:
         client = self._get_client()
 
         client.delete_subnet(SubnetId=subnet_id)
+        vpc_topology.invalidate(get_cache_scope())
 
         return {
             'message': f'Subnet {subnet_id} eliminada exitosamente',
@@ -632,6 +701,7 @@ class VPCMCPTools:
             sg_params['VpcId'] = kwargs['vpc_id']
 
         response = client.create_security_group(**sg_params)
+        security_group_index.invalidate(get_cache_scope())
 
         group_id = response['GroupId']
 
@@ -725,6 +795,7 @@ class VPCMCPTools:
                 GroupId=group_id,
                 IpPermissions=valid_permissions
             )
+            security_group_index.invalidate(get_cache_scope())
 
             return {
                 'success': True,
@@ -896,6 +967,7 @@ class VPCMCPTools:
             InternetGatewayId=internet_gateway_id,
             VpcId=vpc_id
         )
+        vpc_topology.invalidate(get_cache_scope())
 
         return {
             'message': f'Internet gateway {internet_gateway_id} asociado a VPC {vpc_id}',
@@ -935,4 +1007,31 @@ class VPCMCPTools:
         return {
             'nat_gateways': nat_gateways,
             'total_count': len(nat_gateways)
-        }
\ No newline at end of file
+        }
+
+    def _get_topology(self, refresh=False) -> 'vpc_topology.Topology':
+        factory = get_client_factory(client_config=fanout_client_config(
+            vpc_topology.COLLECT_WORKERS, vpc_topology.COLLECT_TIMEOUT))
+        return vpc_topology.get_topology(factory, factory.scope, refresh=refresh)
+
+    def _topology(self, vpc_id=None, refresh=False, **kwargs) -> Dict[str, Any]:
+        """Grafo de red de la cuenta y región (cacheado)"""
+        return self._get_topology(refresh).to_graph(vpc_id)
+
+    def _reachability(self, source, destination, **kwargs) -> Dict[str, Any]:
+        """Camino por tablas de rutas entre origen y destino"""
+        return self._get_topology().reachability(source, destination)
+
+    def _security_group_exposure(self, from_port, to_port=None, protocol='tcp', cidr=None, direction='ingress',
+                                 vpc_id=None, partial=False, **kwargs) -> Dict[str, Any]:
+        """Reglas que exponen un puerto según el índice de security groups"""
+        index = security_group_index.get_index(self._get_client(), get_cache_scope())
+        rules = index.exposure(int(from_port), int(to_port) if to_port is not None else None, protocol,
+                               cidr, direction, vpc_id, partial)
+        return {'rules': rules, 'count': len(rules), 'groups': sorted({rule['group_id'] for rule in rules})}
+
+    def _security_group_overlaps(self, group_id=None, vpc_id=None, **kwargs) -> Dict[str, Any]:
+        """Reglas redundantes o solapadas y grafo de referencias"""
+        index = security_group_index.get_index(self._get_client(), get_cache_scope())
+        findings = index.overlaps(group_id, vpc_id)
+        return {'findings': findings, 'count': len(findings), 'references': index.reference_graph(vpc_id)}
@@ -4,7 +4,8 @@ Herramientas para gestión de identidades y accesos
 """
 import boto3
 from typing import Dict, List, Any, Optional
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import iam_access, credential_report
 
 
 class IAMMCPTools:
@@ -28,6 +29,10 @@ class IAMMCPTools:
             self.iam_client = get_aws_client('iam')
         return self.iam_client
 
+    def _invalidate_snapshot(self):
+        """Descarta el snapshot de permisos tras modificar usuarios, grupos, roles o políticas"""
+        iam_access.invalidate(get_cache_scope())
+
     def get_tools(self) -> List[Dict[str, Any]]:
         """Retorna la lista de herramientas disponibles para IAM"""
         return [
@@ -263,6 +268,56 @@ class IAMMCPTools:
                     },
                     'required': ['role_name']
                 }
+            },
+            {
+                'name': 'iam_simulate_access',
+                'description': 'Evalúa en local si un usuario o rol puede ejecutar acciones sobre un recurso '
+                               '(políticas de identidad y permissions boundary; las condiciones no se evalúan)',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'principal': {'type': 'string', 'description': 'ARN, user/nombre, role/nombre o nombre del principal'},
+                        'actions': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Acciones (ej: s3:GetObject)'},
+                        'resource': {'type': 'string', 'description': 'ARN del recurso', 'default': '*'},
+                        'refresh': {'type': 'boolean', 'description': 'Regenerar el snapshot de IAM', 'default': False}
+                    },
+                    'required': ['principal', 'actions']
+                }
+            },
+            {
+                'name': 'iam_who_can',
+                'description': 'Lista los usuarios y roles con permiso para una acción sobre un recurso, evaluado en local',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'action': {'type': 'string', 'description': 'Acción (ej: iam:PassRole)'},
+                        'resource': {'type': 'string', 'description': 'ARN del recurso', 'default': '*'},
+                        'principal_type': {'type': 'string', 'enum': list(iam_access.PRINCIPAL_TYPES),
+                                           'description': 'Limitar a usuarios o a roles'},
+                        'include_conditional': {'type': 'boolean', 'description': 'Incluir permisos con condiciones', 'default': True},
+                        'refresh': {'type': 'boolean', 'description': 'Regenerar el snapshot de IAM', 'default': False}
+                    },
+                    'required': ['action']
+                }
+            },
+            {
+                'name': 'iam_credential_report',
+                'description': 'Audita las credenciales de todos los usuarios (antigüedad y uso de access keys, '
+                               'contraseña y MFA) a partir del informe de credenciales de la cuenta',
+                'parameters': {
+                    'type': 'object',
+                    'properties': {
+                        'mfa': {'type': 'boolean', 'description': 'Filtrar por MFA activo o inactivo'},
+                        'min_key_age': {'type': 'integer', 'description': 'Solo usuarios con una key activa de al menos N días'},
+                        'min_inactive': {'type': 'integer', 'description': 'Solo usuarios sin actividad en al menos N días'},
+                        'finding': {'type': 'string', 'description': 'Hallazgo (ej: key_not_rotated, console_without_mfa)'},
+                        'with_keys': {'type': 'boolean', 'description': 'Solo usuarios con access keys activas', 'default': False},
+                        'sort': {'type': 'string', 'enum': list(credential_report.SORT_KEYS), 'default': 'key_age'},
+                        'descending': {'type': 'boolean', 'default': True},
+                        'max_items': {'type': 'integer', 'description': self.DESC_MAX_ITEMS, 'default': 100},
+                        'refresh': {'type': 'boolean', 'description': 'Comprobar si AWS tiene un informe más reciente', 'default': False}
+                    }
+                }
             }
         ]
 
@@ -307,6 +362,12 @@ class IAMMCPTools:
                 return self._list_access_keys(**parameters)
             elif tool_name == 'iam_list_attached_role_policies':
                 return self._list_attached_role_policies(**parameters)
+            elif tool_name == 'iam_simulate_access':
+                return self._simulate_access(**parameters)
+            elif tool_name == 'iam_who_can':
+                return self._who_can(**parameters)
+            elif tool_name == 'iam_credential_report':
+                return self._credential_report(**parameters)
             else:
                 return {'error': f'Herramienta IAM no encontrada: {tool_name}'}
 
@@ -317,13 +378,11 @@ class IAMMCPTools:
         """Lista usuarios IAM"""
         client = self._get_client()
 
-        iam_params = {}
+        iam_params = {'PaginationConfig': {'MaxItems': kwargs.get('max_items', 100)}}
         if kwargs.get('path_prefix'):
-            iam_kwargs['PathPrefix'] = kwargs.get('path_prefix')
-        if kwargs.get('max_items'):
-            iam_kwargs['MaxItems'] = kwargs.get('max_items')
+            iam_params['PathPrefix'] = kwargs.get('path_prefix')
 
-        response = client.list_users(**iam_params)
+        response = client.get_paginator('list_users').paginate(**iam_params).build_full_result()
 
         users = []
         for user in response['Users']:
@@ -340,7 +399,7 @@ class IAMMCPTools:
         return {
             'users': users,
             'total_count': len(users),
-            'is_truncated': response.get('IsTruncated', False)
+            'is_truncated': 'NextToken' in response
         }
 
     def _create_user(self, **kwargs) -> Dict[str, Any]:
@@ -352,11 +411,12 @@ class IAMMCPTools:
         }
 
         if kwargs.get('path'):
-            iam_kwargs['Path'] = kwargs.get('path')
+            iam_params['Path'] = kwargs.get('path')
         if kwargs.get('permissions_boundary'):
-            iam_kwargs['PermissionsBoundary'] = kwargs.get('permissions_boundary')
+            iam_params['PermissionsBoundary'] = kwargs.get('permissions_boundary')
 
         response = client.create_user(**iam_params)
+        self._invalidate_snapshot()
 
         user_arn = response['User']['Arn']
 
@@ -378,6 +438,7 @@ class IAMMCPTools:
         client = self._get_client()
 
         client.delete_user(UserName=kwargs.get('user_name'))
+        self._invalidate_snapshot()
 
         return {
             'message': f'Usuario IAM {kwargs.get("user_name")} eliminado exitosamente',
@@ -420,9 +481,9 @@ class IAMMCPTools:
 
         iam_params = {}
         if kwargs.get('path_prefix'):
-            iam_kwargs['PathPrefix'] = kwargs.get('path_prefix')
+            iam_params['PathPrefix'] = kwargs.get('path_prefix')
         if kwargs.get('max_items'):
-            iam_kwargs['MaxItems'] = kwargs.get('max_items')
+            iam_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_groups(**iam_params)
 
@@ -451,7 +512,7 @@ class IAMMCPTools:
         }
 
         if kwargs.get('path'):
-            iam_kwargs['Path'] = kwargs.get('path')
+            iam_params['Path'] = kwargs.get('path')
 
         response = client.create_group(**iam_params)
 
@@ -469,6 +530,7 @@ class IAMMCPTools:
             GroupName=kwargs.get('group_name'),
             UserName=kwargs.get('user_name')
         )
+        self._invalidate_snapshot()
 
         return {
             'message': f'Usuario {kwargs.get("user_name")} agregado al grupo {kwargs.get("group_name")}',
@@ -484,6 +546,7 @@ class IAMMCPTools:
             GroupName=kwargs.get('group_name'),
             UserName=kwargs.get('user_name')
         )
+        self._invalidate_snapshot()
 
         return {
             'message': f'Usuario {kwargs.get("user_name")} removido del grupo {kwargs.get("group_name")}',
@@ -495,13 +558,11 @@ class IAMMCPTools:
         """Lista roles IAM"""
         client = self._get_client()
 
-        iam_params = {}
+        iam_params = {'PaginationConfig': {'MaxItems': kwargs.get('max_items', 100)}}
         if kwargs.get('path_prefix'):
-            iam_kwargs['PathPrefix'] = kwargs.get('path_prefix')
-        if kwargs.get('max_items'):
-            iam_kwargs['MaxItems'] = kwargs.get('max_items')
+            iam_params['PathPrefix'] = kwargs.get('path_prefix')
 
-        response = client.list_roles(**iam_params)
+        response = client.get_paginator('list_roles').paginate(**iam_params).build_full_result()
 
         roles = []
         for role in response['Roles']:
@@ -519,7 +580,7 @@ class IAMMCPTools:
         return {
             'roles': roles,
             'total_count': len(roles),
-            'is_truncated': response.get('IsTruncated', False)
+            'is_truncated': 'NextToken' in response
         }
 
     def _create_role(self, **kwargs) -> Dict[str, Any]:
@@ -532,15 +593,16 @@ class IAMMCPTools:
         }
 
         if kwargs.get('path'):
-            iam_kwargs['Path'] = kwargs.get('path')
+            iam_params['Path'] = kwargs.get('path')
         if kwargs.get('description'):
-            iam_kwargs['Description'] = kwargs.get('description')
+            iam_params['Description'] = kwargs.get('description')
         if kwargs.get('max_session_duration'):
-            iam_kwargs['MaxSessionDuration'] = kwargs.get('max_session_duration')
+            iam_params['MaxSessionDuration'] = kwargs.get('max_session_duration')
         if kwargs.get('permissions_boundary'):
-            iam_kwargs['PermissionsBoundary'] = kwargs.get('permissions_boundary')
+            iam_params['PermissionsBoundary'] = kwargs.get('permissions_boundary')
 
         response = client.create_role(**iam_params)
+        self._invalidate_snapshot()
 
         role_arn = response['Role']['Arn']
 
@@ -562,6 +624,7 @@ class IAMMCPTools:
         client = self._get_client()
 
         client.delete_role(RoleName=kwargs.get('role_name'))
+        self._invalidate_snapshot()
 
         return {
             'message': f'Rol IAM {kwargs.get("role_name")} eliminado exitosamente',
@@ -576,6 +639,7 @@ class IAMMCPTools:
             RoleName=kwargs.get('role_name'),
             PolicyArn=kwargs.get('policy_arn')
         )
+        self._invalidate_snapshot()
 
         return {
             'message': f'Política {kwargs.get("policy_arn")} asociada al rol {kwargs.get("role_name")}',
@@ -591,6 +655,7 @@ class IAMMCPTools:
             RoleName=kwargs.get('role_name'),
             PolicyArn=kwargs.get('policy_arn')
         )
+        self._invalidate_snapshot()
 
         return {
             'message': f'Política {kwargs.get("policy_arn")} desasociada del rol {kwargs.get("role_name")}',
@@ -602,19 +667,17 @@ class IAMMCPTools:
         """Lista políticas IAM"""
         client = self._get_client()
 
-        iam_params = {}
+        iam_params = {'PaginationConfig': {'MaxItems': kwargs.get('max_items', 100)}}
         if kwargs.get('scope'):
-            iam_kwargs['Scope'] = kwargs.get('scope')
+            iam_params['Scope'] = kwargs.get('scope')
         if kwargs.get('only_attached'):
-            iam_kwargs['OnlyAttached'] = kwargs.get('only_attached')
+            iam_params['OnlyAttached'] = kwargs.get('only_attached')
         if kwargs.get('path_prefix'):
-            iam_kwargs['PathPrefix'] = kwargs.get('path_prefix')
+            iam_params['PathPrefix'] = kwargs.get('path_prefix')
         if kwargs.get('policy_usage_filter'):
-            iam_kwargs['PolicyUsageFilter'] = kwargs.get('policy_usage_filter')
-        if kwargs.get('max_items'):
-            iam_kwargs['MaxItems'] = kwargs.get('max_items')
+            iam_params['PolicyUsageFilter'] = kwargs.get('policy_usage_filter')
 
-        response = client.list_policies(**iam_params)
+        response = client.get_paginator('list_policies').paginate(**iam_params).build_full_result()
 
         policies = []
         for policy in response['Policies']:
@@ -635,7 +698,7 @@ class IAMMCPTools:
         return {
             'policies': policies,
             'total_count': len(policies),
-            'is_truncated': response.get('IsTruncated', False)
+            'is_truncated': 'NextToken' in response
         }
 
     def _create_policy(self, **kwargs) -> Dict[str, Any]:
@@ -648,11 +711,12 @@ class IAMMCPTools:
         }
 
         if kwargs.get('path'):
-            iam_kwargs['Path'] = kwargs.get('path')
+            iam_params['Path'] = kwargs.get('path')
         if kwargs.get('description'):
-            iam_kwargs['Description'] = kwargs.get('description')
+            iam_params['Description'] = kwargs.get('description')
 
         response = client.create_policy(**iam_params)
+        self._invalidate_snapshot()
 
         policy_arn = response['Policy']['Arn']
 
@@ -699,7 +763,7 @@ class IAMMCPTools:
         }
 
         if kwargs.get('max_items'):
-            iam_kwargs['MaxItems'] = kwargs.get('max_items')
+            iam_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_access_keys(**iam_params)
 
@@ -727,9 +791,9 @@ class IAMMCPTools:
         }
 
         if kwargs.get('path_prefix'):
-            iam_kwargs['PathPrefix'] = kwargs.get('path_prefix')
+            iam_params['PathPrefix'] = kwargs.get('path_prefix')
         if kwargs.get('max_items'):
-            iam_kwargs['MaxItems'] = kwargs.get('max_items')
+            iam_params['MaxItems'] = kwargs.get('max_items')
 
         response = client.list_attached_role_policies(**iam_params)
 
@@ -745,4 +809,61 @@ class IAMMCPTools:
             'attached_policies': policies,
             'total_count': len(policies),
             'is_truncated': response.get('IsTruncated', False)
-        }
\ No newline at end of file
+        }
+
+    def _snapshot(self, refresh: bool = False) -> iam_access.IAMSnapshot:
+        return iam_access.get_snapshot(self._get_client(), get_cache_scope(), refresh=refresh)
+
+    def _simulate_access(self, **kwargs) -> Dict[str, Any]:
+        """Evalúa acciones de un principal sobre el snapshot de IAM"""
+        snapshot = self._snapshot(kwargs.get('refresh', False))
+        principal = snapshot.find_principal(kwargs.get('principal', ''))
+        if principal is None:
+            return {'error': f'Principal no encontrado: {kwargs.get("principal")}'}
+
+        actions = kwargs.get('actions') or []
+        if isinstance(actions, str):
+            actions = [actions]
+        results = snapshot.simulate(principal, actions, kwargs.get('resource') or '*')
+
+        return {
+            'principal': principal.to_dict(),
+            'results': results,
+            'allowed': [r['action'] for r in results if r['allowed']],
+            'denied': [r['action'] for r in results if not r['allowed']]
+        }
+
+    def _who_can(self, **kwargs) -> Dict[str, Any]:
+        """Principales con permiso para una acción sobre un recurso"""
+        snapshot = self._snapshot(kwargs.get('refresh', False))
+        principals = snapshot.who_can(kwargs.get('action'), kwargs.get('resource') or '*',
+                                      kwargs.get('principal_type'),
+                                      include_conditional=kwargs.get('include_conditional', True))
+
+        return {
+            'action': kwargs.get('action'),
+            'resource': kwargs.get('resource') or '*',
+            'principals': principals,
+            'total_count': len(principals),
+            'snapshot': snapshot.summary()
+        }
+
+    def _credential_report(self, **kwargs) -> Dict[str, Any]:
+        """Informe de credenciales filtrado y ordenado, sin llamadas por usuario"""
+        report = credential_report.get_report(self._get_client(), get_cache_scope(), refresh=kwargs.get('refresh', False))
+
+        rows = credential_report.filter_rows(report['rows'], mfa=kwargs.get('mfa'),
+                                             min_key_age=kwargs.get('min_key_age'),
+                                             min_inactive=kwargs.get('min_inactive'),
+                                             finding=kwargs.get('finding'),
+                                             with_keys=kwargs.get('with_keys', False))
+        rows = credential_report.sort_rows(rows, kwargs.get('sort', 'key_age'), kwargs.get('descending', True))
+        max_items = kwargs.get('max_items', 100)
+
+        return {
+            'generated_time': report['generated_time'].isoformat(),
+            'summary': credential_report.summary(report['rows']),
+            'users': [credential_report.to_json(row) for row in rows[:max_items]],
+            'total_count': len(rows),
+            'is_truncated': len(rows) > max_items
+        }
@@ -2,6 +2,7 @@ import boto3
 import os
 import base64
 from typing import Dict, List, Any, Optional
+from app.utils import kms_envelope
 
 class KMSMCPTools:
     """Herramientas MCP para gestión de AWS Key Management Service (KMS)"""
@@ -16,6 +17,11 @@ class KMSMCPTools:
             region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
         )
 
+    def _scope(self):
+        """Ámbito de caché de las claves de datos (mismo formato que get_cache_scope)"""
+        return (os.environ.get('AWS_ACCESS_KEY_ID') or 'default',
+                os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+
     def list_keys(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Lista todas las claves KMS
@@ -157,6 +163,7 @@ class KMSMCPTools:
 
             kms = self._get_client()
             kms.disable_key(KeyId=params['key_id'])
+            kms_envelope.invalidate(self._scope())
 
             return {
                 'success': True,
@@ -232,6 +239,7 @@ class KMSMCPTools:
                 kwargs['PendingWindowInDays'] = max(7, min(30, window))  # Entre 7 y 30 días
 
             response = kms.schedule_key_deletion(**kwargs)
+            kms_envelope.invalidate(self._scope())
 
             return {
                 'success': True,
@@ -489,4 +497,95 @@ class KMSMCPTools:
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+
+    def envelope_encrypt(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cifra datos de cualquier tamaño con cifrado de sobre (clave de datos cacheada + AES-GCM)
+
+        Args:
+            params: Parámetros de encriptación
+                - key_id (str): ID o ARN de la clave KMS
+                - plaintext (str, opcional): Texto a cifrar
+                - plaintext_base64 (str, opcional): Datos binarios en base64 (alternativa a plaintext)
+                - encryption_context (dict, opcional): Contexto de encriptación
+                - chunk_size (int, opcional): Tamaño de bloque en bytes (default: 65536)
+
+        Returns:
+            Dict con el mensaje cifrado en base64
+        """
+        try:
+            if 'key_id' not in params:
+                return {
+                    'success': False,
+                    'error': 'Parámetro requerido faltante: key_id'
+                }
+            if 'plaintext_base64' in params:
+                data = base64.b64decode(params['plaintext_base64'])
+            elif 'plaintext' in params:
+                data = params['plaintext'].encode('utf-8')
+            else:
+                return {
+                    'success': False,
+                    'error': 'Parámetro requerido faltante: plaintext o plaintext_base64'
+                }
+
+            message, stats = kms_envelope.encrypt_bytes(
+                self._get_client(), self._scope(), params['key_id'], data,
+                context=params.get('encryption_context'),
+                chunk_size=int(params.get('chunk_size', kms_envelope.DEFAULT_CHUNK_SIZE))
+            )
+
+            return {
+                'success': True,
+                'key_id': params['key_id'],
+                'message': base64.b64encode(message).decode('utf-8'),
+                'chunks': stats['chunks'],
+                'cached_data_key': stats['cached_key'],
+                'bytes_in': stats['bytes_in'],
+                'bytes_out': stats['bytes_out']
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def envelope_decrypt(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Descifra un mensaje de envelope_encrypt
+
+        Args:
+            params: Parámetros de desencriptación
+                - message (str): Mensaje cifrado (base64)
+
+        Returns:
+            Dict con los datos descifrados (texto, o base64 si no es UTF-8)
+        """
+        try:
+            if 'message' not in params:
+                return {
+                    'success': False,
+                    'error': 'Parámetro requerido faltante: message'
+                }
+
+            data, stats = kms_envelope.decrypt_bytes(self._get_client(), self._scope(),
+                                                     base64.b64decode(params['message']))
+            result = {
+                'success': True,
+                'chunks': stats['chunks'],
+                'cached_data_key': stats['cached_key'],
+                'encryption_context': stats['context']
+            }
+            try:
+                result['plaintext'] = data.decode('utf-8')
+            except UnicodeDecodeError:
+                result['plaintext_base64'] = base64.b64encode(data).decode('utf-8')
+            return result
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
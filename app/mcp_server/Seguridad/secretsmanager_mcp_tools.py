@@ -3,11 +3,14 @@ Secrets Manager MCP Tools
 Herramientas MCP para gestión de AWS Secrets Manager
 """
 
+import os
 import boto3
 from botocore.exceptions import ClientError
 import json
 from typing import Dict, List, Any, Optional
 
+from app.utils import secret_values
+
 class SecretsManagerMCPTools:
     """Herramientas MCP para AWS Secrets Manager"""
 
@@ -23,6 +26,19 @@ class SecretsManagerMCPTools:
                 raise ConnectionError(f"Error al conectar con Secrets Manager: {str(e)}")
         return self.client
 
+    def _scope(self):
+        """Ámbito de la caché de valores (mismo formato que get_cache_scope)"""
+        return (os.environ.get('AWS_ACCESS_KEY_ID') or 'default',
+                os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+
+    @staticmethod
+    def _parse(secret_value):
+        # Intentar parsear como JSON
+        try:
+            return json.loads(secret_value)
+        except (TypeError, json.JSONDecodeError):
+            return secret_value
+
     def list_secrets(self) -> Dict[str, Any]:
         """
         Listar todos los secretos en Secrets Manager
@@ -106,7 +122,7 @@ class SecretsManagerMCPTools:
             }
 
     def get_secret_value(self, secret_name: str, version_id: str = None,
-                        version_stage: str = None) -> Dict[str, Any]:
+                        version_stage: str = None, refresh: bool = False) -> Dict[str, Any]:
         """
         Obtener el valor de un secreto
 
@@ -114,36 +130,58 @@ class SecretsManagerMCPTools:
             secret_name: Nombre o ARN del secreto
             version_id: ID de versión específico (opcional)
             version_stage: Stage de versión (opcional)
+            refresh: Ignorar la caché de valores
 
         Returns:
             Dict con el valor del secreto
         """
         try:
             client = self._get_client()
+            secret = secret_values.get_secret(client, self._scope(), secret_name, version_id=version_id,
+                                              version_stage=version_stage, refresh=refresh)
 
-            params = {'SecretId': secret_name}
-            if version_id:
-                params['VersionId'] = version_id
-            if version_stage:
-                params['VersionStage'] = version_stage
+            return {
+                'success': True,
+                'secret_value': self._parse(secret['secret_string'] or ''),
+                'arn': secret['arn'],
+                'name': secret['name'],
+                'version_id': secret['version_id'],
+                'version_stages': secret['version_stages'],
+                'created_date': secret['created_date'].isoformat() if secret['created_date'] else None
+            }
 
-            response = client.get_secret_value(**params)
+        except ClientError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
 
-            # Intentar parsear como JSON
-            secret_value = response.get('SecretString', '')
-            try:
-                parsed_value = json.loads(secret_value)
-            except json.JSONDecodeError:
-                parsed_value = secret_value
+    def batch_get_secret_values(self, secret_names: List[str], refresh: bool = False) -> Dict[str, Any]:
+        """
+        Obtener el valor actual de varios secretos en bloque
+
+        Args:
+            secret_names: Nombres o ARNs de los secretos
+            refresh: Ignorar la caché de valores
+
+        Returns:
+            Dict con los valores por secreto y los errores por secreto
+        """
+        try:
+            client = self._get_client()
+            values, errors = secret_values.batch_get_secrets(client, self._scope(), secret_names, refresh=refresh)
 
             return {
                 'success': True,
-                'secret_value': parsed_value,
-                'arn': response.get('ARN'),
-                'name': response.get('Name'),
-                'version_id': response.get('VersionId'),
-                'version_stages': response.get('VersionStages', []),
-                'created_date': response.get('CreatedDate').isoformat() if response.get('CreatedDate') else None
+                'secrets': {
+                    secret_id: {
+                        'secret_value': self._parse(secret['secret_string'] or ''),
+                        'version_id': secret['version_id']
+                    }
+                    for secret_id, secret in values.items()
+                },
+                'errors': errors,
+                'count': len(values)
             }
 
         except ClientError as e:
@@ -185,6 +223,7 @@ class SecretsManagerMCPTools:
                 }
 
             response = client.update_secret(**params)
+            secret_values.invalidate_secret(self._scope(), secret_name)
 
             return {
                 'success': True,
@@ -223,6 +262,7 @@ class SecretsManagerMCPTools:
                 params['AutomaticallyAfterDays'] = automatically_after_days
 
             response = client.rotate_secret(**params)
+            secret_values.invalidate_secret(self._scope(), secret_name)
 
             return {
                 'success': True,
@@ -262,6 +302,7 @@ class SecretsManagerMCPTools:
                 params['RecoveryWindowInDays'] = recovery_window
 
             response = client.delete_secret(**params)
+            secret_values.invalidate_secret(self._scope(), secret_name)
 
             return {
                 'success': True,
@@ -290,6 +331,7 @@ class SecretsManagerMCPTools:
             client = self._get_client()
 
             response = client.restore_secret(SecretId=secret_name)
+            secret_values.invalidate_secret(self._scope(), secret_name)
 
             return {
                 'success': True,
@@ -51,6 +51,7 @@ from .Gestion.cloudwatch_mcp_tools import CloudWatchMCPTools
 from .Gestion.autoscaling_mcp_tools import AutoScalingMCPTools
 from .Gestion.systems_manager_mcp_tools import SystemsManagerMCPTools
 from .Gestion.cloudtrail_mcp_tools import CloudTrailMCPTools
+from .Gestion.inventory_mcp_tools import InventoryMCPTools
 from .Integracion.cloudformation_mcp_tools import CloudFormationMCPTools
 from .AWSConfig.config_mcp_tools import ConfigMCPTools
 from .AI_Assistant.ai_assistant_mcp_tools import AIAssistantMCPTools
@@ -127,6 +128,7 @@ class AWSMCPServer:
                 "autoscaling": AutoScalingMCPTools(),
                 "systems_manager": SystemsManagerMCPTools(),
                 "cloudtrail": CloudTrailMCPTools(),
+                "inventory": InventoryMCPTools(),
             },
             "Config": {
                 "config": ConfigMCPTools(),
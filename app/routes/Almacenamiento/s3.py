@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_client_factory, get_cache_scope
+from app.utils import inventory
+from datetime import datetime
 import boto3
 import json
 
@@ -12,13 +14,16 @@ def index():
 @bp.route('/s3/buckets')
 def buckets():
     try:
-        s3 = get_aws_client('s3')
-        buckets = s3.list_buckets()
+        if request.args.get('refresh') == '1':
+            inventory.mark_dirty(get_cache_scope(), 's3')
+        # Lectura desde el inventario; solo se llama a AWS si la instantánea no es válida
+        entry = inventory.get_items(get_client_factory(), 's3')
         bucket_list = []
-        for bucket in buckets['Buckets']:
+        for bucket in entry['items']:
+            created = bucket['creation_date']
             bucket_list.append({
-                'name': bucket['Name'],
-                'creation_date': bucket['CreationDate'].strftime('%Y-%m-%d %H:%M:%S')
+                'name': bucket['name'],
+                'creation_date': datetime.fromisoformat(created).strftime('%Y-%m-%d %H:%M:%S') if created else ''
             })
         return render_template('Almacenamiento/s3/buckets.html', buckets=bucket_list)
     except Exception as e:
@@ -85,6 +90,7 @@ def delete_bucket(bucket_name):
         
         # Eliminar el bucket
         s3.delete_bucket(Bucket=bucket_name)
+        inventory.mark_dirty(get_cache_scope(), 's3')
         flash(f'Bucket {bucket_name} eliminado exitosamente', 'success')
         
     except Exception as e:
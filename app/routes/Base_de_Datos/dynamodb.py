@@ -1,5 +1,9 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response
+from botocore.config import Config
 from app.utils.aws_client import get_aws_client
+from app.utils.dynamodb_scan import (fetch_page, parallel_scan, ndjson_stream, ScanStats,
+                                     DEFAULT_PAGE_SIZE, MAX_SEGMENTS)
+from app.utils.dynamodb_bulk import put_items, read_import_file, csv_stream, DEFAULT_WORKERS
 import json
 
 bp = Blueprint('dynamodb', __name__)
@@ -138,23 +142,103 @@ def delete_table(table_name):
 
 @bp.route('/table/<table_name>/items')
 def table_items(table_name):
-    """Lista items de una tabla (scan limitado)"""
+    """Lista items de una tabla paginando con LastEvaluatedKey"""
     try:
         dynamodb = get_aws_client('dynamodb')
-        response = dynamodb.scan(
-            TableName=table_name,
-            Limit=50  # Limitar a 50 items
-        )
-        
-        items = response.get('Items', [])
-        return render_template('Base_de_Datos/dynamodb/items.html', 
-                             table_name=table_name, 
-                             items=items,
-                             count=len(items))
+        page_size = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        page = fetch_page(dynamodb, 'scan', {'TableName': table_name},
+                          page_size=page_size, cursor=request.args.get('cursor'))
+
+        return render_template('Base_de_Datos/dynamodb/scan_items.html',
+                             table_name=table_name,
+                             items=page['items'],
+                             count=page['count'],
+                             next_cursor=page['next_cursor'],
+                             page_size=page_size,
+                             stats=page['stats'],
+                             filter_expression='',
+                             expression_values='')
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('dynamodb.table_items', table_name=table_name))
     except Exception as e:
         flash(f'Error obteniendo items: {str(e)}', 'error')
         return redirect(url_for('dynamodb.tables'))
 
+@bp.route('/table/<table_name>/export')
+def export_items(table_name):
+    """Exporta la tabla completa (NDJSON o CSV) usando un scan paralelo por segmentos"""
+    try:
+        segments = max(1, min(request.args.get('segments', 4, type=int), MAX_SEGMENTS))
+        workers = request.args.get('workers', segments, type=int)
+        # El cliente se comparte entre los hilos del scan: un pool de conexiones por segmento
+        dynamodb = get_aws_client('dynamodb',
+                                  client_config=Config(max_pool_connections=max(10, segments)))
+
+        scan_params = {'TableName': table_name}
+        filter_expression = request.args.get('filter_expression')
+        if filter_expression:
+            scan_params['FilterExpression'] = filter_expression
+            expression_values = request.args.get('expression_values')
+            if expression_values:
+                scan_params['ExpressionAttributeValues'] = json.loads(expression_values)
+
+        # Errores de tabla/permisos antes de empezar la respuesta (después solo quedaría cortarla)
+        dynamodb.describe_table(TableName=table_name)
+
+        stats = ScanStats()
+        items = parallel_scan(dynamodb, scan_params, total_segments=segments,
+                              max_workers=workers, stats=stats)
+        if request.args.get('format') == 'csv':
+            # csv_stream necesita todos los items para las columnas: se leen aquí, dentro del try
+            return Response(csv_stream(list(items)), mimetype='text/csv',
+                            headers={'Content-Disposition': f'attachment; filename={table_name}.csv'})
+        return Response(ndjson_stream(items, stats if request.args.get('stats') else None),
+                        mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': f'attachment; filename={table_name}.ndjson'})
+    except json.JSONDecodeError:
+        flash('Error en formato JSON de valores de expresión', 'error')
+    except Exception as e:
+        flash(f'Error exportando tabla: {str(e)}', 'error')
+    return redirect(url_for('dynamodb.table_detail', table_name=table_name))
+
+@bp.route('/table/<table_name>/import', methods=['GET', 'POST'])
+def import_items(table_name):
+    """Importa items desde CSV/JSONL con BatchWriteItem troceado y en paralelo"""
+    if request.method == 'GET':
+        return render_template('Base_de_Datos/dynamodb/import_export.html',
+                             table_name=table_name, result=None)
+    
+    upload = request.files.get('import_file')
+    if not upload or not upload.filename:
+        flash('Seleccione un fichero CSV o JSONL para importar', 'error')
+        return redirect(url_for('dynamodb.import_items', table_name=table_name))
+    
+    try:
+        workers = max(1, min(request.form.get('workers', DEFAULT_WORKERS, type=int), 16))
+        dynamodb = get_aws_client('dynamodb',
+                                  client_config=Config(max_pool_connections=max(10, workers)))
+        table = dynamodb.describe_table(TableName=table_name)['Table']
+        key_names = [key['AttributeName'] for key in table['KeySchema']]
+        
+        items = read_import_file(upload, request.form.get('file_format') or None)
+        result = put_items(dynamodb, table_name, items, max_workers=workers,
+                           key_names={table_name: key_names}).to_dict()
+        
+        if result['unprocessed_count'] or result['errors']:
+            flash(f'Importación parcial: {result["processed"]} items escritos, '
+                  f'{result["unprocessed_count"]} sin procesar', 'warning')
+        else:
+            flash(f'{result["processed"]} items importados en {result["seconds"]} s '
+                  f'({result["items_per_second"]} items/s)', 'success')
+        return render_template('Base_de_Datos/dynamodb/import_export.html',
+                             table_name=table_name, result=result)
+    except ValueError as e:
+        flash(f'Error en el fichero de importación: {str(e)}', 'error')
+    except Exception as e:
+        flash(f'Error importando items: {str(e)}', 'error')
+    return redirect(url_for('dynamodb.import_items', table_name=table_name))
+
 @bp.route('/table/<table_name>/update', methods=['GET', 'POST'])
 def update_table(table_name):
     """Actualiza configuración de tabla (capacidad, streams)"""
@@ -220,38 +304,39 @@ def update_table(table_name):
 
 @bp.route('/table/<table_name>/scan', methods=['GET', 'POST'])
 def scan_items(table_name):
-    """Escanea items de una tabla con filtros opcionales"""
+    """Escanea items de una tabla con filtros opcionales, paginando por cursor"""
     try:
         dynamodb = get_aws_client('dynamodb')
         
-        # Parámetros de scan
+        # Parámetros de scan (GET para la paginación, POST desde el formulario)
         scan_params = {'TableName': table_name}
+        filter_expression = request.values.get('filter_expression', '')
+        expression_values = request.values.get('expression_values', '')
+        page_size = request.values.get('limit', DEFAULT_PAGE_SIZE, type=int)
         
-        # Filtro opcional
-        if request.method == 'POST':
-            filter_expression = request.form.get('filter_expression')
-            if filter_expression:
-                scan_params['FilterExpression'] = filter_expression
-            
-            # Valores de expresión si hay placeholders
-            expression_values = request.form.get('expression_values')
-            if expression_values:
-                try:
-                    scan_params['ExpressionAttributeValues'] = json.loads(expression_values)
-                except json.JSONDecodeError:
-                    flash('Error en formato JSON de valores de expresión', 'error')
+        if filter_expression:
+            scan_params['FilterExpression'] = filter_expression
+        
+        # Valores de expresión si hay placeholders
+        if expression_values:
+            try:
+                scan_params['ExpressionAttributeValues'] = json.loads(expression_values)
+            except json.JSONDecodeError:
+                flash('Error en formato JSON de valores de expresión', 'error')
         
-        # Ejecutar scan
-        response = dynamodb.scan(**scan_params)
-        items = response.get('Items', [])
-        count = response.get('Count', 0)
+        # Ejecutar scan (una página)
+        page = fetch_page(dynamodb, 'scan', scan_params,
+                          page_size=page_size, cursor=request.values.get('cursor'))
         
         return render_template('Base_de_Datos/dynamodb/scan_items.html',
                              table_name=table_name,
-                             items=items,
-                             count=count,
-                             filter_expression=request.form.get('filter_expression', ''),
-                             expression_values=request.form.get('expression_values', ''))
+                             items=page['items'],
+                             count=page['count'],
+                             next_cursor=page['next_cursor'],
+                             page_size=page_size,
+                             stats=page['stats'],
+                             filter_expression=filter_expression,
+                             expression_values=expression_values)
                              
     except Exception as e:
         flash(f'Error escaneando items: {str(e)}', 'error')
@@ -360,17 +445,19 @@ def query_items(table_name):
             if filter_expression:
                 query_params['FilterExpression'] = filter_expression
             
-            # Ejecutar query
-            response = dynamodb.query(**query_params)
-            items = response.get('Items', [])
-            count = response.get('Count', 0)
+            # Ejecutar query (una página, continuando desde el cursor si existe)
+            page = fetch_page(dynamodb, 'query', query_params,
+                              page_size=request.form.get('limit', DEFAULT_PAGE_SIZE, type=int),
+                              cursor=request.form.get('cursor'))
             
             return render_template('Base_de_Datos/dynamodb/query_items.html',
                                  table_name=table_name,
                                  partition_key=partition_key,
                                  sort_key=sort_key,
-                                 items=items,
-                                 count=count,
+                                 items=page['items'],
+                                 count=page['count'],
+                                 next_cursor=page['next_cursor'],
+                                 stats=page['stats'],
                                  key_condition=key_condition,
                                  expression_values=expression_values,
                                  filter_expression=filter_expression)
@@ -1,8 +1,19 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils.fanout import fan_out, fanout_client_config
+from app.utils import ecs_batch, inventory
 
 bp = Blueprint('ecs', __name__)
 
+ECS_MAX_WORKERS = 8
+
+def _ecs_client():
+    return get_aws_client('ecs', client_config=fanout_client_config(ECS_MAX_WORKERS))
+
+def _flash_failures(errors, what):
+    if errors:
+        flash(f'{len(errors)} {what} no se pudieron describir: {"; ".join(errors[:3])}', 'warning')
+
 @bp.route('/')
 def index():
     return render_template('Contenedores/ecs/index.html')
@@ -10,19 +21,19 @@ def index():
 @bp.route('/clusters')
 def clusters():
     try:
-        ecs = get_aws_client('ecs')
-        clusters = ecs.list_clusters()
+        ecs = _ecs_client()
+        described = ecs_batch.describe_clusters(ecs, scope=get_cache_scope(),
+                                                refresh=request.args.get('refresh') == '1')
+        _flash_failures(described['errors'], 'clusters')
         cluster_list = []
-        if clusters['clusterArns']:
-            cluster_details = ecs.describe_clusters(clusters=clusters['clusterArns'])
-            for cluster in cluster_details['clusters']:
-                cluster_list.append({
-                    'name': cluster['clusterName'],
-                    'arn': cluster['clusterArn'],
-                    'status': cluster['status'],
-                    'services': cluster.get('activeServicesCount', 0),
-                    'tasks': cluster.get('runningTasksCount', 0)
-                })
+        for cluster in described['clusters']:
+            cluster_list.append({
+                'name': cluster['clusterName'],
+                'arn': cluster['clusterArn'],
+                'status': cluster['status'],
+                'services': cluster.get('activeServicesCount', 0),
+                'tasks': cluster.get('runningTasksCount', 0)
+            })
         return render_template('Contenedores/ecs/clusters.html', clusters=cluster_list)
     except Exception as e:
         flash(f'Error obteniendo clusters ECS: {str(e)}', 'error')
@@ -35,6 +46,8 @@ def create_cluster():
         try:
             ecs = get_aws_client('ecs')
             response = ecs.create_cluster(clusterName=cluster_name)
+            ecs_batch.invalidate(get_cache_scope())
+            inventory.mark_dirty(get_cache_scope(), 'ecs')
             flash(f'Cluster ECS "{cluster_name}" creado exitosamente', 'success')
             return redirect(url_for('ecs.clusters'))
         except Exception as e:
@@ -46,6 +59,8 @@ def delete_cluster(cluster_name):
     try:
         ecs = get_aws_client('ecs')
         ecs.delete_cluster(cluster=cluster_name)
+        ecs_batch.invalidate(get_cache_scope())
+        inventory.mark_dirty(get_cache_scope(), 'ecs')
         flash(f'Cluster ECS "{cluster_name}" eliminado exitosamente', 'success')
     except Exception as e:
         flash(f'Error eliminando cluster ECS: {str(e)}', 'error')
@@ -54,26 +69,14 @@ def delete_cluster(cluster_name):
 @bp.route('/cluster/<cluster_name>/services')
 def services(cluster_name):
     try:
-        ecs = get_aws_client('ecs')
-        services_response = ecs.list_services(cluster=cluster_name)
-        service_list = []
-        if services_response['serviceArns']:
-            service_details = ecs.describe_services(
-                cluster=cluster_name,
-                services=services_response['serviceArns']
-            )
-            for service in service_details['services']:
-                service_list.append({
-                    'name': service['serviceName'],
-                    'arn': service['serviceArn'],
-                    'status': service['status'],
-                    'desired_count': service['desiredCount'],
-                    'running_count': service['runningCount'],
-                    'task_definition': service['taskDefinition'].split('/')[-1]
-                })
+        ecs = _ecs_client()
+        described = ecs_batch.cluster_services(ecs, cluster_name, scope=get_cache_scope(),
+                                               refresh=request.args.get('refresh') == '1',
+                                               max_workers=ECS_MAX_WORKERS)
+        _flash_failures(described['errors'], 'servicios')
         return render_template('Contenedores/ecs/services.html', 
                              cluster_name=cluster_name, 
-                             services=service_list)
+                             services=described['services'])
     except Exception as e:
         flash(f'Error obteniendo servicios ECS: {str(e)}', 'error')
         return render_template('Contenedores/ecs/services.html', 
@@ -95,6 +98,7 @@ def create_service(cluster_name):
                 taskDefinition=task_definition,
                 desiredCount=desired_count
             )
+            ecs_batch.invalidate(get_cache_scope(), cluster_name)
             flash(f'Servicio "{service_name}" creado exitosamente', 'success')
             return redirect(url_for('ecs.services', cluster_name=cluster_name))
         except Exception as e:
@@ -103,8 +107,8 @@ def create_service(cluster_name):
     # Obtener task definitions disponibles
     try:
         ecs = get_aws_client('ecs')
-        task_defs = ecs.list_task_definitions()
-        task_definitions = [td.split('/')[-1] for td in task_defs['taskDefinitionArns']]
+        task_definitions = [td.split('/')[-1] for td in
+                            ecs_batch.list_all(ecs, 'list_task_definitions', 'taskDefinitionArns')]
     except:
         task_definitions = []
     
@@ -124,6 +128,7 @@ def update_service(cluster_name, service_name):
                 service=service_name,
                 desiredCount=desired_count
             )
+            ecs_batch.invalidate(get_cache_scope(), cluster_name)
             flash(f'Servicio "{service_name}" actualizado exitosamente', 'success')
             return redirect(url_for('ecs.services', cluster_name=cluster_name))
         except Exception as e:
@@ -149,6 +154,7 @@ def delete_service(cluster_name, service_name):
     try:
         ecs = get_aws_client('ecs')
         ecs.delete_service(cluster=cluster_name, service=service_name)
+        ecs_batch.invalidate(get_cache_scope(), cluster_name)
         flash(f'Servicio "{service_name}" eliminado exitosamente', 'success')
     except Exception as e:
         flash(f'Error eliminando servicio: {str(e)}', 'error')
@@ -157,26 +163,14 @@ def delete_service(cluster_name, service_name):
 @bp.route('/cluster/<cluster_name>/tasks')
 def tasks(cluster_name):
     try:
-        ecs = get_aws_client('ecs')
-        tasks_response = ecs.list_tasks(cluster=cluster_name)
-        task_list = []
-        if tasks_response['taskArns']:
-            task_details = ecs.describe_tasks(
-                cluster=cluster_name,
-                tasks=tasks_response['taskArns']
-            )
-            for task in task_details['tasks']:
-                task_list.append({
-                    'arn': task['taskArn'],
-                    'task_id': task['taskArn'].split('/')[-1],
-                    'status': task['lastStatus'],
-                    'desired_status': task['desiredStatus'],
-                    'task_definition': task['taskDefinitionArn'].split('/')[-1],
-                    'created_at': task['createdAt']
-                })
+        ecs = _ecs_client()
+        described = ecs_batch.cluster_tasks(ecs, cluster_name, scope=get_cache_scope(),
+                                            refresh=request.args.get('refresh') == '1',
+                                            max_workers=ECS_MAX_WORKERS)
+        _flash_failures(described['errors'], 'tareas')
         return render_template('Contenedores/ecs/tasks.html', 
                              cluster_name=cluster_name, 
-                             tasks=task_list)
+                             tasks=described['tasks'])
     except Exception as e:
         flash(f'Error obteniendo tareas ECS: {str(e)}', 'error')
         return render_template('Contenedores/ecs/tasks.html', 
@@ -197,6 +191,7 @@ def run_task(cluster_name):
                 count=count
             )
             task_count = len(response['tasks'])
+            ecs_batch.invalidate(get_cache_scope(), cluster_name)
             flash(f'{task_count} tarea(s) ejecutada(s) exitosamente', 'success')
             return redirect(url_for('ecs.tasks', cluster_name=cluster_name))
         except Exception as e:
@@ -205,8 +200,8 @@ def run_task(cluster_name):
     # Obtener task definitions disponibles
     try:
         ecs = get_aws_client('ecs')
-        task_defs = ecs.list_task_definitions()
-        task_definitions = [td.split('/')[-1] for td in task_defs['taskDefinitionArns']]
+        task_definitions = [td.split('/')[-1] for td in
+                            ecs_batch.list_all(ecs, 'list_task_definitions', 'taskDefinitionArns')]
     except:
         task_definitions = []
     
@@ -219,6 +214,7 @@ def stop_task(cluster_name, task_id):
     try:
         ecs = get_aws_client('ecs')
         ecs.stop_task(cluster=cluster_name, task=task_id)
+        ecs_batch.invalidate(get_cache_scope(), cluster_name)
         flash(f'Tarea "{task_id}" detenida exitosamente', 'success')
     except Exception as e:
         flash(f'Error deteniendo tarea: {str(e)}', 'error')
@@ -227,28 +223,15 @@ def stop_task(cluster_name, task_id):
 @bp.route('/task-definitions')
 def task_definitions():
     try:
-        ecs = get_aws_client('ecs')
-        task_defs = ecs.list_task_definitions()
-        task_definition_list = []
-        
-        for td_arn in task_defs['taskDefinitionArns']:
-            try:
-                td_details = ecs.describe_task_definition(taskDefinition=td_arn)
-                td = td_details['taskDefinition']
-                task_definition_list.append({
-                    'family': td['family'],
-                    'revision': td['revision'],
-                    'status': td['status'],
-                    'cpu': td.get('cpu', 'N/A'),
-                    'memory': td.get('memory', 'N/A'),
-                    'container_count': len(td.get('containerDefinitions', []))
-                })
-            except:
-                # Si hay error describiendo una definición, continuar
-                continue
-                
+        ecs = _ecs_client()
+        td_arns = ecs_batch.list_all(ecs, 'list_task_definitions', 'taskDefinitionArns')
+        # describe_task_definition no admite lotes: se describen en paralelo
+        described = fan_out(lambda td_arn: ecs.describe_task_definition(taskDefinition=td_arn)['taskDefinition'],
+                            td_arns, max_workers=ECS_MAX_WORKERS)
+        _flash_failures([f'{arn}: {error}' for arn, error in described.errors.items()],
+                        'definiciones de tareas')
         return render_template('Contenedores/ecs/task_definitions.html', 
-                             task_definitions=task_definition_list)
+                             task_definitions=described.values())
     except Exception as e:
         flash(f'Error obteniendo definiciones de tareas: {str(e)}', 'error')
         return render_template('Contenedores/ecs/task_definitions.html', 
@@ -1,65 +1,129 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils.cache import TTLCache
+from app.utils import inventory
+from app.utils.fanout import fan_out, fanout_client_config
 import boto3
 
 bp = Blueprint('eks', __name__)
 
+EKS_MAX_WORKERS = 10
+EKS_CALL_TIMEOUT = 15.0
+
 @bp.route('/')
 def index():
     return render_template('Contenedores/eks/index.html')
 
+# Caché por cluster: resumen para el listado y detalle con node groups/Fargate.
+# Un detalle con errores parciales solo se guarda unos segundos para reintentar pronto
+_cluster_cache = TTLCache(ttl=60)
+EKS_PARTIAL_TTL = 5
+
+def _eks_client():
+    return get_aws_client('eks', client_config=fanout_client_config(EKS_MAX_WORKERS, EKS_CALL_TIMEOUT))
+
+def _list_all(eks, operation, result_key, **kwargs):
+    """Recorre todas las páginas de una operación list_* de EKS"""
+    names = []
+    for page in eks.get_paginator(operation).paginate(**kwargs):
+        names.extend(page.get(result_key, []))
+    return names
+
+def _cluster_summary(eks, cluster_name):
+    """describe_cluster + conteo de node groups y perfiles Fargate de un cluster"""
+    cluster_info = eks.describe_cluster(name=cluster_name)['cluster']
+    return {
+        'name': cluster_info['name'],
+        'arn': cluster_info['arn'],
+        'status': cluster_info['status'],
+        'version': cluster_info['version'],
+        'created_at': cluster_info['createdAt'].strftime('%Y-%m-%d %H:%M:%S'),
+        'endpoint': cluster_info.get('endpoint', 'N/A'),
+        'nodegroups': len(_list_all(eks, 'list_nodegroups', 'nodegroups', clusterName=cluster_name)),
+        'fargate_profiles': len(_list_all(eks, 'list_fargate_profiles', 'fargateProfileNames',
+                                          clusterName=cluster_name)),
+        'vpc_id': cluster_info.get('resourcesVpcConfig', {}).get('vpcId', 'N/A')
+    }
+
+def _describe_nodegroups(eks, cluster_name):
+    """Describe en paralelo todos los node groups de un cluster"""
+    names = _list_all(eks, 'list_nodegroups', 'nodegroups', clusterName=cluster_name)
+    return fan_out(lambda ng_name: eks.describe_nodegroup(clusterName=cluster_name,
+                                                          nodegroupName=ng_name)['nodegroup'],
+                   names, max_workers=EKS_MAX_WORKERS, timeout=EKS_CALL_TIMEOUT)
+
+def _cluster_details(eks, cluster_name):
+    """Cluster, node groups y perfiles Fargate; los describe_* se lanzan concurrentemente"""
+    cluster = eks.describe_cluster(name=cluster_name)['cluster']
+    nodegroup_names = _list_all(eks, 'list_nodegroups', 'nodegroups', clusterName=cluster_name)
+    fargate_names = _list_all(eks, 'list_fargate_profiles', 'fargateProfileNames',
+                              clusterName=cluster_name)
+
+    def _describe(target):
+        kind, name = target
+        if kind == 'nodegroup':
+            return eks.describe_nodegroup(clusterName=cluster_name, nodegroupName=name)['nodegroup']
+        return eks.describe_fargate_profile(clusterName=cluster_name,
+                                            fargateProfileName=name)['fargateProfile']
+
+    targets = [('nodegroup', n) for n in nodegroup_names] + [('fargate', n) for n in fargate_names]
+    described = fan_out(_describe, targets, max_workers=EKS_MAX_WORKERS, timeout=EKS_CALL_TIMEOUT)
+    return {
+        'cluster': cluster,
+        'nodegroups': [described.results[t] for t in targets if t[0] == 'nodegroup' and t in described.results],
+        'fargate_profiles': [described.results[t] for t in targets if t[0] == 'fargate' and t in described.results],
+        'errors': {f'{kind} {name}': error for (kind, name), error in described.errors.items()}
+    }
+
+def _invalidate_cluster(cluster_name=None):
+    scope = get_cache_scope()
+    if cluster_name is None:
+        _cluster_cache.invalidate_prefix(scope)
+    else:
+        _cluster_cache.invalidate_prefix(scope, cluster_name)
+    _cluster_cache.invalidate_prefix(scope, '__list__')
+    inventory.mark_dirty(scope, 'eks')
+
+def _flash_partial(errors, what):
+    if errors:
+        failed = ', '.join(sorted(str(k) for k in errors)[:5])
+        flash(f'No se pudieron obtener {len(errors)} {what} ({failed}). Se muestran resultados parciales.', 'warning')
+
 @bp.route('/clusters')
 def clusters():
     try:
-        eks = get_aws_client('eks')
-        clusters = eks.list_clusters()
+        eks = _eks_client()
+        scope = get_cache_scope()
+        refresh = request.args.get('refresh') == '1'
+        cluster_names = _cluster_cache.get_or_load(
+            (scope, '__list__'), lambda: _list_all(eks, 'list_clusters', 'clusters'), refresh=refresh)
+
+        # Solo se describen los clusters que no están en caché
+        def _summary(cluster_name):
+            return _cluster_cache.get_or_load((scope, cluster_name, 'summary'),
+                                              lambda: _cluster_summary(eks, cluster_name),
+                                              refresh=refresh)
+
+        summaries = fan_out(_summary, cluster_names, max_workers=EKS_MAX_WORKERS, timeout=EKS_CALL_TIMEOUT)
         cluster_list = []
-
-        if clusters['clusters']:
-            for cluster_name in clusters['clusters']:
-                try:
-                    # Get detailed cluster information
-                    cluster_details = eks.describe_cluster(name=cluster_name)
-                    cluster_info = cluster_details['cluster']
-
-                    # Get node groups for this cluster
-                    try:
-                        nodegroups = eks.list_nodegroups(clusterName=cluster_name)
-                        nodegroup_count = len(nodegroups['nodegroups'])
-                    except:
-                        nodegroup_count = 0
-
-                    # Get Fargate profiles
-                    try:
-                        fargate_profiles = eks.list_fargate_profiles(clusterName=cluster_name)
-                        fargate_count = len(fargate_profiles['fargateProfileNames'])
-                    except:
-                        fargate_count = 0
-
-                    cluster_list.append({
-                        'name': cluster_info['name'],
-                        'arn': cluster_info['arn'],
-                        'status': cluster_info['status'],
-                        'version': cluster_info['version'],
-                        'created_at': cluster_info['createdAt'].strftime('%Y-%m-%d %H:%M:%S'),
-                        'endpoint': cluster_info.get('endpoint', 'N/A'),
-                        'nodegroups': nodegroup_count,
-                        'fargate_profiles': fargate_count,
-                        'vpc_id': cluster_info.get('resourcesVpcConfig', {}).get('vpcId', 'N/A')
-                    })
-                except Exception as e:
-                    # If we can't get details, add basic info
-                    cluster_list.append({
-                        'name': cluster_name,
-                        'arn': 'N/A',
-                        'status': 'Unknown',
-                        'version': 'N/A',
-                        'created_at': 'N/A',
-                        'endpoint': 'N/A',
-                        'nodegroups': 0,
-                        'fargate_profiles': 0,
-                        'vpc_id': 'N/A'
-                    })
+        for cluster_name in cluster_names:
+            if cluster_name in summaries.results:
+                cluster_list.append(summaries.results[cluster_name])
+            else:
+                # If we can't get details, add basic info
+                cluster_list.append({
+                    'name': cluster_name,
+                    'arn': 'N/A',
+                    'status': 'Unknown',
+                    'version': 'N/A',
+                    'created_at': 'N/A',
+                    'endpoint': 'N/A',
+                    'nodegroups': 0,
+                    'fargate_profiles': 0,
+                    'vpc_id': 'N/A',
+                    'error': summaries.errors.get(cluster_name)
+                })
+        _flash_partial(summaries.errors, 'clusters')
 
         return render_template('Contenedores/eks/clusters.html', clusters=cluster_list)
     except Exception as e:
@@ -69,40 +133,17 @@ def clusters():
 @bp.route('/cluster/<cluster_name>')
 def cluster_detail(cluster_name):
     try:
-        eks = get_aws_client('eks')
-
-        # Get cluster details
-        cluster_details = eks.describe_cluster(name=cluster_name)
-        cluster = cluster_details['cluster']
-
-        # Get node groups
-        try:
-            nodegroups_response = eks.list_nodegroups(clusterName=cluster_name)
-            nodegroups = []
-            for ng_name in nodegroups_response['nodegroups']:
-                ng_details = eks.describe_nodegroup(
-                    clusterName=cluster_name,
-                    nodegroupName=ng_name
-                )
-                nodegroups.append(ng_details['nodegroup'])
-        except:
-            nodegroups = []
-
-        # Get Fargate profiles
-        try:
-            fargate_response = eks.list_fargate_profiles(clusterName=cluster_name)
-            fargate_profiles = []
-            for fp_name in fargate_response['fargateProfileNames']:
-                fp_details = eks.describe_fargate_profile(
-                    clusterName=cluster_name,
-                    fargateProfileName=fp_name
-                )
-                fargate_profiles.append(fp_details['fargateProfile'])
-        except:
-            fargate_profiles = []
+        eks = _eks_client()
+        key = (get_cache_scope(), cluster_name, 'detail')
+        details = None if request.args.get('refresh') == '1' else _cluster_cache.get(key)
+        if details is None:
+            details = _cluster_details(eks, cluster_name)
+            _cluster_cache.set(key, details, EKS_PARTIAL_TTL if details['errors'] else None)
+        _flash_partial(details['errors'], 'node groups/perfiles Fargate')
 
         return render_template('Contenedores/eks/cluster_detail.html',
-                             cluster=cluster, nodegroups=nodegroups, fargate_profiles=fargate_profiles)
+                             cluster=details['cluster'], nodegroups=details['nodegroups'],
+                             fargate_profiles=details['fargate_profiles'])
     except Exception as e:
         flash(f'Error obteniendo detalles del cluster: {str(e)}', 'error')
         return redirect(url_for('eks.clusters'))
@@ -134,6 +175,7 @@ def create_cluster():
                 cluster_config['resourcesVpcConfig']['vpcId'] = vpc_id
 
             response = eks.create_cluster(**cluster_config)
+            _invalidate_cluster()
             flash(f'Cluster EKS "{cluster_name}" está siendo creado. Esto puede tomar varios minutos.', 'success')
             return redirect(url_for('eks.clusters'))
         except Exception as e:
@@ -145,6 +187,7 @@ def delete_cluster(cluster_name):
     try:
         eks = get_aws_client('eks')
         eks.delete_cluster(name=cluster_name)
+        _invalidate_cluster(cluster_name)
         flash(f'Cluster EKS "{cluster_name}" está siendo eliminado. Esto puede tomar varios minutos.', 'success')
     except Exception as e:
         flash(f'Error eliminando cluster EKS: {str(e)}', 'error')
@@ -153,19 +196,12 @@ def delete_cluster(cluster_name):
 @bp.route('/cluster/<cluster_name>/nodegroups')
 def nodegroups(cluster_name):
     try:
-        eks = get_aws_client('eks')
-        nodegroups_response = eks.list_nodegroups(clusterName=cluster_name)
-        nodegroups_list = []
-
-        for ng_name in nodegroups_response['nodegroups']:
-            ng_details = eks.describe_nodegroup(
-                clusterName=cluster_name,
-                nodegroupName=ng_name
-            )
-            nodegroups_list.append(ng_details['nodegroup'])
+        eks = _eks_client()
+        described = _describe_nodegroups(eks, cluster_name)
+        _flash_partial(described.errors, 'node groups')
 
         return render_template('Contenedores/eks/nodegroups.html',
-                             cluster_name=cluster_name, nodegroups=nodegroups_list)
+                             cluster_name=cluster_name, nodegroups=described.values())
     except Exception as e:
         flash(f'Error obteniendo node groups: {str(e)}', 'error')
         return redirect(url_for('eks.cluster_detail', cluster_name=cluster_name))
@@ -197,6 +233,7 @@ def create_nodegroup(cluster_name):
             }
 
             eks.create_nodegroup(**nodegroup_config)
+            _invalidate_cluster(cluster_name)
             flash(f'Node group "{ng_name}" está siendo creado.', 'success')
             return redirect(url_for('eks.nodegroups', cluster_name=cluster_name))
         except Exception as e:
@@ -0,0 +1,68 @@
+import time
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort
+from app.utils.aws_client import get_client_factory
+from app.utils import inventory
+
+bp = Blueprint('inventory', __name__)
+
+
+@bp.route('/')
+def index():
+    """Resumen del inventario: recuentos por servicio leídos de la instantánea"""
+    factory = get_client_factory()
+    if request.args.get('refresh') == '1':
+        inventory.refresh_async(factory, full=True)
+    else:
+        inventory.ensure_fresh(factory)
+    summary = inventory.store.summary(factory.scope)
+    return render_template('Gestion/inventory/index.html', summary=summary,
+                           region=factory.region, now=time.time())
+
+
+@bp.route('/<service>')
+def service_items(service):
+    """Recursos de un servicio desde el inventario"""
+    if service not in inventory.INVENTORY_SERVICES:
+        abort(404)
+    factory = get_client_factory()
+    try:
+        if request.args.get('refresh') == '1':
+            inventory.mark_dirty(factory.scope, service)
+        entry = inventory.get_items(factory, service)
+    except Exception as e:
+        flash(f'Error obteniendo el inventario de {service}: {str(e)}', 'error')
+        entry = {'items': [], 'count': 0, 'refreshed_at': None}
+    return render_template('Gestion/inventory/service.html',
+                           service=service,
+                           spec=inventory.INVENTORY_SERVICES[service],
+                           entry=entry,
+                           now=time.time())
+
+
+@bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Lanza un refresco en segundo plano (incremental salvo full=1)"""
+    full = request.form.get('full') == '1'
+    if inventory.refresh_async(get_client_factory(), full=full):
+        flash('Refresco del inventario iniciado', 'info')
+    else:
+        flash('Ya hay un refresco del inventario en curso', 'warning')
+    return redirect(url_for('inventory.index'))
+
+
+@bp.route('/api/summary')
+def api_summary():
+    factory = get_client_factory()
+    inventory.ensure_fresh(factory)
+    return jsonify(inventory.store.summary(factory.scope))
+
+
+@bp.route('/api/<service>')
+def api_service_items(service):
+    if service not in inventory.INVENTORY_SERVICES:
+        return jsonify({'error': f'Servicio no inventariado: {service}'}), 404
+    try:
+        entry = inventory.get_items(get_client_factory(), service)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({key: entry[key] for key in ('items', 'count', 'refreshed_at', 'seconds')})
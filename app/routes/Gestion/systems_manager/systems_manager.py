@@ -4,7 +4,8 @@ Gestión de parámetros, comandos y sesiones
 """
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 import boto3
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import secret_values
 
 systems_manager_bp = Blueprint('systems_manager', __name__, url_prefix='/systems-manager')
 
@@ -17,13 +18,25 @@ def index():
 
 @systems_manager_bp.route('/parameters')
 def parameters():
-    """Lista todos los parámetros de Parameter Store"""
+    """
+    Lista los parámetros de Parameter Store (o de una jerarquía con ?path=/app/prod).
+    Con ?values=1 carga también los valores con get_parameters_by_path; los
+    SecureString no se descifran en el listado.
+    """
+    path = request.args.get('path', '').strip() or None
+    show_values = request.args.get('values') == '1'
+    refresh = request.args.get('refresh') == '1'
     try:
         ssm = get_aws_client('ssm')
-        response = ssm.describe_parameters()
+        scope = get_cache_scope()
+        described = secret_values.describe_parameters(ssm, scope, path, refresh=refresh)
+        values = {}
+        if show_values:
+            by_path = secret_values.get_parameters_by_path(ssm, scope, path or '/', decrypt=False, refresh=refresh)
+            values = {param['Name']: param for param in by_path}
 
         parameters = []
-        for param in response['Parameters']:
+        for param in described:
             param_info = {
                 'name': param['Name'],
                 'type': param['Type'],
@@ -33,12 +46,36 @@ def parameters():
                 'tier': param.get('Tier', 'Standard'),
                 'policies': param.get('Policies', [])
             }
+            if show_values:
+                loaded = values.get(param['Name'], {})
+                param_info['value'] = '********' if param['Type'] == 'SecureString' else loaded.get('Value', '')
             parameters.append(param_info)
 
-        return render_template('Gestion/systems_manager/parameters.html', parameters=parameters)
+        return render_template('Gestion/systems_manager/parameters.html', parameters=parameters,
+                               path=path or '', show_values=show_values)
     except Exception as e:
         flash(f'Error obteniendo parámetros: {str(e)}', 'error')
-        return render_template('Gestion/systems_manager/parameters.html', parameters=[])
+        return render_template('Gestion/systems_manager/parameters.html', parameters=[],
+                               path=path or '', show_values=show_values)
+
+
+@systems_manager_bp.route('/parameters/values.json', methods=['POST'])
+def parameter_values():
+    """Valores de varios parámetros (names) o de una jerarquía (path) en pocas llamadas"""
+    data = request.get_json(silent=True) or {}
+    decrypt = bool(data.get('decrypt', False))
+    try:
+        ssm = get_aws_client('ssm')
+        scope = get_cache_scope()
+        if data.get('path'):
+            found = secret_values.get_parameters_by_path(ssm, scope, data['path'],
+                                                         recursive=data.get('recursive', True), decrypt=decrypt)
+            return jsonify({'success': True, 'parameters': {p['Name']: p['Value'] for p in found}, 'invalid': []})
+        found, invalid = secret_values.get_parameters(ssm, scope, data.get('names', []), decrypt=decrypt)
+        return jsonify({'success': True, 'parameters': {name: p['Value'] for name, p in found.items()},
+                        'invalid': invalid})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @systems_manager_bp.route('/create-parameter', methods=['GET', 'POST'])
@@ -73,6 +110,7 @@ def create_parameter():
                 params['KeyId'] = key_id
 
             response = ssm.put_parameter(**params)
+            secret_values.invalidate_parameter(get_cache_scope(), name)
 
             flash(f'Parámetro {name} creado exitosamente (versión {response.get("Version", "N/A")})', 'success')
             return redirect(url_for('systems_manager.parameters'))
@@ -88,17 +126,21 @@ def create_parameter():
 @systems_manager_bp.route('/parameter/<path:param_name>')
 def get_parameter(param_name):
     """Obtiene el valor de un parámetro específico"""
+    # La URL fusiona la barra inicial (/parameter//app/x); un nombre jerárquico siempre empieza por /
+    if '/' in param_name and not param_name.startswith('/'):
+        param_name = '/' + param_name
     try:
         ssm = get_aws_client('ssm')
-        response = ssm.get_parameter(Name=param_name, WithDecryption=True)
+        found = secret_values.get_parameter(ssm, get_cache_scope(), param_name, decrypt=True,
+                                            refresh=request.args.get('refresh') == '1')
 
         parameter = {
-            'name': response['Parameter']['Name'],
-            'value': response['Parameter']['Value'],
-            'type': response['Parameter']['Type'],
-            'version': response['Parameter']['Version'],
-            'last_modified_date': response['Parameter'].get('LastModifiedDate', '').strftime('%Y-%m-%d %H:%M:%S') if response['Parameter'].get('LastModifiedDate') else 'N/A',
-            'tier': response['Parameter'].get('Tier', 'Standard')
+            'name': found['Name'],
+            'value': found['Value'],
+            'type': found['Type'],
+            'version': found['Version'],
+            'last_modified_date': found.get('LastModifiedDate', '').strftime('%Y-%m-%d %H:%M:%S') if found.get('LastModifiedDate') else 'N/A',
+            'tier': found.get('Tier', 'Standard')
         }
 
         return render_template('Gestion/systems_manager/parameter_detail.html', parameter=parameter)
@@ -1,9 +1,10 @@
-from flask import Blueprint, render_template, request, jsonify, send_file
+from flask import Blueprint, render_template, request, jsonify, send_file, url_for, Response, stream_with_context
 from app.utils.aws_client import get_aws_client
+from app.utils import polly_synthesis
+from app.utils.fanout import fanout_client_config
 from botocore.exceptions import ClientError, BotoCoreError
-import base64
-import io
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
@@ -18,48 +19,92 @@ def index():
 
 @polly_bp.route('/synthesize', methods=['POST'])
 def synthesize_speech():
-    """Sintetiza texto a voz"""
+    """
+    Prepara la síntesis de un texto (sin límite de 3000 caracteres) y devuelve la URL
+    desde la que el reproductor recibe el audio en streaming
+    """
     try:
         data = request.json
         text = data.get('text')
-        voice_id = data.get('voice_id', 'Joanna')
-        engine = data.get('engine', 'neural')
-        output_format = data.get('output_format', 'mp3')
         
         if not text:
             return jsonify({'error': 'El texto es requerido'}), 400
         
-        polly = get_aws_client('polly')
-        
-        response = polly.synthesize_speech(
-            Text=text,
-            VoiceId=voice_id,
-            OutputFormat=output_format,
-            Engine=engine
+        params = polly_synthesis.synthesis_params(
+            voice_id=data.get('voice_id', 'Joanna'),
+            engine=data.get('engine', 'neural'),
+            output_format=data.get('output_format', 'mp3'),
+            text_type=data.get('text_type') or ('ssml' if text.lstrip().startswith('<speak') else 'text'),
+            sample_rate=data.get('sample_rate'),
+            language_code=data.get('language_code')
         )
-        
-        # Leer el audio
-        audio_stream = response['AudioStream'].read()
-        audio_base64 = base64.b64encode(audio_stream).decode('utf-8')
+        prepared = polly_synthesis.register(text, params)
+        extension = polly_synthesis.EXTENSIONS[params['OutputFormat']]
         
         return jsonify({
             'success': True,
-            'audio': audio_base64,
-            'content_type': response.get('ContentType'),
-            'size': len(audio_stream),
-            'characters': len(text)
+            'url': url_for('polly.audio', key=prepared['cache_key'], extension=extension),
+            **prepared
         })
         
-    except ClientError as e:
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error inesperado: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@polly_bp.route('/audio/<key>.<extension>', methods=['GET'])
+def audio(key, extension):
+    """
+    Audio de una síntesis: desde la caché en disco (con soporte de rangos) o, si aún
+    no existe, sintetizando los fragmentos en paralelo y enviándolos en orden por
+    transferencia chunked mientras se guarda en la caché
+    """
+    output_format = next((fmt for fmt, ext in polly_synthesis.EXTENSIONS.items() if ext == extension), None)
+    if output_format is None or not re.fullmatch(r'[0-9a-f]{64}', key):
+        return jsonify({'error': 'Audio no encontrado'}), 404
+    download_name = f'polly-{key[:12]}.{extension}' if request.args.get('download') else None
+    
+    path = polly_synthesis.cached_path(key, output_format)
+    if path:
+        return send_file(path, mimetype=polly_synthesis.CONTENT_TYPES[output_format], conditional=True,
+                         as_attachment=bool(download_name), download_name=download_name, max_age=3600)
+    
+    pending = polly_synthesis.get_pending(key)
+    if pending is None or pending['params']['OutputFormat'] != output_format:
+        return jsonify({'error': 'La síntesis ha caducado, vuelve a enviarla'}), 404
+    
+    polly = get_aws_client('polly', client_config=fanout_client_config(
+        polly_synthesis.MAX_WORKERS, polly_synthesis.CALL_TIMEOUT))
+    stream = polly_synthesis.cached_stream(polly, pending['text'], pending['params'], key,
+                                           chunks=pending['chunks'])
+    try:
+        # El primer fragmento se sintetiza antes de responder para poder informar del error
+        first = next(stream)
+    except (ClientError, BotoCoreError) as e:
+        stream.close()
         logger.error(f"Error en Polly synthesize: {str(e)}")
-        return jsonify({
-            'error': f'Error de AWS: {str(e)}',
-            'error_code': e.response['Error']['Code']
-        }), 500
+        return jsonify({'error': f'Error de AWS: {str(e)}'}), 500
     except Exception as e:
+        stream.close()
         logger.error(f"Error inesperado: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+    def _generate():
+        yield first
+        try:
+            yield from stream
+        except Exception as e:
+            # Con la respuesta ya empezada solo queda cortar el audio
+            logger.error(f"Error en Polly synthesize a mitad de la respuesta: {str(e)}")
+    
+    response = Response(stream_with_context(_generate()), mimetype=polly_synthesis.CONTENT_TYPES[output_format])
+    if download_name:
+        response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 
 @polly_bp.route('/voices', methods=['GET'])
 def list_voices():
@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
-import boto3
-import os
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, stream_with_context
 import base64
-from io import BytesIO
-from PIL import Image
+import json
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils.fanout import fanout_client_config
+from app.utils import rekognition_batch
 
 rekognition = Blueprint('rekognition', __name__)
 
@@ -29,7 +29,7 @@ def detect_labels():
             # Leer la imagen
             image_bytes = image_file.read()
 
-            rekognition_client = boto3.client('rekognition', region_name=region)
+            rekognition_client = get_aws_client('rekognition', region)
 
             response = rekognition_client.detect_labels(
                 Image={'Bytes': image_bytes},
@@ -46,9 +46,9 @@ def detect_labels():
                     'parents': [parent.get('Name', '') for parent in label.get('Parents', [])]
                 })
 
-            # Convertir imagen a base64 para mostrarla
-            image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-            image_format = Image.open(BytesIO(image_bytes)).format.lower()
+            # Vista previa reducida en lugar de la imagen completa en base64
+            image_b64 = base64.b64encode(rekognition_batch.thumbnail_bytes(image_bytes, rekognition_batch.PREVIEW_SIZE)).decode('utf-8')
+            image_format = 'jpeg'
 
             return render_template('ML_AI/rekognition/labels.html',
                                  labels=labels,
@@ -85,7 +85,7 @@ def detect_faces():
             # Leer la imagen
             image_bytes = image_file.read()
 
-            rekognition_client = boto3.client('rekognition', region_name=region)
+            rekognition_client = get_aws_client('rekognition', region)
 
             response = rekognition_client.detect_faces(
                 Image={'Bytes': image_bytes},
@@ -111,9 +111,9 @@ def detect_faces():
                 }
                 faces.append(face_info)
 
-            # Convertir imagen a base64 para mostrarla
-            image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-            image_format = Image.open(BytesIO(image_bytes)).format.lower()
+            # Vista previa reducida en lugar de la imagen completa en base64
+            image_b64 = base64.b64encode(rekognition_batch.thumbnail_bytes(image_bytes, rekognition_batch.PREVIEW_SIZE)).decode('utf-8')
+            image_format = 'jpeg'
 
             return render_template('ML_AI/rekognition/faces.html',
                                  faces=faces,
@@ -149,7 +149,7 @@ def compare_faces():
             source_bytes = source_image.read()
             target_bytes = target_image.read()
 
-            rekognition_client = boto3.client('rekognition', region_name=region)
+            rekognition_client = get_aws_client('rekognition', region)
 
             response = rekognition_client.compare_faces(
                 SourceImage={'Bytes': source_bytes},
@@ -172,11 +172,10 @@ def compare_faces():
                     'bounding_box': face.get('BoundingBox', {})
                 })
 
-            # Convertir imágenes a base64
-            source_b64 = base64.b64encode(source_bytes).decode('utf-8')
-            target_b64 = base64.b64encode(target_bytes).decode('utf-8')
-            source_format = Image.open(BytesIO(source_bytes)).format.lower()
-            target_format = Image.open(BytesIO(target_bytes)).format.lower()
+            # Vistas previas reducidas en lugar de las imágenes completas en base64
+            source_b64 = base64.b64encode(rekognition_batch.thumbnail_bytes(source_bytes, rekognition_batch.PREVIEW_SIZE)).decode('utf-8')
+            target_b64 = base64.b64encode(rekognition_batch.thumbnail_bytes(target_bytes, rekognition_batch.PREVIEW_SIZE)).decode('utf-8')
+            source_format = target_format = 'jpeg'
 
             return render_template('ML_AI/rekognition/compare.html',
                                  face_matches=face_matches,
@@ -216,7 +215,7 @@ def detect_text():
             # Leer la imagen
             image_bytes = image_file.read()
 
-            rekognition_client = boto3.client('rekognition', region_name=region)
+            rekognition_client = get_aws_client('rekognition', region)
 
             response = rekognition_client.detect_text(
                 Image={'Bytes': image_bytes}
@@ -234,9 +233,9 @@ def detect_text():
                     'polygon': text_detection.get('Geometry', {}).get('Polygon', [])
                 })
 
-            # Convertir imagen a base64 para mostrarla
-            image_b64 = base64.b64encode(image_bytes).decode('utf-8')
-            image_format = Image.open(BytesIO(image_bytes)).format.lower()
+            # Vista previa reducida en lugar de la imagen completa en base64
+            image_b64 = base64.b64encode(rekognition_batch.thumbnail_bytes(image_bytes, rekognition_batch.PREVIEW_SIZE)).decode('utf-8')
+            image_format = 'jpeg'
 
             return render_template('ML_AI/rekognition/text.html',
                                  detected_text=detected_text,
@@ -252,4 +251,56 @@ def detect_text():
     return render_template('ML_AI/rekognition/text.html',
                          detected_text=None,
                          image_b64=None,
-                         region='us-east-1')
\ No newline at end of file
+                         region='us-east-1')
+
+@rekognition.route('/batch', methods=['GET'])
+def batch_analysis():
+    """Análisis por lotes de las imágenes de un prefijo de S3"""
+    return render_template('ML_AI/rekognition/batch.html',
+                         analyses=list(rekognition_batch.ANALYSES),
+                         default_tps=rekognition_batch.DEFAULT_TPS,
+                         default_workers=rekognition_batch.DEFAULT_WORKERS,
+                         max_workers=rekognition_batch.MAX_WORKERS,
+                         default_max_images=rekognition_batch.DEFAULT_MAX_IMAGES,
+                         max_images=rekognition_batch.MAX_IMAGES)
+
+@rekognition.route('/batch/stream', methods=['GET', 'POST'])
+def batch_stream():
+    """Resultados del lote en JSONL: una línea por imagen según terminan y un resumen final"""
+    params = request.values
+    bucket = (params.get('bucket') or '').strip()
+    if not bucket:
+        return jsonify({'error': 'Se requiere el bucket'}), 400
+    analysis = params.get('analysis', 'labels')
+    if analysis not in rekognition_batch.ANALYSES:
+        return jsonify({'error': f'Análisis no soportado: {analysis}'}), 400
+    try:
+        region = params.get('region') or None
+        max_workers = max(1, min(int(params.get('workers') or rekognition_batch.DEFAULT_WORKERS), rekognition_batch.MAX_WORKERS))
+        tps = float(params.get('tps') or rekognition_batch.DEFAULT_TPS)
+        max_images = int(params.get('max_images') or rekognition_batch.DEFAULT_MAX_IMAGES)
+        options = {'max_labels': int(params.get('max_labels', 10)),
+                   'min_confidence': float(params.get('min_confidence', 70.0))}
+    except ValueError:
+        return jsonify({'error': 'Parámetros numéricos no válidos'}), 400
+
+    client_config = fanout_client_config(max_workers, 30)
+    rekognition_client = get_aws_client('rekognition', region, client_config=client_config)
+    s3_client = get_aws_client('s3', region, client_config=client_config)
+    records = rekognition_batch.run_batch(
+        rekognition_client, s3_client, get_cache_scope(region), bucket, params.get('prefix', ''), analysis,
+        options, max_images=max_images, max_workers=max_workers, tps=tps,
+        thumbnails=params.get('thumbnails') in ('1', 'true', 'on'))
+
+    def _generate():
+        try:
+            for record in records:
+                yield json.dumps(record, ensure_ascii=False) + '\n'
+        except Exception as e:
+            # Fallo del listado (bucket inexistente, permisos...): se informa como última línea
+            yield json.dumps({'type': 'error', 'error': str(e)}, ensure_ascii=False) + '\n'
+
+    response = Response(stream_with_context(_generate()), mimetype='application/x-ndjson')
+    if params.get('download'):
+        response.headers['Content-Disposition'] = f'attachment; filename=rekognition-{bucket}-{analysis}.jsonl'
+    return response
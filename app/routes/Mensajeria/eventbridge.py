@@ -2,9 +2,14 @@
 Rutas web para AWS EventBridge
 Gestión de buses de eventos, reglas y targets
 """
+import io
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 import boto3
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils.fanout import fanout_client_config
+from app.utils import eventbridge_events
+from app.utils.event_patterns import normalize_event
 
 eventbridge_bp = Blueprint('eventbridge', __name__, url_prefix='/eventbridge')
 
@@ -74,11 +79,9 @@ def list_rules():
     try:
         events = get_aws_client('events')
 
-        # Obtener reglas
-        response = events.list_rules()
-
+        event_bus_name = request.args.get('event_bus_name', 'default')
         rules = []
-        for rule in response['Rules']:
+        for rule in eventbridge_events.list_rules(events, event_bus_name):
             rule_info = {
                 'name': rule['Name'],
                 'arn': rule['Arn'],
@@ -135,6 +138,7 @@ def create_rule():
                 create_params['RoleArn'] = role_arn
 
             response = events.put_rule(**create_params)
+            eventbridge_events.invalidate(get_cache_scope(), event_bus_name)
 
             flash(f'Regla {rule_name} creada exitosamente', 'success')
             return redirect(url_for('eventbridge.list_rules'))
@@ -282,4 +286,59 @@ def put_events():
         except Exception as e:
             flash(f'Error al enviar evento: {str(e)}', 'error')
 
-    return render_template('Mensajeria/eventbridge/put_events.html')
\ No newline at end of file
+    return render_template('Mensajeria/eventbridge/put_events.html')
+
+@eventbridge_bp.route('/put-events-batch', methods=['GET', 'POST'])
+def put_events_batch():
+    """Envío masivo: array JSON o JSONL de eventos en lotes de 10 enviados en paralelo"""
+    result = None
+    if request.method == 'POST':
+        try:
+            event_bus_name = request.form.get('event_bus_name') or None
+            workers = min(max(request.form.get('workers', eventbridge_events.DEFAULT_WORKERS, type=int), 1), 32)
+            upload = request.files.get('file')
+            if upload and upload.filename:
+                text = io.TextIOWrapper(upload.stream, encoding='utf-8-sig').read()
+            else:
+                text = request.form.get('events', '')
+            entries = list(eventbridge_events.read_entries(text, event_bus_name))
+            if not entries:
+                flash('No hay eventos que enviar', 'warning')
+            elif len(entries) > eventbridge_events.MAX_EVENTS:
+                flash(f'Como máximo {eventbridge_events.MAX_EVENTS} eventos por envío', 'warning')
+            else:
+                events = get_aws_client('events', client_config=fanout_client_config(workers))
+                result = eventbridge_events.put_events(events, entries, max_workers=workers).to_dict()
+                if result['failed']:
+                    flash(f'{result["sent"]} eventos enviados, {result["failed"]} fallidos', 'warning')
+                else:
+                    flash(f'{result["sent"]} eventos enviados en {result["batches"]} lotes', 'success')
+        except ValueError as e:
+            flash(f'Eventos no válidos: {str(e)}', 'error')
+        except Exception as e:
+            flash(f'Error al enviar eventos: {str(e)}', 'error')
+
+    return render_template('Mensajeria/eventbridge/put_events_batch.html', result=result,
+                           default_workers=eventbridge_events.DEFAULT_WORKERS)
+
+
+@eventbridge_bp.route('/test-event', methods=['GET', 'POST'])
+def test_event():
+    """Evalúa un evento contra todas las reglas de un bus con el motor local de patrones"""
+    matched = None
+    index = None
+    event_bus_name = request.values.get('event_bus_name', 'default')
+    if request.method == 'POST':
+        try:
+            event = normalize_event(request.form.get('event', ''))
+            events = get_aws_client('events')
+            index = eventbridge_events.rule_index(events, get_cache_scope(), event_bus_name,
+                                                  refresh=bool(request.form.get('refresh')))
+            matched = index.match(event, include_disabled=bool(request.form.get('include_disabled')))
+        except ValueError as e:
+            flash(f'Evento no válido: {str(e)}', 'error')
+        except Exception as e:
+            flash(f'Error al evaluar el evento: {str(e)}', 'error')
+
+    return render_template('Mensajeria/eventbridge/test_event.html', matched=matched, index=index,
+                           event_bus_name=event_bus_name)
@@ -1,9 +1,19 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response
 from app.utils.aws_client import get_aws_client
+from app.utils.fanout import fanout_client_config
+from app.utils.kinesis_consumer import (MultiShardReader, checkpoints, ITERATOR_TYPES,
+                                        DEFAULT_MAX_RECORDS, DEFAULT_MAX_SECONDS, MAX_SHARD_WORKERS)
+from app.utils import kinesis_producer
+from datetime import datetime
 import json
 
 bp = Blueprint('kinesis', __name__)
 
+# Límites para las lecturas lanzadas desde el navegador
+MAX_RECORDS_LIMIT = 10000
+MAX_STREAM_SECONDS = 300
+MAX_PRODUCER_WORKERS = 16
+
 @bp.route('/')
 def index():
     return render_template('Mensajeria/kinesis/index.html')
@@ -89,40 +99,108 @@ def put_record():
     
     return render_template('kinesis/put_record.html')
 
-@bp.route('/get-records', methods=['GET', 'POST'])
-def get_records():
-    records = []
+@bp.route('/put-records', methods=['GET', 'POST'])
+def put_records():
+    """Envío masivo desde un fichero JSONL/CSV con PutRecords en lotes concurrentes"""
+    result = None
     if request.method == 'POST':
         try:
             stream_name = request.form.get('stream_name')
-            shard_id = request.form.get('shard_id')
             region = request.form.get('region', 'us-east-1')
-            
-            kinesis = get_aws_client('kinesis', region)
-            
-            # Obtener iterador de shard
-            iterator_response = kinesis.get_shard_iterator(
-                StreamName=stream_name,
-                ShardId=shard_id,
-                ShardIteratorType='TRIM_HORIZON'
+            upload = request.files.get('file')
+            if not stream_name or not upload or not upload.filename:
+                raise ValueError('Indica el stream y el fichero a enviar')
+            strategy = request.form.get('strategy', 'random')
+            aggregate = request.form.get('aggregate') == '1'
+            workers = max(1, min(request.form.get('workers', kinesis_producer.DEFAULT_WORKERS, type=int),
+                                 MAX_PRODUCER_WORKERS))
+
+            kinesis = get_aws_client('kinesis', region, client_config=fanout_client_config(workers))
+            shard_map = None
+            if strategy == 'round_robin' or aggregate:
+                shard_map = kinesis_producer.ShardMap.load(kinesis, stream_name)
+            entries = kinesis_producer.build_entries(
+                kinesis_producer.read_payloads(upload, request.form.get('format') or None),
+                strategy=strategy,
+                key_field=(request.form.get('key_field') or '').strip() or None,
+                shard_map=shard_map
             )
-            
-            shard_iterator = iterator_response['ShardIterator']
-            
-            # Obtener registros
-            records_response = kinesis.get_records(ShardIterator=shard_iterator)
-            
-            for record in records_response.get('Records', []):
-                records.append({
-                    'sequence_number': record['SequenceNumber'],
-                    'partition_key': record['PartitionKey'],
-                    'data': record['Data'].decode('utf-8') if isinstance(record['Data'], bytes) else str(record['Data']),
-                    'approximate_arrival_timestamp': record.get('ApproximateArrivalTimestamp', '').isoformat() if record.get('ApproximateArrivalTimestamp') else ''
-                })
-            
+            result = kinesis_producer.put_records(kinesis, stream_name, entries, max_workers=workers,
+                                                  aggregate=aggregate, shard_map=shard_map).to_dict()
+            if result['failed_count']:
+                flash(f'{result["failed_count"]} registro(s) no se pudieron enviar', 'warning')
+            else:
+                flash(f'{result["records"]} registro(s) enviados a "{stream_name}" '
+                      f'en {result["seconds"]} s ({result["records_per_second"]} reg/s)', 'success')
+        except Exception as e:
+            flash(f'Error enviando registros: {str(e)}', 'error')
+
+    return render_template('kinesis/put_records.html', result=result,
+                           strategies=kinesis_producer.PARTITION_STRATEGIES,
+                           default_workers=kinesis_producer.DEFAULT_WORKERS)
+
+def _reader_from_form(form):
+    """Construye un MultiShardReader a partir de los parámetros del formulario / query string"""
+    stream_name = form.get('stream_name')
+    region = form.get('region', 'us-east-1')
+    shard_id = (form.get('shard_id') or '').strip()
+    timestamp = form.get('timestamp')
+    rate = form.get('records_per_second', type=float)
+    # Varios shards se leen en paralelo con el mismo cliente
+    kinesis = get_aws_client('kinesis', region,
+                             client_config=fanout_client_config(MAX_SHARD_WORKERS))
+    return MultiShardReader(
+        kinesis, stream_name, region,
+        iterator_type=form.get('iterator_type', 'TRIM_HORIZON'),
+        timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+        sequence_number=(form.get('sequence_number') or '').strip() or None,
+        shard_ids=[s.strip() for s in shard_id.split(',') if s.strip()] or None,
+        max_records=max(1, min(form.get('max_records', DEFAULT_MAX_RECORDS, type=int), MAX_RECORDS_LIMIT)),
+        max_seconds=max(1.0, min(form.get('max_seconds', DEFAULT_MAX_SECONDS, type=float), MAX_STREAM_SECONDS)),
+        records_per_second=rate if rate and rate > 0 else None,
+        follow=form.get('follow') == '1',
+        save_checkpoints=form.get('save_checkpoint', '1') == '1'
+    )
+
+@bp.route('/get-records', methods=['GET', 'POST'])
+def get_records():
+    records = []
+    stats = None
+    if request.method == 'POST':
+        try:
+            if request.form.get('reset_checkpoints') == '1':
+                checkpoints.reset(request.form.get('region', 'us-east-1'), request.form.get('stream_name'))
+                flash('Checkpoints del stream eliminados', 'info')
+            reader = _reader_from_form(request.form)
+            # La lectura por formulario termina al ponerse al día; el seguimiento es de /stream
+            reader.follow = False
+            records = list(reader.records())
+            stats = reader.stats
+            if stats['errors']:
+                flash(f'Errores leyendo shards: {stats["errors"]}', 'warning')
             if not records:
-                flash('No se encontraron registros en el shard especificado', 'info')
+                flash('No se encontraron registros en los shards leídos', 'info')
         except Exception as e:
             flash(f'Error obteniendo registros: {str(e)}', 'error')
     
-    return render_template('kinesis/get_records.html', records=records)
\ No newline at end of file
+    return render_template('kinesis/get_records.html', records=records, stats=stats,
+                           iterator_types=ITERATOR_TYPES)
+
+@bp.route('/get-records/stream')
+def stream_records():
+    """Registros en NDJSON a medida que se leen (la página los muestra en vivo)"""
+    try:
+        reader = _reader_from_form(request.args)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+    def _generate():
+        try:
+            for record in reader.records():
+                yield json.dumps(record, default=str) + '\n'
+        except Exception as e:
+            yield json.dumps({'_error': str(e)}) + '\n'
+        yield json.dumps({'_stats': reader.stats}, default=str) + '\n'
+
+    return Response(_generate(), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from app.utils.aws_client import get_aws_client
+from app.utils.fanout import fanout_client_config
+from app.utils import sns_publisher
 
 bp = Blueprint('sns', __name__)
 
+MAX_PUBLISH_WORKERS = 32
+
 @bp.route('/')
 def index():
     return render_template('Mensajeria/sns/index.html')
@@ -133,3 +137,54 @@ def delete_topic(topic_name):
     except Exception as e:
         flash(f'Error eliminando tópico: {str(e)}', 'error')
         return redirect(url_for('topics'))
+
+@bp.route('/publish-batch', methods=['GET', 'POST'])
+def publish_batch():
+    """Publicación masiva con PublishBatch en uno o varios tópicos"""
+    result = None
+    topic_arns = []
+    try:
+        topic_arns = sns_publisher.list_topic_arns(get_aws_client('sns'))
+    except Exception as e:
+        flash(f'Error obteniendo tópicos SNS: {str(e)}', 'error')
+
+    selected = request.form.getlist('topic_arn') or request.args.getlist('topic_arn')
+    if request.method == 'POST':
+        try:
+            if not selected:
+                raise ValueError('Selecciona al menos un tópico')
+            upload = request.files.get('file')
+            if upload and upload.filename:
+                entries = list(sns_publisher.read_upload(upload, request.form.get('format') or None))
+            else:
+                lines = (request.form.get('messages') or '').splitlines()
+                entries = [{'Message': line.strip()} for line in lines if line.strip()]
+            if not entries:
+                raise ValueError('No hay mensajes que publicar')
+            if len(entries) * len(selected) > sns_publisher.MAX_MESSAGES:
+                raise ValueError(f'Máximo {sns_publisher.MAX_MESSAGES} publicaciones (mensajes x tópicos) por envío')
+
+            subject = (request.form.get('subject') or '').strip()
+            group_id = (request.form.get('message_group_id') or '').strip()
+            for entry in entries:
+                if subject:
+                    entry.setdefault('Subject', subject)
+                if group_id:
+                    entry.setdefault('MessageGroupId', group_id)
+
+            workers = max(1, min(request.form.get('workers', sns_publisher.DEFAULT_WORKERS, type=int),
+                                 MAX_PUBLISH_WORKERS))
+            rate = request.form.get('messages_per_second', type=float)
+            sns = get_aws_client('sns', client_config=fanout_client_config(workers))
+            result = sns_publisher.publish(sns, selected, entries, max_workers=workers,
+                                           messages_per_second=rate if rate and rate > 0 else None).to_dict()
+            if result['failed']:
+                flash(f'{result["published"]} publicación(es) correctas, {result["failed"]} fallidas', 'warning')
+            else:
+                flash(f'{result["published"]} publicación(es) en {len(selected)} tópico(s) en {result["seconds"]} s '
+                      f'({result["messages_per_second"]} msg/s)', 'success')
+        except Exception as e:
+            flash(f'Error publicando mensajes: {str(e)}', 'error')
+
+    return render_template('Mensajeria/sns/publish_batch.html', topic_arns=topic_arns, selected=selected,
+                           result=result, default_workers=sns_publisher.DEFAULT_WORKERS)
@@ -1,8 +1,15 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, redirect, url_for, jsonify
 from app.utils.aws_client import get_aws_client
+from app.utils.fanout import fanout_client_config
+from app.utils import sqs_bulk
 
 bp = Blueprint('sqs', __name__)
 
+# Límites para las operaciones masivas lanzadas desde el navegador
+MAX_BULK_MESSAGES = 10000
+MAX_BULK_SECONDS = 120
+MAX_BULK_WORKERS = 16
+
 @bp.route('/')
 def index():
     return render_template('Mensajeria/sqs/index.html')
@@ -141,12 +148,21 @@ def receive_messages(queue_name):
             flash('Cola no encontrada', 'error')
             return redirect(url_for('sqs.queues'))
         
-        # Recibir mensajes
-        response = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
-        messages = response.get('Messages', [])
+        # Recibir mensajes con long polling: vuelve en cuanto hay mensajes o la cola está vacía
+        max_messages = max(1, min(request.args.get('max_messages', 10, type=int), 1000))
+        max_seconds = max(1.0, min(request.args.get('max_seconds', 5, type=float), MAX_BULK_SECONDS))
+        pollers = max(1, min(request.args.get('pollers', sqs_bulk.DEFAULT_POLLERS, type=int), MAX_BULK_WORKERS))
+        if pollers > 1:
+            sqs = get_aws_client('sqs', client_config=fanout_client_config(pollers))
+        messages, stats = sqs_bulk.receive_messages(
+            sqs, queue_url, max_messages=max_messages, max_seconds=max_seconds, pollers=pollers,
+            wait_time_seconds=min(sqs_bulk.LONG_POLL_SECONDS, int(max_seconds))
+        )
+        if stats['errors']:
+            flash(f'Errores recibiendo mensajes: {stats["errors"]}', 'warning')
         
         return render_template('Mensajeria/sqs/receive_messages.html', 
-                             queue_name=queue_name, messages=messages)
+                             queue_name=queue_name, messages=messages, stats=stats)
     except Exception as e:
         flash(f'Error recibiendo mensajes: {str(e)}', 'error')
         return redirect(url_for('sqs.queue_detail', queue_name=queue_name))
@@ -176,4 +192,118 @@ def delete_queue(queue_name):
         return redirect(url_for('sqs.queues'))
     except Exception as e:
         flash(f'Error eliminando cola: {str(e)}', 'error')
-        return redirect(url_for('sqs.queues'))
\ No newline at end of file
+        return redirect(url_for('sqs.queues'))
+
+@bp.route('/queue/<queue_name>/send-batch', methods=['GET', 'POST'])
+def send_batch(queue_name):
+    """Enviar muchos mensajes (uno por línea) con send_message_batch en lotes concurrentes"""
+    result = None
+    if request.method == 'POST':
+        try:
+            workers = max(1, min(request.form.get('workers', sqs_bulk.DEFAULT_WORKERS, type=int), MAX_BULK_WORKERS))
+            sqs = get_aws_client('sqs', client_config=fanout_client_config(workers))
+            queue_url = sqs_bulk.queue_url_for(sqs, queue_name)
+
+            upload = request.files.get('file')
+            if upload and upload.filename:
+                lines = upload.stream.read().decode('utf-8-sig').splitlines()
+            else:
+                lines = (request.form.get('messages') or '').splitlines()
+            bodies = [line for line in (l.strip() for l in lines) if line]
+            repeat = max(1, min(request.form.get('repeat', 1, type=int), MAX_BULK_MESSAGES))
+            if not bodies:
+                raise ValueError('No hay mensajes que enviar')
+            if len(bodies) * repeat > MAX_BULK_MESSAGES:
+                raise ValueError(f'Máximo {MAX_BULK_MESSAGES} mensajes por envío')
+
+            message_group_id = (request.form.get('message_group_id') or '').strip()
+
+            def _entries():
+                for _ in range(repeat):
+                    for body in bodies:
+                        entry = {'MessageBody': body}
+                        if message_group_id:
+                            entry['MessageGroupId'] = message_group_id
+                        yield entry
+
+            result = sqs_bulk.send_messages(sqs, queue_url, _entries(), max_workers=workers).to_dict()
+            if result['failed_count']:
+                flash(f'{result["failed_count"]} mensaje(s) no se pudieron enviar', 'warning')
+            else:
+                flash(f'{result["succeeded"]} mensaje(s) enviados en {result["seconds"]} s '
+                      f'({result["messages_per_second"]} msg/s)', 'success')
+        except Exception as e:
+            flash(f'Error enviando mensajes: {str(e)}', 'error')
+
+    return render_template('Mensajeria/sqs/send_batch.html', queue_name=queue_name, result=result,
+                           default_workers=sqs_bulk.DEFAULT_WORKERS)
+
+@bp.route('/queue/<queue_name>/delete-messages', methods=['POST'])
+def delete_messages(queue_name):
+    """Borrar los mensajes recibidos seleccionados con delete_message_batch"""
+    try:
+        receipt_handles = request.form.getlist('receipt_handle')
+        if not receipt_handles:
+            flash('No se seleccionó ningún mensaje', 'warning')
+            return redirect(url_for('sqs.receive_messages', queue_name=queue_name))
+        sqs = get_aws_client('sqs', client_config=fanout_client_config(sqs_bulk.DEFAULT_WORKERS))
+        queue_url = sqs_bulk.queue_url_for(sqs, queue_name)
+        result = sqs_bulk.delete_messages(sqs, queue_url, receipt_handles).to_dict()
+        if result['failed_count']:
+            flash(f'{result["succeeded"]} mensaje(s) eliminados, {result["failed_count"]} con error '
+                  f'(el receipt handle puede haber caducado)', 'warning')
+        else:
+            flash(f'{result["succeeded"]} mensaje(s) eliminados', 'success')
+    except Exception as e:
+        flash(f'Error eliminando mensajes: {str(e)}', 'error')
+    return redirect(url_for('sqs.queue_detail', queue_name=queue_name))
+
+@bp.route('/queue/<queue_name>/move', methods=['GET', 'POST'])
+def move_messages(queue_name):
+    """Mover mensajes a otra cola (redrive de una DLQ a su cola de origen)"""
+    result = None
+    sources, queue_names = [], []
+    try:
+        sqs = get_aws_client('sqs')
+        queue_url = sqs_bulk.queue_url_for(sqs, queue_name)
+        sources = [url.rsplit('/', 1)[-1] for url in sqs_bulk.dead_letter_sources(sqs, queue_url)]
+        queue_names = [url.rsplit('/', 1)[-1] for url in sqs.list_queues().get('QueueUrls', [])
+                       if url != queue_url]
+    except Exception as e:
+        flash(f'Error obteniendo colas: {str(e)}', 'error')
+        return redirect(url_for('sqs.queues'))
+
+    if request.method == 'POST':
+        try:
+            target_name = request.form.get('target_queue')
+            if not target_name or target_name == queue_name:
+                raise ValueError('Selecciona una cola de destino distinta del origen')
+            max_in_flight = max(sqs_bulk.SQS_BATCH_LIMIT,
+                                min(request.form.get('max_in_flight', sqs_bulk.DEFAULT_MAX_IN_FLIGHT, type=int), 1000))
+            sqs = get_aws_client('sqs', client_config=fanout_client_config(max_in_flight // sqs_bulk.SQS_BATCH_LIMIT))
+            result = sqs_bulk.move_messages(
+                sqs, queue_url, sqs_bulk.queue_url_for(sqs, target_name),
+                max_messages=max(1, min(request.form.get('max_messages', 1000, type=int), MAX_BULK_MESSAGES)),
+                max_seconds=max(1.0, min(request.form.get('max_seconds', 60, type=float), MAX_BULK_SECONDS)),
+                max_in_flight=max_in_flight
+            )
+            if result['send_failed'] or result['delete_failed'] or result['errors']:
+                flash(f'{result["moved"]} mensaje(s) movidos a "{target_name}" con errores', 'warning')
+            else:
+                flash(f'{result["moved"]} mensaje(s) movidos a "{target_name}" '
+                      f'({result["messages_per_second"]} msg/s)', 'success')
+        except Exception as e:
+            flash(f'Error moviendo mensajes: {str(e)}', 'error')
+
+    return render_template('Mensajeria/sqs/move_messages.html', queue_name=queue_name, result=result,
+                           sources=sources, queue_names=queue_names,
+                           default_in_flight=sqs_bulk.DEFAULT_MAX_IN_FLIGHT)
+
+@bp.route('/metrics')
+def metrics():
+    """Panel de mensajes/segundo de las operaciones masivas hechas desde la aplicación"""
+    return render_template('Mensajeria/sqs/metrics.html', queues=sqs_bulk.metrics.snapshot())
+
+@bp.route('/metrics/api')
+def metrics_api():
+    return jsonify({'queues': sqs_bulk.metrics.snapshot()})
@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, flash
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response
+from app.utils.aws_client import get_aws_client, get_cache_scope, get_client_factory
+from app.utils.fanout import fanout_client_config
+from app.utils import apigateway_walker
 
 bp = Blueprint('apigateway', __name__)
 
@@ -11,9 +13,8 @@ def index():
 def apis():
     try:
         apigw = get_aws_client('apigateway')
-        apis = apigw.get_rest_apis()
         api_list = []
-        for api in apis['items']:
+        for api in apigateway_walker.iter_rest_apis(apigw):
             api_list.append({
                 'id': api['id'],
                 'name': api['name'],
@@ -24,4 +25,72 @@ def apis():
         return render_template('Redes/apigateway/apis.html', apis=api_list)
     except Exception as e:
         flash(f'Error obteniendo APIs de API Gateway: {str(e)}', 'error')
-        return render_template('Redes/apigateway/apis.html', apis=[])
\ No newline at end of file
+        return render_template('Redes/apigateway/apis.html', apis=[])
+
+def _walk(rest_api_id, refresh=False):
+    factory = get_client_factory(client_config=fanout_client_config(
+        apigateway_walker.WALK_WORKERS, apigateway_walker.WALK_TIMEOUT))
+    return apigateway_walker.get_walk(factory, factory.scope, rest_api_id, refresh=refresh)
+
+@bp.route('/apis/<rest_api_id>')
+def api_detail(rest_api_id):
+    try:
+        apigw = get_aws_client('apigateway')
+        api = apigw.get_rest_api(restApiId=rest_api_id)
+        stages = sorted(s['stageName'] for s in apigw.get_stages(restApiId=rest_api_id).get('item', []))
+        walk = _walk(rest_api_id, refresh=request.args.get('refresh') == '1')
+        for route, error in walk['errors'].items():
+            flash(f'Error obteniendo la integración de {route}: {error}', 'warning')
+
+        diff = None
+        base, target = request.args.get('base'), request.args.get('target')
+        if base and target:
+            if base == target:
+                flash('Selecciona dos stages distintos para comparar', 'error')
+            else:
+                diff = apigateway_walker.diff_stages(apigw, get_cache_scope(), rest_api_id, base, target)
+
+        return render_template('Redes/apigateway/api_detail.html', api=api, stages=stages, walk=walk,
+                               diff=diff, base=base, target=target,
+                               export_types=apigateway_walker.EXPORT_TYPES)
+    except Exception as e:
+        flash(f'Error obteniendo la API {rest_api_id}: {str(e)}', 'error')
+        return redirect(url_for('apigateway.apis'))
+
+@bp.route('/apis/<rest_api_id>/routes.json')
+def api_routes_json(rest_api_id):
+    try:
+        return jsonify(_walk(rest_api_id, refresh=request.args.get('refresh') == '1'))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/apis/<rest_api_id>/diff.json')
+def api_diff_json(rest_api_id):
+    base, target = request.args.get('base'), request.args.get('target')
+    if not base or not target:
+        return jsonify({'error': 'Parámetros base y target requeridos'}), 400
+    try:
+        apigw = get_aws_client('apigateway')
+        return jsonify(apigateway_walker.diff_stages(apigw, get_cache_scope(), rest_api_id, base, target))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/apis/<rest_api_id>/export')
+def export_api(rest_api_id):
+    stage = request.args.get('stage')
+    export_type = request.args.get('type', 'oas30')
+    fmt = request.args.get('format', 'json')
+    extensions = request.args.get('extensions', 'integrations') or None
+    if not stage:
+        flash('Selecciona el stage a exportar', 'error')
+        return redirect(url_for('apigateway.api_detail', rest_api_id=rest_api_id))
+    try:
+        apigw = get_aws_client('apigateway')
+        accepts = 'application/yaml' if fmt == 'yaml' else 'application/json'
+        body = apigateway_walker.export(apigw, rest_api_id, stage, export_type, extensions, accepts)
+        filename = f'{rest_api_id}-{stage}-{export_type}.{"yaml" if fmt == "yaml" else "json"}'
+        return Response(body, mimetype=accepts,
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    except Exception as e:
+        flash(f'Error exportando la API: {str(e)}', 'error')
+        return redirect(url_for('apigateway.api_detail', rest_api_id=rest_api_id))
@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from app.utils.aws_client import get_aws_client, get_cache_scope, get_client_factory
+from app.utils import cloudfront_invalidations
 
 bp = Blueprint('cloudfront', __name__)
 
@@ -9,19 +10,10 @@ def index():
 
 @bp.route('/distributions')
 def distributions():
+    refresh = request.args.get('refresh') == '1'
     try:
         cf = get_aws_client('cloudfront')
-        distributions = cf.list_distributions()
-        dist_list = []
-        if 'DistributionList' in distributions and 'Items' in distributions['DistributionList']:
-            for dist in distributions['DistributionList']['Items']:
-                dist_list.append({
-                    'id': dist['Id'],
-                    'domain': dist['DomainName'],
-                    'status': dist['Status'],
-                    'enabled': dist['Enabled'],
-                    'origins': len(dist.get('Origins', {}).get('Items', []))
-                })
+        dist_list = cloudfront_invalidations.list_distributions(cf, get_cache_scope(), refresh=refresh)
         return render_template('Redes/cloudfront/distributions.html', distributions=dist_list)
     except Exception as e:
         flash(f'Error obteniendo distribuciones CloudFront: {str(e)}', 'error')
@@ -93,6 +85,7 @@ def create_distribution():
             # Crear distribución
             response = cf.create_distribution(DistributionConfig=distribution_config)
             distribution_id = response['Distribution']['Id']
+            cloudfront_invalidations.invalidate(get_cache_scope())
 
             flash(f'Distribución CloudFront creada exitosamente. ID: {distribution_id}', 'success')
             return redirect(url_for('cloudfront.distributions'))
@@ -120,11 +113,13 @@ def delete_distribution(distribution_id):
                 DistributionConfig=dist_config['Distribution']['DistributionConfig'],
                 IfMatch=etag
             )
+            cloudfront_invalidations.invalidate(get_cache_scope())
             flash('Distribución deshabilitada. Esperando propagación...', 'info')
             return redirect(url_for('cloudfront.distributions'))
 
         # Una vez deshabilitada, eliminar la distribución
         cf.delete_distribution(Id=distribution_id, IfMatch=etag)
+        cloudfront_invalidations.invalidate(get_cache_scope())
         flash(f'Distribución {distribution_id} eliminada exitosamente', 'success')
 
     except Exception as e:
@@ -153,6 +148,7 @@ def update_distribution(distribution_id):
                 DistributionConfig=config,
                 IfMatch=etag
             )
+            cloudfront_invalidations.invalidate(get_cache_scope())
 
             flash(f'Distribución {distribution_id} actualizada exitosamente', 'success')
             return redirect(url_for('cloudfront.distributions'))
@@ -173,37 +169,76 @@ def update_distribution(distribution_id):
 def create_invalidation(distribution_id):
     if request.method == 'POST':
         try:
-            cf = get_aws_client('cloudfront')
-
             # Obtener paths a invalidar
             paths = request.form.get('paths', '').strip()
-            if not paths:
+            path_list = [path.strip() for path in paths.split('\n') if path.strip()]
+            if not path_list:
                 flash('Debe especificar al menos una ruta para invalidar', 'error')
                 return redirect(url_for('cloudfront.create_invalidation', distribution_id=distribution_id))
 
-            # Convertir paths a lista
-            path_list = [path.strip() for path in paths.split('\n') if path.strip()]
-
-            # Crear invalidación
-            invalidation_config = {
-                'CallerReference': f'invalidation-{int(__import__("time").time())}',
-                'Paths': {
-                    'Quantity': len(path_list),
-                    'Items': path_list
-                }
-            }
-
-            response = cf.create_invalidation(
-                DistributionId=distribution_id,
-                InvalidationBatch=invalidation_config
-            )
-
-            invalidation_id = response['Invalidation']['Id']
-            flash(f'Invalidación creada exitosamente. ID: {invalidation_id}', 'success')
-            return redirect(url_for('cloudfront.distributions'))
+            # Las rutas se encolan y se agrupan con las de otras peticiones a la misma distribución
+            queue = cloudfront_invalidations.get_queue()
+            immediate = request.form.get('immediate') == 'on'
+            result = queue.enqueue(get_client_factory(), distribution_id, path_list, immediate=immediate)
+
+            if not immediate:
+                flash(f'{result["queued"]} ruta(s) en cola; se enviarán en {result["flush_in"]:.0f} s '
+                      f'junto con el resto de rutas pendientes ({result["pending"]})', 'success')
+            elif result['error']:
+                flash(f'Error creando invalidación: {result["error"]}', 'error')
+            elif result['invalidation']:
+                flash(f'Invalidación creada exitosamente. ID: {result["invalidation"]["id"]} '
+                      f'({len(result["paths"])} ruta(s) tras agrupar {result["requested"]})', 'success')
+            if immediate and result['deferred']:
+                flash(f'{len(result["deferred"])} ruta(s) aplazadas por el límite de invalidaciones en curso', 'warning')
+            return redirect(url_for('cloudfront.invalidations', distribution_id=distribution_id))
 
         except Exception as e:
             flash(f'Error creando invalidación: {str(e)}', 'error')
             return redirect(url_for('cloudfront.create_invalidation', distribution_id=distribution_id))
 
-    return render_template('Redes/cloudfront/create_invalidation.html', distribution_id=distribution_id)
\ No newline at end of file
+    return render_template('Redes/cloudfront/create_invalidation.html', distribution_id=distribution_id)
+
+def _invalidation_status(distribution_id):
+    cf = get_aws_client('cloudfront')
+    status = cloudfront_invalidations.get_queue().status(get_cache_scope(), distribution_id)
+    usage = cloudfront_invalidations.in_progress_usage(cf, distribution_id)
+    status['in_progress'] = {
+        'invalidations': len(usage['invalidations']),
+        'files': usage['files'],
+        'wildcards': usage['wildcards'],
+        'max_files': cloudfront_invalidations.MAX_FILES_IN_PROGRESS,
+        'max_wildcards': cloudfront_invalidations.MAX_WILDCARDS_IN_PROGRESS,
+    }
+    status['recent'] = cloudfront_invalidations.recent_invalidations(cf, distribution_id)
+    return status
+
+@bp.route('/invalidations/<distribution_id>')
+def invalidations(distribution_id):
+    try:
+        status = _invalidation_status(distribution_id)
+    except Exception as e:
+        flash(f'Error obteniendo invalidaciones: {str(e)}', 'error')
+        status = None
+    return render_template('Redes/cloudfront/invalidations.html',
+                           distribution_id=distribution_id, status=status)
+
+@bp.route('/invalidations/<distribution_id>.json')
+def invalidations_json(distribution_id):
+    try:
+        return jsonify(_invalidation_status(distribution_id))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/invalidations/<distribution_id>/flush', methods=['POST'])
+def flush_invalidations(distribution_id):
+    result = cloudfront_invalidations.get_queue().flush(get_cache_scope(), distribution_id)
+    if result['error']:
+        flash(f'Error creando invalidación: {result["error"]}', 'error')
+    elif result['invalidation']:
+        flash(f'Invalidación {result["invalidation"]["id"]} creada con {len(result["paths"])} ruta(s)', 'success')
+    elif not result['requested']:
+        flash('No hay rutas pendientes', 'info')
+    if result['deferred']:
+        flash(f'{len(result["deferred"])} ruta(s) aplazadas por el límite de invalidaciones en curso', 'warning')
+    return redirect(url_for('cloudfront.invalidations', distribution_id=distribution_id))
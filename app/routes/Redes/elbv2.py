@@ -1,5 +1,8 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from app.utils.aws_client import get_aws_client, get_cache_scope, get_client_factory
+from app.utils.fanout import fanout_client_config
+from app.utils.vpc_topology import paginate
+from app.utils import elbv2_health
 
 bp = Blueprint('elbv2', __name__)
 
@@ -11,17 +14,8 @@ def index():
 def load_balancers():
     try:
         elbv2 = get_aws_client('elbv2')
-        lbs = elbv2.describe_load_balancers()
-        lb_list = []
-        for lb in lbs['LoadBalancers']:
-            lb_list.append({
-                'name': lb['LoadBalancerName'],
-                'arn': lb['LoadBalancerArn'],
-                'dns_name': lb['DNSName'],
-                'state': lb['State']['Code'],
-                'type': lb['Type']
-            })
-        return render_template('Redes/elbv2/load_balancers.html', load_balancers=lb_list)
+        structure = elbv2_health.get_structure(elbv2, get_cache_scope(), refresh=request.args.get('refresh') == '1')
+        return render_template('Redes/elbv2/load_balancers.html', load_balancers=structure['load_balancers'])
     except Exception as e:
         flash(f'Error obteniendo load balancers: {str(e)}', 'error')
         return render_template('Redes/elbv2/load_balancers.html', load_balancers=[])
@@ -49,6 +43,7 @@ def create_load_balancer():
                 Type=lb_type
             )
 
+            elbv2_health.invalidate(get_cache_scope())
             flash(f'Load Balancer creado exitosamente: {response["LoadBalancers"][0]["LoadBalancerArn"]}', 'success')
             return redirect(url_for('elbv2.load_balancers'))
 
@@ -57,26 +52,34 @@ def create_load_balancer():
             return redirect(url_for('elbv2.create_load_balancer'))
 
     # GET request - mostrar formulario
+    # Un LB vive en una sola VPC: solo se piden las subnets y security groups de la VPC elegida
     try:
         ec2 = get_aws_client('ec2')
-        # Obtener subnets disponibles
-        subnets_response = ec2.describe_subnets()
-        subnets = [{'id': s['SubnetId'], 'cidr': s['CidrBlock'], 'az': s['AvailabilityZone']} for s in subnets_response['Subnets']]
-
-        # Obtener security groups disponibles
-        sg_response = ec2.describe_security_groups()
-        security_groups = [{'id': sg['GroupId'], 'name': sg['GroupName']} for sg in sg_response['SecurityGroups']]
-
-        return render_template('Redes/elbv2/create_load_balancer.html', subnets=subnets, security_groups=security_groups)
+        vpcs = [{'id': vpc['VpcId'], 'cidr': vpc['CidrBlock'], 'default': vpc.get('IsDefault', False)}
+                for vpc in paginate(ec2, 'describe_vpcs', 'Vpcs')]
+        vpc_id = request.args.get('vpc_id') or next((v['id'] for v in vpcs if v['default']),
+                                                    vpcs[0]['id'] if vpcs else None)
+        subnets, security_groups = [], []
+        if vpc_id:
+            vpc_filter = [{'Name': 'vpc-id', 'Values': [vpc_id]}]
+            subnets = [{'id': s['SubnetId'], 'cidr': s['CidrBlock'], 'az': s['AvailabilityZone']}
+                       for s in paginate(ec2, 'describe_subnets', 'Subnets', Filters=vpc_filter)]
+            security_groups = [{'id': sg['GroupId'], 'name': sg['GroupName']}
+                               for sg in paginate(ec2, 'describe_security_groups', 'SecurityGroups', Filters=vpc_filter)]
+
+        return render_template('Redes/elbv2/create_load_balancer.html', subnets=subnets, security_groups=security_groups,
+                               vpcs=vpcs, vpc_id=vpc_id)
     except Exception as e:
         flash(f'Error obteniendo datos para el formulario: {str(e)}', 'error')
-        return render_template('Redes/elbv2/create_load_balancer.html', subnets=[], security_groups=[])
+        return render_template('Redes/elbv2/create_load_balancer.html', subnets=[], security_groups=[],
+                               vpcs=[], vpc_id=None)
 
 @bp.route('/delete-load-balancer/<load_balancer_arn>', methods=['POST'])
 def delete_load_balancer(load_balancer_arn):
     try:
         elbv2 = get_aws_client('elbv2')
         elbv2.delete_load_balancer(LoadBalancerArn=load_balancer_arn)
+        elbv2_health.invalidate(get_cache_scope())
         flash('Load Balancer eliminado exitosamente', 'success')
     except Exception as e:
         flash(f'Error eliminando load balancer: {str(e)}', 'error')
@@ -86,18 +89,8 @@ def delete_load_balancer(load_balancer_arn):
 def target_groups():
     try:
         elbv2 = get_aws_client('elbv2')
-        tgs = elbv2.describe_target_groups()
-        tg_list = []
-        for tg in tgs['TargetGroups']:
-            tg_list.append({
-                'name': tg['TargetGroupName'],
-                'arn': tg['TargetGroupArn'],
-                'protocol': tg['Protocol'],
-                'port': tg['Port'],
-                'vpc_id': tg['VpcId'],
-                'health_check_path': tg.get('HealthCheckPath', '/')
-            })
-        return render_template('Redes/elbv2/target_groups.html', target_groups=tg_list)
+        structure = elbv2_health.get_structure(elbv2, get_cache_scope(), refresh=request.args.get('refresh') == '1')
+        return render_template('Redes/elbv2/target_groups.html', target_groups=structure['target_groups'])
     except Exception as e:
         flash(f'Error obteniendo target groups: {str(e)}', 'error')
         return render_template('Redes/elbv2/target_groups.html', target_groups=[])
@@ -124,6 +117,7 @@ def create_target_group():
                 HealthCheckPath=health_check_path
             )
 
+            elbv2_health.invalidate(get_cache_scope())
             flash(f'Target Group creado exitosamente: {response["TargetGroups"][0]["TargetGroupArn"]}', 'success')
             return redirect(url_for('elbv2.target_groups'))
 
@@ -135,8 +129,7 @@ def create_target_group():
     try:
         ec2 = get_aws_client('ec2')
         # Obtener VPCs disponibles
-        vpcs_response = ec2.describe_vpcs()
-        vpcs = [{'id': vpc['VpcId'], 'cidr': vpc['CidrBlock']} for vpc in vpcs_response['Vpcs']]
+        vpcs = [{'id': vpc['VpcId'], 'cidr': vpc['CidrBlock']} for vpc in paginate(ec2, 'describe_vpcs', 'Vpcs')]
 
         return render_template('Redes/elbv2/create_target_group.html', vpcs=vpcs)
     except Exception as e:
@@ -148,7 +141,39 @@ def delete_target_group(target_group_arn):
     try:
         elbv2 = get_aws_client('elbv2')
         elbv2.delete_target_group(TargetGroupArn=target_group_arn)
+        elbv2_health.invalidate(get_cache_scope())
         flash('Target Group eliminado exitosamente', 'success')
     except Exception as e:
         flash(f'Error eliminando target group: {str(e)}', 'error')
-    return redirect(url_for('elbv2.target_groups'))
\ No newline at end of file
+    return redirect(url_for('elbv2.target_groups'))
+
+def _health_snapshot(refresh=False):
+    factory = get_client_factory(client_config=fanout_client_config(
+        elbv2_health.HEALTH_WORKERS, elbv2_health.HEALTH_TIMEOUT))
+    load_balancer_arn = request.args.get('load_balancer') or None
+    return factory.scope, elbv2_health.get_snapshot(factory, factory.scope, load_balancer_arn, refresh=refresh)
+
+@bp.route('/target-health')
+def target_health():
+    try:
+        elbv2 = get_aws_client('elbv2')
+        structure = elbv2_health.get_structure(elbv2, get_cache_scope())
+        _, snapshot = _health_snapshot(refresh=request.args.get('refresh') == '1')
+        for tg_arn, error in snapshot['errors'].items():
+            flash(f'Error obteniendo la salud de {tg_arn}: {error}', 'warning')
+        return render_template('Redes/elbv2/target_health.html', snapshot=snapshot,
+                               load_balancers=structure['load_balancers'],
+                               load_balancer_arn=request.args.get('load_balancer', ''))
+    except Exception as e:
+        flash(f'Error obteniendo la salud de los targets: {str(e)}', 'error')
+        return render_template('Redes/elbv2/target_health.html', snapshot=None,
+                               load_balancers=[], load_balancer_arn='')
+
+@bp.route('/target-health/changes')
+def target_health_changes():
+    """Diff respecto a la versión since para el refresco incremental de la vista"""
+    try:
+        scope, snapshot = _health_snapshot()
+        return jsonify(elbv2_health.diff(snapshot, scope, request.args.get('since')))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
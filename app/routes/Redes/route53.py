@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from datetime import datetime
+from botocore.exceptions import ClientError
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import route53_records
 
 bp = Blueprint('route53', __name__)
 
+RECORDS_PAGE_SIZE = 200
+
 @bp.route('/')
 def index():
     return render_template('Redes/route53/index.html')
@@ -11,18 +16,11 @@ def index():
 def hosted_zones():
     try:
         r53 = get_aws_client('route53')
-        zones = r53.list_hosted_zones()
-        zone_list = []
-        for zone in zones['HostedZones']:
-            zone_list.append({
-                'id': zone['Id'],
-                'name': zone['Name'],
-                'private': zone['Config']['PrivateZone']
-            })
-        return render_template('Redes/route53/hosted_zones.html', zones=zone_list)
+        zones = list(route53_records.iter_hosted_zones(r53))
+        return render_template('Redes/route53/hosted_zones.html', hosted_zones=zones)
     except Exception as e:
         flash(f'Error obteniendo zonas hospedadas de Route 53: {str(e)}', 'error')
-        return render_template('Redes/route53/hosted_zones.html', zones=[])
+        return render_template('Redes/route53/hosted_zones.html', hosted_zones=[])
 
 @bp.route('/create-hosted-zone', methods=['GET', 'POST'])
 def create_hosted_zone():
@@ -77,15 +75,14 @@ def delete_hosted_zone(zone_id):
         r53 = get_aws_client('route53')
 
         # Verificar que la zona existe
-        zones = r53.list_hosted_zones()
-        zone = next((z for z in zones['HostedZones'] if z['Id'] == zone_id), None)
-
+        zone = _get_zone(r53, zone_id)
         if not zone:
             flash('Zona hospedada no encontrada', 'error')
             return redirect(url_for('route53.hosted_zones'))
 
         # Eliminar la zona hospedada
         r53.delete_hosted_zone(Id=zone_id)
+        route53_records.invalidate(get_cache_scope(), zone_id)
 
         flash(f'Zona hospedada {zone["Name"]} eliminada exitosamente', 'success')
         return redirect(url_for('route53.hosted_zones'))
@@ -94,42 +91,76 @@ def delete_hosted_zone(zone_id):
         flash(f'Error eliminando zona hospedada: {str(e)}', 'error')
         return redirect(url_for('route53.hosted_zones'))
 
-@bp.route('/zone/<zone_id>/records')
-def list_resource_record_sets(zone_id):
-    """Listar registros de una zona hospedada"""
+def _get_zone(r53, zone_id):
+    """Zona hospedada por ID (None si no existe)"""
     try:
-        r53 = get_aws_client('route53')
+        return r53.get_hosted_zone(Id=route53_records.short_zone_id(zone_id))['HostedZone']
+    except r53.exceptions.NoSuchHostedZone:
+        return None
 
-        # Obtener información de la zona
-        zones = r53.list_hosted_zones()
-        zone = next((z for z in zones['HostedZones'] if z['Id'] == zone_id), None)
+def _index(r53, zone_id, refresh=False):
+    return route53_records.get_index(r53, get_cache_scope(), zone_id, refresh=refresh)
 
-        if not zone:
-            flash('Zona hospedada no encontrada', 'error')
-            return redirect(url_for('route53.hosted_zones'))
+def _values(text):
+    """Un valor por línea del formulario"""
+    return [line.strip() for line in (text or '').splitlines() if line.strip()]
 
-        # Obtener registros
-        records = r53.list_resource_record_sets(HostedZoneId=zone_id)
-
-        record_list = []
-        for record in records.get('ResourceRecordSets', []):
-            record_list.append({
-                'name': record['Name'],
-                'type': record['Type'],
-                'ttl': record.get('TTL'),
-                'value': record.get('ResourceRecords', [{}])[0].get('Value', '') if record.get('ResourceRecords') else '',
-                'alias_target': record.get('AliasTarget', {}),
-                'set_identifier': record.get('SetIdentifier')
-            })
-
-        return render_template('Redes/route53/records.html',
-                             zone=zone,
-                             records=record_list)
+def _apply(r53, zone_id, changes, comment=''):
+    """Envía los cambios en lotes e invalida el índice de la zona"""
+    try:
+        return route53_records.submit_changes(r53, zone_id, changes, comment)
+    finally:
+        route53_records.invalidate(get_cache_scope(), zone_id)
 
+@bp.route('/zone/<zone_id>/records')
+def list_records(zone_id):
+    """Listar y buscar registros de una zona hospedada"""
+    try:
+        r53 = get_aws_client('route53')
+        index = _index(r53, zone_id, refresh=request.args.get('refresh') == '1')
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchHostedZone':
+            flash('Zona hospedada no encontrada', 'error')
+        else:
+            flash(f'Error obteniendo registros: {str(e)}', 'error')
+        return redirect(url_for('route53.hosted_zones'))
     except Exception as e:
         flash(f'Error obteniendo registros: {str(e)}', 'error')
         return redirect(url_for('route53.hosted_zones'))
 
+    query = request.args.get('q', '').strip()
+    record_type = request.args.get('type', '').strip()
+    matches = index.search(query, record_type or None)
+    page = max(1, request.args.get('page', 1, type=int))
+    pages = max(1, -(-len(matches) // RECORDS_PAGE_SIZE))
+    page = min(page, pages)
+    records = matches[(page - 1) * RECORDS_PAGE_SIZE:page * RECORDS_PAGE_SIZE]
+
+    return render_template('Redes/route53/records.html',
+                         zone_id=zone_id,
+                         zone_name=index.zone_name,
+                         records=records,
+                         total=len(index.records),
+                         matched=len(matches),
+                         type_counts=index.type_counts(),
+                         query=query,
+                         record_type=record_type,
+                         page=page,
+                         pages=pages,
+                         current_time=datetime.fromtimestamp(index.built_at).strftime('%Y-%m-%d %H:%M:%S'))
+
+@bp.route('/zone/<zone_id>/records.json')
+def search_records(zone_id):
+    """Búsqueda de registros por nombre, valor o tipo sobre el índice de la zona"""
+    try:
+        r53 = get_aws_client('route53')
+        index = _index(r53, zone_id, refresh=request.args.get('refresh') == '1')
+        matches = index.search(request.args.get('q', ''), request.args.get('type') or None)
+        return jsonify({'zone': index.zone_name, 'total': len(index.records),
+                        'count': len(matches), 'records': matches})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/zone/<zone_id>/create-record', methods=['GET', 'POST'])
 def create_record(zone_id):
     """Crear un nuevo registro DNS"""
@@ -137,47 +168,38 @@ def create_record(zone_id):
         r53 = get_aws_client('route53')
 
         # Obtener información de la zona
-        zones = r53.list_hosted_zones()
-        zone = next((z for z in zones['HostedZones'] if z['Id'] == zone_id), None)
-
+        zone = _get_zone(r53, zone_id)
         if not zone:
             flash('Zona hospedada no encontrada', 'error')
             return redirect(url_for('route53.hosted_zones'))
 
         if request.method == 'POST':
             # Obtener datos del formulario
-            name = request.form.get('name')
-            record_type = request.form.get('record_type')
-            value = request.form.get('value')
-            ttl = int(request.form.get('ttl', 300))
+            name = route53_records.fqdn(request.form.get('name', ''), zone['Name'])
+            record_type = request.form.get('type') or request.form.get('record_type')
+            values = _values(request.form.get('value'))
+            ttl = int(request.form.get('ttl') or 300)
+            priority = request.form.get('priority', '').strip()
+            if record_type == 'MX' and priority:
+                values = [value if value.split()[0].isdigit() else f'{priority} {value}' for value in values]
 
             # Crear el registro
-            change_batch = {
-                'Changes': [{
-                    'Action': 'CREATE',
-                    'ResourceRecordSet': {
-                        'Name': name,
-                        'Type': record_type,
-                        'TTL': ttl,
-                        'ResourceRecords': [{'Value': value}]
-                    }
-                }]
-            }
-
-            r53.change_resource_record_sets(
-                HostedZoneId=zone_id,
-                ChangeBatch=change_batch
-            )
+            _apply(r53, zone_id, route53_records.changes_for('CREATE', [{
+                'Name': name,
+                'Type': record_type,
+                'TTL': ttl,
+                'ResourceRecords': [{'Value': value} for value in values]
+            }]))
 
             flash(f'Registro {name} ({record_type}) creado exitosamente', 'success')
-            return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
+            return redirect(url_for('route53.list_records', zone_id=zone_id))
 
         # GET: Mostrar formulario
-        return render_template('Redes/route53/create_record.html', zone=zone)
+        return render_template('Redes/route53/create_record.html', zone_id=zone_id, zone_name=zone['Name'])
 
     except Exception as e:
         flash(f'Error creando registro: {str(e)}', 'error')
-        return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
+        return redirect(url_for('route53.list_records', zone_id=zone_id))
 
 @bp.route('/zone/<zone_id>/delete-record', methods=['POST'])
 def delete_record(zone_id):
@@ -185,36 +207,23 @@ def delete_record(zone_id):
     try:
         r53 = get_aws_client('route53')
 
-        # Obtener datos del formulario
-        name = request.form.get('name')
-        record_type = request.form.get('record_type')
-        value = request.form.get('value')
-        ttl = int(request.form.get('ttl', 300))
-
-        # Eliminar el registro
-        change_batch = {
-            'Changes': [{
-                'Action': 'DELETE',
-                'ResourceRecordSet': {
-                    'Name': name,
-                    'Type': record_type,
-                    'TTL': ttl,
-                    'ResourceRecords': [{'Value': value}]
-                }
-            }]
-        }
+        # El DELETE debe coincidir exactamente con el record set actual
+        name = request.values.get('record_name') or request.form.get('name')
+        record_type = request.values.get('record_type') or request.form.get('type')
+        set_identifier = request.values.get('set_identifier') or None
+        record = route53_records.get_record_set(r53, zone_id, name, record_type, set_identifier)
+        if not record:
+            flash('Registro no encontrado', 'error')
+            return redirect(url_for('route53.list_records', zone_id=zone_id))
 
-        r53.change_resource_record_sets(
-            HostedZoneId=zone_id,
-            ChangeBatch=change_batch
-        )
+        _apply(r53, zone_id, route53_records.changes_for('DELETE', [record]))
 
         flash(f'Registro {name} ({record_type}) eliminado exitosamente', 'success')
-        return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
+        return redirect(url_for('route53.list_records', zone_id=zone_id))
 
     except Exception as e:
         flash(f'Error eliminando registro: {str(e)}', 'error')
-        return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
+        return redirect(url_for('route53.list_records', zone_id=zone_id))
 
 @bp.route('/zone/<zone_id>/update-record', methods=['GET', 'POST'])
 def update_record(zone_id):
@@ -223,81 +232,121 @@ def update_record(zone_id):
         r53 = get_aws_client('route53')
 
         # Obtener información de la zona
-        zones = r53.list_hosted_zones()
-        zone = next((z for z in zones['HostedZones'] if z['Id'] == zone_id), None)
-
+        zone = _get_zone(r53, zone_id)
         if not zone:
             flash('Zona hospedada no encontrada', 'error')
             return redirect(url_for('route53.hosted_zones'))
 
-        if request.method == 'POST':
-            # Obtener datos del formulario
-            old_name = request.form.get('old_name')
-            old_type = request.form.get('old_type')
-            old_value = request.form.get('old_value')
-            old_ttl = int(request.form.get('old_ttl', 300))
-
-            new_name = request.form.get('new_name')
-            new_type = request.form.get('new_type')
-            new_value = request.form.get('new_value')
-            new_ttl = int(request.form.get('new_ttl', 300))
-
-            # Actualizar el registro (DELETE + CREATE)
-            change_batch = {
-                'Changes': [
-                    {
-                        'Action': 'DELETE',
-                        'ResourceRecordSet': {
-                            'Name': old_name,
-                            'Type': old_type,
-                            'TTL': old_ttl,
-                            'ResourceRecords': [{'Value': old_value}]
-                        }
-                    },
-                    {
-                        'Action': 'CREATE',
-                        'ResourceRecordSet': {
-                            'Name': new_name,
-                            'Type': new_type,
-                            'TTL': new_ttl,
-                            'ResourceRecords': [{'Value': new_value}]
-                        }
-                    }
-                ]
-            }
-
-            r53.change_resource_record_sets(
-                HostedZoneId=zone_id,
-                ChangeBatch=change_batch
-            )
-
-            flash(f'Registro {new_name} ({new_type}) actualizado exitosamente', 'success')
-            return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
-
-        # GET: Mostrar formulario con registro existente
-        record_name = request.args.get('name')
-        record_type = request.args.get('type')
+        record_name = request.values.get('record_name') or request.form.get('name')
+        record_type = request.values.get('record_type') or request.form.get('type')
+        set_identifier = request.values.get('set_identifier') or None
 
         if not record_name or not record_type:
             flash('Parámetros de registro faltantes', 'error')
-            return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
+            return redirect(url_for('route53.list_records', zone_id=zone_id))
 
         # Buscar el registro existente
-        records = r53.list_resource_record_sets(HostedZoneId=zone_id)
-        record = None
-        for r in records.get('ResourceRecordSets', []):
-            if r['Name'] == record_name and r['Type'] == record_type:
-                record = r
-                break
+        record = route53_records.get_record_set(r53, zone_id, route53_records.fqdn(record_name, zone['Name']),
+                                                record_type, set_identifier)
+        if not record or record.get('AliasTarget'):
+            flash('Registro no encontrado o es un alias', 'error')
+            return redirect(url_for('route53.list_records', zone_id=zone_id))
 
-        if not record:
-            flash('Registro no encontrado', 'error')
-            return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
+        if request.method == 'POST':
+            values = _values(request.form.get('new_value') or request.form.get('value'))
+            if not values:
+                flash('El registro necesita al menos un valor', 'error')
+                return redirect(url_for('route53.update_record', zone_id=zone_id, record_name=record_name,
+                                        record_type=record_type))
+
+            # UPSERT conserva la política de enrutamiento del record set
+            updated = dict(record, TTL=int(request.form.get('ttl') or record.get('TTL') or 300),
+                           ResourceRecords=[{'Value': value} for value in values])
+            _apply(r53, zone_id, route53_records.changes_for('UPSERT', [updated]))
+
+            flash(f'Registro {record["Name"]} ({record_type}) actualizado exitosamente', 'success')
+            return redirect(url_for('route53.list_records', zone_id=zone_id))
 
         return render_template('Redes/route53/update_record.html',
-                             zone=zone,
-                             record=record)
+                             zone_id=zone_id,
+                             zone_name=zone['Name'],
+                             record_name=record['Name'],
+                             record_type=record_type,
+                             current_value='\n'.join(route53_records.record_values(record)),
+                             current_ttl=record.get('TTL'))
 
     except Exception as e:
         flash(f'Error actualizando registro: {str(e)}', 'error')
-        return redirect(url_for('route53.list_resource_record_sets', zone_id=zone_id))
\ No newline at end of file
+        return redirect(url_for('route53.list_records', zone_id=zone_id))
+
+@bp.route('/zone/<zone_id>/export')
+def export_zone(zone_id):
+    """Descarga la zona en formato BIND"""
+    try:
+        r53 = get_aws_client('route53')
+        index = _index(r53, zone_id, refresh=True)
+        body = route53_records.to_bind(index.zone_name, index.records)
+        filename = index.zone_name.rstrip('.') + '.zone'
+        return Response(body, mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    except Exception as e:
+        flash(f'Error exportando la zona: {str(e)}', 'error')
+        return redirect(url_for('route53.list_records', zone_id=zone_id))
+
+@bp.route('/zone/<zone_id>/import', methods=['GET', 'POST'])
+def import_zone(zone_id):
+    """Importa un fichero de zona BIND con cambios por lotes"""
+    try:
+        r53 = get_aws_client('route53')
+        zone = _get_zone(r53, zone_id)
+        if not zone:
+            flash('Zona hospedada no encontrada', 'error')
+            return redirect(url_for('route53.hosted_zones'))
+    except Exception as e:
+        flash(f'Error obteniendo la zona: {str(e)}', 'error')
+        return redirect(url_for('route53.hosted_zones'))
+
+    context = {'zone_id': zone_id, 'zone_name': zone['Name'], 'result': None,
+               'action': 'UPSERT', 'zone_text': ''}
+    if request.method == 'GET':
+        return render_template('Redes/route53/import_zone.html', **context)
+
+    upload = request.files.get('zone_file')
+    text = upload.read().decode('utf-8') if upload and upload.filename else request.form.get('zone_text', '')
+    action = request.form.get('action', 'UPSERT')
+    dry_run = request.form.get('dry_run') == 'on'
+    context.update(action=action, zone_text=text)
+    try:
+        if action not in ('UPSERT', 'CREATE'):
+            raise ValueError(f'Acción no soportada: {action}')
+        parsed = route53_records.parse_bind(text, zone['Name'])
+        changes = route53_records.changes_for(action, parsed['record_sets'])
+        batches = route53_records.pack_batches(changes)
+        result = {'record_sets': len(parsed['record_sets']), 'skipped': parsed['skipped'],
+                  'batches': len(batches), 'dry_run': dry_run, 'changes': [], 'statuses': {}}
+        if not dry_run and changes:
+            result['changes'] = _apply(r53, zone_id, changes, f'Importación de {zone["Name"]}')
+            if request.form.get('wait') == 'on':
+                result['statuses'] = route53_records.wait_insync(r53, [c['id'] for c in result['changes']])
+            flash(f'{len(changes)} record sets enviados en {len(batches)} lote(s)', 'success')
+        context['result'] = result
+    except ValueError as e:
+        flash(f'Fichero de zona no válido: {str(e)}', 'error')
+    except Exception as e:
+        sent = len(getattr(e, 'submitted', []))
+        flash(f'Error importando la zona ({sent} lote(s) ya aplicados): {str(e)}', 'error')
+    return render_template('Redes/route53/import_zone.html', **context)
+
+@bp.route('/change/<change_id>')
+def change_status(change_id):
+    """Estado de un cambio; con wait=1 espera (con límite) a que esté INSYNC"""
+    try:
+        r53 = get_aws_client('route53')
+        if request.args.get('wait') == '1':
+            timeout = min(request.args.get('timeout', 60, type=float), route53_records.WAIT_TIMEOUT)
+            statuses = route53_records.wait_insync(r53, [change_id], timeout=timeout)
+            return jsonify({'id': change_id, 'status': statuses[change_id]})
+        info = r53.get_change(Id=change_id)['ChangeInfo']
+        return jsonify({'id': info['Id'], 'status': info['Status'], 'submitted_at': info['SubmittedAt'].isoformat()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from app.utils.aws_client import get_aws_client, get_client_factory, get_cache_scope
+from app.utils.fanout import fanout_client_config
+from app.utils import vpc_topology
 
 bp = Blueprint('vpc', __name__)
 
@@ -11,9 +13,8 @@ def index():
 def vpcs():
     try:
         ec2 = get_aws_client('ec2')
-        vpcs = ec2.describe_vpcs()
         vpc_list = []
-        for vpc in vpcs['Vpcs']:
+        for vpc in vpc_topology.paginate(ec2, 'describe_vpcs', 'Vpcs'):
             vpc_list.append({
                 'id': vpc['VpcId'],
                 'state': vpc['State'],
@@ -29,9 +30,8 @@ def vpcs():
 def subnets():
     try:
         ec2 = get_aws_client('ec2')
-        subnets = ec2.describe_subnets()
         subnet_list = []
-        for subnet in subnets['Subnets']:
+        for subnet in vpc_topology.paginate(ec2, 'describe_subnets', 'Subnets'):
             subnet_list.append({
                 'id': subnet['SubnetId'],
                 'vpc_id': subnet['VpcId'],
@@ -64,6 +64,7 @@ def create_subnet():
             response = ec2.create_subnet(**params)
             subnet_id = response['Subnet']['SubnetId']
 
+            vpc_topology.invalidate(get_cache_scope())
             flash(f'Subnet {subnet_id} creada exitosamente', 'success')
             return redirect(url_for('vpc.subnets'))
         except Exception as e:
@@ -84,6 +85,7 @@ def delete_subnet(subnet_id):
     try:
         ec2 = get_aws_client('ec2')
         ec2.delete_subnet(SubnetId=subnet_id)
+        vpc_topology.invalidate(get_cache_scope())
         flash(f'Subnet {subnet_id} eliminada exitosamente', 'success')
     except Exception as e:
         flash(f'Error eliminando subnet: {str(e)}', 'error')
@@ -93,9 +95,8 @@ def delete_subnet(subnet_id):
 def route_tables():
     try:
         ec2 = get_aws_client('ec2')
-        route_tables = ec2.describe_route_tables()
         rt_list = []
-        for rt in route_tables['RouteTables']:
+        for rt in vpc_topology.paginate(ec2, 'describe_route_tables', 'RouteTables'):
             rt_list.append({
                 'id': rt['RouteTableId'],
                 'vpc_id': rt['VpcId'],
@@ -117,6 +118,7 @@ def create_route_table():
             response = ec2.create_route_table(VpcId=vpc_id)
             rt_id = response['RouteTable']['RouteTableId']
 
+            vpc_topology.invalidate(get_cache_scope())
             flash(f'Route table {rt_id} creada exitosamente', 'success')
             return redirect(url_for('vpc.route_tables'))
         except Exception as e:
@@ -135,9 +137,8 @@ def create_route_table():
 def internet_gateways():
     try:
         ec2 = get_aws_client('ec2')
-        igws = ec2.describe_internet_gateways()
         igw_list = []
-        for igw in igws['InternetGateways']:
+        for igw in vpc_topology.paginate(ec2, 'describe_internet_gateways', 'InternetGateways'):
             igw_list.append({
                 'id': igw['InternetGatewayId'],
                 'state': igw.get('Attachments', [{}])[0].get('State', 'detached'),
@@ -172,6 +173,7 @@ def attach_internet_gateway(igw_id):
             vpc_id = request.form['vpc_id']
 
             ec2.attach_internet_gateway(InternetGatewayId=igw_id, VpcId=vpc_id)
+            vpc_topology.invalidate(get_cache_scope())
             flash(f'Internet Gateway {igw_id} adjuntado a VPC {vpc_id}', 'success')
             return redirect(url_for('vpc.internet_gateways'))
         except Exception as e:
@@ -190,9 +192,8 @@ def attach_internet_gateway(igw_id):
 def nat_gateways():
     try:
         ec2 = get_aws_client('ec2')
-        nat_gateways = ec2.describe_nat_gateways()
         nat_list = []
-        for nat in nat_gateways['NatGateways']:
+        for nat in vpc_topology.paginate(ec2, 'describe_nat_gateways', 'NatGateways'):
             nat_list.append({
                 'id': nat['NatGatewayId'],
                 'state': nat['State'],
@@ -225,6 +226,7 @@ def create_nat_gateway():
             response = ec2.create_nat_gateway(**params)
             nat_id = response['NatGateway']['NatGatewayId']
 
+            vpc_topology.invalidate(get_cache_scope())
             flash(f'NAT Gateway {nat_id} creado exitosamente', 'success')
             return redirect(url_for('vpc.nat_gateways'))
         except Exception as e:
@@ -245,9 +247,8 @@ def create_nat_gateway():
 def vpc_peerings():
     try:
         ec2 = get_aws_client('ec2')
-        peerings = ec2.describe_vpc_peering_connections()
         peering_list = []
-        for peering in peerings['VpcPeeringConnections']:
+        for peering in vpc_topology.paginate(ec2, 'describe_vpc_peering_connections', 'VpcPeeringConnections'):
             peering_list.append({
                 'id': peering['VpcPeeringConnectionId'],
                 'status': peering['Status']['Code'],
@@ -278,6 +279,7 @@ def create_vpc_peering():
             response = ec2.create_vpc_peering_connection(**params)
             peering_id = response['VpcPeeringConnection']['VpcPeeringConnectionId']
 
+            vpc_topology.invalidate(get_cache_scope())
             flash(f'VPC Peering {peering_id} creado exitosamente', 'success')
             return redirect(url_for('vpc.vpc_peerings'))
         except Exception as e:
@@ -297,7 +299,49 @@ def accept_vpc_peering(peering_id):
     try:
         ec2 = get_aws_client('ec2')
         ec2.accept_vpc_peering_connection(VpcPeeringConnectionId=peering_id)
+        vpc_topology.invalidate(get_cache_scope())
         flash(f'VPC Peering {peering_id} aceptado exitosamente', 'success')
     except Exception as e:
         flash(f'Error aceptando VPC peering: {str(e)}', 'error')
-    return redirect(url_for('vpc.vpc_peerings'))
\ No newline at end of file
+    return redirect(url_for('vpc.vpc_peerings'))
+
+def _topology(refresh=False):
+    factory = get_client_factory(client_config=fanout_client_config(
+        vpc_topology.COLLECT_WORKERS, vpc_topology.COLLECT_TIMEOUT))
+    return vpc_topology.get_topology(factory, factory.scope, refresh=refresh)
+
+@bp.route('/vpc/topology')
+def topology():
+    try:
+        topo = _topology(refresh=request.args.get('refresh') == '1')
+        for name, error in topo.errors.items():
+            flash(f'Topología incompleta: error obteniendo {name}: {error}', 'warning')
+        vpc_ids = sorted(topo.vpcs)
+        vpc_id = request.args.get('vpc_id') or (vpc_ids[0] if vpc_ids else None)
+        overview = topo.vpc_overview(vpc_id) if vpc_id in topo.vpcs else None
+        return render_template('Redes/vpc/topology.html', vpcs=[topo.vpcs[v] for v in vpc_ids], vpc_id=vpc_id,
+                               overview=overview, summary=topo.summary(), built_at=topo.built_at)
+    except Exception as e:
+        flash(f'Error obteniendo la topología: {str(e)}', 'error')
+        return render_template('Redes/vpc/topology.html', vpcs=[], vpc_id=None, overview=None, summary={}, built_at=None)
+
+@bp.route('/vpc/topology.json')
+def topology_json():
+    try:
+        topo = _topology(refresh=request.args.get('refresh') == '1')
+        return jsonify(topo.to_graph(request.args.get('vpc_id') or None))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/vpc/reachability')
+def reachability():
+    source = request.args.get('source', '').strip()
+    destination = request.args.get('destination', '').strip()
+    if not source or not destination:
+        return jsonify({'error': 'Se requieren origen y destino'}), 400
+    try:
+        return jsonify(_topology(refresh=request.args.get('refresh') == '1').reachability(source, destination))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
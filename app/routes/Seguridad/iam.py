@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils.vpc_topology import paginate
+from app.utils import iam_access, credential_report
 
 bp = Blueprint('iam', __name__)
 
@@ -11,9 +13,8 @@ def index():
 def users():
     try:
         iam = get_aws_client('iam')
-        users = iam.list_users()
         user_list = []
-        for user in users['Users']:
+        for user in paginate(iam, 'list_users', 'Users'):
             user_list.append({
                 'name': user['UserName'],
                 'id': user['UserId'],
@@ -29,9 +30,8 @@ def users():
 def roles():
     try:
         iam = get_aws_client('iam')
-        roles = iam.list_roles()
         role_list = []
-        for role in roles['Roles']:
+        for role in paginate(iam, 'list_roles', 'Roles'):
             role_list.append({
                 'name': role['RoleName'],
                 'id': role['RoleId'],
@@ -53,6 +53,7 @@ def create_user():
             
             # Crear usuario
             iam.create_user(UserName=username)
+            iam_access.invalidate(get_cache_scope())
             
             flash(f'Usuario IAM "{username}" creado exitosamente', 'success')
             return redirect(url_for('iam.users'))
@@ -78,6 +79,7 @@ def delete_user(username):
         
         # Eliminar usuario
         iam.delete_user(UserName=username)
+        iam_access.invalidate(get_cache_scope())
         
         flash(f'Usuario IAM "{username}" eliminado exitosamente', 'success')
     except Exception as e:
@@ -99,6 +101,7 @@ def create_role():
                 RoleName=role_name,
                 AssumeRolePolicyDocument=assume_role_policy
             )
+            iam_access.invalidate(get_cache_scope())
             
             flash(f'Rol IAM "{role_name}" creado exitosamente', 'success')
             return redirect(url_for('iam.roles'))
@@ -124,6 +127,7 @@ def delete_role(role_name):
         
         # Eliminar rol
         iam.delete_role(RoleName=role_name)
+        iam_access.invalidate(get_cache_scope())
         
         flash(f'Rol IAM "{role_name}" eliminado exitosamente', 'success')
     except Exception as e:
@@ -136,9 +140,8 @@ def policies():
     """Listar policies IAM"""
     try:
         iam = get_aws_client('iam')
-        policies = iam.list_policies(Scope='Local')  # Solo policies de la cuenta
         policy_list = []
-        for policy in policies['Policies']:
+        for policy in paginate(iam, 'list_policies', 'Policies', Scope='Local'):  # Solo policies de la cuenta
             policy_list.append({
                 'name': policy['PolicyName'],
                 'id': policy['PolicyId'],
@@ -167,6 +170,7 @@ def create_policy():
                 PolicyDocument=policy_document,
                 Description=description
             )
+            iam_access.invalidate(get_cache_scope())
             
             flash(f'Policy IAM "{policy_name}" creada exitosamente', 'success')
             return redirect(url_for('iam.policies'))
@@ -263,6 +267,7 @@ def attach_user_policy(username):
             policy_arn = request.form.get('policy_arn')
 
             iam.attach_user_policy(UserName=username, PolicyArn=policy_arn)
+            iam_access.invalidate(get_cache_scope())
 
             flash(f'Policy adjuntada exitosamente al usuario "{username}"', 'success')
             return redirect(url_for('iam.user_policies', username=username))
@@ -273,9 +278,8 @@ def attach_user_policy(username):
     # GET: Mostrar formulario
     try:
         iam = get_aws_client('iam')
-        policies = iam.list_policies(Scope='All')
         policy_list = []
-        for policy in policies['Policies']:
+        for policy in paginate(iam, 'list_policies', 'Policies', Scope='All'):
             policy_list.append({
                 'name': policy['PolicyName'],
                 'arn': policy['Arn']
@@ -292,6 +296,7 @@ def detach_user_policy(username, policy_arn):
         iam = get_aws_client('iam')
 
         iam.detach_user_policy(UserName=username, PolicyArn=policy_arn)
+        iam_access.invalidate(get_cache_scope())
 
         flash(f'Policy desadjuntada exitosamente del usuario "{username}"', 'success')
     except Exception as e:
@@ -338,6 +343,7 @@ def attach_role_policy(role_name):
             policy_arn = request.form.get('policy_arn')
 
             iam.attach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
+            iam_access.invalidate(get_cache_scope())
 
             flash(f'Policy adjuntada exitosamente al rol "{role_name}"', 'success')
             return redirect(url_for('iam.role_policies', role_name=role_name))
@@ -348,9 +354,8 @@ def attach_role_policy(role_name):
     # GET: Mostrar formulario
     try:
         iam = get_aws_client('iam')
-        policies = iam.list_policies(Scope='All')
         policy_list = []
-        for policy in policies['Policies']:
+        for policy in paginate(iam, 'list_policies', 'Policies', Scope='All'):
             policy_list.append({
                 'name': policy['PolicyName'],
                 'arn': policy['Arn']
@@ -367,9 +372,108 @@ def detach_role_policy(role_name, policy_arn):
         iam = get_aws_client('iam')
 
         iam.detach_role_policy(RoleName=role_name, PolicyArn=policy_arn)
+        iam_access.invalidate(get_cache_scope())
 
         flash(f'Policy desadjuntada exitosamente del rol "{role_name}"', 'success')
     except Exception as e:
         flash(f'Error desadjuntando policy: {str(e)}', 'error')
 
-    return redirect(url_for('iam.role_policies', role_name=role_name))
\ No newline at end of file
+    return redirect(url_for('iam.role_policies', role_name=role_name))
+def _access_query(snapshot, args):
+    """Simulación (con principal) o búsqueda de quién puede (sin principal) sobre el snapshot"""
+    actions = [a.strip() for a in args.get('actions', '').replace(',', '\n').splitlines() if a.strip()]
+    resource = args.get('resource', '').strip() or '*'
+    if not actions:
+        return None
+    principal_name = args.get('principal', '').strip()
+    if principal_name:
+        principal = snapshot.find_principal(principal_name)
+        if principal is None:
+            raise ValueError(f'Principal no encontrado: {principal_name}')
+        return {'mode': 'simulate', 'principal': principal.to_dict(), 'resource': resource,
+                'results': snapshot.simulate(principal, actions, resource),
+                'statements': snapshot.statements_on(principal, resource) if args.get('statements') else None}
+    principal_type = args.get('type') if args.get('type') in iam_access.PRINCIPAL_TYPES else None
+    return {'mode': 'who_can', 'resource': resource, 'type': principal_type,
+            'results': {action: snapshot.who_can(action, resource, principal_type,
+                                                 include_conditional=args.get('conditional', '1') == '1')
+                        for action in actions}}
+
+@bp.route('/iam/access')
+def access():
+    """Evaluación local de permisos sobre el snapshot de IAM"""
+    result, summary = None, None
+    try:
+        snapshot = iam_access.get_snapshot(get_aws_client('iam'), get_cache_scope(),
+                                           refresh=request.args.get('refresh') == '1')
+        summary = snapshot.summary()
+        result = _access_query(snapshot, request.args)
+    except Exception as e:
+        flash(f'Error evaluando permisos IAM: {str(e)}', 'error')
+    return render_template('Seguridad/iam_access.html', result=result, summary=summary, args=request.args,
+                           principal_types=iam_access.PRINCIPAL_TYPES)
+
+@bp.route('/iam/access.json')
+def access_json():
+    try:
+        snapshot = iam_access.get_snapshot(get_aws_client('iam'), get_cache_scope(),
+                                           refresh=request.args.get('refresh') == '1')
+        result = _access_query(snapshot, request.args)
+        if result is None:
+            return jsonify({'error': 'Parámetro actions requerido'}), 400
+        return jsonify(dict(result, snapshot=snapshot.summary()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _int_arg(args, name):
+    value = args.get(name, '').strip()
+    return int(value) if value else None
+
+def _credential_rows(report, args):
+    """Filtrado y orden del informe de credenciales según los parámetros de la petición"""
+    mfa = {'yes': True, 'no': False}.get(args.get('mfa', ''))
+    rows = credential_report.filter_rows(report['rows'], mfa=mfa,
+                                         min_key_age=_int_arg(args, 'min_key_age'),
+                                         min_inactive=_int_arg(args, 'min_inactive'),
+                                         finding=args.get('finding') or None,
+                                         with_keys=args.get('with_keys') == '1',
+                                         search=args.get('q', '').strip() or None)
+    return credential_report.sort_rows(rows, args.get('sort', 'key_age'), args.get('order', 'desc') == 'desc')
+
+@bp.route('/iam/credential-report')
+def credential_report_view():
+    """Auditoría de credenciales de toda la cuenta a partir del informe de IAM"""
+    report, rows = None, []
+    try:
+        report = credential_report.get_report(get_aws_client('iam'), get_cache_scope(),
+                                              refresh=request.args.get('refresh') == '1')
+        rows = _credential_rows(report, request.args)
+    except credential_report.ReportNotReady as e:
+        flash(str(e), 'warning')
+    except Exception as e:
+        flash(f'Error obteniendo el informe de credenciales: {str(e)}', 'error')
+    return render_template('Seguridad/credential_report.html', report=report, rows=rows, args=request.args,
+                           summary=credential_report.summary(report['rows']) if report else None,
+                           sort_keys=credential_report.SORT_KEYS, key_age_warning=credential_report.KEY_AGE_WARNING,
+                           inactive_warning=credential_report.INACTIVE_WARNING)
+
+@bp.route('/iam/credential-report.json')
+def credential_report_json():
+    try:
+        report = credential_report.get_report(get_aws_client('iam'), get_cache_scope(),
+                                              refresh=request.args.get('refresh') == '1')
+        rows = _credential_rows(report, request.args)
+        return jsonify({
+            'generated_time': report['generated_time'].isoformat(),
+            'summary': credential_report.summary(report['rows']),
+            'total_count': len(rows),
+            'users': [credential_report.to_json(row) for row in rows],
+        })
+    except credential_report.ReportNotReady as e:
+        return jsonify({'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,9 +1,12 @@
 """
 Rutas para AWS Key Management Service (KMS)
 """
+import base64
+import tempfile
 import boto3
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import kms_envelope
 
 kms_bp = Blueprint('kms', __name__)
 
@@ -96,6 +99,7 @@ def disable_key(key_id):
     try:
         kms = get_aws_client('kms')
         kms.disable_key(KeyId=key_id)
+        kms_envelope.invalidate(get_cache_scope())
         flash(f'Clave KMS {key_id} deshabilitada exitosamente', 'success')
     except Exception as e:
         flash(f'Error al deshabilitar clave KMS: {str(e)}', 'error')
@@ -127,6 +131,7 @@ def schedule_deletion(key_id):
             KeyId=key_id,
             PendingWindowInDays=pending_days
         )
+        kms_envelope.invalidate(get_cache_scope())
 
         flash(f'Eliminación de clave KMS {key_id} programada para {pending_days} días', 'success')
     except Exception as e:
@@ -267,4 +272,62 @@ def generate_data_key(key_id):
             flash(f'Error al generar clave de datos: {str(e)}', 'error')
             return redirect(url_for('kms.generate_data_key', key_id=key_id))
 
-    return render_template('Seguridad/kms/generate_data_key.html', key_id=key_id)
\ No newline at end of file
+    return render_template('Seguridad/kms/generate_data_key.html', key_id=key_id)
+
+
+# Ficheros de más de este tamaño se vuelcan a disco en lugar de mantenerse en memoria
+ENVELOPE_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+def _encryption_context(form):
+    """Pares context_key_N / context_value_N del formulario"""
+    context = {}
+    for name, value in form.items():
+        if name.startswith('context_key_') and value.strip():
+            context[value.strip()] = form.get('context_value_' + name[len('context_key_'):], '')
+    return context or None
+
+
+@kms_bp.route('/<key_id>/envelope', methods=['GET', 'POST'])
+def envelope(key_id):
+    """Cifrado de sobre: ficheros y textos grandes cifrados en local con una clave de datos"""
+    if request.method == 'GET':
+        return render_template('Seguridad/kms/envelope.html', key_id=key_id, cache=kms_envelope.cache_stats(),
+                               chunk_size=kms_envelope.DEFAULT_CHUNK_SIZE)
+
+    operation = request.form.get('operation', 'encrypt')
+    upload = request.files.get('file')
+    try:
+        kms = get_aws_client('kms')
+        scope = get_cache_scope()
+        if upload and upload.filename:
+            output = tempfile.SpooledTemporaryFile(max_size=ENVELOPE_SPOOL_SIZE)
+            if operation == 'encrypt':
+                kms_envelope.encrypt_stream(kms, scope, key_id, upload.stream, output,
+                                            context=_encryption_context(request.form),
+                                            size_hint=request.content_length or 0)
+                filename = f'{upload.filename}.enc'
+            else:
+                kms_envelope.decrypt_stream(kms, scope, upload.stream, output)
+                filename = upload.filename[:-4] if upload.filename.endswith('.enc') else f'{upload.filename}.dec'
+            output.seek(0)
+            return send_file(output, mimetype='application/octet-stream', as_attachment=True, download_name=filename)
+
+        text = request.form.get('text', '')
+        if not text:
+            flash('Debe proporcionar un fichero o un texto', 'error')
+            return redirect(url_for('kms.envelope', key_id=key_id))
+        if operation == 'encrypt':
+            message, stats = kms_envelope.encrypt_bytes(kms, scope, key_id, text.encode('utf-8'),
+                                                        context=_encryption_context(request.form))
+            result = base64.b64encode(message).decode('ascii')
+        else:
+            plaintext, stats = kms_envelope.decrypt_bytes(kms, scope, base64.b64decode(text.strip()))
+            result = plaintext.decode('utf-8')
+        return render_template('Seguridad/kms/envelope.html', key_id=key_id, cache=kms_envelope.cache_stats(),
+                               chunk_size=kms_envelope.DEFAULT_CHUNK_SIZE, operation=operation,
+                               result=result, stats=stats)
+    except Exception as e:
+        action = 'cifrar' if operation == 'encrypt' else 'descifrar'
+        flash(f'Error al {action} con cifrado de sobre: {str(e)}', 'error')
+        return redirect(url_for('kms.envelope', key_id=key_id))
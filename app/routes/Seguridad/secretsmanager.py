@@ -2,8 +2,9 @@
 Rutas para AWS Secrets Manager
 """
 import boto3
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import secret_values
 
 secretsmanager_bp = Blueprint('secretsmanager', __name__, url_prefix='/secretsmanager')
 
@@ -13,10 +14,10 @@ def index():
     """Página principal de Secrets Manager"""
     try:
         sm = get_aws_client('secretsmanager')
-        secrets = sm.list_secrets()
+        secrets = secret_values.list_secrets(sm, get_cache_scope(), refresh=request.args.get('refresh') == '1')
 
         secret_list = []
-        for secret in secrets.get('SecretList', []):
+        for secret in secrets:
             secret_list.append({
                 'name': secret['Name'],
                 'arn': secret['ARN'],
@@ -57,6 +58,7 @@ def create_secret():
                 params['KmsKeyId'] = kms_key_id
 
             response = sm.create_secret(**params)
+            secret_values.invalidate_secret(get_cache_scope(), name)
 
             flash(f'Secreto "{name}" creado exitosamente', 'success')
             return redirect(url_for('secretsmanager.index'))
@@ -91,6 +93,7 @@ def delete_secret(secret_name):
                 RecoveryWindowInDays=recovery_window
             )
             flash(f'Eliminación de secreto "{secret_name}" programada para {recovery_window} días', 'success')
+        secret_values.invalidate_secret(get_cache_scope(), secret_name)
 
     except Exception as e:
         flash(f'Error eliminando secreto: {str(e)}', 'error')
@@ -104,6 +107,7 @@ def restore_secret(secret_name):
     try:
         sm = get_aws_client('secretsmanager')
         sm.restore_secret(SecretId=secret_name)
+        secret_values.invalidate_secret(get_cache_scope(), secret_name)
         flash(f'Secreto "{secret_name}" restaurado exitosamente', 'success')
     except Exception as e:
         flash(f'Error restaurando secreto: {str(e)}', 'error')
@@ -118,9 +122,11 @@ def get_secret_value(secret_name):
         try:
             sm = get_aws_client('secretsmanager')
 
-            # Obtener el valor del secreto
-            response = sm.get_secret_value(SecretId=secret_name)
-            secret_value = response.get('SecretString', 'No se pudo obtener el valor')
+            # Obtener el valor del secreto (cacheado; por versión si se indica)
+            secret = secret_values.get_secret(sm, get_cache_scope(), secret_name,
+                                              version_id=request.form.get('version_id') or None,
+                                              version_stage=request.form.get('version_stage') or None)
+            secret_value = secret['secret_string'] or 'No se pudo obtener el valor'
 
             return render_template('Seguridad/secretsmanager/secret_value.html',
                                  secret_name=secret_name,
@@ -156,6 +162,7 @@ def update_secret(secret_name):
                 params['KmsKeyId'] = kms_key_id
 
             sm.update_secret(**params)
+            secret_values.invalidate_secret(get_cache_scope(), secret_name)
 
             flash(f'Secreto "{secret_name}" actualizado exitosamente', 'success')
             return redirect(url_for('secretsmanager.index'))
@@ -192,6 +199,7 @@ def rotate_secret(secret_name):
                     'AutomaticallyAfterDays': int(request.form.get('rotation_days', 30))
                 }
             )
+            secret_values.invalidate_secret(get_cache_scope(), secret_name)
 
             flash(f'Rotación de secreto "{secret_name}" iniciada exitosamente', 'success')
             return redirect(url_for('secretsmanager.index'))
@@ -200,4 +208,21 @@ def rotate_secret(secret_name):
             flash(f'Error rotando secreto: {str(e)}', 'error')
             return redirect(url_for('secretsmanager.rotate_secret', secret_name=secret_name))
 
-    return render_template('Seguridad/secretsmanager/rotate_secret.html', secret_name=secret_name)
\ No newline at end of file
+    return render_template('Seguridad/secretsmanager/rotate_secret.html', secret_name=secret_name)
+
+
+@secretsmanager_bp.route('/values.json', methods=['POST'])
+def batch_secret_values():
+    """Valores actuales de varios secretos (ids) en una sola petición"""
+    secret_ids = (request.get_json(silent=True) or {}).get('ids', [])
+    try:
+        sm = get_aws_client('secretsmanager')
+        values, errors = secret_values.batch_get_secrets(sm, get_cache_scope(), secret_ids)
+        return jsonify({
+            'success': True,
+            'secrets': {secret_id: {'value': secret['secret_string'], 'version_id': secret['version_id']}
+                        for secret_id, secret in values.items()},
+            'errors': errors
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
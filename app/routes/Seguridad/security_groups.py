@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
-from app.utils.aws_client import get_aws_client
+from app.utils.aws_client import get_aws_client, get_cache_scope
+from app.utils import security_group_index
 import boto3
 import logging
 
@@ -7,6 +8,10 @@ logger = logging.getLogger(__name__)
 
 bp = Blueprint('security_groups', __name__)
 
+def _index(ec2, refresh=False):
+    """Índice de reglas de la cuenta y región de la sesión (cacheado)"""
+    return security_group_index.get_index(ec2, get_cache_scope(), refresh=refresh)
+
 @bp.route('/security-groups')
 def index():
     """Página principal de Security Groups"""
@@ -17,10 +22,10 @@ def list_security_groups():
     """Listar todos los security groups"""
     try:
         ec2 = get_aws_client('ec2')
-        response = ec2.describe_security_groups()
+        index = _index(ec2, refresh=request.args.get('refresh') == '1')
 
         security_groups = []
-        for sg in response.get('SecurityGroups', []):
+        for sg in index.groups.values():
             security_groups.append({
                 'id': sg['GroupId'],
                 'name': sg.get('GroupName', 'N/A'),
@@ -52,6 +57,7 @@ def delete_security_group(group_id):
 
         # Eliminar el security group
         ec2.delete_security_group(GroupId=group_id)
+        security_group_index.invalidate(get_cache_scope())
 
         flash(f'Security Group {sg.get("GroupName", group_id)} eliminado exitosamente', 'success')
         return redirect(url_for('security_groups.list_security_groups'))
@@ -96,6 +102,7 @@ def authorize_ingress(group_id):
                 GroupId=group_id,
                 IpPermissions=ip_permissions
             )
+            security_group_index.invalidate(get_cache_scope())
 
             flash('Regla de entrada autorizada exitosamente', 'success')
             return redirect(url_for('security_groups.list_security_groups'))
@@ -105,12 +112,8 @@ def authorize_ingress(group_id):
         response = ec2.describe_security_groups(GroupIds=[group_id])
         security_group = response['SecurityGroups'][0]
 
-        # Obtener otros security groups para referencias
-        all_sgs_response = ec2.describe_security_groups()
-        other_security_groups = [
-            sg for sg in all_sgs_response.get('SecurityGroups', [])
-            if sg['GroupId'] != group_id
-        ]
+        # Otros security groups para referencias (del índice cacheado)
+        other_security_groups = _index(ec2).group_options(exclude=group_id)
 
         return render_template('Seguridad/security_groups/authorize_ingress.html',
                              security_group=security_group,
@@ -141,6 +144,7 @@ def revoke_ingress(group_id):
                     GroupId=group_id,
                     IpPermissions=[ingress_rules[rule_index]]
                 )
+                security_group_index.invalidate(get_cache_scope())
 
                 flash('Regla de entrada revocada exitosamente', 'success')
             else:
@@ -196,6 +200,7 @@ def authorize_egress(group_id):
                 GroupId=group_id,
                 IpPermissions=ip_permissions
             )
+            security_group_index.invalidate(get_cache_scope())
 
             flash('Regla de salida autorizada exitosamente', 'success')
             return redirect(url_for('security_groups.list_security_groups'))
@@ -205,12 +210,8 @@ def authorize_egress(group_id):
         response = ec2.describe_security_groups(GroupIds=[group_id])
         security_group = response['SecurityGroups'][0]
 
-        # Obtener otros security groups para referencias
-        all_sgs_response = ec2.describe_security_groups()
-        other_security_groups = [
-            sg for sg in all_sgs_response.get('SecurityGroups', [])
-            if sg['GroupId'] != group_id
-        ]
+        # Otros security groups para referencias (del índice cacheado)
+        other_security_groups = _index(ec2).group_options(exclude=group_id)
 
         return render_template('Seguridad/security_groups/authorize_egress.html',
                              security_group=security_group,
@@ -241,6 +242,7 @@ def revoke_egress(group_id):
                     GroupId=group_id,
                     IpPermissions=[egress_rules[rule_index]]
                 )
+                security_group_index.invalidate(get_cache_scope())
 
                 flash('Regla de salida revocada exitosamente', 'success')
             else:
@@ -258,4 +260,55 @@ def revoke_egress(group_id):
 
     except Exception as e:
         flash(f'Error revocando regla de salida: {str(e)}', 'error')
-        return redirect(url_for('security_groups.list_security_groups'))
\ No newline at end of file
+        return redirect(url_for('security_groups.list_security_groups'))
+
+def _int_arg(name, default=None):
+    value = request.args.get(name, '').strip()
+    return int(value) if value else default
+
+def _analysis(index):
+    """Exposición, reglas solapadas y referencias según los parámetros de la petición"""
+    vpc_id = request.args.get('vpc_id') or None
+    query = {
+        'from_port': _int_arg('from_port', 22),
+        'to_port': _int_arg('to_port'),
+        'protocol': request.args.get('protocol') or 'tcp',
+        'cidr': request.args.get('cidr', '').strip() or None,
+        'direction': request.args.get('direction') or 'ingress',
+        'partial': request.args.get('partial') == '1'
+    }
+    return {
+        'query': dict(query, vpc_id=vpc_id),
+        'summary': index.summary(),
+        'exposure': index.exposure(vpc_id=vpc_id, **query),
+        'overlaps': index.overlaps(group_id=request.args.get('group_id') or None, vpc_id=vpc_id),
+        'references': index.reference_graph(vpc_id)
+    }
+
+@bp.route('/security-groups/analysis')
+def analysis():
+    """Consultas de exposición, reglas redundantes y grafo de referencias"""
+    vpcs = []
+    try:
+        ec2 = get_aws_client('ec2')
+        index = _index(ec2, refresh=request.args.get('refresh') == '1')
+        vpcs = sorted({g.get('VpcId') for g in index.groups.values() if g.get('VpcId')})
+        result = _analysis(index)
+    except ValueError as e:
+        flash(f'Consulta no válida: {str(e)}', 'error')
+        result = None
+    except Exception as e:
+        flash(f'Error analizando security groups: {str(e)}', 'error')
+        result = None
+    args = {key: value for key, value in request.args.items() if key != 'refresh'}
+    return render_template('Seguridad/security_groups/analysis.html', result=result, vpcs=vpcs, args=args)
+
+@bp.route('/security-groups/analysis.json')
+def analysis_json():
+    try:
+        ec2 = get_aws_client('ec2')
+        return jsonify(_analysis(_index(ec2, refresh=request.args.get('refresh') == '1')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
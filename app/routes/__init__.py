@@ -62,6 +62,7 @@ from .Gestion.cloudwatch import bp as cloudwatch
 from .Gestion.cost_explorer import cost_explorer
 from .Gestion.systems_manager import systems_manager_bp as systems_manager
 from .Gestion.cloudtrail import cloudtrail_bp as cloudtrail
+from .Gestion.inventory import bp as inventory
 
 # Config
 from .AWSConfig.config import config_bp as config
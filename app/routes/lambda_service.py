@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from app.utils.aws_client import get_aws_client
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, abort
+from app.utils.aws_client import get_aws_client, get_client_factory, get_cache_scope
+from app.utils import inventory, lambda_deploy, lambda_load, lambda_inventory
+from app.utils.fanout import fanout_client_config
 
 bp = Blueprint('lambda_bp', __name__)
 
+# Tiempo máximo de una prueba de carga lanzada desde el panel (petición síncrona)
+LOAD_TEST_MAX_SECONDS = 120
+
 @bp.route('/')
 def index():
     return render_template('Computo/lambda_service/index.html')
@@ -10,21 +15,31 @@ def index():
 @bp.route('/functions')
 def functions():
     try:
-        lambda_client = get_aws_client('lambda')
-        functions = lambda_client.list_functions()
-        function_list = []
-        for function in functions['Functions']:
-            function_list.append({
-                'name': function['FunctionName'],
-                'arn': function['FunctionArn'],
-                'runtime': function['Runtime'],
-                'last_modified': function['LastModified']
-            })
-        return render_template('Computo/lambda_service/functions.html', functions=function_list)
+        scope = get_cache_scope()
+        refresh = request.args.get('refresh') == '1'
+        if refresh:
+            inventory.mark_dirty(scope, 'lambda')
+        # Lectura desde el inventario (list_functions paginado completo al recolectar)
+        function_list = inventory.get_items(get_client_factory(), 'lambda')['items']
+        lambda_client = get_aws_client('lambda', client_config=fanout_client_config(
+            lambda_inventory.ENRICH_MAX_WORKERS, lambda_inventory.ENRICH_CALL_TIMEOUT))
+        enriched = lambda_inventory.enrich(lambda_client, scope, function_list, refresh=refresh)
+        if enriched['errors']:
+            failed = ', '.join(sorted(enriched['errors'])[:5])
+            flash(f'No se pudo completar la información de {len(enriched["errors"])} funciones ({failed}). '
+                  'Se muestran resultados parciales.', 'warning')
+        return render_template('Computo/lambda_service/functions.html', functions=enriched['functions'],
+                               enrich_seconds=enriched['seconds'])
     except Exception as e:
         flash(f'Error obteniendo funciones Lambda: {str(e)}', 'error')
         return render_template('Computo/lambda_service/functions.html', functions=[])
 
+def _invalidate_function(function_name=None):
+    """Tras crear, desplegar o modificar una función: inventario y enriquecimiento"""
+    scope = get_cache_scope()
+    inventory.mark_dirty(scope, 'lambda')
+    lambda_inventory.invalidate(scope, function_name)
+
 @bp.route('/create-function', methods=['GET', 'POST'])
 def create_function():
     """Crear una nueva función Lambda"""
@@ -59,6 +74,7 @@ def create_function():
                 MemorySize=memory_size
             )
 
+            _invalidate_function(function_name)
             flash(f'Función Lambda "{function_name}" creada exitosamente', 'success')
             return redirect(url_for('lambda_bp.functions'))
 
@@ -74,6 +90,7 @@ def delete_function(function_name):
     try:
         lambda_client = get_aws_client('lambda')
         lambda_client.delete_function(FunctionName=function_name)
+        _invalidate_function(function_name)
         flash(f'Función Lambda "{function_name}" eliminada exitosamente', 'success')
     except Exception as e:
         flash(f'Error eliminando función Lambda: {str(e)}', 'error')
@@ -81,26 +98,89 @@ def delete_function(function_name):
 
 @bp.route('/update-code/<function_name>', methods=['GET', 'POST'])
 def update_code(function_name):
-    """Actualizar el código de una función Lambda"""
+    """Actualizar el código de una función Lambda (se omite si el SHA-256 no cambia)"""
+    result = None
     if request.method == 'POST':
         try:
             code_zip = request.files.get('code_zip')
-            lambda_client = get_aws_client('lambda')
 
             if code_zip:
-                code = {'ZipFile': code_zip.read()}
-                lambda_client.update_function_code(
-                    FunctionName=function_name,
-                    ZipFile=code['ZipFile']
-                )
-                flash(f'Código de función "{function_name}" actualizado exitosamente', 'success')
+                package = lambda_deploy.CodePackage.from_stream(code_zip.stream)
+                try:
+                    staging_bucket = request.form.get('staging_bucket') or lambda_deploy.STAGING_BUCKET
+                    result = lambda_deploy.deploy_function(
+                        get_aws_client('lambda'), function_name, package,
+                        s3=get_aws_client('s3') if staging_bucket else None,
+                        staging_bucket=staging_bucket, force=bool(request.form.get('force')),
+                        publish=bool(request.form.get('publish')))
+                finally:
+                    package.close()
+                if result['status'] == 'skipped':
+                    flash(f'El código de "{function_name}" no ha cambiado (mismo SHA-256); no se ha desplegado', 'info')
+                elif result['status'] == 'deployed':
+                    _invalidate_function(function_name)
+                    flash(f'Código de función "{function_name}" actualizado exitosamente', 'success')
+                else:
+                    flash(f'Error actualizando código: {result["error"]}', 'error')
             else:
                 flash('Debe proporcionar un archivo ZIP con el código', 'error')
 
         except Exception as e:
             flash(f'Error actualizando código: {str(e)}', 'error')
 
-    return render_template('Computo/lambda_service/update_code.html', function_name=function_name)
+    return render_template('Computo/lambda_service/update_code.html', function_name=function_name,
+                           result=result, staging_bucket=lambda_deploy.STAGING_BUCKET)
+
+@bp.route('/deploy', methods=['GET', 'POST'])
+def deploy():
+    """Desplegar un mismo paquete en varias funciones en paralelo"""
+    if request.method == 'POST':
+        try:
+            function_names = request.form.getlist('function_names')
+            code_zip = request.files.get('code_zip')
+            if not function_names or not code_zip:
+                flash('Selecciona al menos una función y un archivo ZIP', 'error')
+            else:
+                workers = request.form.get('workers', lambda_deploy.DEFAULT_WORKERS, type=int)
+                workers = max(1, min(workers, lambda_deploy.MAX_WORKERS))
+                threshold_mb = request.form.get('s3_threshold_mb', type=float)
+                package = lambda_deploy.CodePackage.from_stream(code_zip.stream)
+                run = lambda_deploy.start_deploy(
+                    get_client_factory(client_config=fanout_client_config(workers)), function_names, package,
+                    staging_bucket=request.form.get('staging_bucket') or lambda_deploy.STAGING_BUCKET,
+                    s3_threshold=int(threshold_mb * 1024 * 1024) if threshold_mb is not None
+                    else lambda_deploy.DEFAULT_S3_THRESHOLD,
+                    max_workers=workers, force=bool(request.form.get('force')),
+                    publish=bool(request.form.get('publish')))
+                return redirect(url_for('lambda_bp.deploy_status', run_id=run.id))
+        except Exception as e:
+            flash(f'Error iniciando el despliegue: {str(e)}', 'error')
+
+    try:
+        function_list = inventory.get_items(get_client_factory(), 'lambda')['items']
+    except Exception as e:
+        flash(f'Error obteniendo funciones Lambda: {str(e)}', 'error')
+        function_list = []
+    return render_template('Computo/lambda_service/deploy.html', functions=function_list,
+                           staging_bucket=lambda_deploy.STAGING_BUCKET,
+                           default_workers=lambda_deploy.DEFAULT_WORKERS,
+                           default_threshold_mb=lambda_deploy.DEFAULT_S3_THRESHOLD // (1024 * 1024))
+
+@bp.route('/deploy/<run_id>')
+def deploy_status(run_id):
+    """Progreso de un despliegue múltiple"""
+    run = lambda_deploy.get_run(run_id)
+    if run is None:
+        abort(404)
+    return render_template('Computo/lambda_service/deploy_status.html', run=run.to_dict())
+
+@bp.route('/deploy/<run_id>/status')
+def deploy_status_api(run_id):
+    """Progreso de un despliegue múltiple en JSON (para refresco periódico)"""
+    run = lambda_deploy.get_run(run_id)
+    if run is None:
+        return jsonify({'error': 'Despliegue no encontrado'}), 404
+    return jsonify(run.to_dict())
 
 @bp.route('/invoke/<function_name>', methods=['GET', 'POST'])
 def invoke_function(function_name):
@@ -131,6 +211,34 @@ def invoke_function(function_name):
     return render_template('Computo/lambda_service/invoke_function.html',
                          function_name=function_name, result=result)
 
+@bp.route('/load-test/<function_name>', methods=['GET', 'POST'])
+def load_test(function_name):
+    """Prueba de carga: N invocaciones con concurrencia C y percentiles de latencia"""
+    result = None
+    if request.method == 'POST':
+        try:
+            invocations = request.form.get('invocations', lambda_load.DEFAULT_INVOCATIONS, type=int)
+            concurrency = request.form.get('concurrency', lambda_load.DEFAULT_CONCURRENCY, type=int)
+            lambda_client = get_aws_client('lambda', client_config=lambda_load.load_client_config(concurrency))
+            result = lambda_load.run_load(
+                lambda_client, function_name, invocations=invocations, concurrency=concurrency,
+                payload_template=request.form.get('payload_template', '{}'),
+                qualifier=request.form.get('qualifier') or None,
+                max_seconds=LOAD_TEST_MAX_SECONDS)
+            if result['completed'] < result['requested']:
+                flash(f'Se alcanzó el límite de {LOAD_TEST_MAX_SECONDS} s: '
+                      f'{result["completed"]} de {result["requested"]} invocaciones', 'warning')
+        except ValueError as e:
+            flash(str(e), 'error')
+        except Exception as e:
+            flash(f'Error en la prueba de carga: {str(e)}', 'error')
+
+    return render_template('Computo/lambda_service/load_test.html', function_name=function_name, result=result,
+                           default_invocations=lambda_load.DEFAULT_INVOCATIONS,
+                           default_concurrency=lambda_load.DEFAULT_CONCURRENCY,
+                           max_invocations=lambda_load.MAX_INVOCATIONS,
+                           max_concurrency=lambda_load.MAX_CONCURRENCY)
+
 @bp.route('/layers')
 def layers():
     """Listar layers de Lambda"""
@@ -204,6 +312,7 @@ def create_alias(function_name):
                 Description=description
             )
 
+            lambda_inventory.invalidate(get_cache_scope(), function_name)
             flash(f'Alias "{alias_name}" creado exitosamente', 'success')
             return redirect(url_for('lambda_bp.function_versions', function_name=function_name))
 
@@ -254,6 +363,7 @@ def update_configuration(function_name):
                     FunctionName=function_name,
                     **update_params
                 )
+                _invalidate_function(function_name)
                 flash(f'Configuración de "{function_name}" actualizada exitosamente', 'success')
                 return redirect(url_for('lambda_bp.functions'))
             else:
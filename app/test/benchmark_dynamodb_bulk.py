@@ -0,0 +1,122 @@
+"""Benchmark de escritura masiva en DynamoDB (items/segundo)
+
+Por defecto usa un sustituto local en memoria que simula la latencia de red y el
+throttling (UnprocessedItems) de BatchWriteItem. Con --endpoint-url se puede
+apuntar a DynamoDB Local (p. ej. http://localhost:8000).
+
+Uso:
+    python -m app.test.benchmark_dynamodb_bulk --items 20000 --workers 1 4 8
+    python -m app.test.benchmark_dynamodb_bulk --endpoint-url http://localhost:8000
+"""
+import argparse
+import random
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.dynamodb_bulk import put_items, BATCH_WRITE_LIMIT
+
+
+class LocalDynamoDBStandIn:
+    """Sustituto mínimo de un cliente DynamoDB: latencia fija + fracción de items no procesados"""
+
+    def __init__(self, latency=0.02, unprocessed_ratio=0.05, seed=42):
+        self.latency = latency
+        self.unprocessed_ratio = unprocessed_ratio
+        self.tables = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        time.sleep(self.latency)
+        unprocessed = {}
+        with self._lock:
+            self.calls += 1
+            for table_name, requests in RequestItems.items():
+                if len(requests) > BATCH_WRITE_LIMIT:
+                    raise ValueError('Too many items requested for the BatchWriteItem call')
+                store = self.tables.setdefault(table_name, {})
+                for entry in requests:
+                    if self._rng.random() < self.unprocessed_ratio:
+                        unprocessed.setdefault(table_name, []).append(entry)
+                        continue
+                    item = entry['PutRequest']['Item']
+                    store[item['pk']['S']] = item
+        return {
+            'UnprocessedItems': unprocessed,
+            'ConsumedCapacity': [{'TableName': t, 'CapacityUnits': float(len(r))}
+                                 for t, r in RequestItems.items()]
+        }
+
+
+def generate_items(count):
+    for i in range(count):
+        yield {
+            'pk': {'S': f'item-{i:08d}'},
+            'price': {'N': str(i % 1000)},
+            'name': {'S': f'Producto {i}'},
+        }
+
+
+def ensure_table(client, table_name):
+    """Crea la tabla de pruebas si no existe; devuelve True si la ha creado este script"""
+    try:
+        client.describe_table(TableName=table_name)
+        return False
+    except client.exceptions.ResourceNotFoundException:
+        pass
+    client.create_table(TableName=table_name,
+                        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}],
+                        AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}],
+                        BillingMode='PAY_PER_REQUEST')
+    client.get_waiter('table_exists').wait(TableName=table_name, WaiterConfig={'Delay': 1, 'MaxAttempts': 60})
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escritura masiva en DynamoDB')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--latency', type=float, default=0.02, help='Latencia simulada por llamada (s)')
+    parser.add_argument('--unprocessed-ratio', type=float, default=0.05)
+    parser.add_argument('--endpoint-url', help='Endpoint de DynamoDB Local en lugar del sustituto en memoria')
+    parser.add_argument('--table', default='benchmark-bulk')
+    args = parser.parse_args()
+
+    created = False
+    if args.endpoint_url:
+        import boto3
+        from botocore.config import Config
+
+        def make_client(workers):
+            return boto3.client('dynamodb', endpoint_url=args.endpoint_url,
+                                region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+                                config=Config(max_pool_connections=max(10, workers)))
+
+        created = ensure_table(make_client(1), args.table)
+    else:
+        def make_client(workers):
+            return LocalDynamoDBStandIn(args.latency, args.unprocessed_ratio)
+
+    print(f"📊 Escribiendo {args.items} items por ejecución")
+    try:
+        for workers in args.workers:
+            result = put_items(make_client(workers), args.table, generate_items(args.items),
+                               max_workers=workers).to_dict()
+            print(f"  workers={workers:>3}  {result['items_per_second']:>10.1f} items/s  "
+                  f"lotes={result['batches']}  reintentos={result['retries']}  "
+                  f"sin procesar={result['unprocessed_count']}  {result['seconds']} s")
+    finally:
+        if created:
+            client = make_client(1)
+            client.delete_table(TableName=args.table)
+            client.get_waiter('table_not_exists').wait(TableName=args.table,
+                                                       WaiterConfig={'Delay': 1, 'MaxAttempts': 60})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark del productor masivo de Kinesis (registros/segundo)
+
+Compara put_record uno a uno con PutRecords en lotes concurrentes y con agregación
+KPL. Por defecto usa un sustituto local en memoria que simula la latencia de red y
+los límites por shard (1.000 registros/s y 1 MB/s), devolviendo
+ProvisionedThroughputExceededException por entrada como Kinesis. Con --endpoint-url
+se puede apuntar a un Kinesis local (p. ej. kinesalite o LocalStack).
+
+Uso:
+    python -m app.test.benchmark_kinesis_producer --records 20000 --workers 1 4 8
+    python -m app.test.benchmark_kinesis_producer --endpoint-url http://localhost:4567
+"""
+import argparse
+import hashlib
+import json
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.kinesis_producer import (put_records, build_entries, ShardMap,
+                                        PUT_RECORDS_MAX_COUNT, PUT_RECORDS_MAX_BYTES)
+
+MAX_HASH_KEY = 2 ** 128 - 1
+
+
+class LocalKinesisStandIn:
+    """Sustituto mínimo de un cliente Kinesis: latencia fija + límites de escritura por shard"""
+
+    def __init__(self, shards=4, latency=0.02, records_per_second=1000, bytes_per_second=1024 * 1024):
+        self.latency = latency
+        self.records_per_second = records_per_second
+        self.bytes_per_second = bytes_per_second
+        step = (MAX_HASH_KEY + 1) // shards
+        self.shards = [{
+            'ShardId': f'shardId-{i:012d}',
+            'HashKeyRange': {'StartingHashKey': str(i * step),
+                             'EndingHashKey': str(MAX_HASH_KEY if i == shards - 1 else (i + 1) * step - 1)},
+            'SequenceNumberRange': {'StartingSequenceNumber': '0'}
+        } for i in range(shards)]
+        self._shard_map = ShardMap(self.shards)
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.stored = 0
+
+    def list_shards(self, **kwargs):
+        return {'Shards': self.shards}
+
+    def _accept(self, entry):
+        """Aplica el límite por shard en ventanas de un segundo"""
+        shard_id = self._shard_map.shard_for(entry['PartitionKey'], entry.get('ExplicitHashKey'))
+        size = len(entry['Data']) + len(entry['PartitionKey'])
+        second = int(time.monotonic())
+        window = self._windows.get(shard_id)
+        if not window or window[0] != second:
+            window = self._windows[shard_id] = [second, 0, 0]
+        if window[1] + 1 > self.records_per_second or window[2] + size > self.bytes_per_second:
+            return shard_id, False
+        window[1] += 1
+        window[2] += size
+        self.stored += 1
+        return shard_id, True
+
+    def put_record(self, StreamName, Data, PartitionKey, ExplicitHashKey=None, **kwargs):
+        entry = {'Data': Data, 'PartitionKey': PartitionKey}
+        if ExplicitHashKey:
+            entry['ExplicitHashKey'] = ExplicitHashKey
+        while True:
+            time.sleep(self.latency)
+            with self._lock:
+                self.calls += 1
+                shard_id, accepted = self._accept(entry)
+            if accepted:
+                return {'ShardId': shard_id, 'SequenceNumber': str(self.stored)}
+
+    def put_records(self, StreamName, Records, **kwargs):
+        if len(Records) > PUT_RECORDS_MAX_COUNT:
+            raise ValueError('Too many records requested for the PutRecords call')
+        if sum(len(r['Data']) + len(r['PartitionKey']) for r in Records) > PUT_RECORDS_MAX_BYTES:
+            raise ValueError('PutRecords request exceeds 5 MB')
+        time.sleep(self.latency)
+        results, failed = [], 0
+        with self._lock:
+            self.calls += 1
+            for entry in Records:
+                shard_id, accepted = self._accept(entry)
+                if accepted:
+                    results.append({'ShardId': shard_id, 'SequenceNumber': str(self.stored)})
+                else:
+                    failed += 1
+                    results.append({'ErrorCode': 'ProvisionedThroughputExceededException',
+                                    'ErrorMessage': 'Rate exceeded for shard'})
+        return {'FailedRecordCount': failed, 'Records': results}
+
+
+def generate_payloads(count, size):
+    padding = 'x' * max(0, size - 60)
+    for i in range(count):
+        obj = {'user_id': f'user-{i % 997}', 'seq': i, 'pad': padding}
+        yield json.dumps(obj).encode('utf-8'), obj
+
+
+def run_sequential(client, stream, count, size):
+    started = time.monotonic()
+    for data, obj in generate_payloads(count, size):
+        client.put_record(StreamName=stream, Data=data,
+                          PartitionKey=hashlib.md5(data).hexdigest())
+    elapsed = time.monotonic() - started
+    return count / elapsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del productor masivo de Kinesis')
+    parser.add_argument('--records', type=int, default=10000)
+    parser.add_argument('--record-size', type=int, default=200, help='Tamaño aproximado de cada registro (bytes)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.02, help='Latencia simulada por llamada (s)')
+    parser.add_argument('--sequential-records', type=int, default=500,
+                        help='Registros del caso put_record uno a uno (es lento)')
+    parser.add_argument('--endpoint-url', help='Endpoint de un Kinesis local en lugar del sustituto en memoria')
+    parser.add_argument('--stream', default='benchmark-producer')
+    args = parser.parse_args()
+
+    def make_client(workers):
+        if args.endpoint_url:
+            import boto3
+            from botocore.config import Config
+            return boto3.client('kinesis', endpoint_url=args.endpoint_url,
+                                region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+                                config=Config(max_pool_connections=max(10, workers)))
+        return LocalKinesisStandIn(args.shards, args.latency)
+
+    print(f"📊 {args.records} registros de ~{args.record_size} bytes por ejecución")
+    rate, elapsed = run_sequential(make_client(1), args.stream, args.sequential_records, args.record_size)
+    print(f"  put_record secuencial       {rate:>10.1f} reg/s  ({args.sequential_records} registros, {elapsed:.2f} s)")
+
+    for aggregate in (False, True):
+        for workers in args.workers:
+            client = make_client(workers)
+            shard_map = ShardMap.load(client, args.stream)
+            entries = build_entries(generate_payloads(args.records, args.record_size),
+                                    strategy='field', key_field='user_id')
+            result = put_records(client, args.stream, entries, max_workers=workers,
+                                 aggregate=aggregate, shard_map=shard_map).to_dict()
+            label = 'put_records+KPL' if aggregate else 'put_records'
+            print(f"  {label:<16} workers={workers:>2}  {result['records_per_second']:>10.1f} reg/s  "
+                  f"lotes={result['batches']}  registros kinesis={result['kinesis_records']}  "
+                  f"reintentos={result['retries']}  fallidos={result['failed_count']}  {result['seconds']} s")
+
+
+if __name__ == '__main__':
+    main()
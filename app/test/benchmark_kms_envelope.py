@@ -0,0 +1,153 @@
+"""Benchmark del cifrado de sobre con KMS (MB/s y llamadas a KMS)
+
+Compara Encrypt directo (bloques de 4 KB, una llamada por bloque) con el cifrado de
+sobre de app.utils.kms_envelope, con y sin caché de claves de datos, para varios
+tamaños de mensaje y de bloque. Por defecto usa un sustituto local de KMS que
+simula la latencia de red; con --endpoint-url y --key-id se puede apuntar a un KMS
+local (p. ej. LocalStack).
+
+Uso:
+    python -m app.test.benchmark_kms_envelope --messages 200 --sizes 1024 65536 1048576
+    python -m app.test.benchmark_kms_envelope --endpoint-url http://localhost:4566 --key-id alias/bench
+"""
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.utils.kms_envelope import DataKeyCache, encrypt_stream, encrypt_bytes, decrypt_bytes, DEFAULT_CHUNK_SIZE
+
+KMS_ENCRYPT_LIMIT = 4096
+
+
+class LocalKMSStandIn:
+    """Sustituto mínimo de un cliente KMS: latencia fija por llamada y claves en memoria"""
+
+    def __init__(self, latency=0.01):
+        self.latency = latency
+        self._blobs = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _call(self):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+
+    def generate_data_key(self, KeyId, KeySpec='AES_256', EncryptionContext=None, **kwargs):
+        self._call()
+        plaintext = os.urandom(32)
+        blob = os.urandom(8) + KeyId.encode()[:64]
+        with self._lock:
+            self._blobs[blob] = plaintext
+        return {'KeyId': KeyId, 'Plaintext': plaintext, 'CiphertextBlob': blob}
+
+    def decrypt(self, CiphertextBlob, EncryptionContext=None, **kwargs):
+        self._call()
+        return {'Plaintext': self._blobs[CiphertextBlob]}
+
+    def encrypt(self, KeyId, Plaintext, **kwargs):
+        if len(Plaintext) > KMS_ENCRYPT_LIMIT:
+            raise ValueError('Plaintext supera 4096 bytes')
+        self._call()
+        return {'KeyId': KeyId, 'CiphertextBlob': Plaintext[::-1]}
+
+
+def run_direct(kms, key_id, messages, size):
+    """Encrypt directo troceando cada mensaje en bloques de 4 KB"""
+    payload = os.urandom(size)
+    started = time.monotonic()
+    for _ in range(messages):
+        for offset in range(0, max(size, 1), KMS_ENCRYPT_LIMIT):
+            kms.encrypt(KeyId=key_id, Plaintext=payload[offset:offset + KMS_ENCRYPT_LIMIT])
+    return time.monotonic() - started
+
+
+def run_envelope(kms, key_id, messages, size, chunk_size, cache):
+    payload = os.urandom(size)
+    scope = ('benchmark', str(id(cache)))
+    started = time.monotonic()
+    for _ in range(messages):
+        encrypt_stream(kms, scope, key_id, io.BytesIO(payload), _Sink(),
+                       chunk_size=chunk_size, size_hint=size, cache=cache)
+    return time.monotonic() - started
+
+
+def run_decrypt(kms, key_id, messages, size, chunk_size):
+    payload = os.urandom(size)
+    scope = ('benchmark-decrypt', size, chunk_size)
+    message, _ = encrypt_bytes(kms, scope, key_id, payload, chunk_size=chunk_size)
+    started = time.monotonic()
+    for _ in range(messages):
+        decrypt_bytes(kms, scope, message)
+    return time.monotonic() - started
+
+
+class _Sink:
+    """Destino que descarta la salida (mide el cifrado, no la copia en memoria)"""
+
+    def write(self, data):
+        return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del cifrado de sobre con KMS')
+    parser.add_argument('--messages', type=int, default=100, help='Mensajes por caso')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 64 * 1024, 1024 * 1024],
+                        help='Tamaños de mensaje (bytes)')
+    parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[16 * 1024, DEFAULT_CHUNK_SIZE, 1024 * 1024])
+    parser.add_argument('--latency', type=float, default=0.01, help='Latencia simulada por llamada a KMS (s)')
+    parser.add_argument('--direct-messages', type=int, default=10,
+                        help='Mensajes del caso Encrypt directo (es lento)')
+    parser.add_argument('--endpoint-url', help='Endpoint de un KMS local en lugar del sustituto en memoria')
+    parser.add_argument('--key-id', default='alias/benchmark-envelope')
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        import boto3
+        kms = boto3.client('kms', endpoint_url=args.endpoint_url,
+                           region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    else:
+        kms = LocalKMSStandIn(args.latency)
+
+    def calls():
+        return getattr(kms, 'calls', None)
+
+    # Ida y vuelta antes de medir
+    sample = os.urandom(3 * DEFAULT_CHUNK_SIZE + 17)
+    message, _ = encrypt_bytes(kms, ('benchmark-check',), args.key_id, sample)
+    assert decrypt_bytes(kms, ('benchmark-check',), message)[0] == sample
+
+    print(f"📊 {args.messages} mensajes por caso, latencia KMS {args.latency * 1000:.0f} ms"
+          if not args.endpoint_url else f"📊 {args.messages} mensajes por caso contra {args.endpoint_url}")
+    for size in args.sizes:
+        total_mb = size * args.messages / (1024 * 1024)
+        print(f"\n  Mensajes de {size} bytes")
+
+        before = calls()
+        elapsed = run_direct(kms, args.key_id, args.direct_messages, size)
+        mb = size * args.direct_messages / (1024 * 1024)
+        extra = f"  llamadas KMS={calls() - before}" if before is not None else ''
+        print(f"    Encrypt directo (4 KB)     {mb / elapsed:>9.2f} MB/s  {args.direct_messages / elapsed:>9.1f} msg/s{extra}")
+
+        for cached in (False, True):
+            for chunk_size in args.chunk_sizes:
+                cache = DataKeyCache(max_messages=args.messages + 1) if cached else DataKeyCache(max_messages=1)
+                before = calls()
+                elapsed = run_envelope(kms, args.key_id, args.messages, size, chunk_size, cache)
+                extra = f"  llamadas KMS={calls() - before}" if before is not None else ''
+                label = 'sobre + caché' if cached else 'sobre sin caché'
+                print(f"    {label:<16} bloque={chunk_size // 1024:>5} KB  {total_mb / elapsed:>9.2f} MB/s  "
+                      f"{args.messages / elapsed:>9.1f} msg/s{extra}")
+
+        elapsed = run_decrypt(kms, args.key_id, args.messages, size, DEFAULT_CHUNK_SIZE)
+        print(f"    descifrado (clave cacheada) bloque={DEFAULT_CHUNK_SIZE // 1024:>5} KB  "
+              f"{total_mb / elapsed:>9.2f} MB/s  {args.messages / elapsed:>9.1f} msg/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Recorrido de APIs REST de API Gateway
+get_resources paginado con embed=methods, integraciones que falten pedidas en paralelo
+(con límite de ritmo), exportación OpenAPI con get_export e índice de rutas por stage
+para comparar dos stages en local
+"""
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.utils.batching import RateLimiter
+from app.utils.cache import TTLCache
+from app.utils.fanout import fan_out
+
+WALK_TTL = 120.0
+# Un stage apunta a un deployment inmutable: su índice puede cachearse mucho tiempo
+STAGE_INDEX_TTL = 3600.0
+WALK_WORKERS = 8
+WALK_TIMEOUT = 30.0
+# Las operaciones de control de API Gateway tienen límites de ritmo bajos por cuenta
+CONTROL_RATE = 10.0
+CONTROL_BURST = 20
+RESOURCES_PAGE_SIZE = 500
+
+EXPORT_TYPES = ('oas30', 'swagger')
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch')
+ANY_METHOD = 'x-amazon-apigateway-any-method'
+INTEGRATION_KEY = 'x-amazon-apigateway-integration'
+# Ajustes del stage que se comparan además de las rutas
+STAGE_FIELDS = ('deploymentId', 'variables', 'methodSettings', 'cacheClusterEnabled', 'cacheClusterSize',
+                'tracingEnabled', 'webAclArn', 'clientCertificateId')
+
+_cache = TTLCache(ttl=WALK_TTL, max_entries=256)
+
+
+# ---------------------------------------------------------------------------
+# Recorrido de recursos
+# ---------------------------------------------------------------------------
+
+def iter_rest_apis(client):
+    for page in client.get_paginator('get_rest_apis').paginate(PaginationConfig={'PageSize': RESOURCES_PAGE_SIZE}):
+        yield from page.get('items', [])
+
+
+def get_resources(client, rest_api_id: str) -> List[Dict[str, Any]]:
+    """Todos los recursos con sus métodos embebidos (una llamada por cada 500 recursos)"""
+    resources = []
+    paginator = client.get_paginator('get_resources')
+    for page in paginator.paginate(restApiId=rest_api_id, embed=['methods'],
+                                   PaginationConfig={'PageSize': RESOURCES_PAGE_SIZE}):
+        resources.extend(page.get('items', []))
+    return resources
+
+
+def _integration(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not data or not data.get('type'):
+        return None
+    return {
+        'type': data.get('type'),
+        'uri': data.get('uri'),
+        'http_method': data.get('httpMethod'),
+        'connection_type': data.get('connectionType'),
+        'timeout': data.get('timeoutInMillis'),
+        'passthrough': data.get('passthroughBehavior'),
+        'responses': sorted((data.get('integrationResponses') or {}).keys()),
+    }
+
+
+def _route(path: str, resource_id: str, method: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'key': f'{method} {path}',
+        'path': path,
+        'method': method,
+        'resource_id': resource_id,
+        'authorization_type': data.get('authorizationType'),
+        'authorizer_id': data.get('authorizerId'),
+        'api_key_required': bool(data.get('apiKeyRequired')),
+        'operation_name': data.get('operationName'),
+        'request_parameters': sorted((data.get('requestParameters') or {}).keys()),
+        'integration': _integration(data.get('methodIntegration')),
+    }
+
+
+def walk(client, rest_api_id: str, max_workers: int = WALK_WORKERS,
+         limiter: Optional[RateLimiter] = None) -> Dict[str, Any]:
+    """
+    Todas las rutas (método + path) con su integración. Con embed=methods la mayoría
+    de métodos ya traen methodIntegration; solo los que no la traen se piden aparte,
+    en paralelo y respetando limiter. client debe admitir max_workers conexiones.
+    """
+    started = time.monotonic()
+    limiter = limiter or RateLimiter(CONTROL_RATE, CONTROL_BURST)
+    resources = get_resources(client, rest_api_id)
+
+    methods: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    paths: Dict[str, str] = {}
+    pending = []
+    for resource in resources:
+        paths[resource['id']] = resource.get('path', '/')
+        for method, data in (resource.get('resourceMethods') or {}).items():
+            methods[(resource['id'], method)] = data or {}
+            if 'methodIntegration' not in (data or {}):
+                pending.append((resource['id'], method))
+
+    def _fetch(task):
+        resource_id, method = task
+        limiter.acquire()
+        if not methods[task].get('httpMethod'):
+            # Método sin embeber: get_method trae también la integración
+            return client.get_method(restApiId=rest_api_id, resourceId=resource_id, httpMethod=method)
+        try:
+            integration = client.get_integration(restApiId=rest_api_id, resourceId=resource_id, httpMethod=method)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'NotFoundException':
+                integration = None
+            else:
+                raise
+        return dict(methods[task], methodIntegration=integration)
+
+    fetched = fan_out(_fetch, pending, max_workers=max_workers, timeout=WALK_TIMEOUT)
+    methods.update(fetched.results)
+
+    routes = [_route(paths[resource_id], resource_id, method, data)
+              for (resource_id, method), data in methods.items()]
+    routes.sort(key=lambda r: (r['path'], r['method']))
+    return {
+        'rest_api_id': rest_api_id,
+        'resources': len(resources),
+        'routes': routes,
+        'fetched': len(pending),
+        'errors': {f'{m} {paths.get(r, r)}': e for (r, m), e in fetched.errors.items()},
+        'seconds': round(time.monotonic() - started, 3),
+    }
+
+
+def get_walk(factory: Callable, scope: Hashable, rest_api_id: str, refresh: bool = False) -> Dict[str, Any]:
+    """walk cacheado por ámbito. factory con pool de al menos WALK_WORKERS conexiones"""
+    return _cache.get_or_load((scope, 'walk', rest_api_id),
+                              lambda: walk(factory('apigateway'), rest_api_id), refresh=refresh)
+
+
+def invalidate(scope: Hashable, rest_api_id: Optional[str] = None):
+    """Descarta los recorridos cacheados tras modificar recursos, métodos o integraciones"""
+    if rest_api_id:
+        _cache.invalidate_prefix(scope, 'walk', rest_api_id)
+    else:
+        _cache.invalidate_prefix(scope, 'walk')
+
+
+# ---------------------------------------------------------------------------
+# Exportación
+# ---------------------------------------------------------------------------
+
+def export(client, rest_api_id: str, stage_name: str, export_type: str = 'oas30',
+           extensions: Optional[str] = 'integrations', accepts: str = 'application/json') -> bytes:
+    """Definición OpenAPI/Swagger del deployment de un stage tal como la genera get_export"""
+    if export_type not in EXPORT_TYPES:
+        raise ValueError(f'Tipo de exportación no soportado: {export_type}')
+    params = {'restApiId': rest_api_id, 'stageName': stage_name, 'exportType': export_type, 'accepts': accepts}
+    if extensions:
+        params['parameters'] = {'extensions': extensions}
+    return client.get_export(**params)['body'].read()
+
+
+# ---------------------------------------------------------------------------
+# Índice de rutas por stage y diff
+# ---------------------------------------------------------------------------
+
+def _fingerprint(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def route_index(document: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """'MÉTODO /path' -> {'fingerprint', 'definition'} a partir de una exportación"""
+    index = {}
+    for path, item in (document.get('paths') or {}).items():
+        for name, operation in item.items():
+            if name == ANY_METHOD:
+                method = 'ANY'
+            elif name.lower() in HTTP_METHODS:
+                method = name.upper()
+            else:
+                continue
+            index[f'{method} {path}'] = {'fingerprint': _fingerprint(operation), 'definition': operation}
+    return index
+
+
+def _stage_settings(stage: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: stage.get(field) for field in STAGE_FIELDS}
+
+
+def get_stage_index(client, scope: Hashable, rest_api_id: str, stage_name: str) -> Dict[str, Any]:
+    """
+    Ajustes e índice de rutas de un stage. El índice se cachea por deploymentId, así
+    que solo se vuelve a exportar cuando el stage apunta a otro deployment.
+    """
+    stage = client.get_stage(restApiId=rest_api_id, stageName=stage_name)
+    deployment_id = stage.get('deploymentId')
+
+    def _load():
+        document = json.loads(export(client, rest_api_id, stage_name))
+        return route_index(document)
+
+    routes = _cache.get_or_load((scope, 'stage', rest_api_id, deployment_id or stage_name), _load,
+                                ttl=STAGE_INDEX_TTL if deployment_id else None)
+    return {'stage': stage_name, 'settings': _stage_settings(stage), 'routes': routes}
+
+
+def _changed_fields(before: Dict[str, Any], after: Dict[str, Any]) -> List[str]:
+    fields = []
+    for key in sorted(set(before) | set(after)):
+        if before.get(key) == after.get(key):
+            continue
+        if key == INTEGRATION_KEY and isinstance(before.get(key), dict) and isinstance(after.get(key), dict):
+            fields.extend(f'integration.{sub}' for sub in _changed_fields(before[key], after[key]))
+        else:
+            fields.append(key)
+    return fields
+
+
+def diff_indexes(base: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """Rutas añadidas, eliminadas y modificadas (por huella) y ajustes distintos entre dos stages"""
+    base_routes, target_routes = base['routes'], target['routes']
+    added = sorted(set(target_routes) - set(base_routes))
+    removed = sorted(set(base_routes) - set(target_routes))
+    changed = []
+    for key in sorted(set(base_routes) & set(target_routes)):
+        before, after = base_routes[key], target_routes[key]
+        if before['fingerprint'] != after['fingerprint']:
+            changed.append({'route': key, 'fields': _changed_fields(before['definition'], after['definition'])})
+    settings = [{'field': field, 'base': base['settings'].get(field), 'target': target['settings'].get(field)}
+                for field in STAGE_FIELDS if base['settings'].get(field) != target['settings'].get(field)]
+    return {
+        'base': base['stage'],
+        'target': target['stage'],
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'settings': settings,
+        'unchanged': len(base_routes) - len(removed) - len(changed),
+        'identical': not (added or removed or changed or settings),
+    }
+
+
+def diff_stages(client, scope: Hashable, rest_api_id: str, base_stage: str, target_stage: str) -> Dict[str, Any]:
+    return diff_indexes(get_stage_index(client, scope, rest_api_id, base_stage),
+                        get_stage_index(client, scope, rest_api_id, target_stage))
@@ -1,9 +1,13 @@
 import boto3
-from flask import current_app, session
+from flask import current_app, session, has_request_context
 import os
 
-def get_aws_client(service_name, region=None):
-    """Get AWS client with credentials from session or environment variables"""
+def get_aws_client(service_name, region=None, client_config=None):
+    """Get AWS client with credentials from session or environment variables
+
+    client_config acepta un botocore.config.Config opcional (p. ej. para ampliar
+    max_pool_connections cuando el cliente se comparte entre hilos).
+    """
     if region is None:
         # Primero intentar obtener de sesión, luego de variables de entorno
         region = session.get('aws_default_region') or os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
@@ -25,6 +29,8 @@ def get_aws_client(service_name, region=None):
         config['aws_secret_access_key'] = secret_key
     if session_token:
         config['aws_session_token'] = session_token
+    if client_config is not None:
+        config['config'] = client_config
 
     return boto3.client(**config)
 
@@ -52,4 +58,48 @@ def get_aws_resource(service_name, region=None):
     if session_token:
         config['aws_session_token'] = session_token
 
-    return boto3.resource(**config)
\ No newline at end of file
+    return boto3.resource(**config)
+
+
+def get_cache_scope(region=None):
+    """Ámbito para claves de caché: (access key, región) de la sesión o del entorno
+
+    Evita que dos sesiones con credenciales o regiones distintas compartan
+    resultados cacheados.
+    """
+    if region is None:
+        region = session.get('aws_default_region') or os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+    access_key = session.get('aws_access_key_id') or os.environ.get('AWS_ACCESS_KEY_ID') or 'default'
+    return (access_key, region)
+
+
+def get_client_factory(region=None, client_config=None):
+    """Fábrica de clientes boto3 utilizable desde hilos en segundo plano
+
+    Toma una foto de las credenciales (de la sesión si hay petición en curso, si no
+    del entorno) para que los hilos puedan crear clientes sin acceder a la sesión.
+    La fábrica expone .scope con el mismo formato que get_cache_scope().
+    """
+    in_request = has_request_context()
+
+    def _value(session_key, env_key):
+        return (session.get(session_key) if in_request else None) or os.environ.get(env_key)
+
+    if region is None:
+        region = _value('aws_default_region', 'AWS_DEFAULT_REGION') or 'us-east-1'
+    credentials = {
+        'aws_access_key_id': _value('aws_access_key_id', 'AWS_ACCESS_KEY_ID'),
+        'aws_secret_access_key': _value('aws_secret_access_key', 'AWS_SECRET_ACCESS_KEY'),
+        'aws_session_token': _value('aws_session_token', 'AWS_SESSION_TOKEN'),
+    }
+    credentials = {k: v for k, v in credentials.items() if v}
+
+    def factory(service_name, region_name=None):
+        params = dict(credentials, service_name=service_name, region_name=region_name or region)
+        if client_config is not None:
+            params['config'] = client_config
+        return boto3.client(**params)
+
+    factory.scope = (credentials.get('aws_access_key_id') or 'default', region)
+    factory.region = region
+    return factory
@@ -0,0 +1,160 @@
+"""
+Utilidades de batching para las APIs batch de AWS
+Troceado por número de entradas/bytes, backoff exponencial con jitter, reintento
+de entradas fallidas y limitación de ritmo
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from botocore.exceptions import ClientError
+
+T = TypeVar('T')
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Divide un iterable en listas de como máximo size elementos"""
+    chunk: List[T] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def chunked_by_size(items: Iterable[T], max_count: int, max_bytes: int,
+                    size_of: Callable[[T], int]) -> Iterator[List[T]]:
+    """
+    Divide un iterable respetando a la vez un máximo de entradas y de bytes por lote.
+    Un elemento que por sí solo supera max_bytes se entrega en un lote propio
+    para que sea la API quien lo rechace con su error específico.
+    """
+    chunk: List[T] = []
+    chunk_bytes = 0
+    for item in items:
+        item_bytes = size_of(item)
+        if chunk and (len(chunk) >= max_count or chunk_bytes + item_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(item)
+        chunk_bytes += item_bytes
+    if chunk:
+        yield chunk
+
+
+def backoff_delay(attempt: int, base: float = 0.05, cap: float = 5.0,
+                  rng: Optional[random.Random] = None) -> float:
+    """Retardo de backoff exponencial con 'full jitter' para el intento indicado (0, 1, 2...)"""
+    rng = rng or random
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def run_bounded(chunks: Iterable[Any], worker: Callable[[Any], Any], max_workers: int,
+                thread_name_prefix: str = 'batch'):
+    """
+    Ejecuta worker(chunk) para cada lote en un pool acotado. Solo hay max_workers * 2
+    lotes en vuelo, de modo que una entrada grande se consume a medida que se envía.
+    """
+    if max_workers <= 1:
+        for chunk in chunks:
+            worker(chunk)
+        return
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix) as executor:
+        for chunk in chunks:
+            slots.acquire()
+            future = executor.submit(worker, chunk)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+    # Propaga excepciones no controladas de los workers
+    for future in futures:
+        future.result()
+
+
+class RateLimiter:
+    """
+    Token bucket thread-safe: acquire(n) espera hasta poder consumir n unidades a un
+    ritmo de rate por segundo (con ráfagas de hasta burst unidades). rate None = sin límite.
+    """
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        self.rate = rate if rate and rate > 0 else None
+        self.capacity = max(burst or self.rate or 1, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float = 1):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Un lote mayor que la ráfaga pasa en cuanto el bucket está lleno
+                needed = min(units, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= units
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_failed_entries(call: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+                         entries: List[Dict[str, Any]], max_retries: int,
+                         retryable_codes: Iterable[str] = (),
+                         limiter: Optional[RateLimiter] = None) -> Tuple[int, int, List[Dict[str, Any]]]:
+    """
+    Ejecuta una API batch con respuesta Successful/Failed por Id (SQS, SNS PublishBatch)
+    reintentando solo las entradas fallidas por causas transitorias (SenderFault=false).
+    Asigna a cada entrada un Id por posición. Devuelve (correctas, reintentos, fallidas),
+    con las fallidas como {'entry', 'code', 'message'}.
+    """
+    retryable_codes = tuple(retryable_codes)
+    pending = {str(i): entry for i, entry in enumerate(entries)}
+    succeeded = retries = 0
+    failed: List[Dict[str, Any]] = []
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire(len(pending))
+        try:
+            response = call([dict(entry, Id=entry_id) for entry_id, entry in pending.items()])
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in retryable_codes and attempt < max_retries:
+                retries += 1
+                time.sleep(backoff_delay(attempt, base=0.1))
+                continue
+            failed.extend({'entry': entry, 'code': code, 'message': str(e)} for entry in pending.values())
+            return succeeded, retries, failed
+        for ok in response.get('Successful', []):
+            if pending.pop(ok['Id'], None) is not None:
+                succeeded += 1
+        retry = {}
+        for error in response.get('Failed', []):
+            entry = pending.pop(error['Id'], None)
+            if entry is None:
+                continue
+            if error.get('SenderFault') or attempt >= max_retries:
+                failed.append({'entry': entry, 'code': error.get('Code'), 'message': error.get('Message', '')})
+            else:
+                retry[error['Id']] = entry
+        # Entradas sin respuesta (no debería ocurrir): se reintentan también
+        retry.update(pending)
+        if not retry:
+            break
+        pending = retry
+        if attempt < max_retries:
+            retries += 1
+            time.sleep(backoff_delay(attempt, base=0.1))
+    else:
+        failed.extend({'entry': entry, 'code': 'NoResponse', 'message': 'Entrada sin respuesta tras los reintentos'}
+                      for entry in pending.values())
+    return succeeded, retries, failed
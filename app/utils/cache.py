@@ -0,0 +1,72 @@
+"""
+Caché en memoria con TTL para respuestas de AWS
+Las claves incluyen el ámbito de credenciales/región (ver get_cache_scope)
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Caché thread-safe con expiración por entrada y tamaño máximo"""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict()
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], refresh: bool = False,
+                    ttl: Optional[float] = None) -> Any:
+        """Devuelve el valor cacheado o lo calcula con loader() y lo guarda"""
+        if not refresh:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        value = loader()
+        self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """Elimina todas las entradas, o solo las que cumplen predicate(key)"""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def invalidate_prefix(self, *prefix: Any):
+        """Elimina las entradas cuya clave (tupla) empieza por prefix"""
+        size = len(prefix)
+        self.invalidate(lambda k: isinstance(k, tuple) and k[:size] == prefix)
+
+    def _evict(self):
+        # Primero las expiradas; si no basta, la que antes expira
+        now = time.monotonic()
+        expired = [k for k, (expires, _) in self._data.items() if expires < now]
+        for key in expired:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            oldest = min(self._data, key=lambda k: self._data[k][0])
+            del self._data[oldest]
+
+
+_MISSING = object()
@@ -0,0 +1,327 @@
+"""
+Distribuciones e invalidaciones de CloudFront
+Listado paginado (Marker) cacheado por cuenta y cola de invalidaciones que agrupa
+las rutas de cada distribución durante una ventana corta, las colapsa en wildcards
+cuando sale más barato y respeta el límite de invalidaciones en curso
+"""
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.utils.cache import TTLCache
+
+DISTRIBUTIONS_TTL = 120.0
+COALESCE_WINDOW = 5.0
+RETRY_DELAY = 30.0
+COLLAPSE_THRESHOLD = 10
+# Límites de CloudFront por distribución: rutas individuales y rutas con wildcard
+# en curso se cuentan por separado
+MAX_FILES_IN_PROGRESS = 3000
+MAX_WILDCARDS_IN_PROGRESS = 15
+HISTORY_SIZE = 20
+
+_cache = TTLCache(ttl=DISTRIBUTIONS_TTL, max_entries=64)
+# Las rutas de una invalidación no cambian: se guardan para no repetir get_invalidation
+_batch_sizes = TTLCache(ttl=3600.0, max_entries=4096)
+
+
+# ---------------------------------------------------------------------------
+# Distribuciones
+# ---------------------------------------------------------------------------
+
+def iter_distributions(cf) -> Iterator[Dict[str, Any]]:
+    """Recorre todas las distribuciones siguiendo Marker/NextMarker"""
+    for page in cf.get_paginator('list_distributions').paginate():
+        yield from page.get('DistributionList', {}).get('Items', [])
+
+
+def distribution_summary(dist: Dict[str, Any]) -> Dict[str, Any]:
+    modified = dist.get('LastModifiedTime')
+    return {
+        'id': dist['Id'],
+        'domain': dist['DomainName'],
+        'status': dist['Status'],
+        'enabled': dist['Enabled'],
+        'comment': dist.get('Comment', ''),
+        'aliases': dist.get('Aliases', {}).get('Items', []),
+        'origins': len(dist.get('Origins', {}).get('Items', [])),
+        'last_modified': modified.isoformat() if hasattr(modified, 'isoformat') else modified,
+    }
+
+
+def list_distributions(cf, scope: Hashable, refresh: bool = False) -> List[Dict[str, Any]]:
+    """Resumen de todas las distribuciones de la cuenta, cacheado por ámbito"""
+    return _cache.get_or_load((scope, 'distributions'),
+                              lambda: [distribution_summary(d) for d in iter_distributions(cf)],
+                              refresh=refresh)
+
+
+def invalidate(scope: Hashable):
+    """Descarta el listado cacheado tras crear, modificar o eliminar distribuciones"""
+    _cache.invalidate_prefix(scope)
+
+
+# ---------------------------------------------------------------------------
+# Rutas
+# ---------------------------------------------------------------------------
+
+def normalize_path(path: str) -> str:
+    """Ruta con '/' inicial y sin barras duplicadas; '*' solo se admite al final"""
+    path = path.strip()
+    if not path:
+        raise ValueError('Ruta vacía')
+    if not path.startswith('/'):
+        path = '/' + path
+    while '//' in path:
+        path = path.replace('//', '/')
+    if '*' in path[:-1]:
+        raise ValueError(f'El wildcard (*) solo puede ir al final de la ruta: {path}')
+    return path
+
+
+def is_wildcard(path: str) -> bool:
+    return path.endswith('*')
+
+
+def _parent(path: str) -> str:
+    """Directorio que contiene la ruta ('/a/b/c.css' y '/a/b/*' -> '/a/b/' y '/a/')"""
+    if is_wildcard(path) and path.endswith('/*'):
+        path = path[:-2]
+    return path.rsplit('/', 1)[0] + '/'
+
+
+def _covered(path: str, prefixes: Set[str]) -> bool:
+    """True si algún wildcard (distinto de la propia ruta) ya cubre la ruta"""
+    own = path[:-1] if is_wildcard(path) else None
+    for end in range(1, len(path) + 1):
+        prefix = path[:end]
+        if prefix in prefixes and prefix != own:
+            return True
+    return False
+
+
+def _prune(paths: Set[str]) -> Set[str]:
+    prefixes = {p[:-1] for p in paths if is_wildcard(p)}
+    return {p for p in paths if not _covered(p, prefixes)}
+
+
+def coalesce_paths(paths: Iterable[str], threshold: int = COLLAPSE_THRESHOLD,
+                   max_wildcards: int = MAX_WILDCARDS_IN_PROGRESS) -> List[str]:
+    """
+    Normaliza y deduplica las rutas, elimina las cubiertas por un wildcard y sustituye
+    por '/dir/*' los directorios con threshold o más rutas (cada ruta se factura
+    igual, con o sin wildcard). Nunca genera '/*' y no supera max_wildcards.
+    threshold <= 1 desactiva el colapso.
+    """
+    current = _prune({normalize_path(p) for p in paths})
+    while threshold > 1:
+        groups: Dict[str, List[str]] = {}
+        for path in current:
+            parent = _parent(path)
+            if parent != '/':
+                groups.setdefault(parent, []).append(path)
+        candidates = sorted(((len(members), parent) for parent, members in groups.items()
+                             if len(members) >= threshold), reverse=True)
+        wildcards = sum(1 for p in current if is_wildcard(p))
+        changed = False
+        for _, parent in candidates:
+            members = groups[parent]
+            delta = 1 - sum(1 for p in members if is_wildcard(p))
+            if wildcards + delta > max_wildcards:
+                continue
+            current.difference_update(members)
+            current.add(parent + '*')
+            wildcards += delta
+            changed = True
+        if not changed:
+            break
+        current = _prune(current)
+    return sorted(current)
+
+
+def split_paths(paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """(rutas individuales, rutas con wildcard)"""
+    files, wildcards = [], []
+    for path in paths:
+        (wildcards if is_wildcard(path) else files).append(path)
+    return files, wildcards
+
+
+# ---------------------------------------------------------------------------
+# Invalidaciones en curso
+# ---------------------------------------------------------------------------
+
+def _batch_size(cf, distribution_id: str, invalidation_id: str) -> Tuple[int, int]:
+    def _load():
+        batch = cf.get_invalidation(DistributionId=distribution_id, Id=invalidation_id)
+        items = batch['Invalidation']['InvalidationBatch']['Paths'].get('Items', [])
+        files, wildcards = split_paths(items)
+        return len(files), len(wildcards)
+    return _batch_sizes.get_or_load(invalidation_id, _load)
+
+
+def in_progress_usage(cf, distribution_id: str) -> Dict[str, Any]:
+    """
+    Rutas individuales y wildcards en invalidaciones InProgress. El listado viene de más
+    reciente a más antigua, así que se deja de paginar en la primera página sin
+    invalidaciones en curso.
+    """
+    usage = {'invalidations': [], 'files': 0, 'wildcards': 0}
+    for page in cf.get_paginator('list_invalidations').paginate(DistributionId=distribution_id):
+        items = page.get('InvalidationList', {}).get('Items', [])
+        running = [item for item in items if item.get('Status') == 'InProgress']
+        for item in running:
+            files, wildcards = _batch_size(cf, distribution_id, item['Id'])
+            usage['invalidations'].append(item['Id'])
+            usage['files'] += files
+            usage['wildcards'] += wildcards
+        if not running:
+            break
+    return usage
+
+
+def recent_invalidations(cf, distribution_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    response = cf.list_invalidations(DistributionId=distribution_id, MaxItems=str(limit))
+    return [{'id': item['Id'], 'status': item['Status'], 'create_time': item.get('CreateTime')}
+            for item in response.get('InvalidationList', {}).get('Items', [])]
+
+
+def create_invalidation(cf, distribution_id: str, paths: List[str]) -> Dict[str, Any]:
+    response = cf.create_invalidation(
+        DistributionId=distribution_id,
+        InvalidationBatch={
+            'CallerReference': f'invalidation-{uuid.uuid4().hex}',
+            'Paths': {'Quantity': len(paths), 'Items': paths}
+        }
+    )
+    invalidation = response['Invalidation']
+    files, wildcards = split_paths(paths)
+    _batch_sizes.set(invalidation['Id'], (len(files), len(wildcards)))
+    return {'id': invalidation['Id'], 'status': invalidation['Status']}
+
+
+# ---------------------------------------------------------------------------
+# Cola
+# ---------------------------------------------------------------------------
+
+class InvalidationQueue:
+    """
+    Acumula rutas por (ámbito, distribución) y las envía en una sola invalidación
+    cuando pasa la ventana de agrupación o se pide un flush. Lo que no cabe en el
+    límite de invalidaciones en curso queda pendiente y se reintenta más tarde.
+    """
+
+    def __init__(self, window: float = COALESCE_WINDOW, retry_delay: float = RETRY_DELAY,
+                 threshold: int = COLLAPSE_THRESHOLD):
+        self.window = window
+        self.retry_delay = retry_delay
+        self.threshold = threshold
+        self._pending: Dict[Tuple, Set[str]] = {}
+        self._factories: Dict[Tuple, Callable] = {}
+        self._timers: Dict[Tuple, threading.Timer] = {}
+        self._history: Dict[Tuple, Deque[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, factory: Callable, distribution_id: str, paths: Iterable[str],
+                immediate: bool = False) -> Dict[str, Any]:
+        """
+        Añade rutas a la cola de la distribución. factory es una fábrica de
+        get_client_factory() para que el envío pueda hacerse desde un hilo.
+        Con immediate=True se envía ya y se devuelve el resultado del flush.
+        """
+        normalized = {normalize_path(p) for p in paths}
+        if not normalized:
+            raise ValueError('Debe especificar al menos una ruta para invalidar')
+        key = (factory.scope, distribution_id)
+        with self._lock:
+            pending = self._pending.setdefault(key, set())
+            pending.update(normalized)
+            self._factories[key] = factory
+            queued = len(pending)
+            if not immediate and key not in self._timers:
+                self._schedule(key, self.window)
+        if immediate:
+            return self.flush(factory.scope, distribution_id)
+        return {'queued': len(normalized), 'pending': queued, 'flush_in': self.window}
+
+    def _schedule(self, key: Tuple, delay: float):
+        # Llamar con el lock tomado
+        timer = threading.Timer(delay, self._on_timer, args=(key,))
+        timer.daemon = True
+        timer.name = f'cf-invalidation-{key[1]}'
+        self._timers[key] = timer
+        timer.start()
+
+    def _on_timer(self, key: Tuple):
+        with self._lock:
+            self._timers.pop(key, None)
+        try:
+            self.flush(*key)
+        except Exception:
+            # flush ya registra los errores de AWS; esto evita que muera el hilo
+            pass
+
+    def flush(self, scope: Hashable, distribution_id: str) -> Dict[str, Any]:
+        """Envía lo pendiente de la distribución respetando la capacidad disponible"""
+        key = (scope, distribution_id)
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            raw = self._pending.pop(key, set())
+            factory = self._factories.get(key)
+        result = {'distribution_id': distribution_id, 'time': time.time(), 'requested': len(raw),
+                  'paths': [], 'deferred': [], 'invalidation': None, 'error': None}
+        if not raw or factory is None:
+            return result
+
+        paths = coalesce_paths(raw, self.threshold)
+        try:
+            cf = factory('cloudfront')
+            usage = in_progress_usage(cf, distribution_id)
+            files, wildcards = split_paths(paths)
+            free_files = max(MAX_FILES_IN_PROGRESS - usage['files'], 0)
+            free_wildcards = max(MAX_WILDCARDS_IN_PROGRESS - usage['wildcards'], 0)
+            batch = files[:free_files] + wildcards[:free_wildcards]
+            result['deferred'] = files[free_files:] + wildcards[free_wildcards:]
+            if batch:
+                result['invalidation'] = create_invalidation(cf, distribution_id, batch)
+                result['paths'] = batch
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            result['error'] = str(e)
+            if code in ('TooManyInvalidationsInProgress', 'Throttling'):
+                result['deferred'] = paths
+        except Exception as e:
+            result['error'] = str(e)
+
+        with self._lock:
+            if result['deferred']:
+                self._pending.setdefault(key, set()).update(result['deferred'])
+                if key not in self._timers:
+                    self._schedule(key, self.retry_delay)
+            self._history.setdefault(key, deque(maxlen=HISTORY_SIZE)).appendleft(result)
+        return result
+
+    def status(self, scope: Hashable, distribution_id: str) -> Dict[str, Any]:
+        key = (scope, distribution_id)
+        with self._lock:
+            pending = sorted(self._pending.get(key, ()))
+            return {
+                'distribution_id': distribution_id,
+                'pending': pending,
+                'coalesced': coalesce_paths(pending, self.threshold) if pending else [],
+                'scheduled': key in self._timers,
+                'history': list(self._history.get(key, ())),
+            }
+
+
+_queue = InvalidationQueue()
+
+
+def get_queue() -> InvalidationQueue:
+    return _queue
@@ -0,0 +1,208 @@
+"""
+Informe de credenciales de IAM
+Un único CSV para toda la cuenta (generate_credential_report / get_credential_report)
+en lugar de list_access_keys por usuario. Se parsea fila a fila y el resultado se
+reutiliza mientras AWS devuelva el mismo GeneratedTime.
+"""
+import csv
+import io
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional
+
+from app.utils.cache import TTLCache
+
+# AWS solo regenera el informe si tiene más de 4 horas: no merece la pena
+# preguntar por uno nuevo más a menudo que esto
+CHECK_INTERVAL = 300.0
+REPORT_TTL = 4 * 3600.0
+GENERATE_WAIT = 30.0
+GENERATE_POLL = 1.0
+
+KEY_AGE_WARNING = 90
+INACTIVE_WARNING = 90
+ROOT_USER = '<root_account>'
+SORT_KEYS = ('user', 'key_age', 'last_used', 'inactive', 'mfa', 'password_last_used')
+
+_cache = TTLCache(ttl=REPORT_TTL, max_entries=32)
+
+
+class ReportNotReady(Exception):
+    """El informe sigue generándose tras GENERATE_WAIT segundos"""
+
+
+def _timestamp(value: str) -> Optional[datetime]:
+    if not value or value in ('N/A', 'no_information', 'not_supported'):
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _flag(value: str) -> bool:
+    return value == 'true'
+
+
+def _days(moment: Optional[datetime], now: datetime) -> Optional[int]:
+    return (now - moment).days if moment else None
+
+
+def _key(row: Dict[str, str], slot: int, now: datetime) -> Optional[Dict[str, Any]]:
+    prefix = f'access_key_{slot}_'
+    rotated = _timestamp(row.get(prefix + 'last_rotated', ''))
+    active = _flag(row.get(prefix + 'active', ''))
+    if not active and rotated is None:
+        return None
+    last_used = _timestamp(row.get(prefix + 'last_used_date', ''))
+    return {
+        'slot': slot,
+        'active': active,
+        'last_rotated': rotated,
+        'age_days': _days(rotated, now),
+        'last_used': last_used,
+        'last_used_days': _days(last_used, now),
+        'service': row.get(prefix + 'last_used_service') if last_used else None,
+        'region': row.get(prefix + 'last_used_region') if last_used else None,
+    }
+
+
+def parse_row(row: Dict[str, str], now: datetime) -> Dict[str, Any]:
+    """Fila del CSV a un dict con fechas, antigüedades en días y hallazgos"""
+    keys = [key for key in (_key(row, 1, now), _key(row, 2, now)) if key]
+    active_keys = [key for key in keys if key['active']]
+    password_enabled = _flag(row.get('password_enabled', ''))
+    password_last_used = _timestamp(row.get('password_last_used', ''))
+    activity = [moment for moment in [password_last_used] + [key['last_used'] for key in keys] if moment]
+    created = _timestamp(row.get('user_creation_time', ''))
+    last_activity = max(activity) if activity else None
+    entry = {
+        'user': row.get('user'),
+        'arn': row.get('arn'),
+        'root': row.get('user') == ROOT_USER,
+        'created': created,
+        'mfa': _flag(row.get('mfa_active', '')),
+        'password_enabled': password_enabled,
+        'password_last_used': password_last_used,
+        'password_last_changed': _timestamp(row.get('password_last_changed', '')),
+        'keys': keys,
+        'active_keys': len(active_keys),
+        'key_age': max((key['age_days'] for key in active_keys if key['age_days'] is not None), default=None),
+        'last_used': last_activity,
+        # Días sin actividad: desde la última vez que se usó algo, o desde la creación
+        'inactive': _days(last_activity or created, now),
+    }
+    entry['findings'] = findings(entry)
+    return entry
+
+
+def findings(entry: Dict[str, Any]) -> List[str]:
+    found = []
+    if entry['root'] and entry['active_keys']:
+        found.append('root_access_key')
+    if not entry['mfa'] and (entry['password_enabled'] or entry['root']):
+        found.append('console_without_mfa')
+    if entry['key_age'] is not None and entry['key_age'] > KEY_AGE_WARNING:
+        found.append('key_not_rotated')
+    if any(key['active'] and key['last_used'] is None for key in entry['keys']):
+        found.append('key_never_used')
+    if entry['inactive'] is not None and entry['inactive'] > INACTIVE_WARNING:
+        found.append('inactive')
+    if entry['active_keys'] > 1:
+        found.append('two_active_keys')
+    return found
+
+
+def iter_rows(content: bytes, now: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """Recorre el CSV línea a línea sin partirlo entero en memoria"""
+    now = now or datetime.now(timezone.utc)
+    stream = io.TextIOWrapper(io.BytesIO(content), encoding='utf-8', newline='')
+    for row in csv.DictReader(stream):
+        yield parse_row(row, now)
+
+
+def fetch(iam, wait: float = GENERATE_WAIT) -> Dict[str, Any]:
+    """Pide (o reutiliza) el informe y lo descarga cuando está COMPLETE"""
+    deadline = time.monotonic() + wait
+    while iam.generate_credential_report()['State'] != 'COMPLETE':
+        if time.monotonic() >= deadline:
+            raise ReportNotReady('El informe de credenciales se está generando; inténtalo en unos segundos')
+        time.sleep(GENERATE_POLL)
+    return iam.get_credential_report()
+
+
+def get_report(iam, scope: Hashable, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Informe parseado. Como mucho se consulta a AWS cada CHECK_INTERVAL segundos y solo
+    se vuelve a parsear si el GeneratedTime del informe ha cambiado.
+    """
+    current = _cache.get((scope, 'report'))
+    if current is not None and not refresh and _cache.get((scope, 'checked')):
+        return current
+    response = fetch(iam)
+    generated = response['GeneratedTime']
+    if current is None or current['generated_time'] != generated:
+        started = time.monotonic()
+        rows = list(iter_rows(response['Content']))
+        current = {
+            'generated_time': generated,
+            'rows': rows,
+            'parse_seconds': round(time.monotonic() - started, 3),
+        }
+        _cache.set((scope, 'report'), current)
+    _cache.set((scope, 'checked'), True, ttl=CHECK_INTERVAL)
+    return current
+
+
+def filter_rows(rows: Iterable[Dict[str, Any]], mfa: Optional[bool] = None, min_key_age: Optional[int] = None,
+                min_inactive: Optional[int] = None, finding: Optional[str] = None,
+                with_keys: bool = False, search: Optional[str] = None) -> List[Dict[str, Any]]:
+    def _keep(row):
+        if mfa is not None and row['mfa'] != mfa:
+            return False
+        if min_key_age is not None and (row['key_age'] is None or row['key_age'] < min_key_age):
+            return False
+        if min_inactive is not None and (row['inactive'] is None or row['inactive'] < min_inactive):
+            return False
+        if finding and finding not in row['findings']:
+            return False
+        if with_keys and not row['active_keys']:
+            return False
+        return not search or search.lower() in row['user'].lower()
+    return [row for row in rows if _keep(row)]
+
+
+def _sort_value(field: str) -> Callable[[Dict[str, Any]], Any]:
+    if field == 'user':
+        return lambda row: row['user'].lower()
+    if field == 'mfa':
+        return lambda row: row['mfa']
+    return lambda row: row[field]
+
+
+def sort_rows(rows: List[Dict[str, Any]], field: str = 'key_age', descending: bool = True) -> List[Dict[str, Any]]:
+    """Ordena por field dejando siempre al final las filas sin valor"""
+    if field not in SORT_KEYS:
+        raise ValueError(f'Campo de ordenación no soportado: {field}')
+    value = _sort_value(field)
+    present = [row for row in rows if value(row) is not None]
+    missing = [row for row in rows if value(row) is None]
+    return sorted(present, key=value, reverse=descending) + missing
+
+
+def summary(rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    counts = {'users': len(rows), 'active_keys': sum(row['active_keys'] for row in rows)}
+    for row in rows:
+        for finding in row['findings']:
+            counts[finding] = counts.get(finding, 0) + 1
+    return counts
+
+
+def to_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Fila serializable (fechas en ISO 8601)"""
+    def _value(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+    data = {name: _value(value) for name, value in row.items() if name != 'keys'}
+    data['keys'] = [{name: _value(value) for name, value in key.items()} for key in row['keys']]
+    return data
+
+
+def invalidate(scope: Hashable):
+    _cache.invalidate_prefix(scope)
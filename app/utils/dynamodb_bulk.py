@@ -0,0 +1,358 @@
+"""
+E/S masiva para DynamoDB
+BatchWriteItem/BatchGetItem troceados a los límites del servicio, con reintento
+de UnprocessedItems/UnprocessedKeys e importación/exportación CSV y JSONL
+"""
+import base64
+import csv
+import io
+import json
+import logging
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from boto3.dynamodb.types import TypeSerializer
+
+from app.utils.batching import chunked, backoff_delay, run_bounded
+from app.utils.dynamodb_scan import item_to_json
+
+logger = logging.getLogger(__name__)
+
+# Límites de las APIs batch de DynamoDB
+BATCH_WRITE_LIMIT = 25
+BATCH_GET_LIMIT = 100
+DEFAULT_MAX_RETRIES = 8
+DEFAULT_WORKERS = 4
+
+ATTRIBUTE_TYPES = ('S', 'N', 'B', 'BOOL', 'NULL', 'SS', 'NS', 'BS', 'L', 'M')
+
+_serializer = TypeSerializer()
+
+
+class BulkResult:
+    """Resultado agregado de una operación masiva (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.processed = 0
+        self.batches = 0
+        self.retries = 0
+        self.capacity_units = 0.0
+        self.unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        self.errors: List[str] = []
+
+    def add_batch(self, processed: int, retries: int, capacity_units: float):
+        with self._lock:
+            self.processed += processed
+            self.batches += 1
+            self.retries += retries
+            self.capacity_units += capacity_units
+
+    def add_unprocessed(self, table_name: str, entries: List[Dict[str, Any]]):
+        with self._lock:
+            self.unprocessed.setdefault(table_name, []).extend(entries)
+
+    def add_error(self, message: str):
+        with self._lock:
+            self.errors.append(message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'processed': self.processed,
+                'unprocessed_count': sum(len(v) for v in self.unprocessed.values()),
+                'batches': self.batches,
+                'retries': self.retries,
+                'capacity_units': round(self.capacity_units, 2),
+                'seconds': round(elapsed, 3),
+                'items_per_second': round(self.processed / elapsed, 1) if elapsed else 0.0,
+                'errors': list(self.errors)
+            }
+
+
+def _capacity(response: Dict[str, Any]) -> float:
+    return sum(c.get('CapacityUnits', 0.0) for c in response.get('ConsumedCapacity') or [])
+
+
+def _group(pairs: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for table_name, entry in pairs:
+        grouped.setdefault(table_name, []).append(entry)
+    return grouped
+
+
+def _dedupe(chunk: List[Tuple[str, Dict[str, Any]]],
+            key_names: Dict[str, List[str]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """BatchWriteItem rechaza claves duplicadas en un mismo lote: gana la última escritura"""
+    unique: Dict[Any, Tuple[str, Dict[str, Any]]] = {}
+    for table_name, entry in chunk:
+        names = key_names.get(table_name)
+        request = entry.get('PutRequest', {}).get('Item') or entry.get('DeleteRequest', {}).get('Key')
+        if not names or request is None:
+            unique[id(entry)] = (table_name, entry)
+            continue
+        key = (table_name,) + tuple(json.dumps(request.get(n), sort_keys=True, default=str) for n in names)
+        unique.pop(key, None)
+        unique[key] = (table_name, entry)
+    return list(unique.values())
+
+
+def batch_write(client, request_items: Dict[str, Iterable[Dict[str, Any]]],
+                max_workers: int = DEFAULT_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES,
+                result: Optional[BulkResult] = None,
+                key_names: Optional[Dict[str, List[str]]] = None) -> BulkResult:
+    """
+    Escribe RequestItems de cualquier tamaño ({tabla: [PutRequest|DeleteRequest...]})
+    en lotes de 25, reintentando UnprocessedItems con backoff exponencial y jitter.
+    Las peticiones que siguen sin procesar tras max_retries quedan en result.unprocessed.
+    Con key_names ({tabla: [atributos clave]}) se eliminan claves duplicadas dentro de cada lote.
+    """
+    result = result or BulkResult()
+    pairs = ((table, entry) for table, entries in request_items.items() for entry in entries)
+
+    def _write(chunk: List[Tuple[str, Dict[str, Any]]]):
+        if key_names:
+            chunk = _dedupe(chunk, key_names)
+        pending = _group(chunk)
+        total = len(chunk)
+        attempt = 0
+        capacity = 0.0
+        while pending:
+            try:
+                response = client.batch_write_item(RequestItems=pending,
+                                                   ReturnConsumedCapacity='TOTAL')
+            except Exception as e:
+                if attempt >= max_retries or not _is_throttle(e):
+                    result.add_error(str(e))
+                    for table_name, entries in pending.items():
+                        result.add_unprocessed(table_name, entries)
+                    break
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            capacity += _capacity(response)
+            pending = response.get('UnprocessedItems') or {}
+            if pending and attempt >= max_retries:
+                for table_name, entries in pending.items():
+                    result.add_unprocessed(table_name, entries)
+                break
+            if pending:
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+        left = sum(len(v) for v in pending.values()) if pending else 0
+        result.add_batch(total - left, attempt, capacity)
+
+    run_bounded(chunked(pairs, BATCH_WRITE_LIMIT), _write, max_workers, 'dynamodb-bulk')
+    return result
+
+
+def batch_get(client, request_items: Dict[str, Dict[str, Any]],
+              max_workers: int = DEFAULT_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES
+              ) -> Tuple[Dict[str, List[Dict[str, Any]]], BulkResult]:
+    """
+    Lee RequestItems de cualquier tamaño ({tabla: {'Keys': [...], ...}}) en lotes de 100
+    claves, reintentando UnprocessedKeys. Devuelve (Responses agregadas, resultado).
+    """
+    result = BulkResult()
+    responses: Dict[str, List[Dict[str, Any]]] = {}
+    responses_lock = threading.Lock()
+
+    # Parámetros por tabla (ProjectionExpression, ConsistentRead...) que acompañan a cada lote
+    table_options = {table: {k: v for k, v in spec.items() if k != 'Keys'}
+                     for table, spec in request_items.items()}
+    pairs = ((table, key) for table, spec in request_items.items() for key in spec.get('Keys', []))
+
+    def _get(chunk: List[Tuple[str, Dict[str, Any]]]):
+        pending = {table: dict(table_options[table], Keys=keys)
+                   for table, keys in _group(chunk).items()}
+        total = len(chunk)
+        attempt = 0
+        capacity = 0.0
+        while pending:
+            try:
+                response = client.batch_get_item(RequestItems=pending,
+                                                 ReturnConsumedCapacity='TOTAL')
+            except Exception as e:
+                if attempt >= max_retries or not _is_throttle(e):
+                    result.add_error(str(e))
+                    for table_name, spec in pending.items():
+                        result.add_unprocessed(table_name, spec['Keys'])
+                    break
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            capacity += _capacity(response)
+            with responses_lock:
+                for table_name, items in response.get('Responses', {}).items():
+                    responses.setdefault(table_name, []).extend(items)
+            pending = response.get('UnprocessedKeys') or {}
+            if pending and attempt >= max_retries:
+                for table_name, spec in pending.items():
+                    result.add_unprocessed(table_name, spec.get('Keys', []))
+                break
+            if pending:
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+        left = sum(len(spec.get('Keys', [])) for spec in pending.values()) if pending else 0
+        result.add_batch(total - left, attempt, capacity)
+
+    run_bounded(chunked(pairs, BATCH_GET_LIMIT), _get, max_workers, 'dynamodb-bulk')
+    return responses, result
+
+
+def _is_throttle(error: Exception) -> bool:
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code', '')
+    return code in ('ProvisionedThroughputExceededException', 'ThrottlingException',
+                    'RequestLimitExceeded', 'InternalServerError')
+
+
+def put_items(client, table_name: str, items: Iterable[Dict[str, Any]], **kwargs) -> BulkResult:
+    """Atajo para escribir un iterable de items (formato AttributeValue) en una tabla"""
+    return batch_write(client, {table_name: ({'PutRequest': {'Item': item}} for item in items)}, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Importación / exportación
+# ---------------------------------------------------------------------------
+
+def _is_attribute_value(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and next(iter(value)) in ATTRIBUTE_TYPES
+
+
+def to_attribute_item(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normaliza un registro JSON a formato AttributeValue.
+    Acepta JSON de DynamoDB ({"pk": {"S": "a"}}), el formato de exportación
+    de DynamoDB ({"Item": {...}}) o JSON plano ({"pk": "a", "n": 1}).
+    """
+    if set(record) == {'Item'} and isinstance(record['Item'], dict):
+        record = record['Item']
+    if record and all(_is_attribute_value(v) for v in record.values()):
+        return record
+    # JSON plano: float no está soportado por TypeSerializer, se pasa por el tipo N
+    return {k: _serializer.serialize(_plain_number(v)) for k, v in record.items()}
+
+
+def _plain_number(value: Any) -> Any:
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, list):
+        return [_plain_number(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain_number(v) for k, v in value.items()}
+    return value
+
+
+def read_jsonl(stream: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Lee items desde líneas JSON (una por item)"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Línea {line_number}: JSON inválido ({str(e)})')
+        if '_stats' in record and len(record) == 1:
+            # Línea de estadísticas que añade la exportación NDJSON
+            continue
+        yield to_attribute_item(record)
+
+
+def _split_header(column: str) -> Tuple[str, str]:
+    """'precio:N' -> ('precio', 'N'); sin sufijo el tipo es S"""
+    name, sep, attr_type = column.rpartition(':')
+    if sep and attr_type in ATTRIBUTE_TYPES:
+        return name, attr_type
+    return column, 'S'
+
+
+def _csv_value(attr_type: str, raw: str) -> Dict[str, Any]:
+    if attr_type in ('S', 'N'):
+        return {attr_type: raw}
+    if attr_type == 'B':
+        return {'B': base64.b64decode(raw)}
+    if attr_type == 'BOOL':
+        return {'BOOL': raw.strip().lower() in ('true', '1', 'yes', 'si', 'sí')}
+    if attr_type == 'NULL':
+        return {'NULL': True}
+    value = json.loads(raw)
+    if attr_type == 'BS':
+        value = [base64.b64decode(v) for v in value]
+    return {attr_type: value}
+
+
+def read_csv(stream: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Lee items desde CSV. La cabecera puede indicar el tipo con sufijo (id:S, precio:N,
+    tags:SS); las columnas sin sufijo son String y las celdas vacías se omiten.
+    """
+    reader = csv.reader(stream)
+    try:
+        header = [_split_header(col) for col in next(reader)]
+    except StopIteration:
+        return
+    for row_number, row in enumerate(reader, start=2):
+        item = {}
+        for (name, attr_type), raw in zip(header, row):
+            if raw == '':
+                continue
+            try:
+                item[name] = _csv_value(attr_type, raw)
+            except (ValueError, TypeError) as e:
+                raise ValueError(f'Fila {row_number}, columna {name}: {str(e)}')
+        if item:
+            yield item
+
+
+def read_import_file(file_storage, file_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Lee items desde un fichero subido (werkzeug FileStorage) en CSV o JSONL"""
+    filename = (file_storage.filename or '').lower()
+    file_format = file_format or ('csv' if filename.endswith('.csv') else 'jsonl')
+    text = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        return read_csv(text)
+    return read_jsonl(text)
+
+
+def csv_stream(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    Exporta items a CSV con cabecera tipada (compatible con read_csv).
+    Las columnas se calculan sobre todos los items, por lo que se mantienen en memoria;
+    para tablas grandes es preferible la exportación NDJSON.
+    """
+    rows = list(items)
+    columns: Dict[Tuple[str, str], None] = {}
+    for item in rows:
+        for name, value in item.items():
+            columns[(name, next(iter(value)))] = None
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([f'{name}:{attr_type}' for name, attr_type in columns])
+    yield buffer.getvalue()
+
+    for item in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        row = []
+        for name, attr_type in columns:
+            value = item.get(name)
+            if not value or attr_type not in value:
+                row.append('')
+            elif attr_type in ('S', 'N'):
+                row.append(value[attr_type])
+            elif attr_type == 'BOOL':
+                row.append('true' if value['BOOL'] else 'false')
+            elif attr_type == 'NULL':
+                row.append('null')
+            elif attr_type == 'B':
+                row.append(base64.b64encode(value['B']).decode('ascii'))
+            else:
+                row.append(item_to_json(value[attr_type]))
+        writer.writerow(row)
+        yield buffer.getvalue()
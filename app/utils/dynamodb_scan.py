@@ -0,0 +1,268 @@
+"""
+Motor de scan/query para DynamoDB
+Paginación por LastEvaluatedKey, scans paralelos por segmentos y exportación NDJSON
+"""
+import base64
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+# Límites prácticos del motor
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_SEGMENTS = 64
+# Llamadas máximas para completar una página cuando el filtro descarta items
+MAX_CALLS_PER_PAGE = 10
+
+
+def encode_cursor(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Convierte un LastEvaluatedKey en un cursor opaco apto para URLs"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Convierte un cursor generado por encode_cursor en un ExclusiveStartKey"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f'Cursor de paginación inválido: {str(e)}')
+    if not isinstance(key, dict):
+        raise ValueError('Cursor de paginación inválido')
+    return _restore_binary(key)
+
+
+def _json_default(value):
+    """Serializa los tipos binarios que devuelve el cliente de bajo nivel"""
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    if isinstance(value, set):
+        return list(value)
+    raise TypeError(f'Tipo no serializable: {type(value).__name__}')
+
+
+def _restore_binary(key: Dict[str, Any]) -> Dict[str, Any]:
+    """Vuelve a convertir a bytes los atributos B de una clave decodificada"""
+    restored = {}
+    for name, attr in key.items():
+        if isinstance(attr, dict) and isinstance(attr.get('B'), str):
+            restored[name] = {'B': base64.b64decode(attr['B'])}
+        else:
+            restored[name] = attr
+    return restored
+
+
+def item_to_json(item: Dict[str, Any]) -> str:
+    """Serializa un item de DynamoDB (formato AttributeValue) en una línea JSON"""
+    return json.dumps(item, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+
+class ScanStats:
+    """Acumula capacidad consumida y contadores de un scan/query (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.capacity_units = 0.0
+        self.count = 0
+        self.scanned_count = 0
+        self.pages = 0
+        self.segments: Dict[int, Dict[str, Any]] = {}
+
+    def add_page(self, response: Dict[str, Any], segment: Optional[int] = None):
+        """Registra una página de respuesta de scan/query"""
+        capacity = (response.get('ConsumedCapacity') or {}).get('CapacityUnits', 0.0)
+        with self._lock:
+            self.capacity_units += capacity
+            self.count += response.get('Count', 0)
+            self.scanned_count += response.get('ScannedCount', 0)
+            self.pages += 1
+            if segment is not None:
+                seg = self.segments.setdefault(segment, {
+                    'segment': segment, 'pages': 0, 'count': 0,
+                    'scanned_count': 0, 'capacity_units': 0.0, 'seconds': 0.0
+                })
+                seg['pages'] += 1
+                seg['count'] += response.get('Count', 0)
+                seg['scanned_count'] += response.get('ScannedCount', 0)
+                seg['capacity_units'] += capacity
+                seg['seconds'] = round(time.monotonic() - self.started, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'count': self.count,
+                'scanned_count': self.scanned_count,
+                'pages': self.pages,
+                'capacity_units': round(self.capacity_units, 2),
+                'seconds': round(elapsed, 3),
+                'capacity_units_per_second': round(self.capacity_units / elapsed, 2) if elapsed else 0.0,
+                'segments': [self.segments[k] for k in sorted(self.segments)]
+            }
+
+
+def _operation(client, operation: str):
+    if operation not in ('scan', 'query'):
+        raise ValueError(f'Operación no soportada: {operation}')
+    return getattr(client, operation)
+
+
+def fetch_page(client, operation: str, params: Dict[str, Any], page_size: int = DEFAULT_PAGE_SIZE,
+               cursor: Optional[str] = None, stats: Optional[ScanStats] = None) -> Dict[str, Any]:
+    """
+    Obtiene una página de hasta page_size items a partir de un cursor.
+    Si el FilterExpression descarta items, encadena llamadas (con Limit decreciente)
+    para completar la página sin sobrepasar el LastEvaluatedKey devuelto.
+    """
+    call = _operation(client, operation)
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    stats = stats or ScanStats()
+
+    request = dict(params)
+    request['ReturnConsumedCapacity'] = 'TOTAL'
+    start_key = decode_cursor(cursor)
+
+    items: List[Dict[str, Any]] = []
+    last_key = None
+    for _ in range(MAX_CALLS_PER_PAGE):
+        request['Limit'] = page_size - len(items)
+        if start_key:
+            request['ExclusiveStartKey'] = start_key
+        response = call(**request)
+        stats.add_page(response)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key or len(items) >= page_size:
+            break
+        start_key = last_key
+
+    return {
+        'items': items,
+        'count': len(items),
+        'next_cursor': encode_cursor(last_key),
+        'stats': stats.to_dict()
+    }
+
+
+def iter_items(client, operation: str, params: Dict[str, Any],
+               stats: Optional[ScanStats] = None, segment: Optional[int] = None,
+               stop_event: Optional[threading.Event] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Recorre todas las páginas de un scan/query y produce los items de cada una"""
+    call = _operation(client, operation)
+    request = dict(params)
+    request['ReturnConsumedCapacity'] = 'TOTAL'
+    if segment is not None:
+        request['Segment'] = segment
+
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            return
+        response = call(**request)
+        if stats is not None:
+            stats.add_page(response, segment)
+        yield response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        request['ExclusiveStartKey'] = last_key
+
+
+_DONE = object()
+
+
+def parallel_scan(client, params: Dict[str, Any], total_segments: int = 4,
+                  max_workers: Optional[int] = None, stats: Optional[ScanStats] = None,
+                  buffer_pages: int = 8) -> Iterator[Dict[str, Any]]:
+    """
+    Scan paralelo por segmentos (Segment/TotalSegments) sobre un pool de hilos.
+    Los items se entregan en cuanto llegan; la cola acotada aplica backpressure
+    sobre los workers si el consumidor (p. ej. una respuesta HTTP) es más lento.
+    El cliente boto3 se comparte entre hilos: debe tener max_pool_connections >= max_workers.
+    """
+    total_segments = max(1, min(int(total_segments), MAX_SEGMENTS))
+    max_workers = max(1, min(int(max_workers or total_segments), total_segments))
+    stats = stats if stats is not None else ScanStats()
+
+    request = dict(params)
+    request.pop('ExclusiveStartKey', None)
+    request['TotalSegments'] = total_segments
+
+    pages: queue.Queue = queue.Queue(maxsize=max(1, buffer_pages))
+    stop_event = threading.Event()
+    errors: List[BaseException] = []
+
+    def _put(value):
+        while not stop_event.is_set():
+            try:
+                pages.put(value, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _scan_segment(segment: int):
+        try:
+            for page in iter_items(client, 'scan', request, stats, segment, stop_event):
+                if page:
+                    _put(page)
+        except Exception as e:
+            if not stop_event.is_set():
+                logger.error(f'Error en segmento {segment} de {params.get("TableName")}: {str(e)}')
+                errors.append(e)
+                stop_event.set()
+        finally:
+            _put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dynamodb-scan')
+    try:
+        for segment in range(total_segments):
+            executor.submit(_scan_segment, segment)
+
+        finished = 0
+        while finished < total_segments:
+            if errors:
+                raise errors[0]
+            try:
+                page = pages.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if page is _DONE:
+                finished += 1
+                continue
+            for item in page:
+                yield item
+        if errors:
+            raise errors[0]
+    finally:
+        # Si el consumidor abandona (cliente HTTP desconectado) se detienen los workers
+        stop_event.set()
+        executor.shutdown(wait=False)
+
+
+def ndjson_stream(items: Iterator[Dict[str, Any]], stats: Optional[ScanStats] = None) -> Iterator[str]:
+    """
+    Convierte un iterador de items en líneas NDJSON; opcionalmente cierra con las estadísticas.
+    Un error de AWS durante el scan (la respuesta ya está en curso) se informa como última línea.
+    """
+    try:
+        for item in items:
+            yield item_to_json(item) + '\n'
+    except (ClientError, BotoCoreError) as e:
+        logger.error(f'Exportación NDJSON interrumpida: {str(e)}')
+        yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+        return
+    if stats is not None:
+        yield json.dumps({'_stats': stats.to_dict()}) + '\n'
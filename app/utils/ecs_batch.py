@@ -0,0 +1,141 @@
+"""
+Lecturas de ECS con paginación completa y describe_* en lotes máximos
+Compartido por el blueprint de ECS y las herramientas MCP
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.utils.batching import chunked
+from app.utils.cache import TTLCache
+from app.utils.fanout import fan_out, DEFAULT_MAX_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Límites de las APIs describe_* de ECS
+DESCRIBE_CLUSTERS_LIMIT = 100
+DESCRIBE_SERVICES_LIMIT = 10
+DESCRIBE_TASKS_LIMIT = 100
+
+ECS_CACHE_TTL = 15.0
+
+_cache = TTLCache(ttl=ECS_CACHE_TTL)
+
+
+def cluster_key(cluster: str) -> str:
+    """Nombre del cluster a partir de nombre o ARN (arn:aws:ecs:region:cuenta:cluster/nombre)"""
+    return cluster.split(':cluster/', 1)[1] if ':cluster/' in cluster else cluster
+
+
+def list_all(ecs, operation: str, result_key: str, **kwargs) -> List[str]:
+    """Recorre todas las páginas de una operación list_* de ECS"""
+    arns: List[str] = []
+    for page in ecs.get_paginator(operation).paginate(**kwargs):
+        arns.extend(page.get(result_key, []))
+    return arns
+
+
+def _list_and_describe(ecs, list_operation: str, list_key: str, list_kwargs: Dict[str, Any],
+                       describe, batch_size: int, max_workers: int) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Lista ARNs página a página y lanza describe_* sobre cada lote en cuanto está
+    disponible, solapando la paginación con las descripciones.
+    Devuelve (recursos en el orden del listado, errores de lotes fallidos).
+    """
+    futures = []
+    pending: List[str] = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ecs-describe') as executor:
+        for page in ecs.get_paginator(list_operation).paginate(**list_kwargs):
+            pending.extend(page.get(list_key, []))
+            while len(pending) >= batch_size:
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                futures.append(executor.submit(describe, batch))
+        for batch in chunked(pending, batch_size):
+            futures.append(executor.submit(describe, batch))
+
+    resources: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for future in futures:
+        try:
+            response = future.result()
+        except Exception as e:
+            logger.warning(f'ECS: fallo describiendo un lote: {str(e)}')
+            errors.append(str(e))
+            continue
+        resources.extend(response.get('items', []))
+        errors.extend(f'{f.get("arn")}: {f.get("reason")}' for f in response.get('failures', []))
+    return resources, errors
+
+
+def describe_clusters(ecs, cluster_arns: Optional[List[str]] = None,
+                      scope: Optional[Hashable] = None, refresh: bool = False) -> Dict[str, Any]:
+    """Todos los clusters (o los indicados) descritos en lotes de 100"""
+    def _load():
+        arns = cluster_arns if cluster_arns is not None else list_all(ecs, 'list_clusters', 'clusterArns')
+        clusters, errors = [], []
+        for batch in chunked(arns, DESCRIBE_CLUSTERS_LIMIT):
+            response = ecs.describe_clusters(clusters=batch)
+            clusters.extend(response.get('clusters', []))
+            errors.extend(f'{f.get("arn")}: {f.get("reason")}' for f in response.get('failures', []))
+        return {'clusters': clusters, 'errors': errors}
+
+    if scope is None or cluster_arns is not None:
+        return _load()
+    return _cache.get_or_load((scope, 'clusters'), _load, refresh=refresh)
+
+
+def cluster_services(ecs, cluster: str, scope: Optional[Hashable] = None, refresh: bool = False,
+                     max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, Any]:
+    """Servicios de un cluster: list_services paginado + describe_services de 10 en 10 en paralelo"""
+    def _describe(batch):
+        response = ecs.describe_services(cluster=cluster, services=batch)
+        return {'items': response.get('services', []), 'failures': response.get('failures', [])}
+
+    def _load():
+        services, errors = _list_and_describe(ecs, 'list_services', 'serviceArns', {'cluster': cluster},
+                                              _describe, DESCRIBE_SERVICES_LIMIT, max_workers)
+        return {'services': services, 'errors': errors}
+
+    if scope is None:
+        return _load()
+    return _cache.get_or_load((scope, cluster_key(cluster), 'services'), _load, refresh=refresh)
+
+
+def cluster_tasks(ecs, cluster: str, scope: Optional[Hashable] = None, refresh: bool = False,
+                  max_workers: int = DEFAULT_MAX_WORKERS, **list_kwargs) -> Dict[str, Any]:
+    """Tareas de un cluster: list_tasks paginado + describe_tasks de 100 en 100 en paralelo"""
+    def _describe(batch):
+        response = ecs.describe_tasks(cluster=cluster, tasks=batch)
+        return {'items': response.get('tasks', []), 'failures': response.get('failures', [])}
+
+    def _load():
+        tasks, errors = _list_and_describe(ecs, 'list_tasks', 'taskArns', dict(list_kwargs, cluster=cluster),
+                                           _describe, DESCRIBE_TASKS_LIMIT, max_workers)
+        return {'tasks': tasks, 'errors': errors}
+
+    if scope is None:
+        return _load()
+    cache_key = (scope, cluster_key(cluster), 'tasks', tuple(sorted(list_kwargs.items())))
+    return _cache.get_or_load(cache_key, _load, refresh=refresh)
+
+
+def across_clusters(ecs, loader, clusters: Optional[List[str]] = None,
+                    max_workers: int = DEFAULT_MAX_WORKERS, **kwargs) -> Dict[str, Any]:
+    """
+    Ejecuta cluster_services/cluster_tasks concurrentemente sobre varios clusters.
+    Devuelve {'results': {cluster: resultado}, 'errors': {cluster: error}}.
+    """
+    if clusters is None:
+        clusters = list_all(ecs, 'list_clusters', 'clusterArns')
+    outcome = fan_out(lambda cluster: loader(ecs, cluster, **kwargs), clusters, max_workers=max_workers)
+    return {'results': outcome.results, 'errors': outcome.errors}
+
+
+def invalidate(scope: Hashable, cluster: Optional[str] = None):
+    """Invalida la caché de ECS de un ámbito (tras crear/modificar/eliminar recursos)"""
+    if cluster is None:
+        _cache.invalidate_prefix(scope)
+    else:
+        # Las entradas se guardan por nombre aunque se consulten por ARN (across_clusters)
+        _cache.invalidate_prefix(scope, cluster_key(cluster))
+        _cache.invalidate_prefix(scope, 'clusters')
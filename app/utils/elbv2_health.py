@@ -0,0 +1,218 @@
+"""
+Salud de targets de ELBv2
+Load balancers y target groups paginados, describe_target_health concurrente por
+target group, nombres de instancias EC2 desde un índice cacheado que solo consulta
+los IDs que faltan, y diff entre versiones para el refresco incremental de la vista
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from app.utils.batching import chunked
+from app.utils.cache import TTLCache
+from app.utils.fanout import fan_out
+from app.utils.vpc_topology import paginate, tag_value
+
+STRUCTURE_TTL = 60.0
+HEALTH_TTL = 5.0
+INSTANCE_TTL = 600.0
+HEALTH_WORKERS = 16
+HEALTH_TIMEOUT = 20.0
+# Valores admitidos por el filtro instance-id de describe_instances
+INSTANCE_FILTER_SIZE = 200
+# Versiones anteriores que se conservan para poder responder con un diff
+VERSIONS_KEPT = 16
+
+HEALTH_STATES = ('healthy', 'unhealthy', 'initial', 'draining', 'unused', 'unavailable')
+
+_cache = TTLCache(ttl=STRUCTURE_TTL, max_entries=256)
+_instances = TTLCache(ttl=INSTANCE_TTL, max_entries=50000)
+_versions: Dict[Hashable, 'OrderedDict[str, Dict[str, Dict[str, Any]]]'] = {}
+_versions_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Load balancers y target groups
+# ---------------------------------------------------------------------------
+
+def _load_structure(elbv2) -> Dict[str, Any]:
+    load_balancers = [{
+        'arn': lb['LoadBalancerArn'],
+        'name': lb['LoadBalancerName'],
+        'type': lb.get('Type'),
+        'state': lb.get('State', {}).get('Code'),
+        'dns_name': lb.get('DNSName'),
+    } for lb in paginate(elbv2, 'describe_load_balancers', 'LoadBalancers')]
+    target_groups = [{
+        'arn': tg['TargetGroupArn'],
+        'name': tg['TargetGroupName'],
+        'protocol': tg.get('Protocol'),
+        'port': tg.get('Port'),
+        'target_type': tg.get('TargetType', 'instance'),
+        'vpc_id': tg.get('VpcId'),
+        'health_check_path': tg.get('HealthCheckPath', '/'),
+        'load_balancer_arns': tg.get('LoadBalancerArns', []),
+    } for tg in paginate(elbv2, 'describe_target_groups', 'TargetGroups')]
+    return {'load_balancers': load_balancers, 'target_groups': target_groups}
+
+
+def get_structure(elbv2, scope: Hashable, refresh: bool = False) -> Dict[str, Any]:
+    return _cache.get_or_load((scope, 'structure'), lambda: _load_structure(elbv2), refresh=refresh)
+
+
+def invalidate(scope: Hashable):
+    """Descarta estructura y salud cacheadas tras crear o eliminar LBs o target groups"""
+    _cache.invalidate_prefix(scope)
+
+
+# ---------------------------------------------------------------------------
+# Índice de instancias
+# ---------------------------------------------------------------------------
+
+def instance_names(ec2, scope: Hashable, instance_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Nombre, estado e IP privada de las instancias pedidas. Solo se describen las
+    que no están en la caché, filtrando por instance-id en lugar de listar la cuenta.
+    Las instancias que ya no existen se cachean como None.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    for instance_id in set(instance_ids):
+        cached = _instances.get((scope, instance_id), _MISSING)
+        if cached is _MISSING:
+            missing.append(instance_id)
+        elif cached is not None:
+            found[instance_id] = cached
+    for chunk in chunked(sorted(missing), INSTANCE_FILTER_SIZE):
+        reservations = paginate(ec2, 'describe_instances', 'Reservations',
+                                Filters=[{'Name': 'instance-id', 'Values': chunk}])
+        for reservation in reservations:
+            for instance in reservation.get('Instances', []):
+                info = {
+                    'name': tag_value(instance.get('Tags')),
+                    'state': instance.get('State', {}).get('Name'),
+                    'private_ip': instance.get('PrivateIpAddress'),
+                }
+                found[instance['InstanceId']] = info
+                _instances.set((scope, instance['InstanceId']), info)
+        for instance_id in chunk:
+            if instance_id not in found:
+                _instances.set((scope, instance_id), None)
+    return found
+
+
+def forget_instances(scope: Hashable):
+    _instances.invalidate_prefix(scope)
+
+
+# ---------------------------------------------------------------------------
+# Salud
+# ---------------------------------------------------------------------------
+
+def _target_key(tg_arn: str, target: Dict[str, Any]) -> str:
+    return f'{tg_arn}|{target["Id"]}|{target.get("Port", "")}'
+
+
+def _describe_health(elbv2, tg_arn: str) -> List[Dict[str, Any]]:
+    return elbv2.describe_target_health(TargetGroupArn=tg_arn).get('TargetHealthDescriptions', [])
+
+
+def build_snapshot(factory: Callable, structure: Dict[str, Any],
+                   load_balancer_arn: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Salud de todos los targets (o solo de los target groups de un LB). factory es una
+    fábrica de get_client_factory() con un pool de al menos HEALTH_WORKERS conexiones.
+    """
+    elbv2 = factory('elbv2')
+    lb_names = {lb['arn']: lb['name'] for lb in structure['load_balancers']}
+    groups = [tg for tg in structure['target_groups']
+              if not load_balancer_arn or load_balancer_arn in tg['load_balancer_arns']]
+    health = fan_out(lambda tg: _describe_health(elbv2, tg['arn']), groups,
+                     max_workers=HEALTH_WORKERS, timeout=HEALTH_TIMEOUT, key=lambda tg: tg['arn'])
+
+    instance_ids = [d['Target']['Id'] for tg in groups if tg['target_type'] == 'instance'
+                    for d in health.results.get(tg['arn'], [])]
+    names = instance_names(factory('ec2'), factory.scope, instance_ids) if instance_ids else {}
+
+    rows = []
+    for tg in groups:
+        balancers = [lb_names.get(arn, arn.rsplit('/', 2)[-2]) for arn in tg['load_balancer_arns']]
+        for description in health.results.get(tg['arn'], []):
+            target = description['Target']
+            state = description.get('TargetHealth', {})
+            instance = names.get(target['Id'], {}) if tg['target_type'] == 'instance' else {}
+            rows.append({
+                'key': _target_key(tg['arn'], target),
+                'load_balancers': balancers,
+                'target_group': tg['name'],
+                'target_group_arn': tg['arn'],
+                'target_id': target['Id'],
+                'port': target.get('Port'),
+                'az': target.get('AvailabilityZone'),
+                'instance_name': instance.get('name'),
+                'instance_state': instance.get('state'),
+                'state': state.get('State', 'unavailable'),
+                'reason': state.get('Reason'),
+                'description': state.get('Description'),
+            })
+
+    summary = {s: 0 for s in HEALTH_STATES}
+    for row in rows:
+        summary[row['state']] = summary.get(row['state'], 0) + 1
+    digest = hashlib.sha1()
+    for row in sorted(rows, key=lambda r: r['key']):
+        digest.update(f'{row["key"]}={row["state"]}:{row["reason"]}:{row["instance_name"]};'.encode())
+    return {
+        'version': digest.hexdigest()[:16],
+        'generated_at': time.time(),
+        'load_balancer_arn': load_balancer_arn,
+        'rows': rows,
+        'summary': summary,
+        'target_groups': len(groups),
+        'errors': health.errors,
+        'seconds': round(health.seconds, 3),
+    }
+
+
+def get_snapshot(factory: Callable, scope: Hashable, load_balancer_arn: Optional[str] = None,
+                 refresh: bool = False) -> Dict[str, Any]:
+    """
+    Snapshot cacheado unos segundos para que varias pestañas sondeando compartan
+    las llamadas. Guarda las últimas versiones para calcular diffs.
+    """
+    def _load():
+        structure = get_structure(factory('elbv2'), scope, refresh=refresh)
+        snapshot = build_snapshot(factory, structure, load_balancer_arn)
+        with _versions_lock:
+            versions = _versions.setdefault((scope, load_balancer_arn), OrderedDict())
+            versions[snapshot['version']] = {row['key']: row for row in snapshot['rows']}
+            versions.move_to_end(snapshot['version'])
+            while len(versions) > VERSIONS_KEPT:
+                versions.popitem(last=False)
+        return snapshot
+    return _cache.get_or_load((scope, 'health', load_balancer_arn), _load, refresh=refresh, ttl=HEALTH_TTL)
+
+
+def diff(snapshot: Dict[str, Any], scope: Hashable, since: Optional[str]) -> Dict[str, Any]:
+    """
+    Cambios entre la versión since y el snapshot: filas nuevas o modificadas y claves
+    eliminadas. Si since no se conoce (o es otra versión ya descartada) se devuelven
+    todas las filas con full=True.
+    """
+    response = {'version': snapshot['version'], 'summary': snapshot['summary'],
+                'generated_at': snapshot['generated_at'], 'errors': snapshot['errors']}
+    if since == snapshot['version']:
+        return dict(response, changed=False)
+    with _versions_lock:
+        previous = _versions.get((scope, snapshot['load_balancer_arn']), {}).get(since) if since else None
+    if previous is None:
+        return dict(response, changed=True, full=True, rows=snapshot['rows'], removed=[])
+    current = {row['key']: row for row in snapshot['rows']}
+    changed = [row for key, row in current.items() if previous.get(key) != row]
+    removed = [key for key in previous if key not in current]
+    return dict(response, changed=True, full=False, rows=changed, removed=removed)
+
+
+_MISSING = object()
@@ -0,0 +1,323 @@
+"""
+Motor local de event patterns de EventBridge
+Compila cada patrón una sola vez a funciones de comparación (literales en conjuntos,
+prefijos, sufijos, wildcard, anything-but, numeric, cidr, exists, equals-ignore-case
+y $or) y permite evaluar un evento contra miles de reglas sin llamar a
+test_event_pattern por cada una.
+"""
+import ipaddress
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+NUMERIC_OPERATORS = {
+    '=': lambda a, b: a == b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+_MISSING = object()
+
+
+class PatternError(ValueError):
+    """Patrón de evento no válido"""
+
+
+def _literal_key(value: Any) -> Tuple:
+    """Clave de comparación exacta: distingue tipos y compara números por valor"""
+    if value is None:
+        return ('null',)
+    if isinstance(value, bool):
+        return ('bool', value)
+    if isinstance(value, (int, float)):
+        return ('num', float(value))
+    if isinstance(value, str):
+        return ('str', value)
+    raise PatternError(f'Valor no admitido en un patrón: {value!r}')
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _string_operand(operator: str, operand: Any) -> Tuple[str, bool]:
+    """Operando de prefix/suffix: cadena o {'equals-ignore-case': cadena}"""
+    if isinstance(operand, dict) and set(operand) == {'equals-ignore-case'}:
+        operand, ignore_case = operand['equals-ignore-case'], True
+    else:
+        ignore_case = False
+    if not isinstance(operand, str):
+        raise PatternError(f'"{operator}" necesita una cadena')
+    return (operand.lower() if ignore_case else operand), ignore_case
+
+
+def _wildcard_regex(expression: str):
+    parts, i = [], 0
+    while i < len(expression):
+        char = expression[i]
+        if char == '\\' and i + 1 < len(expression):
+            parts.append(re.escape(expression[i + 1]))
+            i += 2
+            continue
+        parts.append('.*' if char == '*' else re.escape(char))
+        i += 1
+    return re.compile(''.join(parts), re.DOTALL)
+
+
+def _string_predicate(operator: str, operand: Any) -> Callable[[Any], bool]:
+    """Predicado para prefix, suffix, equals-ignore-case y wildcard (solo aplica a cadenas)"""
+    if operator in ('prefix', 'suffix'):
+        text, ignore_case = _string_operand(operator, operand)
+        if operator == 'prefix':
+            if ignore_case:
+                return lambda v: isinstance(v, str) and v.lower().startswith(text)
+            return lambda v: isinstance(v, str) and v.startswith(text)
+        if ignore_case:
+            return lambda v: isinstance(v, str) and v.lower().endswith(text)
+        return lambda v: isinstance(v, str) and v.endswith(text)
+    if operator == 'equals-ignore-case':
+        if not isinstance(operand, str):
+            raise PatternError('"equals-ignore-case" necesita una cadena')
+        folded = operand.lower()
+        return lambda v: isinstance(v, str) and v.lower() == folded
+    if operator == 'wildcard':
+        if not isinstance(operand, str):
+            raise PatternError('"wildcard" necesita una cadena')
+        regex = _wildcard_regex(operand)
+        return lambda v: isinstance(v, str) and regex.fullmatch(v) is not None
+    raise PatternError(f'Operador no soportado: {operator}')
+
+
+def _numeric_predicate(operand: Any) -> Callable[[Any], bool]:
+    if not isinstance(operand, list) or not operand or len(operand) % 2:
+        raise PatternError('"numeric" necesita pares [operador, número, ...]')
+    checks = []
+    for operator, bound in zip(operand[::2], operand[1::2]):
+        if operator not in NUMERIC_OPERATORS or not _is_number(bound):
+            raise PatternError(f'Condición numeric no válida: {operator} {bound!r}')
+        checks.append((NUMERIC_OPERATORS[operator], float(bound)))
+    return lambda v: _is_number(v) and all(op(float(v), bound) for op, bound in checks)
+
+
+def _cidr_predicate(operand: Any) -> Callable[[Any], bool]:
+    try:
+        network = ipaddress.ip_network(operand, strict=False)
+    except (TypeError, ValueError):
+        raise PatternError(f'CIDR no válido: {operand!r}')
+
+    def _match(value):
+        if not isinstance(value, str):
+            return False
+        try:
+            return ipaddress.ip_address(value) in network
+        except ValueError:
+            return False
+    return _match
+
+
+def _anything_but_predicate(operand: Any) -> Callable[[Any], bool]:
+    if isinstance(operand, dict):
+        if len(operand) != 1:
+            raise PatternError('"anything-but" admite un único operador')
+        operator, inner = next(iter(operand.items()))
+        positive = _string_predicate(operator, inner)
+        return lambda v: isinstance(v, str) and not positive(v)
+    values = operand if isinstance(operand, list) else [operand]
+    excluded = frozenset(_literal_key(value) for value in values)
+    return lambda v: _literal_key(v) not in excluded
+
+
+class _Leaf:
+    """Lista de condiciones de un campo: coincide si cualquiera coincide"""
+
+    __slots__ = ('literals', 'predicates', 'exists')
+
+    def __init__(self, rules: List[Any]):
+        if not isinstance(rules, list) or not rules:
+            raise PatternError('Cada campo del patrón debe ser una lista no vacía')
+        literals = set()
+        self.predicates: List[Callable[[Any], bool]] = []
+        self.exists: Optional[bool] = None
+        for rule in rules:
+            if not isinstance(rule, dict):
+                literals.add(_literal_key(rule))
+                continue
+            if len(rule) != 1:
+                raise PatternError(f'Cada condición debe tener un único operador: {rule}')
+            operator, operand = next(iter(rule.items()))
+            if operator == 'exists':
+                if not isinstance(operand, bool):
+                    raise PatternError('"exists" necesita true o false')
+                self.exists = operand
+            elif operator == 'numeric':
+                self.predicates.append(_numeric_predicate(operand))
+            elif operator == 'anything-but':
+                self.predicates.append(_anything_but_predicate(operand))
+            elif operator == 'cidr':
+                self.predicates.append(_cidr_predicate(operand))
+            else:
+                self.predicates.append(_string_predicate(operator, operand))
+        self.literals: FrozenSet[Tuple] = frozenset(literals)
+
+    def matches(self, value: Any) -> bool:
+        if value is _MISSING:
+            return self.exists is False
+        if self.exists is True:
+            return True
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if isinstance(item, (dict, list)):
+                continue
+            if self.literals and _literal_key(item) in self.literals:
+                return True
+            for predicate in self.predicates:
+                if predicate(item):
+                    return True
+        return False
+
+
+def _compile_object(pattern: Dict[str, Any]) -> Callable[[Any], bool]:
+    if not isinstance(pattern, dict) or not pattern:
+        raise PatternError('El patrón debe ser un objeto JSON no vacío')
+    conditions: List[Callable[[Any], bool]] = []
+    for key, value in pattern.items():
+        if key == '$or':
+            if not isinstance(value, list) or len(value) < 2:
+                raise PatternError('"$or" necesita al menos dos patrones')
+            alternatives = [_compile_object(alternative) for alternative in value]
+            conditions.append(lambda event, alts=alternatives: any(alt(event) for alt in alts))
+        elif isinstance(value, dict):
+            nested = _compile_object(value)
+
+            def _nested(event, key=key, nested=nested):
+                field = event.get(key, _MISSING) if isinstance(event, dict) else _MISSING
+                if isinstance(field, list):
+                    return any(nested(item) for item in field if isinstance(item, dict))
+                return nested(field if isinstance(field, dict) else {})
+            conditions.append(_nested)
+        else:
+            leaf = _Leaf(value)
+            conditions.append(lambda event, key=key, leaf=leaf: leaf.matches(
+                event.get(key, _MISSING) if isinstance(event, dict) else _MISSING))
+    return lambda event: all(condition(event) for condition in conditions)
+
+
+class CompiledPattern:
+    """Patrón compilado; index_sources es el conjunto de sources literales si el patrón lo exige"""
+
+    def __init__(self, pattern: Dict[str, Any]):
+        self.pattern = pattern
+        self._match = _compile_object(pattern)
+        self.index_sources: Optional[FrozenSet[str]] = None
+        source = pattern.get('source')
+        if isinstance(source, list) and source and all(isinstance(s, str) for s in source):
+            self.index_sources = frozenset(source)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return self._match(event)
+
+
+@lru_cache(maxsize=4096)
+def compile_pattern_text(text: str) -> CompiledPattern:
+    """Compila un EventPattern en texto; memoizado porque muchas reglas repiten patrón"""
+    try:
+        pattern = json.loads(text)
+    except ValueError as e:
+        raise PatternError(f'El patrón no es JSON válido: {str(e)}')
+    return CompiledPattern(pattern)
+
+
+def compile_pattern(pattern: Union[str, Dict[str, Any]]) -> CompiledPattern:
+    if isinstance(pattern, str):
+        return compile_pattern_text(pattern)
+    return compile_pattern_text(json.dumps(pattern, sort_keys=True))
+
+
+def normalize_event(event: Union[str, Dict[str, Any]], region: Optional[str] = None,
+                    account: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Evento con la forma que ven las reglas (source, detail-type, detail...).
+    Acepta el evento completo o una entrada de put_events (Source, DetailType, Detail).
+    """
+    if isinstance(event, str):
+        event = json.loads(event)
+    if not isinstance(event, dict):
+        raise PatternError('El evento debe ser un objeto JSON')
+    if 'Source' in event or 'DetailType' in event:
+        event = {
+            'source': event.get('Source'),
+            'detail-type': event.get('DetailType'),
+            'detail': event.get('Detail', '{}'),
+            'resources': event.get('Resources', []),
+            'time': event.get('Time')
+        }
+    normalized = dict(event)
+    detail = normalized.get('detail', {})
+    if isinstance(detail, str):
+        try:
+            detail = json.loads(detail) if detail else {}
+        except ValueError:
+            raise PatternError('El campo detail no es JSON válido')
+    normalized['detail'] = detail
+    normalized.setdefault('version', '0')
+    normalized.setdefault('id', str(uuid.uuid4()))
+    normalized.setdefault('resources', [])
+    if not normalized.get('time'):
+        normalized['time'] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    elif isinstance(normalized['time'], datetime):
+        normalized['time'] = normalized['time'].strftime('%Y-%m-%dT%H:%M:%SZ')
+    if region:
+        normalized.setdefault('region', region)
+    if account:
+        normalized.setdefault('account', account)
+    return normalized
+
+
+class RuleIndex:
+    """
+    Reglas compiladas de un event bus. Las que exigen un source literal se indexan por
+    source, de modo que un evento solo se compara con las reglas de su source y con
+    las que no fijan source.
+    """
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        self.by_source: Dict[str, List[Tuple[Dict[str, Any], CompiledPattern]]] = {}
+        self.unindexed: List[Tuple[Dict[str, Any], CompiledPattern]] = []
+        self.errors: Dict[str, str] = {}
+        self.scheduled = 0
+        self.count = 0
+        for rule in rules:
+            text = rule.get('EventPattern')
+            if not text:
+                self.scheduled += 1
+                continue
+            try:
+                compiled = compile_pattern(text)
+            except PatternError as e:
+                self.errors[rule.get('Name', '?')] = str(e)
+                continue
+            self.count += 1
+            if compiled.index_sources:
+                for source in compiled.index_sources:
+                    self.by_source.setdefault(source, []).append((rule, compiled))
+            else:
+                self.unindexed.append((rule, compiled))
+
+    def candidates(self, event: Dict[str, Any]) -> List[Tuple[Dict[str, Any], CompiledPattern]]:
+        source = event.get('source')
+        indexed = self.by_source.get(source, []) if isinstance(source, str) else []
+        return indexed + self.unindexed
+
+    def match(self, event: Dict[str, Any], include_disabled: bool = False) -> List[Dict[str, Any]]:
+        matched = []
+        for rule, compiled in self.candidates(event):
+            if not include_disabled and rule.get('State') not in (None, 'ENABLED', 'ENABLED_WITH_ALL_CLOUDTRAIL_MANAGEMENT_EVENTS'):
+                continue
+            if compiled.matches(event):
+                matched.append(rule)
+        return matched
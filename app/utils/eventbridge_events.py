@@ -0,0 +1,211 @@
+"""
+Envío masivo de eventos a EventBridge y evaluación local de reglas
+put_events en lotes de 10 entradas / 256 KB enviados en paralelo, reintento solo de
+las entradas fallidas por causas transitorias e índice de reglas compiladas (cacheado
+por ámbito y bus) para saber qué reglas dispararía un evento.
+Compartido por el blueprint de EventBridge y las herramientas MCP
+"""
+import io
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.utils.batching import chunked_by_size, run_bounded, backoff_delay
+from app.utils.cache import TTLCache
+from app.utils.event_patterns import RuleIndex
+
+logger = logging.getLogger(__name__)
+
+PUT_EVENTS_LIMIT = 10
+PUT_EVENTS_MAX_BYTES = 256 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 5
+MAX_EVENTS = 100000
+RULE_INDEX_TTL = 60.0
+
+RETRYABLE_CODES = ('ThrottlingException', 'InternalFailure', 'InternalException', 'ServiceUnavailable')
+
+_rule_cache = TTLCache(ttl=RULE_INDEX_TTL, max_entries=256)
+
+
+class PutEventsResult:
+    """Estadísticas agregadas de un envío masivo (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.error_codes: Counter = Counter()
+        self.samples: List[Dict[str, Any]] = []
+
+    def add_batch(self, sent: int, retries: int, failed: List[Dict[str, Any]]):
+        with self._lock:
+            self.batches += 1
+            self.sent += sent
+            self.retries += retries
+            self.failed += len(failed)
+            for failure in failed:
+                self.error_codes[failure['code'] or 'Unknown'] += 1
+                if len(self.samples) < 20:
+                    entry = failure['entry']
+                    self.samples.append({'source': entry.get('Source'), 'detail_type': entry.get('DetailType'),
+                                         'code': failure['code'], 'message': failure['message']})
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'batches': self.batches,
+                'retries': self.retries,
+                'seconds': round(elapsed, 3),
+                'events_per_second': round(self.sent / elapsed, 1) if elapsed else 0.0,
+                'error_codes': dict(self.error_codes),
+                'failure_samples': list(self.samples)
+            }
+
+
+def entry_size(entry: Dict[str, Any]) -> int:
+    """Tamaño de una entrada según el cálculo documentado de PutEvents"""
+    size = 14 if entry.get('Time') is not None else 0
+    for field in ('Source', 'DetailType', 'Detail'):
+        if entry.get(field):
+            size += len(entry[field].encode('utf-8'))
+    for resource in entry.get('Resources') or []:
+        size += len(resource.encode('utf-8'))
+    return size
+
+
+def _send_batch(events, batch: List[Dict[str, Any]], max_retries: int):
+    """
+    Un put_events con reintentos. La respuesta Entries está alineada por posición con
+    la petición: solo se reenvían las entradas con ErrorCode transitorio.
+    Devuelve (enviadas, reintentos, fallidas).
+    """
+    pending = list(batch)
+    sent = retries = 0
+    failed: List[Dict[str, Any]] = []
+    for attempt in range(max_retries + 1):
+        try:
+            response = events.put_events(Entries=pending)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in RETRYABLE_CODES and attempt < max_retries:
+                retries += 1
+                time.sleep(backoff_delay(attempt, base=0.1))
+                continue
+            failed.extend({'entry': entry, 'code': code, 'message': str(e)} for entry in pending)
+            return sent, retries, failed
+        retry = []
+        for entry, outcome in zip(pending, response.get('Entries', [])):
+            code = outcome.get('ErrorCode')
+            if not code:
+                sent += 1
+            elif code in RETRYABLE_CODES and attempt < max_retries:
+                retry.append(entry)
+            else:
+                failed.append({'entry': entry, 'code': code, 'message': outcome.get('ErrorMessage', '')})
+        # Entradas sin respuesta (no debería ocurrir): se reintentan también
+        retry.extend(pending[len(response.get('Entries', [])):])
+        if not retry:
+            break
+        pending = retry
+        if attempt < max_retries:
+            retries += 1
+            time.sleep(backoff_delay(attempt, base=0.1))
+    else:
+        failed.extend({'entry': entry, 'code': 'NoResponse', 'message': 'Entrada sin respuesta tras los reintentos'}
+                      for entry in pending)
+    return sent, retries, failed
+
+
+def put_events(events, entries: Iterable[Dict[str, Any]], max_workers: int = DEFAULT_WORKERS,
+               max_retries: int = DEFAULT_MAX_RETRIES, result: Optional[PutEventsResult] = None) -> PutEventsResult:
+    """
+    Envía entradas de put_events ({'Source', 'DetailType', 'Detail'[, 'EventBusName',
+    'Resources', 'Time']}) en lotes de hasta 10 entradas / 256 KB, con max_workers
+    lotes en paralelo. El cliente se comparte entre hilos.
+    """
+    result = result or PutEventsResult()
+
+    def _worker(batch):
+        sent, retries, failed = _send_batch(events, batch, max_retries)
+        result.add_batch(sent, retries, failed)
+
+    run_bounded(chunked_by_size(entries, PUT_EVENTS_LIMIT, PUT_EVENTS_MAX_BYTES, entry_size),
+                _worker, max_workers, 'eventbridge-put')
+    return result
+
+
+def entry_from_object(obj: Dict[str, Any], event_bus_name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Entrada de put_events a partir de un objeto con source, detail_type y detail
+    (también acepta las claves de la API: Source, DetailType, Detail, o detail-type).
+    detail puede ser un objeto; se serializa a JSON.
+    """
+    source = obj.get('source', obj.get('Source'))
+    detail_type = obj.get('detail_type', obj.get('detail-type', obj.get('DetailType')))
+    detail = obj.get('detail', obj.get('Detail', {}))
+    if not source or not detail_type:
+        raise ValueError('Cada evento necesita source y detail_type')
+    entry = {
+        'Source': source,
+        'DetailType': detail_type,
+        'Detail': detail if isinstance(detail, str) else json.dumps(detail, ensure_ascii=False)
+    }
+    bus = obj.get('event_bus_name', obj.get('EventBusName')) or event_bus_name
+    if bus:
+        entry['EventBusName'] = bus
+    resources = obj.get('resources', obj.get('Resources'))
+    if resources:
+        entry['Resources'] = list(resources)
+    return entry
+
+
+def read_entries(text: str, event_bus_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Entradas de un texto que es un array JSON de eventos o JSONL (un evento por línea)"""
+    stripped = text.strip()
+    if stripped.startswith('['):
+        for obj in json.loads(stripped):
+            yield entry_from_object(obj, event_bus_name)
+        return
+    for number, line in enumerate(io.StringIO(text), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f'Línea {number}: JSON no válido ({str(e)})')
+        yield entry_from_object(obj, event_bus_name)
+
+
+def list_rules(events, event_bus_name: str = 'default') -> List[Dict[str, Any]]:
+    """Todas las reglas de un bus (list_rules devuelve como mucho 100 por página)"""
+    rules: List[Dict[str, Any]] = []
+    for page in events.get_paginator('list_rules').paginate(EventBusName=event_bus_name):
+        rules.extend(page.get('Rules', []))
+    return rules
+
+
+def rule_index(events, scope: Hashable, event_bus_name: str = 'default', refresh: bool = False) -> RuleIndex:
+    """Índice de reglas compiladas de un bus, cacheado RULE_INDEX_TTL segundos"""
+    return _rule_cache.get_or_load((scope, event_bus_name),
+                                   lambda: RuleIndex(list_rules(events, event_bus_name)), refresh)
+
+
+def invalidate(scope: Hashable, event_bus_name: Optional[str] = None):
+    """Invalida el índice de reglas de un ámbito (tras crear o modificar reglas)"""
+    if event_bus_name is None:
+        _rule_cache.invalidate_prefix(scope)
+    else:
+        _rule_cache.invalidate_prefix(scope, event_bus_name)
@@ -0,0 +1,112 @@
+"""
+Fan-out concurrente para patrones "listar y luego describir"
+Concurrencia acotada, timeout por llamada y reporte de fallos parciales
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_CALL_TIMEOUT = 20.0
+
+
+def fanout_client_config(max_workers: int = DEFAULT_MAX_WORKERS,
+                         timeout: float = DEFAULT_CALL_TIMEOUT) -> Config:
+    """
+    Config de botocore para un cliente compartido por los hilos del fan-out:
+    pool de conexiones suficiente y timeouts de socket alineados con el timeout por llamada.
+    """
+    return Config(
+        max_pool_connections=max(10, max_workers),
+        connect_timeout=min(5, timeout),
+        read_timeout=timeout,
+        retries={'max_attempts': 3, 'mode': 'standard'}
+    )
+
+
+class FanOutResult:
+    """Resultados de un fan-out: valores por clave (en el orden de entrada) y fallos"""
+
+    def __init__(self, keys: List[Hashable]):
+        self.keys = keys
+        self.results: Dict[Hashable, Any] = {}
+        self.errors: Dict[Hashable, str] = {}
+        self.seconds = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def values(self) -> List[Any]:
+        """Valores de las llamadas correctas, en el orden de entrada"""
+        return [self.results[k] for k in self.keys if k in self.results]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': len(self.keys),
+            'succeeded': len(self.results),
+            'failed': len(self.errors),
+            'errors': {str(k): v for k, v in self.errors.items()},
+            'seconds': round(self.seconds, 3)
+        }
+
+
+def fan_out(func: Callable[[Any], Any], items: Iterable[Any],
+            max_workers: int = DEFAULT_MAX_WORKERS, timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+            key: Optional[Callable[[Any], Hashable]] = None) -> FanOutResult:
+    """
+    Ejecuta func(item) para cada item con como mucho max_workers llamadas simultáneas.
+
+    Cada llamada que supera timeout segundos se da por fallida (el hilo no puede
+    interrumpirse, pero deja de esperarse; usar fanout_client_config para que la
+    llamada boto3 también corte). Los fallos se devuelven en result.errors en lugar
+    de propagarse, para que la vista pueda mostrar resultados parciales.
+    """
+    items = list(items)
+    keys = [key(item) if key else item for item in items]
+    result = FanOutResult(keys)
+    if not items:
+        return result
+
+    started_at = time.monotonic()
+    call_started: Dict[Hashable, float] = {}
+
+    def _call(item_key, item):
+        call_started[item_key] = time.monotonic()
+        return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))),
+                                  thread_name_prefix='fanout')
+    futures = {executor.submit(_call, k, item): k for k, item in zip(keys, items)}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.1 if timeout else None,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                item_key = futures[future]
+                try:
+                    result.results[item_key] = future.result()
+                except Exception as e:
+                    logger.warning(f'Fan-out: fallo en {item_key}: {str(e)}')
+                    result.errors[item_key] = str(e)
+            if timeout:
+                now = time.monotonic()
+                for future in list(pending):
+                    item_key = futures[future]
+                    began = call_started.get(item_key)
+                    if began is not None and now - began > timeout:
+                        pending.discard(future)
+                        future.cancel()
+                        logger.warning(f'Fan-out: timeout en {item_key} tras {timeout} s')
+                        result.errors[item_key] = f'Timeout tras {timeout} s'
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    result.seconds = time.monotonic() - started_at
+    return result
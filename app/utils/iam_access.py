@@ -0,0 +1,396 @@
+"""
+Snapshot de IAM y evaluación local de permisos
+Usuarios, grupos, roles y políticas de la cuenta con get_account_authorization_details
+(paginado, unas pocas llamadas) y sentencias compiladas a matchers de acción/recurso
+para responder "¿puede X hacer A sobre R?" y "¿quién puede?" sin llamar a AWS.
+
+Solo se evalúan políticas de identidad y permissions boundaries: las SCP, las políticas
+de recurso y las condiciones no se evalúan (una sentencia con Condition o con variables
+se marca como condicional).
+"""
+import json
+import re
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+from app.utils.cache import TTLCache
+
+SNAPSHOT_TTL = 600.0
+DETAIL_FILTERS = ['User', 'Role', 'Group', 'LocalManagedPolicy', 'AWSManagedPolicy']
+PRINCIPAL_TYPES = ('user', 'role')
+
+_cache = TTLCache(ttl=SNAPSHOT_TTL, max_entries=32)
+_VARIABLE = re.compile(r'\$\{[^}]*\}')
+
+
+def _as_list(value) -> List[str]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _document(value) -> Dict[str, Any]:
+    """Los documentos llegan como dict (botocore los decodifica) o como JSON URL-encoded"""
+    if isinstance(value, dict):
+        return value
+    if not value:
+        return {}
+    return json.loads(unquote(value))
+
+
+# ---------------------------------------------------------------------------
+# Matchers
+# ---------------------------------------------------------------------------
+
+def _wildcard_regex(pattern: str) -> str:
+    parts = []
+    for char in pattern:
+        if char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return ''.join(parts)
+
+
+class PatternSet:
+    """
+    Patrones IAM (* y ?) compilados una vez: los literales van a un set y los
+    comodines a una única regex con alternativas. Las acciones no distinguen
+    mayúsculas; los recursos sí.
+    """
+    __slots__ = ('patterns', 'ignore_case', 'any', 'exact', 'regex')
+
+    def __init__(self, patterns: Iterable[str], ignore_case: bool = False):
+        self.patterns = list(patterns)
+        self.ignore_case = ignore_case
+        folded = [p.lower() if ignore_case else p for p in self.patterns]
+        self.any = '*' in folded
+        self.exact = {p for p in folded if '*' not in p and '?' not in p}
+        wildcards = [p for p in folded if p not in self.exact]
+        self.regex = (re.compile('|'.join(f'(?:{_wildcard_regex(p)})' for p in wildcards))
+                      if wildcards and not self.any else None)
+
+    def matches(self, value: str) -> bool:
+        if self.any:
+            return True
+        if self.ignore_case:
+            value = value.lower()
+        if value in self.exact:
+            return True
+        return bool(self.regex and self.regex.fullmatch(value))
+
+
+class Statement:
+    __slots__ = ('sid', 'effect', 'actions', 'not_actions', 'resources', 'not_resources',
+                 'conditional', 'services')
+
+    def __init__(self, data: Dict[str, Any]):
+        self.sid = data.get('Sid')
+        self.effect = data.get('Effect', 'Allow')
+        actions = _as_list(data.get('Action'))
+        not_actions = _as_list(data.get('NotAction'))
+        resources = _as_list(data.get('Resource'))
+        not_resources = _as_list(data.get('NotResource'))
+        # Las variables (${aws:username}...) dependen de la petición: se tratan como *
+        variables = any(_VARIABLE.search(r) for r in resources + not_resources)
+        self.actions = PatternSet(actions, ignore_case=True) if 'Action' in data else None
+        self.not_actions = PatternSet(not_actions, ignore_case=True) if 'NotAction' in data else None
+        self.resources = (PatternSet([_VARIABLE.sub('*', r) for r in resources])
+                          if 'Resource' in data else None)
+        self.not_resources = (PatternSet([_VARIABLE.sub('*', r) for r in not_resources])
+                              if 'NotResource' in data else None)
+        self.conditional = bool(data.get('Condition')) or variables
+        # Servicios a los que aplica la sentencia ('*' = cualquiera) para indexarla
+        services = set()
+        for action in actions:
+            prefix = action.split(':', 1)[0].lower() if ':' in action else '*'
+            services.add('*' if '*' in prefix or '?' in prefix else prefix)
+        self.services = services if actions and not not_actions else {'*'}
+
+    def applies(self, action: str, resource: str) -> bool:
+        if self.actions is not None and not self.actions.matches(action):
+            return False
+        if self.not_actions is not None and self.not_actions.matches(action):
+            return False
+        if self.resources is not None and not self.resources.matches(resource):
+            return False
+        if self.not_resources is not None and self.not_resources.matches(resource):
+            return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'sid': self.sid, 'effect': self.effect, 'conditional': self.conditional}
+        for name in ('actions', 'not_actions', 'resources', 'not_resources'):
+            patterns = getattr(self, name)
+            if patterns is not None:
+                data[name] = patterns.patterns
+        return data
+
+
+class CompiledPolicy:
+    """Sentencias de una política indexadas por prefijo de servicio"""
+    __slots__ = ('key', 'name', 'statements', '_by_service')
+
+    def __init__(self, key: str, name: str, document: Dict[str, Any]):
+        self.key = key
+        self.name = name
+        raw = document.get('Statement', [])
+        self.statements = [Statement(s) for s in ([raw] if isinstance(raw, dict) else raw)]
+        self._by_service: Dict[str, List[Statement]] = {}
+        for statement in self.statements:
+            for service in statement.services:
+                self._by_service.setdefault(service, []).append(statement)
+
+    def matching(self, action: str, resource: str) -> List[Statement]:
+        service = action.split(':', 1)[0].lower()
+        candidates = self._by_service.get(service, [])
+        if service != '*':
+            candidates = candidates + self._by_service.get('*', [])
+        return [s for s in candidates if s.applies(action, resource)]
+
+    def evaluate(self, action: str, resource: str) -> Tuple[str, bool, List[Statement]]:
+        """('deny' | 'allow' | 'none', condicional, sentencias aplicables)"""
+        matched = self.matching(action, resource)
+        denies = [s for s in matched if s.effect == 'Deny']
+        allows = [s for s in matched if s.effect == 'Allow']
+        if any(not s.conditional for s in denies):
+            return 'deny', False, matched
+        if allows:
+            unconditional = any(not s.conditional for s in allows)
+            return 'allow', bool(denies) or not unconditional, matched
+        return ('deny', True, matched) if denies else ('none', False, matched)
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+
+class Principal:
+    __slots__ = ('type', 'name', 'arn', 'id', 'path', 'groups', 'policy_keys', 'boundary', 'trust')
+
+    def __init__(self, principal_type: str, detail: Dict[str, Any], name_key: str, id_key: str):
+        self.type = principal_type
+        self.name = detail[name_key]
+        self.arn = detail['Arn']
+        self.id = detail.get(id_key)
+        self.path = detail.get('Path', '/')
+        self.groups: List[str] = detail.get('GroupList', [])
+        self.policy_keys: List[str] = []
+        self.boundary = (detail.get('PermissionsBoundary') or {}).get('PermissionsBoundaryArn')
+        self.trust = _document(detail.get('AssumeRolePolicyDocument')) if principal_type == 'role' else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'type': self.type, 'name': self.name, 'arn': self.arn, 'path': self.path,
+                'groups': self.groups, 'policies': len(self.policy_keys), 'boundary': self.boundary}
+
+
+def fetch_details(iam) -> Dict[str, List[Dict[str, Any]]]:
+    """Todas las páginas de get_account_authorization_details"""
+    details = {'UserDetailList': [], 'GroupDetailList': [], 'RoleDetailList': [], 'Policies': []}
+    paginator = iam.get_paginator('get_account_authorization_details')
+    for page in paginator.paginate(Filter=DETAIL_FILTERS):
+        for key in details:
+            details[key].extend(page.get(key, []))
+    return details
+
+
+class IAMSnapshot:
+    """Vista local de IAM con las políticas asociadas ya compiladas"""
+
+    def __init__(self, details: Dict[str, List[Dict[str, Any]]]):
+        started = time.monotonic()
+        self.built_at = time.time()
+        self.principals: Dict[str, Principal] = {}
+        self.policies: Dict[str, CompiledPolicy] = {}
+        self.managed: Dict[str, Dict[str, Any]] = {}
+        self._documents: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+        for policy in details.get('Policies', []):
+            name = policy.get('PolicyName') or policy['Arn'].rsplit('/', 1)[-1]
+            document = next((v.get('Document') for v in policy.get('PolicyVersionList', [])
+                             if v.get('IsDefaultVersion')), None)
+            self.managed[policy['Arn']] = {
+                'name': name,
+                'arn': policy['Arn'],
+                'aws_managed': ':aws:policy/' in policy['Arn'],
+                'attachments': policy.get('AttachmentCount', 0),
+                'boundary_usage': policy.get('PermissionsBoundaryUsageCount', 0),
+            }
+            self._documents[policy['Arn']] = (name, _document(document))
+
+        groups: Dict[str, List[str]] = {}
+        for group in details.get('GroupDetailList', []):
+            keys = self._inline(group['Arn'], group.get('GroupPolicyList', []))
+            keys += self._attached(group.get('AttachedManagedPolicies', []))
+            groups[group['GroupName']] = keys
+        self.groups = {name: len(keys) for name, keys in groups.items()}
+
+        for user in details.get('UserDetailList', []):
+            principal = Principal('user', user, 'UserName', 'UserId')
+            keys = self._inline(principal.arn, user.get('UserPolicyList', []))
+            keys += self._attached(user.get('AttachedManagedPolicies', []))
+            for group in principal.groups:
+                keys += groups.get(group, [])
+            principal.policy_keys = list(dict.fromkeys(keys))
+            self.principals[principal.arn] = principal
+
+        for role in details.get('RoleDetailList', []):
+            principal = Principal('role', role, 'RoleName', 'RoleId')
+            keys = self._inline(principal.arn, role.get('RolePolicyList', []))
+            keys += self._attached(role.get('AttachedManagedPolicies', []))
+            principal.policy_keys = list(dict.fromkeys(keys))
+            self.principals[principal.arn] = principal
+
+        for principal in self.principals.values():
+            if principal.boundary:
+                self.policy(principal.boundary)
+        self._by_name = {(p.type, p.name): p for p in self.principals.values()}
+        self.seconds = round(time.monotonic() - started, 3)
+
+    def _inline(self, owner_arn: str, policies: List[Dict[str, Any]]) -> List[str]:
+        keys = []
+        for policy in policies:
+            key = f'{owner_arn}#{policy["PolicyName"]}'
+            self.policies[key] = CompiledPolicy(key, policy['PolicyName'], _document(policy.get('PolicyDocument')))
+            keys.append(key)
+        return keys
+
+    def _attached(self, attached: List[Dict[str, Any]]) -> List[str]:
+        keys = []
+        for policy in attached:
+            if self.policy(policy['PolicyArn']) is not None:
+                keys.append(policy['PolicyArn'])
+        return keys
+
+    def policy(self, arn: str) -> Optional[CompiledPolicy]:
+        """Política gestionada compilada; solo se compilan las que se usan"""
+        compiled = self.policies.get(arn)
+        if compiled is None and arn in self._documents:
+            name, document = self._documents[arn]
+            compiled = self.policies[arn] = CompiledPolicy(arn, name, document)
+        return compiled
+
+    # -- consultas ------------------------------------------------------------
+
+    def find_principal(self, value: str) -> Optional[Principal]:
+        """Por ARN, por 'user/nombre' o 'role/nombre', o por nombre (usuario primero)"""
+        if value in self.principals:
+            return self.principals[value]
+        if '/' in value:
+            principal_type, _, name = value.partition('/')
+            return self._by_name.get((principal_type.lower(), name))
+        return self._by_name.get(('user', value)) or self._by_name.get(('role', value))
+
+    def _decide(self, principal: Principal, action: str, resource: str,
+                memo: Optional[Dict[str, Tuple[str, bool, List[Statement]]]] = None) -> Dict[str, Any]:
+        memo = {} if memo is None else memo
+
+        def _eval(key):
+            if key not in memo:
+                compiled = self.policies.get(key) or self.policy(key)
+                memo[key] = compiled.evaluate(action, resource) if compiled else ('none', False, [])
+            return memo[key]
+
+        allowed_by, denied_by = [], []
+        conditional = False
+        for key in principal.policy_keys:
+            outcome, cond, _ = _eval(key)
+            if outcome == 'deny' and not cond:
+                denied_by.append(key)
+            elif outcome == 'allow':
+                allowed_by.append(key)
+            conditional = conditional or (cond and outcome != 'none')
+
+        if denied_by:
+            decision = 'explicit_deny'
+        elif allowed_by:
+            decision = 'allowed'
+        else:
+            decision = 'implicit_deny'
+        if decision == 'allowed' and principal.boundary:
+            outcome, cond, _ = _eval(principal.boundary)
+            if outcome != 'allow':
+                decision = 'boundary_deny'
+            conditional = conditional or cond
+        return {
+            'principal': principal.arn,
+            'type': principal.type,
+            'name': principal.name,
+            'action': action,
+            'resource': resource,
+            'decision': decision,
+            'allowed': decision == 'allowed',
+            'conditional': conditional,
+            'allowed_by': [self._policy_name(k) for k in allowed_by],
+            'denied_by': [self._policy_name(k) for k in denied_by],
+        }
+
+    def _policy_name(self, key: str) -> str:
+        compiled = self.policies.get(key)
+        if '#' in key:
+            return f'{compiled.name if compiled else key} (inline)'
+        return compiled.name if compiled else key
+
+    def simulate(self, principal: Principal, actions: Iterable[str], resource: str = '*') -> List[Dict[str, Any]]:
+        return [self._decide(principal, action, resource) for action in actions]
+
+    def who_can(self, action: str, resource: str = '*', principal_type: Optional[str] = None,
+                include_conditional: bool = True) -> List[Dict[str, Any]]:
+        """
+        Principales con permiso para action sobre resource. Cada política se evalúa una
+        sola vez por consulta aunque la compartan miles de principales.
+        """
+        memo: Dict[str, Tuple[str, bool, List[Statement]]] = {}
+        result = []
+        for principal in self.principals.values():
+            if principal_type and principal.type != principal_type:
+                continue
+            decision = self._decide(principal, action, resource, memo)
+            if decision['allowed'] and (include_conditional or not decision['conditional']):
+                result.append(decision)
+        result.sort(key=lambda d: (d['type'], d['name']))
+        return result
+
+    def statements_on(self, principal: Principal, resource: str) -> List[Dict[str, Any]]:
+        """Sentencias de las políticas del principal cuyo recurso cubre resource"""
+        found = []
+        for key in principal.policy_keys:
+            compiled = self.policies.get(key)
+            if compiled is None:
+                continue
+            for statement in compiled.statements:
+                if statement.resources is not None and not statement.resources.matches(resource):
+                    continue
+                if statement.not_resources is not None and statement.not_resources.matches(resource):
+                    continue
+                found.append(dict(statement.to_dict(), policy=self._policy_name(key)))
+        return found
+
+    def summary(self) -> Dict[str, Any]:
+        types = [p.type for p in self.principals.values()]
+        return {
+            'users': types.count('user'),
+            'roles': types.count('role'),
+            'groups': len(self.groups),
+            'managed_policies': len(self.managed),
+            'compiled_policies': len(self.policies),
+            'statements': sum(len(p.statements) for p in self.policies.values()),
+            'built_at': self.built_at,
+            'seconds': self.seconds,
+        }
+
+
+def build(iam) -> IAMSnapshot:
+    return IAMSnapshot(fetch_details(iam))
+
+
+def get_snapshot(iam, scope: Hashable, refresh: bool = False) -> IAMSnapshot:
+    return _cache.get_or_load((scope, 'snapshot'), lambda: build(iam), refresh=refresh)
+
+
+def invalidate(scope: Hashable):
+    """Descarta el snapshot tras crear, borrar o cambiar usuarios, roles, grupos o políticas"""
+    _cache.invalidate_prefix(scope)
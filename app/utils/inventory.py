@@ -0,0 +1,503 @@
+"""
+Inventario de recursos de la cuenta por servicio y región
+Instantáneas en memoria refrescadas en un pool de hilos; los refrescos posteriores
+son incrementales: solo se vuelven a recolectar los servicios con cambios detectados
+por AWS Config (list_discovered_resources) o CloudTrail (eventos de escritura).
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from app.utils import ecs_batch
+from app.utils.fanout import fan_out, DEFAULT_MAX_WORKERS
+from app.utils.vpc_topology import tag_value
+
+logger = logging.getLogger(__name__)
+
+# Antigüedad máxima de una instantánea antes de recolectarla de nuevo aunque no haya cambios
+DEFAULT_MAX_AGE = 15 * 60
+# Intervalo mínimo entre comprobaciones de cambios lanzadas desde las vistas
+CHECK_INTERVAL = 60
+# Timeout por servicio en la recolección (cuentas grandes tardan más que una llamada normal)
+COLLECT_TIMEOUT = 120.0
+# CloudTrail entrega eventos con hasta ~15 min de retraso: se solapa la ventana
+CLOUDTRAIL_LAG = timedelta(minutes=15)
+# Por encima de este número de eventos se considera que todo ha cambiado
+CLOUDTRAIL_MAX_EVENTS = 1000
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _paginate(client, operation, result_key, **kwargs):
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        yield from page.get(result_key, [])
+
+
+def _collect_ec2(factory):
+    ec2 = factory('ec2')
+    items = []
+    for reservation in _paginate(ec2, 'describe_instances', 'Reservations'):
+        for instance in reservation.get('Instances', []):
+            items.append({
+                'id': instance['InstanceId'],
+                'name': tag_value(instance.get('Tags')) or instance['InstanceId'],
+                'state': instance.get('State', {}).get('Name'),
+                'type': instance.get('InstanceType'),
+                'availability_zone': instance.get('Placement', {}).get('AvailabilityZone'),
+                'launch_time': _iso(instance.get('LaunchTime'))
+            })
+    return items
+
+
+def _collect_s3(factory):
+    buckets = factory('s3').list_buckets().get('Buckets', [])
+    return [{'id': b['Name'], 'name': b['Name'], 'creation_date': _iso(b.get('CreationDate'))}
+            for b in buckets]
+
+
+def _collect_rds(factory):
+    return [{
+        'id': db['DBInstanceIdentifier'],
+        'name': db['DBInstanceIdentifier'],
+        'engine': db.get('Engine'),
+        'status': db.get('DBInstanceStatus'),
+        'instance_class': db.get('DBInstanceClass')
+    } for db in _paginate(factory('rds'), 'describe_db_instances', 'DBInstances')]
+
+
+def _collect_lambda(factory):
+    return [{
+        'id': fn['FunctionName'],
+        'name': fn['FunctionName'],
+        'arn': fn.get('FunctionArn'),
+        'runtime': fn.get('Runtime'),
+        'last_modified': fn.get('LastModified'),
+        'memory_size': fn.get('MemorySize'),
+        'timeout': fn.get('Timeout'),
+        'code_size': fn.get('CodeSize'),
+        'code_sha256': fn.get('CodeSha256'),
+        'package_type': fn.get('PackageType'),
+        'layers': [layer['Arn'] for layer in fn.get('Layers', [])]
+    } for fn in _paginate(factory('lambda'), 'list_functions', 'Functions')]
+
+
+def _collect_dynamodb(factory):
+    return [{'id': name, 'name': name}
+            for name in _paginate(factory('dynamodb'), 'list_tables', 'TableNames')]
+
+
+def _collect_vpc(factory):
+    return [{
+        'id': vpc['VpcId'],
+        'name': tag_value(vpc.get('Tags')) or vpc['VpcId'],
+        'cidr_block': vpc.get('CidrBlock'),
+        'state': vpc.get('State'),
+        'is_default': vpc.get('IsDefault', False)
+    } for vpc in _paginate(factory('ec2'), 'describe_vpcs', 'Vpcs')]
+
+
+def _collect_security_groups(factory):
+    return [{
+        'id': sg['GroupId'],
+        'name': sg.get('GroupName'),
+        'vpc_id': sg.get('VpcId'),
+        'description': sg.get('Description')
+    } for sg in _paginate(factory('ec2'), 'describe_security_groups', 'SecurityGroups')]
+
+
+def _collect_ecs(factory):
+    clusters = ecs_batch.describe_clusters(factory('ecs'))['clusters']
+    return [{
+        'id': c['clusterArn'],
+        'name': c['clusterName'],
+        'status': c.get('status'),
+        'running_tasks': c.get('runningTasksCount', 0),
+        'active_services': c.get('activeServicesCount', 0)
+    } for c in clusters]
+
+
+def _collect_eks(factory):
+    return [{'id': name, 'name': name}
+            for name in _paginate(factory('eks'), 'list_clusters', 'clusters')]
+
+
+def _collect_sqs(factory):
+    return [{'id': url, 'name': url.rsplit('/', 1)[-1], 'url': url}
+            for url in _paginate(factory('sqs'), 'list_queues', 'QueueUrls')]
+
+
+def _collect_sns(factory):
+    return [{'id': t['TopicArn'], 'name': t['TopicArn'].rsplit(':', 1)[-1], 'arn': t['TopicArn']}
+            for t in _paginate(factory('sns'), 'list_topics', 'Topics')]
+
+
+# Servicios inventariados: recolector, tipos de AWS Config, origen de eventos de
+# CloudTrail y vista de listado del blueprint correspondiente
+INVENTORY_SERVICES: Dict[str, Dict[str, Any]] = {
+    'ec2': {'label': 'Instancias EC2', 'collect': _collect_ec2, 'endpoint': 'ec2.instances',
+            'config_types': ['AWS::EC2::Instance'], 'event_source': 'ec2.amazonaws.com'},
+    's3': {'label': 'Buckets S3', 'collect': _collect_s3, 'endpoint': 's3.buckets', 'global': True,
+           'config_types': ['AWS::S3::Bucket'], 'event_source': 's3.amazonaws.com'},
+    'rds': {'label': 'Instancias RDS', 'collect': _collect_rds, 'endpoint': 'rds.instances',
+            'config_types': ['AWS::RDS::DBInstance'], 'event_source': 'rds.amazonaws.com'},
+    'lambda': {'label': 'Funciones Lambda', 'collect': _collect_lambda, 'endpoint': 'lambda_bp.functions',
+               'config_types': ['AWS::Lambda::Function'], 'event_source': 'lambda.amazonaws.com'},
+    'dynamodb': {'label': 'Tablas DynamoDB', 'collect': _collect_dynamodb, 'endpoint': 'dynamodb.tables',
+                 'config_types': ['AWS::DynamoDB::Table'], 'event_source': 'dynamodb.amazonaws.com'},
+    'vpc': {'label': 'VPCs', 'collect': _collect_vpc, 'endpoint': 'vpc.vpcs',
+            'config_types': ['AWS::EC2::VPC'], 'event_source': 'ec2.amazonaws.com'},
+    'security_groups': {'label': 'Security Groups', 'collect': _collect_security_groups,
+                        'endpoint': 'security_groups.list_security_groups',
+                        'config_types': ['AWS::EC2::SecurityGroup'], 'event_source': 'ec2.amazonaws.com'},
+    'ecs': {'label': 'Clusters ECS', 'collect': _collect_ecs, 'endpoint': 'ecs.clusters',
+            'config_types': ['AWS::ECS::Cluster'], 'event_source': 'ecs.amazonaws.com'},
+    'eks': {'label': 'Clusters EKS', 'collect': _collect_eks, 'endpoint': 'eks.clusters',
+            'config_types': ['AWS::EKS::Cluster'], 'event_source': 'eks.amazonaws.com'},
+    'sqs': {'label': 'Colas SQS', 'collect': _collect_sqs, 'endpoint': 'sqs.queues',
+            'config_types': ['AWS::SQS::Queue'], 'event_source': 'sqs.amazonaws.com'},
+    'sns': {'label': 'Topics SNS', 'collect': _collect_sns, 'endpoint': 'sns.topics',
+            'config_types': ['AWS::SNS::Topic'], 'event_source': 'sns.amazonaws.com'},
+}
+
+
+GLOBAL_REGION = 'global'
+
+
+def storage_scope(scope: Hashable, service: str) -> Hashable:
+    """Los servicios globales (list_buckets de S3) se guardan una vez por credenciales, sin región"""
+    if INVENTORY_SERVICES.get(service, {}).get('global') and isinstance(scope, tuple):
+        return (scope[0], GLOBAL_REGION)
+    return scope
+
+
+class InventoryStore:
+    """Instantáneas por ámbito (credenciales, región) y servicio; lecturas O(1)"""
+
+    def __init__(self):
+        self._snapshots: Dict[Hashable, Dict[str, Dict[str, Any]]] = {}
+        self._state: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _scope_state(self, scope):
+        return self._state.setdefault(scope, {
+            'checked_at': None, 'dirty': set(), 'fingerprints': {},
+            'seen_events': {}, 'refreshing': False, 'last_report': None
+        })
+
+    def get(self, scope: Hashable, service: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._snapshots.get(storage_scope(scope, service), {}).get(service)
+
+    def put(self, scope: Hashable, service: str, entry: Dict[str, Any]):
+        scope = storage_scope(scope, service)
+        with self._lock:
+            self._snapshots.setdefault(scope, {})[service] = entry
+            self._scope_state(scope)['dirty'].discard(service)
+
+    def has_snapshot(self, scope: Hashable) -> bool:
+        with self._lock:
+            return bool(self._snapshots.get(scope))
+
+    def summary(self, scope: Hashable) -> Dict[str, Any]:
+        """Recuento por servicio sin tocar AWS"""
+        with self._lock:
+            state = self._scope_state(scope)
+            services = {}
+            for name, spec in INVENTORY_SERVICES.items():
+                stored = storage_scope(scope, name)
+                entry = self._snapshots.get(stored, {}).get(name)
+                services[name] = {
+                    'label': spec['label'],
+                    'endpoint': spec['endpoint'],
+                    'count': entry['count'] if entry else None,
+                    'refreshed_at': entry['refreshed_at'] if entry else None,
+                    'error': entry.get('error') if entry else None,
+                    'dirty': name in self._scope_state(stored)['dirty']
+                }
+            return {
+                'services': services,
+                'checked_at': state['checked_at'],
+                'refreshing': state['refreshing'],
+                'last_report': state['last_report']
+            }
+
+    def mark_dirty(self, scope: Hashable, *services: str):
+        with self._lock:
+            for service in services or INVENTORY_SERVICES:
+                self._scope_state(storage_scope(scope, service))['dirty'].add(service)
+
+    def take_dirty(self, scope: Hashable) -> Set[str]:
+        with self._lock:
+            dirty = set()
+            for stored in {storage_scope(scope, service) for service in INVENTORY_SERVICES}:
+                state = self._scope_state(stored)
+                dirty |= {service for service in state['dirty'] if storage_scope(scope, service) == stored}
+                state['dirty'] -= dirty
+            return dirty
+
+    def is_dirty(self, scope: Hashable, service: str) -> bool:
+        with self._lock:
+            return service in self._scope_state(storage_scope(scope, service))['dirty']
+
+    def state(self, scope: Hashable) -> Dict[str, Any]:
+        """Estado mutable del ámbito; usar solo dentro de begin_refresh/end_refresh"""
+        with self._lock:
+            return self._scope_state(scope)
+
+    def begin_refresh(self, scope: Hashable) -> bool:
+        """Marca el ámbito como en refresco; False si ya había uno en curso"""
+        with self._lock:
+            state = self._scope_state(scope)
+            if state['refreshing']:
+                return False
+            state['refreshing'] = True
+            return True
+
+    def end_refresh(self, scope: Hashable, checked_at: Optional[float] = None,
+                    report: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            state = self._scope_state(scope)
+            state['refreshing'] = False
+            if checked_at is not None:
+                state['checked_at'] = checked_at
+            if report is not None:
+                state['last_report'] = report
+
+    def clear(self, scope: Optional[Hashable] = None):
+        with self._lock:
+            if scope is None:
+                self._snapshots.clear()
+                self._state.clear()
+            else:
+                self._snapshots.pop(scope, None)
+                self._state.pop(scope, None)
+
+
+store = InventoryStore()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='inventory')
+
+
+def collect_service(factory: Callable, service: str) -> Dict[str, Any]:
+    """Recolecta un servicio completo y devuelve la entrada de la instantánea"""
+    started = time.monotonic()
+    items = INVENTORY_SERVICES[service]['collect'](factory)
+    return {
+        'items': items,
+        'index': {item['id']: item for item in items},
+        'count': len(items),
+        'refreshed_at': time.time(),
+        'seconds': round(time.monotonic() - started, 3),
+        'error': None
+    }
+
+
+def _config_changes(factory, state) -> Optional[Set[str]]:
+    """
+    Servicios cuyo conjunto de recursos registrado por AWS Config ha cambiado.
+    None si Config no está grabando en la región (no sirve para detectar cambios).
+    """
+    config = factory('config')
+    statuses = config.describe_configuration_recorder_status().get('ConfigurationRecordersStatus', [])
+    if not any(status.get('recording') for status in statuses):
+        return None
+
+    changed = set()
+    fingerprints = {}
+    for service, spec in INVENTORY_SERVICES.items():
+        digest = hashlib.sha1()
+        for resource_type in spec['config_types']:
+            ids = sorted(r['resourceId'] for r in _paginate(
+                config, 'list_discovered_resources', 'resourceIdentifiers', resourceType=resource_type))
+            digest.update(f'{resource_type}:{",".join(ids)};'.encode())
+        fingerprints[service] = digest.hexdigest()
+        if state['fingerprints'].get(service) != fingerprints[service]:
+            changed.add(service)
+    state['fingerprints'] = fingerprints
+    return changed
+
+
+def _cloudtrail_changes(factory, state, now: datetime) -> Optional[Set[str]]:
+    """
+    Servicios con eventos de escritura en CloudTrail desde la última comprobación.
+    None si no hay comprobación previa (no hay ventana que revisar).
+    """
+    if state['checked_at'] is None:
+        return None
+    since = datetime.fromtimestamp(state['checked_at'], tz=timezone.utc) - CLOUDTRAIL_LAG
+    by_source: Dict[str, List[str]] = {}
+    for service, spec in INVENTORY_SERVICES.items():
+        by_source.setdefault(spec['event_source'], []).append(service)
+
+    seen = {event_id: at for event_id, at in state['seen_events'].items() if at >= since}
+    changed = set()
+    count = 0
+    for event in _paginate(factory('cloudtrail'), 'lookup_events', 'Events',
+                           LookupAttributes=[{'AttributeKey': 'ReadOnly', 'AttributeValue': 'false'}],
+                           StartTime=since, EndTime=now):
+        count += 1
+        if count > CLOUDTRAIL_MAX_EVENTS:
+            # Demasiada actividad: más barato recolectar todo que seguir paginando (2 TPS)
+            state['seen_events'] = seen
+            return set(INVENTORY_SERVICES)
+        if event['EventId'] in seen:
+            continue
+        seen[event['EventId']] = event['EventTime']
+        changed.update(by_source.get(event.get('EventSource'), []))
+    state['seen_events'] = seen
+    return changed
+
+
+def refresh(factory: Callable, services: Optional[Iterable[str]] = None, full: bool = False,
+            max_age: float = DEFAULT_MAX_AGE, max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, Any]:
+    """
+    Refresca el inventario del ámbito de la fábrica (ver get_client_factory).
+
+    - services: recolecta exactamente esos servicios.
+    - full o sin instantánea previa: recolecta todos.
+    - en otro caso: servicios marcados como sucios, con instantánea más antigua que
+      max_age, o con cambios según AWS Config / CloudTrail.
+    Devuelve un informe con el modo, los servicios recolectados y los errores.
+    """
+    scope = factory.scope
+    started = time.time()
+    now = datetime.now(timezone.utc)
+    state = store.state(scope)
+    report: Dict[str, Any] = {'mode': 'incremental', 'detection': {}, 'refreshed': [], 'errors': {}}
+
+    if services is not None:
+        targets = set(services)
+        report['mode'] = 'services'
+    else:
+        detected: Set[str] = set()
+        for method, detect in (('config', lambda: _config_changes(factory, state)),
+                               ('cloudtrail', lambda: _cloudtrail_changes(factory, state, now))):
+            try:
+                found = detect()
+            except Exception as e:
+                logger.info(f'Inventario: detección de cambios con {method} no disponible: {str(e)}')
+                report['detection'][method] = f'no disponible: {str(e)}'
+                continue
+            if found is None:
+                report['detection'][method] = 'no disponible'
+                continue
+            report['detection'][method] = sorted(found)
+            detected |= found
+
+        if full or not store.has_snapshot(scope):
+            targets = set(INVENTORY_SERVICES)
+            report['mode'] = 'full'
+            store.take_dirty(scope)
+        else:
+            stale = {name for name in INVENTORY_SERVICES
+                     if (store.get(scope, name) or {}).get('refreshed_at', 0) < started - max_age}
+            targets = detected | stale | store.take_dirty(scope)
+
+    targets = sorted(t for t in targets if t in INVENTORY_SERVICES)
+    outcome = fan_out(lambda service: collect_service(factory, service), targets,
+                      max_workers=max_workers, timeout=COLLECT_TIMEOUT)
+    for service, entry in outcome.results.items():
+        store.put(scope, service, entry)
+    for service, error in outcome.errors.items():
+        previous = store.get(scope, service)
+        if previous:
+            # Conserva los datos anteriores y anota el fallo
+            store.put(scope, service, dict(previous, error=error))
+        else:
+            store.put(scope, service, {'items': [], 'index': {}, 'count': None,
+                                       'refreshed_at': time.time(), 'seconds': 0, 'error': error})
+
+    report['refreshed'] = sorted(outcome.results)
+    report['errors'] = dict(outcome.errors)
+    report['seconds'] = round(time.time() - started, 3)
+    return report
+
+
+def _run_refresh(factory, **kwargs):
+    scope = factory.scope
+    report = None
+    started = time.time()
+    try:
+        report = refresh(factory, **kwargs)
+    except Exception as e:
+        logger.error(f'Inventario: error refrescando {scope[1]}: {str(e)}')
+        report = {'mode': 'error', 'errors': {'inventory': str(e)}}
+    finally:
+        store.end_refresh(scope, checked_at=started, report=report)
+    return report
+
+
+def refresh_async(factory: Callable, **kwargs) -> bool:
+    """Lanza un refresco en segundo plano; False si ya había uno en curso para el ámbito"""
+    if not store.begin_refresh(factory.scope):
+        return False
+    _executor.submit(_run_refresh, factory, **kwargs)
+    return True
+
+
+def refresh_now(factory: Callable, **kwargs) -> Optional[Dict[str, Any]]:
+    """Refresco síncrono; None si ya había uno en curso para el ámbito"""
+    if not store.begin_refresh(factory.scope):
+        return None
+    return _run_refresh(factory, **kwargs)
+
+
+def ensure_fresh(factory: Callable, check_interval: float = CHECK_INTERVAL) -> bool:
+    """Sin bloquear: lanza una comprobación incremental si la última es más antigua que check_interval"""
+    checked_at = store.state(factory.scope)['checked_at']
+    if checked_at is not None and time.time() - checked_at < check_interval:
+        return False
+    return refresh_async(factory)
+
+
+def get_items(factory: Callable, service: str, max_age: float = DEFAULT_MAX_AGE) -> Dict[str, Any]:
+    """
+    Entrada del inventario para un servicio. Se sirve de la instantánea si existe,
+    no está marcada como sucia y no supera max_age; si no, se recolecta ese servicio
+    en el momento y se guarda.
+    """
+    scope = factory.scope
+    entry = store.get(scope, service)
+    if (entry is not None and entry.get('error') is None and not store.is_dirty(scope, service)
+            and time.time() - entry['refreshed_at'] < max_age):
+        return entry
+    entry = collect_service(factory, service)
+    store.put(scope, service, entry)
+    return entry
+
+
+def mark_dirty(scope: Hashable, *services: str):
+    """Marca servicios para recolectar en el próximo acceso (tras crear/eliminar recursos)"""
+    store.mark_dirty(scope, *services)
+
+
+_scheduler_lock = threading.Lock()
+_scheduler_thread: Optional[threading.Thread] = None
+
+
+def start_scheduler(interval: float, factory_provider: Callable[[], Callable]) -> bool:
+    """
+    Refresco periódico en un hilo daemon (para las credenciales del entorno).
+    factory_provider se invoca en cada ciclo para obtener la fábrica de clientes.
+    """
+    global _scheduler_thread
+    with _scheduler_lock:
+        if _scheduler_thread is not None:
+            return False
+
+        def _loop():
+            while True:
+                try:
+                    refresh_now(factory_provider())
+                except Exception as e:
+                    logger.error(f'Inventario: error en el refresco periódico: {str(e)}')
+                time.sleep(interval)
+
+        _scheduler_thread = threading.Thread(target=_loop, name='inventory-scheduler', daemon=True)
+        _scheduler_thread.start()
+        return True
@@ -0,0 +1,370 @@
+"""
+Lector multi-shard de Kinesis con checkpoints locales
+Lista los shards (incluidos los hijos de un resharding), los lee concurrentemente
+respetando el orden padre -> hijo y entrega registros decodificados con límite de ritmo.
+"""
+import base64
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.utils import kpl
+from app.utils.batching import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+ITERATOR_TYPES = ('TRIM_HORIZON', 'LATEST', 'AT_TIMESTAMP', 'AFTER_SEQUENCE_NUMBER')
+
+DEFAULT_MAX_RECORDS = 500
+DEFAULT_MAX_SECONDS = 10.0
+MAX_SHARD_WORKERS = 16
+# GetRecords admite hasta 10.000 registros y 5 llamadas/s por shard
+GET_RECORDS_LIMIT = 1000
+MIN_POLL_INTERVAL = 0.2
+# Espera entre lecturas de un shard que ya está al día
+IDLE_POLL_INTERVAL = 1.0
+
+THROTTLE_CODES = ('ProvisionedThroughputExceededException', 'LimitExceededException')
+
+CHECKPOINT_FILE = os.environ.get('KINESIS_CHECKPOINT_FILE',
+                                 os.path.join(os.getcwd(), 'data', 'kinesis_checkpoints.json'))
+
+
+class ShardCheckpoints:
+    """Último número de secuencia entregado por (región, stream, shard), persistido en JSON"""
+
+    def __init__(self, path: str = CHECKPOINT_FILE):
+        self.path = path
+        self._data: Optional[Dict[str, Dict[str, str]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except FileNotFoundError:
+                self._data = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f'Kinesis: checkpoints ilegibles en {self.path}: {str(e)}')
+                self._data = {}
+        return self._data
+
+    @staticmethod
+    def _key(region: str, stream_name: str) -> str:
+        return f'{region}/{stream_name}'
+
+    def for_stream(self, region: str, stream_name: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._load().get(self._key(region, stream_name), {}))
+
+    def update(self, region: str, stream_name: str, positions: Dict[str, str]):
+        """Guarda las posiciones de los shards indicados (escritura atómica del fichero)"""
+        if not positions:
+            return
+        with self._lock:
+            data = self._load()
+            data.setdefault(self._key(region, stream_name), {}).update(positions)
+            self._save(data)
+
+    def reset(self, region: str, stream_name: str):
+        with self._lock:
+            data = self._load()
+            if data.pop(self._key(region, stream_name), None) is not None:
+                self._save(data)
+
+    def _save(self, data):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+checkpoints = ShardCheckpoints()
+
+
+def list_shards(kinesis, stream_name: str) -> List[Dict[str, Any]]:
+    """Todos los shards del stream (abiertos y cerrados), con paginación por NextToken"""
+    shards: List[Dict[str, Any]] = []
+    response = kinesis.list_shards(StreamName=stream_name)
+    shards.extend(response.get('Shards', []))
+    while response.get('NextToken'):
+        response = kinesis.list_shards(NextToken=response['NextToken'])
+        shards.extend(response.get('Shards', []))
+    return shards
+
+
+def decode_record(record: Dict[str, Any], shard_id: str) -> Dict[str, Any]:
+    """Registro de Kinesis listo para JSON: datos como JSON, texto UTF-8 o base64"""
+    raw = record['Data']
+    try:
+        text = raw.decode('utf-8')
+        try:
+            data, encoding = json.loads(text), 'json'
+        except ValueError:
+            data, encoding = text, 'text'
+    except UnicodeDecodeError:
+        data, encoding = base64.b64encode(raw).decode('ascii'), 'base64'
+    arrival = record.get('ApproximateArrivalTimestamp')
+    return {
+        'shard_id': shard_id,
+        'sequence_number': record['SequenceNumber'],
+        'partition_key': record['PartitionKey'],
+        'data': data,
+        'encoding': encoding,
+        'approximate_arrival_timestamp': arrival.isoformat() if isinstance(arrival, datetime) else arrival or ''
+    }
+
+
+def expand_record(record: Dict[str, Any], shard_id: str) -> List[Dict[str, Any]]:
+    """Registros de usuario de un registro de Kinesis (varios si es un agregado KPL)"""
+    user_records = kpl.deaggregate(record['Data'])
+    if user_records is None:
+        return [decode_record(record, shard_id)]
+    expanded = []
+    for index, (partition_key, data) in enumerate(user_records):
+        decoded = decode_record(dict(record, Data=data, PartitionKey=partition_key), shard_id)
+        decoded['sub_sequence_number'] = index
+        expanded.append(decoded)
+    return expanded
+
+
+class MultiShardReader:
+    """
+    Lee varios shards de un stream con un pool de hilos acotado.
+
+    Cada tarea del pool es una única llamada a get_records; el generador records()
+    planifica la siguiente lectura de un shard solo después de entregar su lote, de
+    modo que un consumidor lento frena la lectura (backpressure) y cualquier número
+    de shards se reparte entre max_workers hilos.
+
+    Posición inicial (iterator_type):
+    - TRIM_HORIZON / LATEST / AT_TIMESTAMP (timestamp obligatorio).
+    - AFTER_SEQUENCE_NUMBER: sequence_number si se lee un único shard; si no, se
+      reanuda desde los checkpoints locales (TRIM_HORIZON en shards sin checkpoint).
+
+    Los hijos de un resharding se empiezan a leer cuando todos sus padres leídos se
+    cierran. Si save_checkpoints, al terminar se guarda por shard el último registro
+    entregado. Con follow=False la lectura termina cuando todos los shards están al día.
+    """
+
+    def __init__(self, kinesis, stream_name: str, region: str,
+                 iterator_type: str = 'TRIM_HORIZON', timestamp: Optional[datetime] = None,
+                 sequence_number: Optional[str] = None, shard_ids: Optional[List[str]] = None,
+                 max_records: int = DEFAULT_MAX_RECORDS, max_seconds: float = DEFAULT_MAX_SECONDS,
+                 records_per_second: Optional[float] = None, follow: bool = False,
+                 save_checkpoints: bool = True, max_workers: int = MAX_SHARD_WORKERS,
+                 checkpoint_store: Optional[ShardCheckpoints] = None):
+        if iterator_type not in ITERATOR_TYPES:
+            raise ValueError(f'Tipo de iterador no soportado: {iterator_type}')
+        if iterator_type == 'AT_TIMESTAMP' and timestamp is None:
+            raise ValueError('AT_TIMESTAMP requiere una fecha de inicio')
+        self.kinesis = kinesis
+        self.stream_name = stream_name
+        self.region = region
+        self.iterator_type = iterator_type
+        self.timestamp = timestamp
+        self.sequence_number = sequence_number
+        self.shard_ids = shard_ids
+        self.max_records = max_records
+        self.max_seconds = max_seconds
+        self.records_per_second = records_per_second
+        self.follow = follow
+        self.save_checkpoints = save_checkpoints
+        self.max_workers = max(1, max_workers)
+        self.checkpoint_store = checkpoint_store or checkpoints
+
+        self.positions: Dict[str, str] = {}
+        self.stats: Dict[str, Any] = {
+            'records': 0, 'polls': 0, 'throttled': 0, 'shards_read': [], 'shards_closed': [],
+            'millis_behind_latest': {}, 'errors': {}, 'seconds': 0.0, 'stopped_by': None
+        }
+
+    def _start_position(self, shard_id: str, stored: Dict[str, str], is_child: bool) -> Dict[str, Any]:
+        if self.iterator_type == 'AFTER_SEQUENCE_NUMBER':
+            if self.sequence_number and self.shard_ids and len(self.shard_ids) == 1:
+                return {'ShardIteratorType': 'AFTER_SEQUENCE_NUMBER',
+                        'StartingSequenceNumber': self.sequence_number}
+            if stored.get(shard_id):
+                return {'ShardIteratorType': 'AFTER_SEQUENCE_NUMBER',
+                        'StartingSequenceNumber': stored[shard_id]}
+            return {'ShardIteratorType': 'TRIM_HORIZON'}
+        if self.iterator_type == 'AT_TIMESTAMP':
+            return {'ShardIteratorType': 'AT_TIMESTAMP', 'Timestamp': self.timestamp}
+        if is_child:
+            # Un hijo abierto durante la lectura se lee entero para no perder registros
+            return {'ShardIteratorType': 'TRIM_HORIZON'}
+        return {'ShardIteratorType': self.iterator_type}
+
+    def _plan_shards(self):
+        """Shards a leer ya y shards hijos en espera de que se cierren sus padres"""
+        shards = list_shards(self.kinesis, self.stream_name)
+        by_id = {shard['ShardId']: shard for shard in shards}
+        if self.shard_ids:
+            missing = [s for s in self.shard_ids if s not in by_id]
+            if missing:
+                raise ValueError(f'Shards inexistentes en {self.stream_name}: {", ".join(missing)}')
+            return [by_id[s] for s in self.shard_ids], {}
+
+        if self.iterator_type == 'LATEST':
+            # Los shards cerrados no recibirán registros nuevos
+            shards = [s for s in shards if 'EndingSequenceNumber' not in s.get('SequenceNumberRange', {})]
+            by_id = {shard['ShardId']: shard for shard in shards}
+
+        initial, waiting = [], {}
+        for shard in shards:
+            parents = [p for p in (shard.get('ParentShardId'), shard.get('AdjacentParentShardId'))
+                       if p and p in by_id]
+            if parents:
+                waiting[shard['ShardId']] = set(parents)
+            else:
+                initial.append(shard)
+        return initial, waiting
+
+    def _get_iterator(self, shard_id: str, position: Dict[str, Any]) -> Optional[str]:
+        response = self.kinesis.get_shard_iterator(StreamName=self.stream_name, ShardId=shard_id, **position)
+        return response.get('ShardIterator')
+
+    def _poll(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Una llamada a get_records (se ejecuta en el pool)"""
+        if state['iterator'] is None:
+            state['iterator'] = self._get_iterator(state['shard_id'], state['position'])
+        return self.kinesis.get_records(ShardIterator=state['iterator'], Limit=GET_RECORDS_LIMIT)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        started = time.monotonic()
+        deadline = started + self.max_seconds
+        stored = self.checkpoint_store.for_stream(self.region, self.stream_name) \
+            if self.iterator_type == 'AFTER_SEQUENCE_NUMBER' else {}
+        initial, waiting = self._plan_shards()
+
+        states: Dict[str, Dict[str, Any]] = {}
+        schedule: List = []  # heap de (instante, shard_id)
+        caught_up = set()
+
+        def _open(shard_id, is_child):
+            states[shard_id] = {'shard_id': shard_id, 'iterator': None, 'attempt': 0,
+                                'position': self._start_position(shard_id, stored, is_child)}
+            self.stats['shards_read'].append(shard_id)
+            heapq.heappush(schedule, (time.monotonic(), shard_id))
+
+        for shard in initial:
+            _open(shard['ShardId'], False)
+
+        next_delivery = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(initial) + len(waiting))),
+                                      thread_name_prefix='kinesis-reader')
+        pending = {}
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    self.stats['stopped_by'] = 'max_seconds'
+                    break
+                if not self.follow and states and caught_up >= set(states) and not pending:
+                    self.stats['stopped_by'] = 'caught_up'
+                    break
+                while schedule and schedule[0][0] <= now and len(pending) < self.max_workers:
+                    _, shard_id = heapq.heappop(schedule)
+                    pending[executor.submit(self._poll, states[shard_id])] = shard_id
+                if not pending:
+                    if not schedule:
+                        self.stats['stopped_by'] = 'no_shards'
+                        break
+                    time.sleep(max(0.0, min(schedule[0][0], deadline) - now))
+                    continue
+
+                timeout = min(deadline - now, (schedule[0][0] - now) if schedule else 0.5, 0.5)
+                done, _ = wait(pending, timeout=max(0.01, timeout), return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard_id = pending.pop(future)
+                    state = states[shard_id]
+                    try:
+                        response = future.result()
+                    except ClientError as e:
+                        code = e.response.get('Error', {}).get('Code')
+                        if code == 'ExpiredIteratorException':
+                            # Se reanuda tras el último registro entregado
+                            state['iterator'] = None
+                            if shard_id in self.positions:
+                                state['position'] = {'ShardIteratorType': 'AFTER_SEQUENCE_NUMBER',
+                                                     'StartingSequenceNumber': self.positions[shard_id]}
+                            heapq.heappush(schedule, (time.monotonic(), shard_id))
+                        elif code in THROTTLE_CODES:
+                            self.stats['throttled'] += 1
+                            state['attempt'] += 1
+                            heapq.heappush(schedule, (time.monotonic() + backoff_delay(state['attempt'], base=0.2),
+                                                      shard_id))
+                        else:
+                            logger.warning(f'Kinesis: error leyendo {shard_id} de {self.stream_name}: {str(e)}')
+                            self.stats['errors'][shard_id] = str(e)
+                            caught_up.add(shard_id)
+                        continue
+                    except Exception as e:
+                        logger.warning(f'Kinesis: error leyendo {shard_id} de {self.stream_name}: {str(e)}')
+                        self.stats['errors'][shard_id] = str(e)
+                        caught_up.add(shard_id)
+                        continue
+
+                    self.stats['polls'] += 1
+                    state['attempt'] = 0
+                    records = response.get('Records', [])
+                    behind = response.get('MillisBehindLatest')
+                    self.stats['millis_behind_latest'][shard_id] = behind
+
+                    for record in records:
+                        if self.stats['records'] >= self.max_records:
+                            break
+                        if self.records_per_second:
+                            next_delivery = max(next_delivery, time.monotonic())
+                            time.sleep(max(0.0, next_delivery - time.monotonic()))
+                            next_delivery += 1.0 / self.records_per_second
+                        # Un agregado KPL se entrega como sus registros de usuario; el
+                        # checkpoint avanza solo cuando se ha entregado el agregado completo
+                        for user_record in expand_record(record, shard_id):
+                            yield user_record
+                            self.stats['records'] += 1
+                        self.positions[shard_id] = record['SequenceNumber']
+                    if self.stats['records'] >= self.max_records:
+                        self.stats['stopped_by'] = 'max_records'
+                        return
+
+                    state['iterator'] = response.get('NextShardIterator')
+                    if state['iterator'] is None:
+                        # Shard cerrado y agotado: se liberan los hijos cuyos padres ya terminaron
+                        self.stats['shards_closed'].append(shard_id)
+                        caught_up.add(shard_id)
+                        for child_id, parents in list(waiting.items()):
+                            parents.discard(shard_id)
+                            if not parents:
+                                del waiting[child_id]
+                                _open(child_id, True)
+                        continue
+
+                    if not records and behind == 0:
+                        caught_up.add(shard_id)
+                        delay = IDLE_POLL_INTERVAL
+                    else:
+                        caught_up.discard(shard_id)
+                        delay = MIN_POLL_INTERVAL
+                    if self.follow or shard_id not in caught_up:
+                        heapq.heappush(schedule, (time.monotonic() + delay, shard_id))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.stats['seconds'] = round(time.monotonic() - started, 3)
+            if self.save_checkpoints:
+                try:
+                    self.checkpoint_store.update(self.region, self.stream_name, self.positions)
+                except OSError as e:
+                    logger.error(f'Kinesis: no se pudieron guardar los checkpoints: {str(e)}')
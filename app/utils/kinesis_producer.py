@@ -0,0 +1,269 @@
+"""
+Productor masivo para Kinesis
+PutRecords en lotes de hasta 500 registros / 5 MB, reintento solo de las entradas
+fallidas, reparto de claves de partición entre shards, agregación opcional estilo
+KPL e importación de ficheros JSONL/CSV.
+"""
+import bisect
+import csv
+import hashlib
+import io
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from app.utils import kpl
+from app.utils.batching import chunked_by_size, backoff_delay, run_bounded
+
+logger = logging.getLogger(__name__)
+
+# Límites de PutRecords
+PUT_RECORDS_MAX_COUNT = 500
+PUT_RECORDS_MAX_BYTES = 5 * 1024 * 1024
+MAX_RECORD_BYTES = 1024 * 1024
+# Tamaño objetivo de un agregado (mismo valor por defecto que la KPL)
+AGGREGATION_MAX_BYTES = 50 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 8
+
+PARTITION_STRATEGIES = ('field', 'random', 'round_robin')
+THROTTLE_CODES = ('ProvisionedThroughputExceededException', 'LimitExceededException',
+                  'ThrottlingException')
+
+
+class ProducerResult:
+    """Resultado agregado de un envío masivo (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.records = 0           # registros de usuario aceptados
+        self.kinesis_records = 0   # registros de Kinesis aceptados (agregados cuentan 1)
+        self.bytes = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed: List[Dict[str, Any]] = []
+        self.errors: List[str] = []
+        self.shards: Counter = Counter()
+
+    def add_success(self, entry: Dict[str, Any], shard_id: Optional[str]):
+        with self._lock:
+            self.records += entry.get('_records', 1)
+            self.kinesis_records += 1
+            self.bytes += record_size(entry)
+            if shard_id:
+                self.shards[shard_id] += 1
+
+    def add_batch(self, retries: int):
+        with self._lock:
+            self.batches += 1
+            self.retries += retries
+
+    def add_failed(self, entries: List[Dict[str, Any]], error: Optional[str] = None):
+        with self._lock:
+            self.failed.extend(entries)
+            if error and len(self.errors) < 100:
+                self.errors.append(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'records': self.records,
+                'kinesis_records': self.kinesis_records,
+                'failed_count': sum(e.get('_records', 1) for e in self.failed),
+                'batches': self.batches,
+                'retries': self.retries,
+                'megabytes': round(self.bytes / (1024 * 1024), 3),
+                'seconds': round(elapsed, 3),
+                'records_per_second': round(self.records / elapsed, 1) if elapsed else 0.0,
+                'shards': dict(self.shards),
+                'errors': list(self.errors)
+            }
+
+
+def record_size(entry: Dict[str, Any]) -> int:
+    """Tamaño que cuenta para los límites de Kinesis: datos + clave de partición"""
+    return len(entry['Data']) + len(entry['PartitionKey'].encode('utf-8'))
+
+
+def _api_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: entry[k] for k in ('Data', 'PartitionKey', 'ExplicitHashKey') if k in entry}
+
+
+class ShardMap:
+    """Rangos de hash de los shards abiertos para predecir el shard de una clave"""
+
+    def __init__(self, shards: List[Dict[str, Any]]):
+        ranges = sorted(
+            (int(s['HashKeyRange']['StartingHashKey']), int(s['HashKeyRange']['EndingHashKey']), s['ShardId'])
+            for s in shards if 'EndingSequenceNumber' not in s.get('SequenceNumberRange', {})
+        )
+        self.starts = [r[0] for r in ranges]
+        self.ranges = ranges
+
+    @classmethod
+    def load(cls, kinesis, stream_name: str) -> 'ShardMap':
+        from app.utils.kinesis_consumer import list_shards
+        return cls(list_shards(kinesis, stream_name))
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def shard_for(self, partition_key: str, explicit_hash_key: Optional[str] = None) -> Optional[str]:
+        if not self.ranges:
+            return None
+        value = int(explicit_hash_key) if explicit_hash_key is not None else \
+            int.from_bytes(hashlib.md5(partition_key.encode('utf-8')).digest(), 'big')
+        index = bisect.bisect_right(self.starts, value) - 1
+        return self.ranges[max(index, 0)][2]
+
+    def midpoints(self) -> List[str]:
+        """Un ExplicitHashKey en el centro de cada shard (reparto round robin exacto)"""
+        return [str((start + end) // 2) for start, end, _ in self.ranges]
+
+
+def build_entries(payloads: Iterable[Tuple[bytes, Optional[Dict[str, Any]]]],
+                  strategy: str = 'random', key_field: Optional[str] = None,
+                  shard_map: Optional[ShardMap] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Convierte (datos, objeto) en entradas de PutRecords según la estrategia de partición:
+    - field: la clave es objeto[key_field] (aleatoria si falta).
+    - random: clave UUID por registro; reparte uniformemente entre shards.
+    - round_robin: ExplicitHashKey rotando por el centro de cada shard abierto.
+    """
+    if strategy not in PARTITION_STRATEGIES:
+        raise ValueError(f'Estrategia de partición no soportada: {strategy}')
+    hash_keys = itertools.cycle(shard_map.midpoints()) if strategy == 'round_robin' and shard_map else None
+    for index, (data, obj) in enumerate(payloads):
+        entry: Dict[str, Any] = {'Data': data}
+        if strategy == 'field' and key_field and isinstance(obj, dict) and obj.get(key_field) not in (None, ''):
+            entry['PartitionKey'] = str(obj[key_field])[:256]
+        elif hash_keys is not None:
+            entry['PartitionKey'] = str(index)
+            entry['ExplicitHashKey'] = next(hash_keys)
+        else:
+            entry['PartitionKey'] = uuid.uuid4().hex
+        yield entry
+
+
+def aggregate_entries(entries: Iterable[Dict[str, Any]], shard_map: ShardMap,
+                      max_bytes: int = AGGREGATION_MAX_BYTES) -> Iterator[Dict[str, Any]]:
+    """
+    Agrupa registros de usuario en agregados KPL por shard de destino, de modo que
+    cada registro sigue llegando al shard que le corresponde por su clave.
+    """
+    pending: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    pending_bytes: Dict[Optional[str], int] = {}
+
+    def _flush(shard_id):
+        group = pending.pop(shard_id)
+        pending_bytes.pop(shard_id)
+        if len(group) == 1:
+            return group[0]
+        first = group[0]
+        aggregated = {
+            'Data': kpl.aggregate([(e['PartitionKey'], e['Data'], e.get('ExplicitHashKey')) for e in group]),
+            'PartitionKey': first['PartitionKey'],
+            '_records': len(group)
+        }
+        if 'ExplicitHashKey' in first:
+            aggregated['ExplicitHashKey'] = first['ExplicitHashKey']
+        return aggregated
+
+    for entry in entries:
+        size = kpl.record_overhead(entry['PartitionKey'], len(entry['Data']))
+        if size >= max_bytes:
+            yield entry
+            continue
+        shard_id = shard_map.shard_for(entry['PartitionKey'], entry.get('ExplicitHashKey'))
+        if shard_id in pending and pending_bytes[shard_id] + size > max_bytes:
+            yield _flush(shard_id)
+        pending.setdefault(shard_id, []).append(entry)
+        pending_bytes[shard_id] = pending_bytes.get(shard_id, 0) + size
+    for shard_id in list(pending):
+        yield _flush(shard_id)
+
+
+def put_records(kinesis, stream_name: str, entries: Iterable[Dict[str, Any]],
+                max_workers: int = DEFAULT_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES,
+                aggregate: bool = False, shard_map: Optional[ShardMap] = None,
+                result: Optional[ProducerResult] = None) -> ProducerResult:
+    """
+    Envía entradas {'Data', 'PartitionKey'[, 'ExplicitHashKey']} con PutRecords en lotes
+    de hasta 500 registros / 5 MB y max_workers lotes concurrentes. Solo se reenvían las
+    entradas con ErrorCode (con backoff y jitter); las que agotan los reintentos quedan en
+    result.failed. Con aggregate se empaquetan en agregados KPL por shard.
+    El cliente se comparte entre hilos: usar max_pool_connections >= max_workers.
+    """
+    result = result or ProducerResult()
+    if aggregate:
+        entries = aggregate_entries(entries, shard_map or ShardMap.load(kinesis, stream_name))
+
+    def _send(batch: List[Dict[str, Any]]):
+        retries = 0
+        pending = batch
+        for attempt in range(max_retries + 1):
+            try:
+                response = kinesis.put_records(StreamName=stream_name,
+                                               Records=[_api_entry(e) for e in pending])
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code in THROTTLE_CODES and attempt < max_retries:
+                    retries += 1
+                    time.sleep(backoff_delay(attempt, base=0.1))
+                    continue
+                logger.warning(f'Kinesis: PutRecords falló en {stream_name}: {str(e)}')
+                result.add_failed(pending, str(e))
+                pending = []
+                break
+            failed = []
+            for entry, outcome in zip(pending, response.get('Records', [])):
+                if outcome.get('ErrorCode'):
+                    failed.append(entry)
+                else:
+                    result.add_success(entry, outcome.get('ShardId'))
+            if not failed:
+                pending = []
+                break
+            pending = failed
+            if attempt < max_retries:
+                retries += 1
+                time.sleep(backoff_delay(attempt, base=0.1))
+        if pending:
+            result.add_failed(pending, f'{len(pending)} registro(s) sin enviar tras {max_retries} reintentos')
+        result.add_batch(retries)
+
+    batches = chunked_by_size(entries, PUT_RECORDS_MAX_COUNT, PUT_RECORDS_MAX_BYTES, record_size)
+    run_bounded(batches, _send, max_workers, 'kinesis-producer')
+    return result
+
+
+def read_payloads(file_storage, fmt: Optional[str] = None) -> Iterator[Tuple[bytes, Optional[Dict[str, Any]]]]:
+    """
+    Registros de un fichero subido: JSONL (cada línea tal cual) o CSV (cada fila como
+    objeto JSON). Devuelve (datos, objeto) para poder extraer la clave de partición.
+    """
+    filename = (file_storage.filename or '').lower()
+    fmt = fmt or ('csv' if filename.endswith('.csv') else 'jsonl')
+    stream = io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig')
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield json.dumps(row, ensure_ascii=False).encode('utf-8'), row
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            obj = None
+        yield line.encode('utf-8'), obj if isinstance(obj, dict) else None
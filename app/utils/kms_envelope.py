@@ -0,0 +1,287 @@
+"""
+Cifrado de sobre (envelope encryption) con KMS
+Una clave de datos de generate_data_key cifra en local con AES-GCM por bloques,
+sin el límite de 4 KB de Encrypt y sin una llamada a KMS por mensaje: la clave de
+datos se reutiliza durante un número acotado de mensajes, bytes y segundos. Al
+descifrar se cachea la clave de datos descifrada por su blob cifrado.
+
+Formato del mensaje (enteros big-endian):
+    cabecera: MAGIC | versión (1) | id de mensaje (16) | tamaño de bloque (4)
+              | long. contexto (2) | contexto JSON | long. clave cifrada (2) | clave cifrada
+    bloques:  final (1) | long. (4) | AES-GCM(bloque), con AAD = cabecera + índice + final
+
+Cada mensaje cifra con una clave derivada (HKDF-SHA256) de la clave de datos y su id
+de mensaje, así que los nonces (contador de bloque) no se repiten aunque la clave de
+datos se comparta entre mensajes.
+"""
+import io
+import json
+import os
+import struct
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Hashable, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.utils.cache import TTLCache
+
+MAGIC = b'AWSE'
+VERSION = 1
+MESSAGE_ID_SIZE = 16
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Límites de reutilización de una clave de datos para cifrar
+DATA_KEY_MAX_AGE = 300.0
+DATA_KEY_MAX_MESSAGES = 10000
+DATA_KEY_MAX_BYTES = 2 ** 32
+# Claves de datos ya descifradas (por blob cifrado) para descifrar
+DECRYPT_KEY_TTL = 300.0
+
+_HEADER = struct.Struct('>4sB16sI')
+_FRAME = struct.Struct('>BI')
+_NONCE = struct.Struct('>4xQ')
+_AAD = struct.Struct('>QB')
+
+
+class EnvelopeError(ValueError):
+    """Mensaje con formato inválido, truncado o manipulado"""
+
+
+class DataKeyCache:
+    """
+    Claves de datos en claro para cifrar, por (ámbito, clave KMS, contexto). Una
+    entrada se retira al superar max_age segundos, max_messages mensajes o
+    max_bytes bytes cifrados, lo que ocurra antes.
+    """
+
+    def __init__(self, max_age: float = DATA_KEY_MAX_AGE, max_messages: int = DATA_KEY_MAX_MESSAGES,
+                 max_bytes: int = DATA_KEY_MAX_BYTES, max_entries: int = 64):
+        self.max_age = max_age
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, key: Hashable, size: int, generate) -> Tuple[bytes, bytes, bool]:
+        """
+        (clave en claro, clave cifrada, venía de caché) para cifrar un mensaje de size
+        bytes. generate() -> (en claro, cifrada) solo se llama si no hay entrada válida.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and (now - entry['created'] > self.max_age or entry['messages'] >= self.max_messages
+                          or entry['bytes'] + size > self.max_bytes):
+                del self._entries[key]
+                entry = None
+            if entry:
+                entry['messages'] += 1
+                entry['bytes'] += size
+                self.hits += 1
+                return entry['plaintext'], entry['ciphertext'], True
+        plaintext, ciphertext = generate()
+        with self._lock:
+            self.misses += 1
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]['created'])
+                del self._entries[oldest]
+            self._entries[key] = {'plaintext': plaintext, 'ciphertext': ciphertext, 'created': now,
+                                  'messages': 1, 'bytes': size}
+        return plaintext, ciphertext, False
+
+    def invalidate(self, scope: Optional[Hashable] = None):
+        with self._lock:
+            for key in [k for k in self._entries if scope is None or k[0] == scope]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+_encrypt_keys = DataKeyCache()
+_decrypt_keys = TTLCache(ttl=DECRYPT_KEY_TTL, max_entries=256)
+
+
+def _context_key(context: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((context or {}).items()))
+
+
+def _message_key(data_key: bytes, message_id: bytes) -> AESGCM:
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=message_id, info=MAGIC + bytes([VERSION]))
+    return AESGCM(hkdf.derive(data_key))
+
+
+def _build_header(message_id: bytes, chunk_size: int, context: Optional[Dict[str, str]],
+                  encrypted_key: bytes) -> bytes:
+    context_bytes = json.dumps(context or {}, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return b''.join([
+        _HEADER.pack(MAGIC, VERSION, message_id, chunk_size),
+        struct.pack('>H', len(context_bytes)), context_bytes,
+        struct.pack('>H', len(encrypted_key)), encrypted_key,
+    ])
+
+
+def _read_exact(reader: BinaryIO, size: int) -> bytes:
+    data = reader.read(size)
+    if len(data) != size:
+        raise EnvelopeError('Mensaje truncado')
+    return data
+
+
+def read_header(reader: BinaryIO) -> Dict[str, Any]:
+    fixed = _read_exact(reader, _HEADER.size)
+    magic, version, message_id, chunk_size = _HEADER.unpack(fixed)
+    if magic != MAGIC or version != VERSION:
+        raise EnvelopeError('No es un mensaje de cifrado de sobre reconocido')
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise EnvelopeError(f'Tamaño de bloque inválido: {chunk_size}')
+    context_len = _read_exact(reader, 2)
+    context_bytes = _read_exact(reader, struct.unpack('>H', context_len)[0])
+    key_len = _read_exact(reader, 2)
+    encrypted_key = _read_exact(reader, struct.unpack('>H', key_len)[0])
+    try:
+        context = json.loads(context_bytes)
+    except ValueError as e:
+        raise EnvelopeError(f'Contexto de cifrado ilegible: {e}') from e
+    if not isinstance(context, dict) or not all(
+            isinstance(k, str) and isinstance(v, str) for k, v in context.items()):
+        raise EnvelopeError('El contexto de cifrado debe ser un objeto de cadenas')
+    return {
+        'message_id': message_id,
+        'chunk_size': chunk_size,
+        'context': context or None,
+        'encrypted_key': encrypted_key,
+        'raw': fixed + context_len + context_bytes + key_len + encrypted_key,
+    }
+
+
+def encrypt_stream(kms, scope: Hashable, key_id: str, reader: BinaryIO, writer: BinaryIO,
+                   context: Optional[Dict[str, str]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   size_hint: int = 0, cache: Optional[DataKeyCache] = None) -> Dict[str, Any]:
+    """
+    Cifra reader en writer por bloques de chunk_size bytes. size_hint (si se conoce)
+    cuenta para el límite de bytes de la clave de datos cacheada.
+    """
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError(f'chunk_size debe estar entre 1 y {MAX_CHUNK_SIZE}')
+    cache = _encrypt_keys if cache is None else cache
+    started = time.monotonic()
+
+    def _generate():
+        params = {'KeyId': key_id, 'KeySpec': 'AES_256'}
+        if context:
+            params['EncryptionContext'] = context
+        response = kms.generate_data_key(**params)
+        return response['Plaintext'], response['CiphertextBlob']
+
+    data_key, encrypted_key, cached = cache.acquire((scope, key_id, _context_key(context)), size_hint, _generate)
+    message_id = os.urandom(MESSAGE_ID_SIZE)
+    aead = _message_key(data_key, message_id)
+    header = _build_header(message_id, chunk_size, context, encrypted_key)
+    writer.write(header)
+
+    bytes_in, bytes_out, chunks = 0, len(header), 0
+    current = reader.read(chunk_size)
+    while True:
+        following = reader.read(chunk_size) if len(current) == chunk_size else b''
+        final = not following
+        sealed = aead.encrypt(_NONCE.pack(chunks), current, header + _AAD.pack(chunks, final))
+        writer.write(_FRAME.pack(final, len(sealed)))
+        writer.write(sealed)
+        bytes_in += len(current)
+        bytes_out += _FRAME.size + len(sealed)
+        chunks += 1
+        if final:
+            break
+        current = following
+
+    return {
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'chunks': chunks,
+        'cached_key': cached,
+        'seconds': round(time.monotonic() - started, 4),
+    }
+
+
+def _data_key(kms, scope: Hashable, header: Dict[str, Any]) -> Tuple[bytes, bool]:
+    cache_key = (scope, header['encrypted_key'], _context_key(header['context']))
+    data_key = _decrypt_keys.get(cache_key)
+    if data_key is not None:
+        return data_key, True
+    params = {'CiphertextBlob': header['encrypted_key']}
+    if header['context']:
+        params['EncryptionContext'] = header['context']
+    data_key = kms.decrypt(**params)['Plaintext']
+    _decrypt_keys.set(cache_key, data_key)
+    return data_key, False
+
+
+def decrypt_stream(kms, scope: Hashable, reader: BinaryIO, writer: BinaryIO) -> Dict[str, Any]:
+    """Descifra un mensaje de encrypt_stream; falla si se ha truncado, reordenado o manipulado"""
+    started = time.monotonic()
+    header = read_header(reader)
+    data_key, cached = _data_key(kms, scope, header)
+    aead = _message_key(data_key, header['message_id'])
+    limit = header['chunk_size'] + TAG_SIZE
+
+    bytes_out, chunks = 0, 0
+    while True:
+        frame = reader.read(_FRAME.size)
+        if len(frame) != _FRAME.size:
+            raise EnvelopeError('Mensaje truncado: falta el bloque final')
+        final, length = _FRAME.unpack(frame)
+        if length > limit:
+            raise EnvelopeError('Bloque mayor que el tamaño declarado')
+        sealed = _read_exact(reader, length)
+        try:
+            chunk = aead.decrypt(_NONCE.pack(chunks), sealed, header['raw'] + _AAD.pack(chunks, final))
+        except Exception:
+            raise EnvelopeError(f'Bloque {chunks} no válido: clave incorrecta o datos manipulados')
+        writer.write(chunk)
+        bytes_out += len(chunk)
+        chunks += 1
+        if final:
+            break
+    if reader.read(1):
+        raise EnvelopeError('Datos adicionales tras el bloque final')
+
+    return {
+        'bytes_out': bytes_out,
+        'chunks': chunks,
+        'cached_key': cached,
+        'context': header['context'],
+        'seconds': round(time.monotonic() - started, 4),
+    }
+
+
+def encrypt_bytes(kms, scope: Hashable, key_id: str, data: bytes, context: Optional[Dict[str, str]] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[bytes, Dict[str, Any]]:
+    output = io.BytesIO()
+    stats = encrypt_stream(kms, scope, key_id, io.BytesIO(data), output, context, chunk_size, size_hint=len(data))
+    return output.getvalue(), stats
+
+
+def decrypt_bytes(kms, scope: Hashable, message: bytes) -> Tuple[bytes, Dict[str, Any]]:
+    output = io.BytesIO()
+    stats = decrypt_stream(kms, scope, io.BytesIO(message), output)
+    return output.getvalue(), stats
+
+
+def cache_stats() -> Dict[str, int]:
+    return _encrypt_keys.stats()
+
+
+def invalidate(scope: Hashable):
+    """Olvida las claves de datos en claro de un ámbito (p. ej. al deshabilitar una clave KMS)"""
+    _encrypt_keys.invalidate(scope)
+    _decrypt_keys.invalidate_prefix(scope)
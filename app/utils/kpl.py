@@ -0,0 +1,133 @@
+"""
+Formato de agregación de la Kinesis Producer Library (KPL)
+Varios registros de usuario en un único registro de Kinesis:
+magic (4 bytes) + protobuf AggregatedRecord + MD5 del protobuf (16 bytes).
+Codificación protobuf mínima escrita a mano para no añadir dependencias.
+"""
+import hashlib
+from typing import List, Optional, Tuple
+
+KPL_MAGIC = b'\xf3\x89\x9a\xc2'
+DIGEST_SIZE = 16
+
+# AggregatedRecord: 1 partition_key_table, 2 explicit_hash_key_table, 3 records
+# Record: 1 partition_key_index, 2 explicit_hash_key_index, 3 data
+_WIRE_VARINT = 0
+_WIRE_64BIT = 1
+_WIRE_BYTES = 2
+_WIRE_32BIT = 5
+
+UserRecord = Tuple[str, bytes, Optional[str]]  # (partition key, datos, explicit hash key)
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _field_bytes(field: int, payload: bytes) -> bytes:
+    return _varint((field << 3) | _WIRE_BYTES) + _varint(len(payload)) + payload
+
+
+def _field_varint(field: int, value: int) -> bytes:
+    return _varint((field << 3) | _WIRE_VARINT) + _varint(value)
+
+
+def _read_varint(buffer: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        if pos >= len(buffer):
+            raise ValueError('varint truncado')
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(buffer: bytes):
+    """Itera (campo, tipo, valor) de un mensaje protobuf"""
+    pos = 0
+    while pos < len(buffer):
+        key, pos = _read_varint(buffer, pos)
+        field, wire = key >> 3, key & 0x07
+        if wire == _WIRE_VARINT:
+            value, pos = _read_varint(buffer, pos)
+        elif wire == _WIRE_BYTES:
+            length, pos = _read_varint(buffer, pos)
+            value, pos = buffer[pos:pos + length], pos + length
+            if pos > len(buffer):
+                raise ValueError('campo truncado')
+        elif wire == _WIRE_64BIT:
+            value, pos = buffer[pos:pos + 8], pos + 8
+        elif wire == _WIRE_32BIT:
+            value, pos = buffer[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f'tipo de campo protobuf no soportado: {wire}')
+        yield field, wire, value
+
+
+def record_overhead(partition_key: str, data_size: int) -> int:
+    """Bytes aproximados que añade un registro al agregado (para decidir cuándo cerrar uno)"""
+    return len(partition_key.encode('utf-8')) + data_size + 16
+
+
+def aggregate(records: List[UserRecord]) -> bytes:
+    """Serializa registros de usuario en un registro agregado KPL"""
+    key_index, hash_index = {}, {}
+    body = bytearray()
+    for partition_key, data, explicit_hash_key in records:
+        record = _field_varint(1, key_index.setdefault(partition_key, len(key_index)))
+        if explicit_hash_key is not None:
+            record += _field_varint(2, hash_index.setdefault(explicit_hash_key, len(hash_index)))
+        record += _field_bytes(3, data)
+        body += _field_bytes(3, record)
+
+    message = b''.join(_field_bytes(1, key.encode('utf-8')) for key in key_index)
+    message += b''.join(_field_bytes(2, key.encode('utf-8')) for key in hash_index)
+    message += bytes(body)
+    return KPL_MAGIC + message + hashlib.md5(message).digest()
+
+
+def is_aggregated(data: bytes) -> bool:
+    return len(data) > len(KPL_MAGIC) + DIGEST_SIZE and data[:len(KPL_MAGIC)] == KPL_MAGIC
+
+
+def deaggregate(data: bytes) -> Optional[List[Tuple[str, bytes]]]:
+    """
+    Registros de usuario (partition key, datos) de un registro agregado KPL.
+    None si los datos no son un agregado válido (se tratan como un registro normal).
+    """
+    if not is_aggregated(data):
+        return None
+    message, digest = data[len(KPL_MAGIC):-DIGEST_SIZE], data[-DIGEST_SIZE:]
+    if hashlib.md5(message).digest() != digest:
+        return None
+    try:
+        keys: List[str] = []
+        raw_records: List[bytes] = []
+        for field, wire, value in _fields(message):
+            if field == 1 and wire == _WIRE_BYTES:
+                keys.append(value.decode('utf-8'))
+            elif field == 3 and wire == _WIRE_BYTES:
+                raw_records.append(value)
+        records = []
+        for raw in raw_records:
+            key_index, payload = 0, b''
+            for field, wire, value in _fields(raw):
+                if field == 1 and wire == _WIRE_VARINT:
+                    key_index = value
+                elif field == 3 and wire == _WIRE_BYTES:
+                    payload = value
+            records.append((keys[key_index], payload))
+        return records
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
@@ -0,0 +1,284 @@
+"""
+Despliegue de código de funciones Lambda
+El paquete se vuelca a un fichero temporal calculando a la vez su SHA-256 (mismo
+formato que CodeSha256), se omiten los despliegues sin cambios, los paquetes grandes
+se suben a S3 por multipart en streaming y varias funciones se despliegan en paralelo
+con concurrencia acotada y un informe de progreso consultable.
+"""
+import base64
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from app.utils import inventory, lambda_inventory
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 1024 * 1024
+# Paquetes hasta este tamaño se mantienen en memoria al volcarlos
+SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+# Por encima se suben a S3 si hay bucket de staging (la subida directa admite 50 MB)
+DEFAULT_S3_THRESHOLD = 10 * 1024 * 1024
+DIRECT_UPLOAD_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 16
+STAGING_PREFIX = 'lambda-deploy/'
+STAGING_BUCKET = os.environ.get('LAMBDA_STAGING_BUCKET') or None
+MAX_RUNS = 50
+
+S3_TRANSFER_CONFIG = TransferConfig(multipart_threshold=8 * 1024 * 1024,
+                                    multipart_chunksize=8 * 1024 * 1024,
+                                    max_concurrency=4)
+
+
+class CodePackage:
+    """Paquete ZIP volcado a un fichero temporal, con su SHA-256 y tamaño"""
+
+    def __init__(self, fileobj, sha256: str, hexdigest: str, size: int):
+        self.fileobj = fileobj
+        self.sha256 = sha256
+        self.hexdigest = hexdigest
+        self.size = size
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _spool(cls, chunks) -> 'CodePackage':
+        digest = hashlib.sha256()
+        size = 0
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+        for chunk in chunks:
+            digest.update(chunk)
+            spooled.write(chunk)
+            size += len(chunk)
+        spooled.seek(0)
+        return cls(spooled, base64.b64encode(digest.digest()).decode('ascii'), digest.hexdigest(), size)
+
+    @classmethod
+    def from_stream(cls, stream) -> 'CodePackage':
+        """Desde un fichero abierto o el stream de una subida, leyendo por bloques"""
+        return cls._spool(iter(lambda: stream.read(READ_CHUNK_BYTES), b''))
+
+    @classmethod
+    def from_path(cls, path: str) -> 'CodePackage':
+        with open(path, 'rb') as handle:
+            return cls.from_stream(handle)
+
+    @classmethod
+    def from_base64(cls, text: str) -> 'CodePackage':
+        """Desde un ZIP en base64, decodificado por bloques (múltiplos de 4 caracteres)"""
+        text = ''.join(text.split())
+        step = (READ_CHUNK_BYTES // 3) * 4
+        return cls._spool(base64.b64decode(text[i:i + step], validate=True)
+                          for i in range(0, len(text), step))
+
+    def read(self) -> bytes:
+        with self._lock:
+            self.fileobj.seek(0)
+            return self.fileobj.read()
+
+    def copy_to(self, target):
+        """Copia el contenido a otro fichero; serializado porque el paquete se comparte entre hilos"""
+        with self._lock:
+            self.fileobj.seek(0)
+            shutil.copyfileobj(self.fileobj, target, READ_CHUNK_BYTES)
+
+    def close(self):
+        self.fileobj.close()
+
+
+def staging_key(package: CodePackage, prefix: str = STAGING_PREFIX) -> str:
+    """Clave direccionada por contenido: un mismo paquete se sube una sola vez"""
+    return f'{prefix}{package.hexdigest}.zip'
+
+
+def stage_to_s3(s3, package: CodePackage, bucket: str, prefix: str = STAGING_PREFIX) -> Dict[str, Any]:
+    """Sube el paquete a S3 por multipart en streaming salvo que ya exista con ese hash"""
+    key = staging_key(package, prefix)
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+        if head.get('ContentLength') == package.size:
+            return {'bucket': bucket, 'key': key, 'uploaded': False}
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+    with tempfile.TemporaryFile() as copy:
+        # Copia propia para que upload_fileobj pueda leer por partes en paralelo
+        package.copy_to(copy)
+        copy.seek(0)
+        s3.upload_fileobj(copy, bucket, key, Config=S3_TRANSFER_CONFIG,
+                          ExtraArgs={'Metadata': {'sha256': package.hexdigest}})
+    return {'bucket': bucket, 'key': key, 'uploaded': True}
+
+
+def deploy_function(lambda_client, function_name: str, package: CodePackage, s3=None,
+                    staging_bucket: Optional[str] = None, s3_threshold: int = DEFAULT_S3_THRESHOLD,
+                    force: bool = False, publish: bool = False, wait: bool = True,
+                    architectures: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Despliega el paquete en una función. Se omite si su CodeSha256 ya coincide y no se
+    pide otra arquitectura (salvo force). Con staging_bucket, los paquetes de más de
+    s3_threshold bytes se suben a S3 y la función se actualiza desde ahí; si no, se
+    envían directamente.
+    """
+    started = time.monotonic()
+    result = {'function_name': function_name, 'sha256': package.sha256, 'size': package.size,
+              'status': 'pending', 'method': None, 'error': None}
+    try:
+        current = lambda_client.get_function_configuration(FunctionName=function_name)
+        result['previous_sha256'] = current.get('CodeSha256')
+        same_architecture = not architectures or current.get('Architectures', ['x86_64']) == list(architectures)
+        if not force and current.get('CodeSha256') == package.sha256 and same_architecture:
+            result['status'] = 'skipped'
+            return result
+
+        params: Dict[str, Any] = {'FunctionName': function_name, 'Publish': publish}
+        if architectures:
+            params['Architectures'] = list(architectures)
+        if staging_bucket and s3 is not None and package.size > s3_threshold:
+            staged = stage_to_s3(s3, package, staging_bucket)
+            params.update(S3Bucket=staged['bucket'], S3Key=staged['key'])
+            result['method'] = 's3'
+            result['staged_key'] = staged['key']
+        elif package.size > DIRECT_UPLOAD_MAX_BYTES:
+            raise ValueError(f'El paquete supera {DIRECT_UPLOAD_MAX_BYTES // (1024 * 1024)} MB: '
+                             'indica un bucket de staging en S3')
+        else:
+            params['ZipFile'] = package.read()
+            result['method'] = 'direct'
+
+        response = lambda_client.update_function_code(**params)
+        result['version'] = response.get('Version')
+        if wait:
+            lambda_client.get_waiter('function_updated_v2').wait(
+                FunctionName=function_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 150})
+        result['status'] = 'deployed'
+    except Exception as e:
+        logger.warning(f'Lambda: fallo desplegando {function_name}: {str(e)}')
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        result['seconds'] = round(time.monotonic() - started, 3)
+    return result
+
+
+class DeploymentRun:
+    """Progreso de un despliegue a varias funciones (thread-safe)"""
+
+    def __init__(self, function_names: List[str], package: CodePackage):
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.sha256 = package.sha256
+        self.size = package.size
+        self._lock = threading.Lock()
+        self.results: Dict[str, Dict[str, Any]] = OrderedDict(
+            (name, {'function_name': name, 'status': 'pending'}) for name in function_names)
+
+    def update(self, function_name: str, result: Dict[str, Any]):
+        with self._lock:
+            self.results[function_name] = result
+
+    def finish(self):
+        with self._lock:
+            self.finished = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            results = [dict(result) for result in self.results.values()]
+            finished = self.finished
+        counts = {status: 0 for status in ('pending', 'running', 'deployed', 'skipped', 'failed')}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        total = len(results)
+        done = counts['deployed'] + counts['skipped'] + counts['failed']
+        return {
+            'id': self.id,
+            'sha256': self.sha256,
+            'size': self.size,
+            'total': total,
+            'done': done,
+            'percent': round(100.0 * done / total, 1) if total else 100.0,
+            'counts': counts,
+            'finished': finished is not None,
+            'seconds': round((finished or time.time()) - self.started, 1),
+            'results': results
+        }
+
+
+_runs: 'OrderedDict[str, DeploymentRun]' = OrderedDict()
+_runs_lock = threading.Lock()
+
+
+def get_run(run_id: str) -> Optional[DeploymentRun]:
+    with _runs_lock:
+        return _runs.get(run_id)
+
+
+def deploy_many(factory: Callable, function_names: List[str], package: CodePackage,
+                staging_bucket: Optional[str] = None, s3_threshold: int = DEFAULT_S3_THRESHOLD,
+                max_workers: int = DEFAULT_WORKERS, force: bool = False, publish: bool = False,
+                wait: bool = True, run: Optional[DeploymentRun] = None) -> DeploymentRun:
+    """
+    Despliega el mismo paquete en varias funciones con max_workers en paralelo.
+    factory es una fábrica de clientes (get_client_factory) para poder ejecutarse en hilos.
+    Si el paquete va por S3 se sube una sola vez antes de repartir los despliegues.
+    """
+    run = run or DeploymentRun(function_names, package)
+    lambda_client = factory('lambda')
+    s3 = factory('s3') if staging_bucket else None
+    max_workers = max(1, min(max_workers, MAX_WORKERS))
+
+    if s3 is not None and package.size > s3_threshold:
+        try:
+            stage_to_s3(s3, package, staging_bucket)
+        except Exception as e:
+            for name in function_names:
+                run.update(name, {'function_name': name, 'status': 'failed', 'sha256': package.sha256,
+                                  'size': package.size, 'method': 's3', 'error': f'Staging en S3: {str(e)}'})
+            run.finish()
+            return run
+
+    def _deploy(name):
+        run.update(name, {'function_name': name, 'status': 'running'})
+        run.update(name, deploy_function(lambda_client, name, package, s3=s3, staging_bucket=staging_bucket,
+                                         s3_threshold=s3_threshold, force=force, publish=publish, wait=wait))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lambda-deploy') as executor:
+        list(executor.map(_deploy, function_names))
+    scope = getattr(factory, 'scope', None)
+    if scope is not None:
+        inventory.mark_dirty(scope, 'lambda')
+        for name in function_names:
+            lambda_inventory.invalidate(scope, name)
+    run.finish()
+    return run
+
+
+def start_deploy(factory: Callable, function_names: List[str], package: CodePackage, **options) -> DeploymentRun:
+    """Lanza deploy_many en segundo plano y devuelve el run para consultar su progreso"""
+    run = DeploymentRun(function_names, package)
+    with _runs_lock:
+        _runs[run.id] = run
+        while len(_runs) > MAX_RUNS:
+            _runs.popitem(last=False)
+
+    def _target():
+        try:
+            deploy_many(factory, function_names, package, run=run, **options)
+        finally:
+            run.finish()
+            package.close()
+
+    threading.Thread(target=_target, name=f'lambda-deploy-{run.id}', daemon=True).start()
+    return run
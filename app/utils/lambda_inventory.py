@@ -0,0 +1,104 @@
+"""
+Enriquecimiento del inventario de funciones Lambda
+Concurrencia reservada y aliases por función en un pool de fan-out compartido, y
+event source mappings de toda la cuenta con un único listado paginado agrupado por
+función. Los resultados se cachean por ámbito y función y se invalidan al desplegar
+o modificar una función.
+Compartido por el blueprint de Lambda y las herramientas MCP
+"""
+import logging
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+from app.utils.cache import TTLCache
+from app.utils.fanout import fan_out
+
+logger = logging.getLogger(__name__)
+
+ENRICH_MAX_WORKERS = 16
+ENRICH_CALL_TIMEOUT = 20.0
+ENRICH_CACHE_TTL = 300.0
+
+_cache = TTLCache(ttl=ENRICH_CACHE_TTL, max_entries=20000)
+
+
+def _unqualified(function_arn: str) -> str:
+    """ARN sin versión ni alias (arn:aws:lambda:región:cuenta:function:nombre)"""
+    return ':'.join(function_arn.split(':')[:7])
+
+
+def list_all_functions(lambda_client) -> List[Dict[str, Any]]:
+    """Configuración de todas las funciones (list_functions devuelve 50 por página)"""
+    functions: List[Dict[str, Any]] = []
+    for page in lambda_client.get_paginator('list_functions').paginate():
+        functions.extend(page.get('Functions', []))
+    return functions
+
+
+def event_source_mappings(lambda_client, scope: Hashable, refresh: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """Event source mappings de la cuenta agrupados por ARN de función sin calificar"""
+    def _load():
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for page in lambda_client.get_paginator('list_event_source_mappings').paginate():
+            for mapping in page.get('EventSourceMappings', []):
+                grouped.setdefault(_unqualified(mapping.get('FunctionArn', '')), []).append({
+                    'uuid': mapping.get('UUID'),
+                    'event_source_arn': mapping.get('EventSourceArn'),
+                    'state': mapping.get('State'),
+                    'batch_size': mapping.get('BatchSize')
+                })
+        return grouped
+    return _cache.get_or_load((scope, '__esm__'), _load, refresh=refresh)
+
+
+def _function_details(lambda_client, function_name: str) -> Dict[str, Any]:
+    """Concurrencia reservada y aliases de una función"""
+    concurrency = lambda_client.get_function_concurrency(FunctionName=function_name)
+    aliases = []
+    for page in lambda_client.get_paginator('list_aliases').paginate(FunctionName=function_name):
+        aliases.extend({'name': alias['Name'], 'version': alias.get('FunctionVersion')}
+                       for alias in page.get('Aliases', []))
+    return {'reserved_concurrency': concurrency.get('ReservedConcurrentExecutions'), 'aliases': aliases}
+
+
+def enrich(lambda_client, scope: Hashable, functions: List[Dict[str, Any]], refresh: bool = False,
+           max_workers: int = ENRICH_MAX_WORKERS) -> Dict[str, Any]:
+    """
+    Añade reserved_concurrency, aliases y event_source_mappings a registros de función
+    con 'name' y 'arn'. Solo se consultan las funciones que no están en caché.
+    El cliente debe admitir max_workers conexiones (fanout_client_config).
+    Devuelve {'functions', 'errors', 'seconds'}.
+    """
+    started = time.monotonic()
+    errors: Dict[str, str] = {}
+    try:
+        mappings = event_source_mappings(lambda_client, scope, refresh)
+    except Exception as e:
+        logger.warning(f'Lambda: fallo listando event source mappings: {str(e)}')
+        mappings = {}
+        errors['event_source_mappings'] = str(e)
+
+    def _details(name):
+        return _cache.get_or_load((scope, name, 'details'), lambda: _function_details(lambda_client, name),
+                                  refresh=refresh)
+
+    names = [function['name'] for function in functions]
+    details = fan_out(_details, names, max_workers=max_workers, timeout=ENRICH_CALL_TIMEOUT)
+    errors.update(details.errors)
+
+    enriched = []
+    for function in functions:
+        record = dict(function)
+        record.update(details.results.get(function['name'], {'reserved_concurrency': None, 'aliases': None}))
+        record['event_source_mappings'] = mappings.get(_unqualified(function.get('arn') or ''), [])
+        enriched.append(record)
+    return {'functions': enriched, 'errors': errors, 'seconds': round(time.monotonic() - started, 3)}
+
+
+def invalidate(scope: Hashable, function_name: Optional[str] = None):
+    """Invalida el enriquecimiento de una función (o de todas) y los event source mappings"""
+    if function_name is None:
+        _cache.invalidate_prefix(scope)
+    else:
+        _cache.invalidate_prefix(scope, function_name)
+        _cache.invalidate_prefix(scope, '__esm__')
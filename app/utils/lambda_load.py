@@ -0,0 +1,220 @@
+"""
+Pruebas de carga de funciones Lambda
+N invocaciones con concurrencia C a partir de una plantilla de payload. De cada
+invocación se registra la latencia vista por el cliente y, de la línea REPORT de
+LogResult, la duración, la duración facturada y si hubo arranque en frío; el
+resumen incluye p50/p95/p99, histograma de latencias y throughput.
+"""
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from botocore.config import Config
+
+MAX_INVOCATIONS = 10000
+MAX_CONCURRENCY = 100
+DEFAULT_INVOCATIONS = 20
+DEFAULT_CONCURRENCY = 5
+# Una invocación síncrona puede durar hasta 15 minutos
+INVOKE_READ_TIMEOUT = 905
+# Límites superiores (ms) de los intervalos del histograma; el último es abierto
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PERCENTILES = (50, 95, 99)
+
+_REPORT_FIELDS = {
+    'duration_ms': re.compile(r'\tDuration: ([\d.]+) ms'),
+    'billed_ms': re.compile(r'Billed Duration: ([\d.]+) ms'),
+    'memory_size_mb': re.compile(r'Memory Size: (\d+) MB'),
+    'max_memory_mb': re.compile(r'Max Memory Used: (\d+) MB'),
+    'init_ms': re.compile(r'Init Duration: ([\d.]+) ms'),
+}
+_PLACEHOLDER = re.compile(r'\{\{\s*(i|uuid|timestamp|random)\s*\}\}')
+
+
+def load_client_config(concurrency: int) -> Config:
+    """Cliente compartido por los hilos, sin reintentos para no falsear las latencias"""
+    return Config(max_pool_connections=max(10, concurrency), connect_timeout=5,
+                  read_timeout=INVOKE_READ_TIMEOUT, retries={'max_attempts': 1, 'mode': 'standard'})
+
+
+def render_payload(template: str, index: int) -> str:
+    """
+    Sustituye los marcadores de la plantilla: {{i}} (número de invocación),
+    {{uuid}}, {{timestamp}} (ISO 8601 UTC) y {{random}} (entero aleatorio).
+    """
+    def _value(match):
+        name = match.group(1)
+        if name == 'i':
+            return str(index)
+        if name == 'uuid':
+            return str(uuid.uuid4())
+        if name == 'timestamp':
+            return datetime.now(timezone.utc).isoformat()
+        return str(random.randint(0, 2 ** 31 - 1))
+    return _PLACEHOLDER.sub(_value, template or '{}')
+
+
+def validate_template(template: str):
+    """Comprueba que la plantilla produce JSON válido"""
+    try:
+        json.loads(render_payload(template, 0))
+    except ValueError as e:
+        raise ValueError(f'La plantilla no genera JSON válido: {str(e)}')
+
+
+def parse_report(log_result: Optional[str]) -> Dict[str, Any]:
+    """Campos de la línea REPORT de un LogResult (base64, últimos 4 KB del log)"""
+    if not log_result:
+        return {}
+    text = base64.b64decode(log_result).decode('utf-8', errors='replace')
+    report_lines = [line for line in text.splitlines() if line.startswith('REPORT ')]
+    if not report_lines:
+        return {}
+    line = report_lines[-1]
+    report: Dict[str, Any] = {}
+    for field, pattern in _REPORT_FIELDS.items():
+        match = pattern.search(line)
+        if match:
+            report[field] = float(match.group(1))
+    return report
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre valores ya ordenados"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    summary = {
+        'count': len(ordered),
+        'min': round(ordered[0], 2),
+        'max': round(ordered[-1], 2),
+        'mean': round(sum(ordered) / len(ordered), 2)
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}'] = round(percentile(ordered, pct), 2)
+    return summary
+
+
+def histogram(values: List[float]) -> List[Dict[str, Any]]:
+    """Número de valores por intervalo de HISTOGRAM_BOUNDS_MS"""
+    counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+    for value in values:
+        for position, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if value <= bound:
+                counts[position] += 1
+                break
+        else:
+            counts[-1] += 1
+    total = len(values) or 1
+    buckets = []
+    lower = 0
+    for position, count in enumerate(counts):
+        upper = HISTOGRAM_BOUNDS_MS[position] if position < len(HISTOGRAM_BOUNDS_MS) else None
+        label = f'{lower}-{upper} ms' if upper is not None else f'> {lower} ms'
+        buckets.append({'label': label, 'count': count, 'percent': round(100.0 * count / total, 1)})
+        if upper is not None:
+            lower = upper
+    return buckets
+
+
+def _invoke_once(lambda_client, function_name: str, payload: str, qualifier: Optional[str], index: int) -> Dict[str, Any]:
+    params = {'FunctionName': function_name, 'Payload': payload, 'LogType': 'Tail'}
+    if qualifier:
+        params['Qualifier'] = qualifier
+    record: Dict[str, Any] = {'i': index}
+    started = time.perf_counter()
+    try:
+        response = lambda_client.invoke(**params)
+        # La latencia incluye leer la respuesta completa
+        response['Payload'].read()
+        record['client_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        record['status_code'] = response.get('StatusCode')
+        record['function_error'] = response.get('FunctionError')
+        record['executed_version'] = response.get('ExecutedVersion')
+        record.update(parse_report(response.get('LogResult')))
+        record['cold_start'] = 'init_ms' in record
+        record['ok'] = not record['function_error']
+    except Exception as e:
+        record['client_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        record['error'] = str(e)
+        record['ok'] = False
+    return record
+
+
+def run_load(lambda_client, function_name: str, invocations: int = DEFAULT_INVOCATIONS,
+             concurrency: int = DEFAULT_CONCURRENCY, payload_template: str = '{}',
+             qualifier: Optional[str] = None, max_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Lanza invocations invocaciones síncronas con concurrency en vuelo como máximo.
+    max_seconds detiene el lanzamiento de nuevas invocaciones al agotarse.
+    Devuelve el resumen y el detalle por invocación.
+    """
+    invocations = max(1, min(int(invocations), MAX_INVOCATIONS))
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY, invocations))
+    validate_template(payload_template)
+
+    records: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    next_index = iter(range(invocations))
+    started = time.perf_counter()
+    deadline = started + max_seconds if max_seconds else None
+
+    def _worker():
+        while True:
+            if deadline and time.perf_counter() >= deadline:
+                return
+            with lock:
+                index = next(next_index, None)
+            if index is None:
+                return
+            record = _invoke_once(lambda_client, function_name, render_payload(payload_template, index),
+                                  qualifier, index)
+            with lock:
+                records.append(record)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='lambda-load') as executor:
+        for future in [executor.submit(_worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    records.sort(key=lambda record: record['i'])
+    client_ms = [r['client_ms'] for r in records]
+    errors = [r for r in records if not r['ok']]
+    error_samples: Dict[str, int] = {}
+    for record in errors:
+        key = record.get('error') or f'FunctionError: {record.get("function_error")}'
+        error_samples[key[:200]] = error_samples.get(key[:200], 0) + 1
+    return {
+        'function_name': function_name,
+        'qualifier': qualifier,
+        'requested': invocations,
+        'completed': len(records),
+        'concurrency': concurrency,
+        'succeeded': len(records) - len(errors),
+        'failed': len(errors),
+        'cold_starts': sum(1 for r in records if r.get('cold_start')),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(records) / elapsed, 2) if elapsed else 0.0,
+        'client_ms': summarize(client_ms),
+        'duration_ms': summarize([r['duration_ms'] for r in records if 'duration_ms' in r]),
+        'billed_ms': summarize([r['billed_ms'] for r in records if 'billed_ms' in r]),
+        'init_ms': summarize([r['init_ms'] for r in records if 'init_ms' in r]),
+        'billed_ms_total': round(sum(r.get('billed_ms', 0) for r in records), 1),
+        'histogram': histogram(client_ms),
+        'errors': error_samples,
+        'invocations': records
+    }
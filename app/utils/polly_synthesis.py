@@ -0,0 +1,304 @@
+"""
+Síntesis de textos largos con Amazon Polly
+El texto se divide en fragmentos por frases (o por límites seguros de SSML) que caben
+en una llamada síncrona a synthesize_speech, los fragmentos se sintetizan en paralelo y
+el audio se entrega en orden a medida que está listo. El resultado completo se guarda
+en una caché en disco con expulsión LRU por tamaño total.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# synthesize_speech admite 3000 caracteres facturables (6000 con etiquetas SSML)
+MAX_CHUNK_CHARS = 2800
+# Un primer fragmento corto para que el audio empiece a sonar cuanto antes
+FIRST_CHUNK_CHARS = 400
+MAX_TEXT_CHARS = 100000
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 8
+CALL_TIMEOUT = 60.0
+
+CACHE_DIR = os.environ.get('POLLY_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'polly-cache')
+CACHE_MAX_BYTES = int(os.environ.get('POLLY_CACHE_MAX_MB') or 500) * 1024 * 1024
+MAX_PENDING = 256
+
+CONTENT_TYPES = {'mp3': 'audio/mpeg', 'ogg_vorbis': 'audio/ogg', 'pcm': 'audio/pcm'}
+EXTENSIONS = {'mp3': 'mp3', 'ogg_vorbis': 'ogg', 'pcm': 'pcm'}
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…;:])\s+|\n\s*\n')
+_CLAUSE_END = re.compile(r'(?<=[,;:])\s+')
+_SSML_TOKEN = re.compile(r'<[^>]*>|[^<]+')
+_SSML_SPEAK = re.compile(r'^\s*<speak(\s[^>]*)?>(.*)</speak>\s*$', re.DOTALL)
+# Etiquetas tras las que se puede cortar sin romper la estructura
+_SSML_BOUNDARY_TAGS = re.compile(r'^<(/p|/s|break\b[^>]*/)\s*>$')
+
+
+def _split_long(sentence: str, limit: int) -> List[str]:
+    """Divide una frase demasiado larga por comas y, si no basta, por espacios"""
+    pieces: List[str] = []
+    for part in _CLAUSE_END.split(sentence):
+        while len(part) > limit:
+            cut = part.rfind(' ', 0, limit)
+            cut = cut if cut > 0 else limit
+            pieces.append(part[:cut])
+            part = part[cut:].lstrip()
+        if part:
+            pieces.append(part)
+    return pieces
+
+
+def _pack(segments: List[str], max_chars: int, first_chars: int, separator: str) -> List[str]:
+    """Agrupa segmentos consecutivos en fragmentos; el primero se limita a first_chars"""
+    chunks: List[str] = []
+    current = ''
+    for segment in segments:
+        limit = first_chars if not chunks else max_chars
+        candidate = f'{current}{separator}{segment}' if current else segment
+        if current and len(candidate) > limit:
+            chunks.append(current)
+            current = segment
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_plain(text: str, max_chars: int, first_chars: int) -> List[str]:
+    segments: List[str] = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if sentence:
+            segments.extend(_split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+    return _pack(segments, max_chars, first_chars, ' ')
+
+
+def _split_ssml(text: str, max_chars: int, first_chars: int) -> List[str]:
+    """
+    Corta solo en el nivel superior de <speak> (sin etiquetas abiertas): tras un fin de
+    frase, </p>, </s> o <break/>. Cada fragmento se vuelve a envolver en <speak>.
+    """
+    match = _SSML_SPEAK.match(text)
+    if not match:
+        raise ValueError('El SSML debe estar envuelto en <speak>...</speak>')
+    attributes, body = match.group(1) or '', match.group(2)
+    limit = max_chars - len(f'<speak{attributes}></speak>')
+
+    segments: List[str] = []
+    current = ''
+    depth = 0
+    for token in _SSML_TOKEN.findall(body):
+        if token.startswith('<'):
+            current += token
+            if token.startswith('</'):
+                depth -= 1
+            elif not token.endswith('/>') and not token.startswith(('<!--', '<?')):
+                depth += 1
+            if depth == 0 and _SSML_BOUNDARY_TAGS.match(token):
+                segments.append(current)
+                current = ''
+        elif depth == 0:
+            parts = _SENTENCE_END.split(token)
+            for part in parts[:-1]:
+                segments.append(current + part)
+                current = ''
+            current += parts[-1]
+        else:
+            current += token
+    if depth != 0:
+        raise ValueError('SSML mal formado: hay etiquetas sin cerrar')
+    if current.strip():
+        segments.append(current)
+
+    segments = [segment.strip() for segment in segments if segment.strip()]
+    too_long = [segment for segment in segments if len(segment) > limit]
+    if too_long:
+        raise ValueError(f'Un bloque SSML supera {limit} caracteres sin un punto de corte seguro: '
+                         'divídelo con <p>, <s> o <break/>')
+    return [f'<speak{attributes}>{chunk}</speak>'
+            for chunk in _pack(segments, limit, min(first_chars, limit), ' ')]
+
+
+def split_text(text: str, text_type: str = 'text', max_chars: int = MAX_CHUNK_CHARS,
+               first_chars: int = FIRST_CHUNK_CHARS) -> List[str]:
+    """Fragmentos en orden que caben en una llamada síncrona a synthesize_speech"""
+    if not text or not text.strip():
+        raise ValueError('El texto es requerido')
+    if len(text) > MAX_TEXT_CHARS:
+        raise ValueError(f'El texto supera {MAX_TEXT_CHARS} caracteres')
+    if text_type == 'ssml':
+        return _split_ssml(text, max_chars, first_chars)
+    return _split_plain(text, max_chars, first_chars)
+
+
+def synthesis_params(voice_id: str, engine: Optional[str] = 'neural', output_format: str = 'mp3',
+                     text_type: str = 'text', sample_rate: Optional[str] = None,
+                     language_code: Optional[str] = None,
+                     lexicon_names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Parámetros comunes a todas las llamadas synthesize_speech de una síntesis"""
+    if output_format not in CONTENT_TYPES:
+        raise ValueError(f'Formato no soportado: {output_format}')
+    params: Dict[str, Any] = {'VoiceId': voice_id, 'OutputFormat': output_format, 'TextType': text_type}
+    if engine:
+        params['Engine'] = engine
+    if sample_rate:
+        params['SampleRate'] = str(sample_rate)
+    if language_code:
+        params['LanguageCode'] = language_code
+    if lexicon_names:
+        params['LexiconNames'] = list(lexicon_names)
+    return params
+
+
+def cache_key(text: str, params: Dict[str, Any]) -> str:
+    """Hash del texto y de todo lo que influye en el audio (voz, motor, formato...)"""
+    digest = hashlib.sha256(text.encode('utf-8'))
+    for name in sorted(params):
+        digest.update(f'\0{name}={params[name]}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _cache_path(key: str, output_format: str) -> str:
+    return os.path.join(CACHE_DIR, f'{key}.{EXTENSIONS[output_format]}')
+
+
+def cached_path(key: str, output_format: str) -> Optional[str]:
+    """Ruta del audio en caché, marcándolo como usado recientemente; None si no está"""
+    path = _cache_path(key, output_format)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES):
+    """Borra los audios menos usados (por mtime) hasta quedar por debajo de max_bytes"""
+    try:
+        entries = []
+        with os.scandir(CACHE_DIR) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _synthesize_chunk(polly, chunk: str, params: Dict[str, Any]) -> bytes:
+    response = polly.synthesize_speech(Text=chunk, **params)
+    with response['AudioStream'] as stream:
+        return stream.read()
+
+
+def synthesize_stream(polly, chunks: List[str], params: Dict[str, Any],
+                      max_workers: int = DEFAULT_WORKERS) -> Iterator[bytes]:
+    """
+    Sintetiza los fragmentos con max_workers llamadas en vuelo y los entrega en orden:
+    el primero sale en cuanto está listo aunque los siguientes sigan en curso.
+    polly debe admitir max_workers conexiones (fanout_client_config).
+    MP3 y PCM se concatenan sin más; OGG produce un flujo encadenado.
+    """
+    max_workers = max(1, min(max_workers, MAX_WORKERS, len(chunks)))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='polly')
+    try:
+        futures = [executor.submit(_synthesize_chunk, polly, chunk, params) for chunk in chunks]
+        for future in futures:
+            yield future.result(timeout=CALL_TIMEOUT)
+    finally:
+        # Si el cliente corta la descarga no se lanzan los fragmentos pendientes
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def cached_stream(polly, text: str, params: Dict[str, Any], key: Optional[str] = None,
+                  max_workers: int = DEFAULT_WORKERS, chunks: Optional[List[str]] = None) -> Iterator[bytes]:
+    """
+    synthesize_stream que además escribe el audio en la caché; el fichero solo se
+    publica (renombrado atómico) si la síntesis termina completa.
+    """
+    key = key or cache_key(text, params)
+    chunks = chunks or split_text(text, params.get('TextType', 'text'))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    final_path = _cache_path(key, params['OutputFormat'])
+    partial_path = f'{final_path}.{uuid.uuid4().hex[:8]}.part'
+    completed = False
+    try:
+        with open(partial_path, 'wb') as partial:
+            for audio in synthesize_stream(polly, chunks, params, max_workers):
+                partial.write(audio)
+                yield audio
+        os.replace(partial_path, final_path)
+        completed = True
+        evict()
+    finally:
+        if not completed:
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+
+
+def synthesize_to_bytes(polly, text: str, params: Dict[str, Any],
+                        max_workers: int = DEFAULT_WORKERS) -> Dict[str, Any]:
+    """Síntesis completa en memoria, usando y poblando la caché en disco"""
+    started = time.monotonic()
+    key = cache_key(text, params)
+    path = cached_path(key, params['OutputFormat'])
+    if path:
+        with open(path, 'rb') as cached:
+            audio, chunk_count, from_cache = cached.read(), None, True
+    else:
+        chunks = split_text(text, params.get('TextType', 'text'))
+        audio = b''.join(cached_stream(polly, text, params, key, max_workers, chunks))
+        chunk_count, from_cache = len(chunks), False
+    return {
+        'audio': audio,
+        'cache_key': key,
+        'cached': from_cache,
+        'chunks': chunk_count,
+        'content_type': CONTENT_TYPES[params['OutputFormat']],
+        'seconds': round(time.monotonic() - started, 3)
+    }
+
+
+# Síntesis preparadas (POST) a la espera de que el reproductor pida el audio (GET)
+_pending: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+_pending_lock = threading.Lock()
+
+
+def register(text: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Valida y fragmenta el texto y guarda la síntesis pendiente bajo su clave de caché"""
+    key = cache_key(text, params)
+    chunks = split_text(text, params.get('TextType', 'text'))
+    with _pending_lock:
+        _pending[key] = {'text': text, 'params': params, 'chunks': chunks}
+        _pending.move_to_end(key)
+        while len(_pending) > MAX_PENDING:
+            _pending.popitem(last=False)
+    return {'cache_key': key, 'chunks': len(chunks), 'characters': len(text),
+            'cached': cached_path(key, params['OutputFormat']) is not None,
+            'content_type': CONTENT_TYPES[params['OutputFormat']]}
+
+
+def get_pending(key: str) -> Optional[Dict[str, Any]]:
+    with _pending_lock:
+        return _pending.get(key)
@@ -0,0 +1,238 @@
+"""
+Análisis por lotes con Amazon Rekognition sobre un prefijo de S3
+Las imágenes se pasan a Rekognition como S3Object (los bytes no pasan por el
+servidor), las llamadas se reparten entre hilos bajo un límite de TPS por cuenta y
+región, y los resultados se cachean por ETag para no repetir análisis de objetos sin
+cambios. Las miniaturas se generan con Pillow a tamaño reducido.
+"""
+import base64
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from PIL import Image
+
+from app.utils.batching import RateLimiter
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Límite de Rekognition para imágenes en S3
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+MAX_IMAGES = 5000
+DEFAULT_MAX_IMAGES = 500
+DEFAULT_WORKERS = 8
+MAX_WORKERS = 32
+# La cuota por defecto de las operaciones de imagen es de 5 TPS en muchas regiones
+ACCOUNT_TPS = max(1.0, float(os.environ.get('REKOGNITION_TPS') or 5))
+DEFAULT_TPS = ACCOUNT_TPS
+THUMBNAIL_SIZE = (320, 320)
+PREVIEW_SIZE = (1024, 1024)
+RESULT_CACHE_TTL = 24 * 3600.0
+
+_results = TTLCache(ttl=RESULT_CACHE_TTL, max_entries=50000)
+_thumbnails = TTLCache(ttl=RESULT_CACHE_TTL, max_entries=5000)
+_limiters: Dict[Hashable, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _labels(client, image, options):
+    response = client.detect_labels(Image=image, MaxLabels=int(options.get('max_labels', 10)),
+                                    MinConfidence=float(options.get('min_confidence', 70.0)))
+    return {'labels': [{'name': label.get('Name', ''),
+                        'confidence': round(label.get('Confidence', 0), 2),
+                        'instances': len(label.get('Instances', []))}
+                       for label in response.get('Labels', [])]}
+
+
+def _faces(client, image, options):
+    response = client.detect_faces(Image=image, Attributes=['DEFAULT'])
+    return {'faces': [{'confidence': round(face.get('Confidence', 0), 2),
+                       'bounding_box': face.get('BoundingBox', {})}
+                      for face in response.get('FaceDetails', [])]}
+
+
+def _text(client, image, options):
+    response = client.detect_text(Image=image)
+    lines = [detection.get('DetectedText', '') for detection in response.get('TextDetections', [])
+             if detection.get('Type') == 'LINE']
+    return {'lines': lines, 'full_text': '\n'.join(lines)}
+
+
+def _moderation(client, image, options):
+    response = client.detect_moderation_labels(Image=image, MinConfidence=float(options.get('min_confidence', 70.0)))
+    return {'moderation_labels': [{'name': label.get('Name', ''),
+                                   'parent': label.get('ParentName', ''),
+                                   'confidence': round(label.get('Confidence', 0), 2)}
+                                  for label in response.get('ModerationLabels', [])]}
+
+
+ANALYSES: Dict[str, Callable] = {
+    'labels': _labels,
+    'faces': _faces,
+    'text': _text,
+    'moderation': _moderation,
+}
+
+# Opciones que usa cada análisis: el resto no forma parte de la clave de la caché
+ANALYSIS_OPTIONS: Dict[str, Tuple[str, ...]] = {
+    'labels': ('max_labels', 'min_confidence'),
+    'faces': (),
+    'text': (),
+    'moderation': ('min_confidence',),
+}
+
+
+class _ChainedLimiter:
+    """Limitador de un lote delante del de la cuenta: se respeta el más restrictivo"""
+
+    def __init__(self, *limiters: RateLimiter):
+        self.limiters = limiters
+
+    def acquire(self, units: float = 1):
+        for limiter in self.limiters:
+            limiter.acquire(units)
+
+
+def rate_limiter(scope: Hashable, tps: float = DEFAULT_TPS):
+    """
+    Limitador para un lote. Todos los lotes de la misma cuenta y región comparten uno
+    a ACCOUNT_TPS; un lote que pide menos (mínimo 1 TPS) añade el suyo por delante.
+    """
+    with _limiters_lock:
+        shared = _limiters.get(scope)
+        if shared is None:
+            shared = _limiters[scope] = RateLimiter(ACCOUNT_TPS, burst=ACCOUNT_TPS)
+    tps = max(1.0, min(float(tps or ACCOUNT_TPS), ACCOUNT_TPS))
+    if tps >= ACCOUNT_TPS:
+        return shared
+    return _ChainedLimiter(RateLimiter(tps, burst=tps), shared)
+
+
+def list_images(s3, bucket: str, prefix: str = '', max_images: int = DEFAULT_MAX_IMAGES) -> Iterator[Dict[str, Any]]:
+    """Objetos JPEG/PNG bajo el prefijo que Rekognition admite, leídos página a página"""
+    count = 0
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix or ''):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if not key.lower().endswith(IMAGE_EXTENSIONS) or obj.get('Size', 0) > MAX_IMAGE_BYTES:
+                continue
+            yield {'key': key, 'etag': obj.get('ETag', '').strip('"'), 'size': obj.get('Size', 0)}
+            count += 1
+            if count >= max_images:
+                return
+
+
+def thumbnail_bytes(image_bytes: bytes, size=THUMBNAIL_SIZE) -> bytes:
+    """JPEG reducido; en JPEG el decodificador ya trabaja a escala (draft)"""
+    with Image.open(BytesIO(image_bytes)) as image:
+        image.draft('RGB', size)
+        image = image.convert('RGB')
+        image.thumbnail(size)
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=80, optimize=True)
+        return output.getvalue()
+
+
+def thumbnail_data_uri(image_bytes: bytes, size=THUMBNAIL_SIZE) -> str:
+    return 'data:image/jpeg;base64,' + base64.b64encode(thumbnail_bytes(image_bytes, size)).decode('ascii')
+
+
+def _thumbnail(s3, scope: Hashable, bucket: str, image: Dict[str, Any]) -> str:
+    def _load():
+        body = s3.get_object(Bucket=bucket, Key=image['key'], IfMatch=image['etag'])['Body']
+        with body:
+            return thumbnail_data_uri(body.read())
+    return _thumbnails.get_or_load((scope, bucket, image['key'], image['etag']), _load)
+
+
+def analyze_image(rekognition, scope: Hashable, bucket: str, image: Dict[str, Any], analysis: str,
+                  options: Dict[str, Any], limiter: Optional[RateLimiter] = None) -> Dict[str, Any]:
+    """Analiza un objeto de S3; el resultado se reutiliza mientras no cambie su ETag"""
+    used = tuple((name, options[name]) for name in ANALYSIS_OPTIONS[analysis] if name in options)
+    key = (scope, bucket, image['key'], image['etag'], analysis, used)
+    cached = _results.get(key)
+    if cached is not None:
+        return dict(cached, cached=True)
+    if limiter is not None:
+        limiter.acquire()
+    result = ANALYSES[analysis](rekognition, {'S3Object': {'Bucket': bucket, 'Name': image['key']}}, options)
+    _results.set(key, result)
+    return dict(result, cached=False)
+
+
+def run_batch(rekognition, s3, scope: Hashable, bucket: str, prefix: str = '', analysis: str = 'labels',
+              options: Optional[Dict[str, Any]] = None, max_images: int = DEFAULT_MAX_IMAGES,
+              max_workers: int = DEFAULT_WORKERS, tps: float = DEFAULT_TPS,
+              thumbnails: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Genera un registro por imagen según se completan (type 'image') y uno final de
+    resumen (type 'summary'). El listado se consume a medida que hay hilos libres,
+    así que el primer resultado llega sin esperar al listado completo.
+    Los clientes deben admitir max_workers conexiones (fanout_client_config).
+    """
+    if analysis not in ANALYSES:
+        raise ValueError(f'Análisis no soportado: {analysis}')
+    options = options or {}
+    max_images = max(1, min(int(max_images), MAX_IMAGES))
+    max_workers = max(1, min(int(max_workers), MAX_WORKERS))
+    limiter = rate_limiter(scope, tps)
+    started = time.monotonic()
+    counts = {'images': 0, 'analyzed': 0, 'cached': 0, 'failed': 0}
+
+    def _process(image):
+        record = {'type': 'image', 'bucket': bucket, 'key': image['key'], 'etag': image['etag'],
+                  'size': image['size'], 'analysis': analysis}
+        try:
+            record.update(analyze_image(rekognition, scope, bucket, image, analysis, options, limiter))
+        except Exception as e:
+            logger.warning(f'Rekognition: fallo analizando s3://{bucket}/{image["key"]}: {str(e)}')
+            record['error'] = str(e)
+            return record
+        if thumbnails:
+            # Sin miniatura el análisis sigue siendo válido
+            try:
+                record['thumbnail'] = _thumbnail(s3, scope, bucket, image)
+            except Exception as e:
+                logger.warning(f'Rekognition: sin miniatura para s3://{bucket}/{image["key"]}: {str(e)}')
+                record['thumbnail_error'] = str(e)
+        return record
+
+    images = list_images(s3, bucket, prefix, max_images)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rekognition')
+    try:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            # Se mantiene una pequeña cola por hilo sin materializar todo el listado
+            while not exhausted and len(pending) < max_workers * 2:
+                image = next(images, None)
+                if image is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(_process, image))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                counts['images'] += 1
+                if 'error' in record:
+                    counts['failed'] += 1
+                elif record.get('cached'):
+                    counts['cached'] += 1
+                else:
+                    counts['analyzed'] += 1
+                yield record
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    yield dict(counts, type='summary', bucket=bucket, prefix=prefix, analysis=analysis,
+               seconds=round(elapsed, 3),
+               images_per_second=round(counts['images'] / elapsed, 2) if elapsed else 0.0)
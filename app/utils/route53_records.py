@@ -0,0 +1,401 @@
+"""
+Registros de Route 53: lectura paginada, índice de búsqueda, ficheros de zona y cambios por lotes
+Los record sets de una zona se leen con el paginador (300 por página) y se indexan por
+tipo y por tokens de nombre y valor para buscar en memoria. Las zonas se exportan e
+importan en formato BIND y las modificaciones masivas se empaquetan en el menor número
+de llamadas a change_resource_record_sets que permiten los límites de la API (1000
+ResourceRecord y 32.000 caracteres de Value por petición, UPSERT cuenta doble). Tras
+enviar, get_change se consulta con espera exponencial hasta que el cambio está INSYNC.
+"""
+import bisect
+import logging
+import re
+import time
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+INDEX_TTL = 120.0
+MAX_BATCH_RECORDS = 1000
+MAX_BATCH_CHARS = 32000
+WAIT_TIMEOUT = 300.0
+WAIT_INTERVAL = 2.0
+WAIT_MAX_INTERVAL = 15.0
+DEFAULT_TTL = 300
+# Registros que Route 53 gestiona en el vértice de la zona y no se importan
+MANAGED_APEX_TYPES = ('SOA', 'NS')
+# Tipos cuyo último campo es un nombre de dominio que puede venir relativo al $ORIGIN
+_NAME_TARGET_TYPES = ('CNAME', 'NS', 'PTR', 'MX', 'SRV')
+_TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_TOKEN_SPLIT = re.compile(r'[^a-z0-9_*\-]+')
+
+_cache = TTLCache(ttl=INDEX_TTL, max_entries=256)
+
+
+def short_zone_id(zone_id: str) -> str:
+    """'/hostedzone/Z123' → 'Z123'"""
+    return zone_id.rsplit('/', 1)[-1]
+
+
+def fqdn(name: str, origin: str) -> str:
+    """Nombre absoluto con punto final; '@' y vacío son el propio origen"""
+    origin = origin if origin.endswith('.') else origin + '.'
+    name = (name or '').strip()
+    if name in ('', '@'):
+        return origin
+    if name.endswith('.'):
+        return name
+    if name == origin[:-1] or name.endswith('.' + origin[:-1]):
+        return name + '.'
+    return f'{name}.{origin}'
+
+
+def relative_name(name: str, origin: str) -> str:
+    if name == origin:
+        return '@'
+    if name.endswith('.' + origin):
+        return name[:-len(origin) - 1]
+    return name
+
+
+def iter_hosted_zones(r53) -> Iterator[Dict[str, Any]]:
+    for page in r53.get_paginator('list_hosted_zones').paginate():
+        yield from page.get('HostedZones', [])
+
+
+def iter_record_sets(r53, zone_id: str, start_name: Optional[str] = None,
+                     start_type: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Todos los record sets de la zona, página a página"""
+    params = {'HostedZoneId': short_zone_id(zone_id)}
+    if start_name:
+        params['StartRecordName'] = start_name
+        if start_type:
+            params['StartRecordType'] = start_type
+    for page in r53.get_paginator('list_resource_record_sets').paginate(**params):
+        yield from page.get('ResourceRecordSets', [])
+
+
+def get_record_set(r53, zone_id: str, name: str, record_type: str,
+                   set_identifier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Un record set concreto leyendo solo desde su posición en la zona"""
+    name = name if name.endswith('.') else name + '.'
+    for record in iter_record_sets(r53, zone_id, name, record_type):
+        if record['Name'].lower() != name.lower() or record['Type'] != record_type:
+            return None
+        if set_identifier is None or record.get('SetIdentifier') == set_identifier:
+            return record
+    return None
+
+
+def record_values(record: Dict[str, Any]) -> List[str]:
+    return [item['Value'] for item in record.get('ResourceRecords', [])]
+
+
+class RecordIndex:
+    """
+    Índice en memoria de los record sets de una zona
+    Los tokens distintos de nombre y valor se concatenan en un único texto: cada término
+    se busca ahí con str.find y la posición se traduce a su token con bisect sobre los
+    desplazamientos. Los candidatos se confirman contra el texto completo del record, así
+    que la búsqueda es "contiene la subcadena" sin recorrer todos los records.
+    """
+
+    def __init__(self, zone: Dict[str, Any], records: List[Dict[str, Any]]):
+        self.built_at = time.time()
+        self.zone = zone
+        self.records = records
+        self.by_type: Dict[str, List[int]] = {}
+        self._text: List[str] = []
+        postings: Dict[str, set] = {}
+        for position, record in enumerate(records):
+            self.by_type.setdefault(record['Type'], []).append(position)
+            alias = record.get('AliasTarget', {}).get('DNSName', '')
+            text = ' '.join([record['Name'], record['Type'], record.get('SetIdentifier') or '', alias]
+                            + record_values(record)).lower()
+            self._text.append(text)
+            for token in _TOKEN_SPLIT.split(text):
+                if token:
+                    postings.setdefault(token, set()).add(position)
+        self._tokens = sorted(postings)
+        self._postings = postings
+        self._offsets: List[int] = []
+        offset = 0
+        for token in self._tokens:
+            self._offsets.append(offset)
+            offset += len(token) + 1
+        self._token_text = '\n'.join(self._tokens)
+
+    @property
+    def zone_name(self) -> str:
+        return self.zone['Name']
+
+    def _containing(self, term: str) -> set:
+        """Posiciones de los records con algún token que contiene term"""
+        found = set()
+        position = self._token_text.find(term)
+        while position != -1:
+            index = bisect.bisect_right(self._offsets, position) - 1
+            found |= self._postings[self._tokens[index]]
+            following = index + 1
+            if following >= len(self._offsets):
+                break
+            position = self._token_text.find(term, self._offsets[following])
+        return found
+
+    def search(self, query: str = '', record_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Record sets cuyo nombre, valor o alias contiene query (y del tipo indicado)"""
+        candidates = None
+        if record_type:
+            candidates = set(self.by_type.get(record_type.upper(), []))
+        query = (query or '').strip().lower()
+        for term in query.split():
+            for token in _TOKEN_SPLIT.split(term):
+                if token:
+                    matched = self._containing(token)
+                    candidates = matched if candidates is None else candidates & matched
+            if candidates is not None:
+                candidates = {position for position in candidates if term in self._text[position]}
+        if candidates is None:
+            return list(self.records)
+        return [self.records[position] for position in sorted(candidates)]
+
+    def type_counts(self) -> Dict[str, int]:
+        return {record_type: len(positions) for record_type, positions in sorted(self.by_type.items())}
+
+
+def build_index(r53, zone_id: str) -> RecordIndex:
+    zone = r53.get_hosted_zone(Id=short_zone_id(zone_id))['HostedZone']
+    return RecordIndex(zone, list(iter_record_sets(r53, zone_id)))
+
+
+def get_index(r53, scope: Hashable, zone_id: str, refresh: bool = False) -> RecordIndex:
+    return _cache.get_or_load((scope, 'zone', short_zone_id(zone_id)),
+                              lambda: build_index(r53, zone_id), refresh=refresh)
+
+
+def invalidate(scope: Hashable, zone_id: Optional[str] = None):
+    if zone_id:
+        _cache.invalidate_prefix(scope, 'zone', short_zone_id(zone_id))
+    else:
+        _cache.invalidate_prefix(scope)
+
+
+# --- Ficheros de zona BIND -------------------------------------------------
+
+def to_bind(zone_name: str, records: List[Dict[str, Any]]) -> str:
+    """
+    Fichero de zona BIND. Los alias y los registros con política de enrutamiento
+    (SetIdentifier) no tienen representación estándar y se exportan como comentarios.
+    """
+    origin = zone_name if zone_name.endswith('.') else zone_name + '.'
+    lines = [f'$ORIGIN {origin}', f'; Exportado de Route 53 el {time.strftime("%Y-%m-%d %H:%M:%S")}']
+    width = max([len(relative_name(r['Name'], origin)) for r in records] + [1])
+    for record in records:
+        owner = relative_name(record['Name'], origin).ljust(width)
+        if record.get('AliasTarget'):
+            target = record['AliasTarget']
+            lines.append(f'; ALIAS {owner} {record["Type"]} {target.get("DNSName")} '
+                         f'(zona {target.get("HostedZoneId")})')
+            continue
+        prefix = ''
+        if record.get('SetIdentifier'):
+            prefix = '; '
+            lines.append(f'; SetIdentifier={record["SetIdentifier"]}: política de enrutamiento no exportable')
+        for value in record_values(record):
+            lines.append(f'{prefix}{owner} {record.get("TTL", DEFAULT_TTL):<6} IN {record["Type"]:<6} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _strip_comment(line: str) -> str:
+    quoted = False
+    escaped = False
+    for position, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            return line[:position]
+    return line
+
+
+def _tokens(line: str) -> List[str]:
+    """Separa por espacios conservando las cadenas entre comillas (TXT) como un token"""
+    return re.findall(r'"(?:[^"\\]|\\.)*"|\S+', line)
+
+
+def _parse_ttl(token: str) -> Optional[int]:
+    if token.isdigit():
+        return int(token)
+    match = re.fullmatch(r'(?:\d+[smhdw])+', token.lower())
+    if not match:
+        return None
+    return sum(int(number) * _TTL_UNITS[unit] for number, unit in re.findall(r'(\d+)([smhdw])', token.lower()))
+
+
+def _outside_quotes(line: str) -> List[str]:
+    """Trozos de la línea fuera de comillas (posiciones pares) y entre comillas (impares)"""
+    return re.split(r'("(?:[^"\\]|\\.)*")', line)
+
+
+def _logical_lines(text: str) -> Iterator[Tuple[int, str]]:
+    """Une las líneas entre paréntesis (p. ej. el SOA) y quita comentarios"""
+    buffer, start, depth = [], 0, 0
+    for number, raw in enumerate(text.splitlines(), 1):
+        parts = _outside_quotes(_strip_comment(raw))
+        if not buffer:
+            start = number
+        depth += sum(part.count('(') - part.count(')') for part in parts[::2])
+        parts[::2] = [part.replace('(', ' ').replace(')', ' ') for part in parts[::2]]
+        buffer.append(''.join(parts))
+        if depth > 0:
+            continue
+        joined = ' '.join(buffer).rstrip()
+        buffer, depth = [], 0
+        if joined.strip():
+            yield start, joined
+    if buffer:
+        raise ValueError(f'Línea {start}: paréntesis sin cerrar')
+
+
+def parse_bind(text: str, zone_name: str) -> Dict[str, Any]:
+    """
+    Record sets de un fichero de zona BIND agrupados por nombre y tipo
+    Admite $ORIGIN, $TTL, '@', nombres relativos, propietario omitido (se repite el
+    anterior), TTL y clase en cualquier orden y registros multilínea entre paréntesis.
+    Los SOA/NS del vértice se omiten porque los gestiona Route 53.
+    """
+    zone_origin = fqdn(zone_name, zone_name)
+    origin = zone_origin
+    default_ttl = DEFAULT_TTL
+    owner = None
+    record_sets: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    skipped = []
+
+    for number, line in _logical_lines(text):
+        tokens = _tokens(line)
+        directive = tokens[0].upper()
+        if directive == '$ORIGIN':
+            origin = fqdn(tokens[1], zone_origin)
+            continue
+        if directive == '$TTL':
+            ttl = _parse_ttl(tokens[1]) if len(tokens) > 1 else None
+            if ttl is None:
+                raise ValueError(f'Línea {number}: $TTL no válido')
+            default_ttl = ttl
+            continue
+        if directive.startswith('$'):
+            raise ValueError(f'Línea {number}: directiva no soportada {tokens[0]}')
+
+        if not line[0].isspace():
+            owner = fqdn(tokens.pop(0), origin)
+        if owner is None:
+            raise ValueError(f'Línea {number}: registro sin nombre')
+        ttl = None
+        while tokens and (tokens[0].upper() in ('IN', 'CH', 'HS') or _parse_ttl(tokens[0]) is not None):
+            token = tokens.pop(0)
+            if token.upper() not in ('IN', 'CH', 'HS'):
+                ttl = _parse_ttl(token)
+        if len(tokens) < 2:
+            raise ValueError(f'Línea {number}: registro incompleto')
+        record_type = tokens.pop(0).upper()
+        if record_type in _NAME_TARGET_TYPES:
+            tokens[-1] = fqdn(tokens[-1], origin)
+        value = ' '.join(tokens)
+
+        if record_type in MANAGED_APEX_TYPES and owner == zone_origin:
+            skipped.append(f'{owner} {record_type}')
+            continue
+        if owner != zone_origin and not owner.endswith('.' + zone_origin):
+            raise ValueError(f'Línea {number}: {owner} no pertenece a la zona {zone_origin}')
+        record_set = record_sets.setdefault((owner, record_type), {
+            'Name': owner, 'Type': record_type, 'TTL': ttl if ttl is not None else default_ttl, 'ResourceRecords': []
+        })
+        if {'Value': value} not in record_set['ResourceRecords']:
+            record_set['ResourceRecords'].append({'Value': value})
+
+    return {'record_sets': list(record_sets.values()), 'skipped': sorted(set(skipped))}
+
+
+# --- Cambios por lotes ------------------------------------------------------
+
+def _change_cost(change: Dict[str, Any]) -> Tuple[int, int]:
+    """(ResourceRecord, caracteres de Value) que cuenta la API; UPSERT cuenta doble"""
+    factor = 2 if change['Action'] == 'UPSERT' else 1
+    values = record_values(change['ResourceRecordSet'])
+    return max(1, len(values)) * factor, sum(len(value) for value in values) * factor
+
+
+def pack_batches(changes: List[Dict[str, Any]], max_records: int = MAX_BATCH_RECORDS,
+                 max_chars: int = MAX_BATCH_CHARS) -> List[List[Dict[str, Any]]]:
+    """Reparte los cambios, en orden, en el menor número de lotes dentro de los límites"""
+    batches: List[List[Dict[str, Any]]] = []
+    batch: List[Dict[str, Any]] = []
+    records = chars = 0
+    for change in changes:
+        change_records, change_chars = _change_cost(change)
+        if change_records > max_records or change_chars > max_chars:
+            raise ValueError(f'El record set {change["ResourceRecordSet"]["Name"]} '
+                             f'{change["ResourceRecordSet"]["Type"]} supera por sí solo el límite de un lote')
+        if batch and (records + change_records > max_records or chars + change_chars > max_chars):
+            batches.append(batch)
+            batch, records, chars = [], 0, 0
+        batch.append(change)
+        records += change_records
+        chars += change_chars
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def changes_for(action: str, record_sets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{'Action': action, 'ResourceRecordSet': record_set} for record_set in record_sets]
+
+
+def submit_changes(r53, zone_id: str, changes: List[Dict[str, Any]], comment: str = '') -> List[Dict[str, Any]]:
+    """
+    Envía los cambios en lotes máximos, de forma secuencial para respetar el orden y
+    el límite de peticiones de la API. Cada lote es atómico por separado: si uno falla,
+    los anteriores ya están aplicados (la excepción lleva los ChangeInfo enviados).
+    """
+    submitted = []
+    batches = pack_batches(changes)
+    for number, batch in enumerate(batches, 1):
+        batch_comment = f'{comment} ({number}/{len(batches)})' if comment and len(batches) > 1 else comment
+        change_batch = {'Changes': batch}
+        if batch_comment:
+            change_batch['Comment'] = batch_comment[:256]
+        try:
+            response = r53.change_resource_record_sets(HostedZoneId=short_zone_id(zone_id), ChangeBatch=change_batch)
+        except Exception as e:
+            e.submitted = submitted
+            raise
+        submitted.append({'id': response['ChangeInfo']['Id'], 'status': response['ChangeInfo']['Status'],
+                          'changes': len(batch)})
+    return submitted
+
+
+def wait_insync(r53, change_ids: List[str], timeout: float = WAIT_TIMEOUT, interval: float = WAIT_INTERVAL,
+                max_interval: float = WAIT_MAX_INTERVAL) -> Dict[str, str]:
+    """Consulta get_change con espera exponencial hasta que todos están INSYNC o vence el plazo"""
+    statuses = {change_id: 'PENDING' for change_id in change_ids}
+    pending = list(change_ids)
+    deadline = time.monotonic() + timeout
+    delay = interval
+    while pending:
+        # Los lotes se aplican en orden: se consulta primero el último pendiente
+        for change_id in reversed(list(pending)):
+            statuses[change_id] = r53.get_change(Id=change_id)['ChangeInfo']['Status']
+            if statuses[change_id] != 'INSYNC':
+                break
+            pending.remove(change_id)
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_interval)
+    return statuses
@@ -0,0 +1,338 @@
+"""
+Caché de valores de Secrets Manager y Parameter Store
+Lecturas masivas (batch_get_secret_value, get_parameters en grupos de 10,
+get_parameters_by_path recursivo) y una caché de valores que:
+- trata como inmutables las lecturas por versión (VersionId o nombre:versión)
+- sirve el valor caducado mientras lo refresca en segundo plano (hasta MAX_STALE)
+- al refrescar un secreto por stage comprueba primero con describe_secret si la
+  versión ha cambiado, y solo entonces vuelve a leer el valor
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.utils.batching import chunked
+from app.utils.fanout import fan_out
+
+logger = logging.getLogger(__name__)
+
+VALUE_TTL = 300.0
+MAX_STALE = 3600.0
+LISTING_TTL = 60.0
+BATCH_SECRETS_MAX = 20
+GET_PARAMETERS_MAX = 10
+BY_PATH_PAGE_SIZE = 10
+DESCRIBE_PAGE_SIZE = 50
+FALLBACK_WORKERS = 8
+CURRENT_STAGE = 'AWSCURRENT'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='secret-values')
+
+
+class ValueCache:
+    """Caché con refresco en segundo plano: fresco < ttl, caducado < max_stale, si no recarga"""
+
+    def __init__(self, ttl: float = VALUE_TTL, max_stale: float = MAX_STALE, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Optional[float], Any]] = {}
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Valor fresco (sin refrescos ni contadores) o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        fetched, ttl, value = entry
+        return value if ttl is None or time.monotonic() - fetched < ttl else None
+
+    def store(self, key: Hashable, value: Any, ttl: Optional[float] = -1):
+        """ttl None = inmutable; -1 = ttl por defecto"""
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic(), self.ttl if ttl == -1 else ttl, value)
+
+    def get(self, key: Hashable, loader: Callable[[], Any], refresh: bool = False,
+            immutable: bool = False, refresher: Optional[Callable[[Any], Any]] = None,
+            ttl: Optional[float] = None) -> Any:
+        """
+        Valor de key. refresher(valor_actual) se usa para el refresco en segundo plano
+        (por defecto loader); puede devolver el mismo valor si no ha cambiado.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not refresh:
+            fetched, entry_ttl, value = entry
+            age = time.monotonic() - fetched
+            if entry_ttl is None or age < entry_ttl:
+                self.hits += 1
+                return value
+            if age < self.max_stale:
+                self.stale_hits += 1
+                self._refresh_async(key, lambda: (refresher or (lambda _: loader()))(value), ttl)
+                return value
+        self.misses += 1
+        value = loader()
+        self.store(key, value, None if immutable else ttl)
+        return value
+
+    def _refresh_async(self, key: Hashable, load: Callable[[], Any], ttl: float):
+        with self._lock:
+            if key in self._inflight:
+                return
+            self._inflight.add(key)
+
+        def _run():
+            try:
+                self.store(key, load(), ttl)
+            except Exception as e:
+                # Se sigue sirviendo el valor anterior hasta max_stale
+                logger.warning('Error refrescando %s: %s', key, e)
+            finally:
+                with self._lock:
+                    self._inflight.discard(key)
+
+        _executor.submit(_run)
+
+    def invalidate_prefix(self, *prefix: Any):
+        size = len(prefix)
+        with self._lock:
+            for key in [k for k in self._entries if isinstance(k, tuple) and k[:size] == prefix]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, inflight = len(self._entries), len(self._inflight)
+        return {'entries': entries, 'refreshing': inflight, 'hits': self.hits,
+                'stale_hits': self.stale_hits, 'misses': self.misses}
+
+
+_cache = ValueCache()
+
+
+# ---------------------------------------------------------------------------
+# Secrets Manager
+# ---------------------------------------------------------------------------
+
+def _secret(response: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'name': response.get('Name'),
+        'arn': response.get('ARN'),
+        'version_id': response.get('VersionId'),
+        'version_stages': response.get('VersionStages', []),
+        'secret_string': response.get('SecretString'),
+        'secret_binary': response.get('SecretBinary'),
+        'created_date': response.get('CreatedDate'),
+    }
+
+
+def _current_version(sm, secret_id: str, stage: str) -> Optional[str]:
+    stages = sm.describe_secret(SecretId=secret_id).get('VersionIdsToStages', {})
+    return next((version for version, names in stages.items() if stage in names), None)
+
+
+def get_secret(sm, scope: Hashable, secret_id: str, version_id: Optional[str] = None,
+               version_stage: Optional[str] = None, refresh: bool = False) -> Dict[str, Any]:
+    """Valor de un secreto; por VersionId se cachea sin caducidad"""
+    if version_id:
+        params = {'SecretId': secret_id, 'VersionId': version_id}
+        if version_stage:
+            params['VersionStage'] = version_stage
+        return _cache.get((scope, 'secret', secret_id, 'version', version_id),
+                          lambda: _secret(sm.get_secret_value(**params)), refresh=refresh, immutable=True)
+
+    stage = version_stage or CURRENT_STAGE
+
+    def _load():
+        return _secret(sm.get_secret_value(SecretId=secret_id, VersionStage=stage))
+
+    def _refresh(current):
+        # describe_secret no descifra nada: solo se relee el valor si cambió la versión
+        if current and _current_version(sm, secret_id, stage) == current['version_id']:
+            return current
+        return _load()
+
+    return _cache.get((scope, 'secret', secret_id, 'stage', stage), _load, refresh=refresh, refresher=_refresh)
+
+
+def batch_get_secrets(sm, scope: Hashable, secret_ids: Iterable[str],
+                      refresh: bool = False) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """
+    Valores actuales de varios secretos: los frescos salen de la caché y el resto se
+    piden con batch_get_secret_value (20 por llamada). Con un botocore sin esa
+    operación se recurre a get_secret_value en paralelo.
+    """
+    values: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for secret_id in dict.fromkeys(secret_ids):
+        cached = None if refresh else _cache.peek((scope, 'secret', secret_id, 'stage', CURRENT_STAGE))
+        if cached is not None:
+            values[secret_id] = cached
+        else:
+            pending.append(secret_id)
+
+    errors: Dict[str, str] = {}
+    if pending and hasattr(sm, 'batch_get_secret_value'):
+        for chunk in chunked(pending, BATCH_SECRETS_MAX):
+            response = sm.batch_get_secret_value(SecretIdList=chunk)
+            by_id = {}
+            for item in response.get('SecretValues', []):
+                by_id[item.get('ARN')] = by_id[item.get('Name')] = _secret(item)
+            for secret_id in chunk:
+                if secret_id in by_id:
+                    values[secret_id] = by_id[secret_id]
+            for error in response.get('Errors', []):
+                errors[error.get('SecretId')] = f"{error.get('ErrorCode')}: {error.get('Message')}"
+    elif pending:
+        fetched = fan_out(lambda secret_id: _secret(sm.get_secret_value(SecretId=secret_id)), pending,
+                          max_workers=FALLBACK_WORKERS)
+        values.update(fetched.results)
+        errors.update(fetched.errors)
+
+    for secret_id in pending:
+        if secret_id in values:
+            _cache.store((scope, 'secret', secret_id, 'stage', CURRENT_STAGE), values[secret_id])
+    return values, errors
+
+
+def list_secrets(sm, scope: Hashable, refresh: bool = False) -> List[Dict[str, Any]]:
+    """Todos los secretos (paginado), cacheado LISTING_TTL segundos"""
+    def _load():
+        secrets = []
+        for page in sm.get_paginator('list_secrets').paginate(PaginationConfig={'PageSize': 100}):
+            secrets.extend(page.get('SecretList', []))
+        return secrets
+    return _cache.get((scope, 'secrets'), _load, refresh=refresh, ttl=LISTING_TTL)
+
+
+def invalidate_secret(scope: Hashable, secret_id: Optional[str] = None):
+    """Descarta valores tras crear, actualizar, rotar, borrar o restaurar un secreto"""
+    _cache.invalidate_prefix(scope, 'secrets')
+    if secret_id:
+        _cache.invalidate_prefix(scope, 'secret', secret_id)
+    else:
+        _cache.invalidate_prefix(scope, 'secret')
+
+
+# ---------------------------------------------------------------------------
+# Parameter Store
+# ---------------------------------------------------------------------------
+
+def _is_versioned(name: str) -> bool:
+    """nombre:versión o nombre:etiqueta; las etiquetas pueden moverse, las versiones no"""
+    selector = name.rsplit(':', 1)[1] if ':' in name else ''
+    return selector.isdigit()
+
+
+def _parameter_key(scope: Hashable, name: str, decrypt: bool) -> Tuple:
+    return (scope, 'parameter', name.split(':', 1)[0], name, decrypt)
+
+
+def get_parameter(ssm, scope: Hashable, name: str, decrypt: bool = True, refresh: bool = False) -> Dict[str, Any]:
+    return _cache.get(_parameter_key(scope, name, decrypt),
+                      lambda: ssm.get_parameter(Name=name, WithDecryption=decrypt)['Parameter'],
+                      refresh=refresh, immutable=_is_versioned(name))
+
+
+def get_parameters(ssm, scope: Hashable, names: Iterable[str], decrypt: bool = True,
+                   refresh: bool = False) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Varios parámetros: los frescos de la caché y el resto con get_parameters de 10 en 10"""
+    values: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for name in dict.fromkeys(names):
+        cached = None if refresh else _cache.peek(_parameter_key(scope, name, decrypt))
+        if cached is not None:
+            values[name] = cached
+        else:
+            pending.append(name)
+
+    invalid: List[str] = []
+    for chunk in chunked(pending, GET_PARAMETERS_MAX):
+        response = ssm.get_parameters(Names=chunk, WithDecryption=decrypt)
+        found: Dict[str, Dict[str, Any]] = {}
+        by_version: Dict[str, Dict[str, Any]] = {}
+        for parameter in response.get('Parameters', []):
+            # Un nombre:versión en la misma llamada que el nombre a secas no debe
+            # pisar el valor actual: sólo lo que llega sin selector es "el nombre"
+            selector = parameter.get('Selector')
+            if selector:
+                found[parameter['Name'] + selector] = parameter
+            else:
+                current = found.get(parameter['Name'])
+                if current is None or parameter.get('Version', 0) > current.get('Version', 0):
+                    found[parameter['Name']] = parameter
+            by_version.setdefault(f"{parameter['Name']}:{parameter.get('Version')}", parameter)
+
+        rejected = set(response.get('InvalidParameters', []))
+        invalid.extend(response.get('InvalidParameters', []))
+        for name in chunk:
+            parameter = found.get(name)
+            if parameter is None and _is_versioned(name):
+                parameter = by_version.get(name)
+            if parameter is None:
+                if name not in rejected:
+                    invalid.append(name)
+                continue
+            values[name] = parameter
+            _cache.store(_parameter_key(scope, name, decrypt), parameter,
+                         None if _is_versioned(name) else -1)
+    return values, invalid
+
+
+def get_parameters_by_path(ssm, scope: Hashable, path: str, recursive: bool = True, decrypt: bool = True,
+                           refresh: bool = False) -> List[Dict[str, Any]]:
+    """
+    Toda una jerarquía (paginado, 10 por página, que es el máximo de la API). Cada
+    parámetro queda además cacheado por nombre para get_parameter/get_parameters.
+    """
+    def _load():
+        parameters = []
+        paginator = ssm.get_paginator('get_parameters_by_path')
+        for page in paginator.paginate(Path=path, Recursive=recursive, WithDecryption=decrypt,
+                                       PaginationConfig={'PageSize': BY_PATH_PAGE_SIZE}):
+            for parameter in page.get('Parameters', []):
+                parameters.append(parameter)
+                _cache.store(_parameter_key(scope, parameter['Name'], decrypt), parameter)
+        return parameters
+    return _cache.get((scope, 'path', path, recursive, decrypt), _load, refresh=refresh)
+
+
+def describe_parameters(ssm, scope: Hashable, path: Optional[str] = None, recursive: bool = True,
+                        refresh: bool = False) -> List[Dict[str, Any]]:
+    """Metadatos de todos los parámetros (o de una jerarquía), 50 por llamada"""
+    params: Dict[str, Any] = {'PaginationConfig': {'PageSize': DESCRIBE_PAGE_SIZE}}
+    if path and path != '/':
+        params['ParameterFilters'] = [{'Key': 'Path', 'Option': 'Recursive' if recursive else 'OneLevel',
+                                       'Values': [path]}]
+
+    def _load():
+        parameters = []
+        for page in ssm.get_paginator('describe_parameters').paginate(**params):
+            parameters.extend(page.get('Parameters', []))
+        return parameters
+    return _cache.get((scope, 'describe', path or '/', recursive), _load, refresh=refresh, ttl=LISTING_TTL)
+
+
+def invalidate_parameter(scope: Hashable, name: Optional[str] = None):
+    """Descarta un parámetro (todas sus versiones) y los listados por jerarquía"""
+    _cache.invalidate_prefix(scope, 'path')
+    _cache.invalidate_prefix(scope, 'describe')
+    if name:
+        _cache.invalidate_prefix(scope, 'parameter', name.split(':', 1)[0])
+    else:
+        _cache.invalidate_prefix(scope, 'parameter')
+
+
+def stats() -> Dict[str, int]:
+    return _cache.stats()
@@ -0,0 +1,382 @@
+"""
+Índice de reglas de security groups de una cuenta y región
+Todos los grupos se leen una vez (paginado) y cada regla se expande a una entrada por
+origen/destino. Los rangos de puertos se guardan en árboles de intervalos por dirección
+y protocolo y los CIDRs en un trie binario por dirección, de modo que las consultas de
+exposición ("¿qué grupos abren el 22 a 0.0.0.0/0?"), la detección de reglas solapadas o
+redundantes y el grafo de referencias entre grupos se resuelven en memoria. El índice se
+cachea por ámbito y se invalida tras cada modificación de reglas o grupos.
+"""
+import logging
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.utils.cache import TTLCache
+from app.utils.vpc_topology import Net, paginate
+
+logger = logging.getLogger(__name__)
+
+INDEX_TTL = 300.0
+MIN_PORT = 0
+MAX_PORT = 65535
+DIRECTIONS = ('ingress', 'egress')
+INTERNET = ('0.0.0.0/0', '::/0')
+
+_cache = TTLCache(ttl=INDEX_TTL, max_entries=64)
+
+# Números de protocolo que la API también acepta en IpProtocol
+_PROTOCOL_NAMES = {'6': 'tcp', '17': 'udp', '1': 'icmp', '58': 'icmpv6'}
+_PORTED = ('tcp', 'udp')
+
+
+def normalize_protocol(protocol) -> str:
+    protocol = str(protocol if protocol not in (None, '') else '-1').lower()
+    if protocol == 'all':
+        return '-1'
+    return _PROTOCOL_NAMES.get(protocol, protocol)
+
+
+def _port_range(protocol: str, from_port, to_port) -> Tuple[int, int]:
+    """Rango efectivo; en ICMP el "puerto" es el tipo y -1 significa todos"""
+    if protocol == '-1' or from_port is None or from_port == -1:
+        return MIN_PORT, MAX_PORT
+    if protocol in _PORTED:
+        return int(from_port), int(to_port if to_port is not None else from_port)
+    return int(from_port), int(from_port)
+
+
+class IntervalTree:
+    """
+    Árbol de intervalos centrado y estático sobre (inicio, fin, valor), extremos incluidos
+    Cada nodo guarda los intervalos que cruzan su centro ordenados por inicio y por fin,
+    así una consulta recorre O(log n) nodos y solo visita los intervalos que coinciden.
+    """
+
+    __slots__ = ('_root', 'size')
+
+    def __init__(self, items: Iterable[Tuple[int, int, Any]]):
+        items = list(items)
+        self.size = len(items)
+        self._root = self._build(items)
+
+    @classmethod
+    def _build(cls, items):
+        if not items:
+            return None
+        endpoints = sorted(point for lo, hi, _ in items for point in (lo, hi))
+        center = endpoints[len(endpoints) // 2]
+        left, right, crossing = [], [], []
+        for item in items:
+            if item[1] < center:
+                left.append(item)
+            elif item[0] > center:
+                right.append(item)
+            else:
+                crossing.append(item)
+        return (center,
+                sorted(crossing, key=lambda item: item[0]),
+                sorted(crossing, key=lambda item: item[1], reverse=True),
+                cls._build(left), cls._build(right))
+
+    def overlapping(self, lo: int, hi: Optional[int] = None) -> List[Any]:
+        """Valores cuyos intervalos se solapan con [lo, hi] (o contienen lo)"""
+        hi = lo if hi is None else hi
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, by_start, by_end, left, right = node
+            if hi < center:
+                for start, _, value in by_start:
+                    if start > hi:
+                        break
+                    found.append(value)
+                stack.append(left)
+            elif lo > center:
+                for _, end, value in by_end:
+                    if end < lo:
+                        break
+                    found.append(value)
+                stack.append(right)
+            else:
+                found.extend(value for _, _, value in by_start)
+                stack.append(left)
+                stack.append(right)
+        return found
+
+
+class CidrTrie:
+    """Trie binario de prefijos IPv4/IPv6: quién contiene a una red y qué redes contiene"""
+
+    __slots__ = ('_roots',)
+
+    def __init__(self):
+        # Nodo: [hijo 0, hijo 1, valores]
+        self._roots = {4: [None, None, []], 6: [None, None, []]}
+
+    @staticmethod
+    def _bits(net: Net):
+        shift = net.bits - 1
+        for depth in range(net.prefix):
+            yield (net.value >> (shift - depth)) & 1
+
+    def insert(self, net: Net, value: Any):
+        node = self._roots[net.version]
+        for bit in self._bits(net):
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+        node[2].append(value)
+
+    def covering(self, net: Net) -> List[Any]:
+        """Valores de los prefijos que contienen a net (incluido el propio net)"""
+        node = self._roots[net.version]
+        found = list(node[2])
+        for bit in self._bits(net):
+            node = node[bit]
+            if node is None:
+                break
+            found.extend(node[2])
+        return found
+
+    def within(self, net: Net) -> List[Any]:
+        """Valores de los prefijos contenidos en net (incluido el propio net)"""
+        node = self._roots[net.version]
+        for bit in self._bits(net):
+            node = node[bit]
+            if node is None:
+                return []
+        found = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            found.extend(node[2])
+            stack.extend(child for child in node[:2] if child is not None)
+        return found
+
+
+class Rule:
+    """Una regla expandida: un grupo, una dirección, un protocolo, un rango y un origen/destino"""
+
+    __slots__ = ('id', 'group_id', 'direction', 'protocol', 'from_port', 'to_port',
+                 'kind', 'target', 'net', 'description', 'permission')
+
+    def __init__(self, rule_id, group_id, direction, protocol, ports, kind, target, net, description, permission):
+        self.id = rule_id
+        self.group_id = group_id
+        self.direction = direction
+        self.protocol = protocol
+        self.from_port, self.to_port = ports
+        self.kind = kind
+        self.target = target
+        self.net = net
+        self.description = description
+        self.permission = permission
+
+    @property
+    def ports(self) -> str:
+        if (self.from_port, self.to_port) == (MIN_PORT, MAX_PORT):
+            return 'todos'
+        if self.from_port == self.to_port:
+            return str(self.from_port)
+        return f'{self.from_port}-{self.to_port}'
+
+    def covers_protocol(self, other: 'Rule') -> bool:
+        return self.protocol == '-1' or self.protocol == other.protocol
+
+    def covers_target(self, other: 'Rule') -> bool:
+        if self.net is not None and other.net is not None:
+            return self.net.contains(other.net)
+        return self.kind == other.kind and self.target == other.target
+
+    def covers(self, other: 'Rule') -> bool:
+        return (self.covers_protocol(other) and self.from_port <= other.from_port
+                and self.to_port >= other.to_port and self.covers_target(other))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rule_id': self.id, 'group_id': self.group_id, 'direction': self.direction,
+            'protocol': self.protocol, 'from_port': self.from_port, 'to_port': self.to_port,
+            'ports': self.ports, 'kind': self.kind, 'target': self.target, 'description': self.description
+        }
+
+
+def _expand(permission: Dict[str, Any]):
+    """(tipo, destino, descripción) por cada origen/destino de un IpPermission"""
+    for item in permission.get('IpRanges', []):
+        yield 'cidr', item.get('CidrIp'), item.get('Description')
+    for item in permission.get('Ipv6Ranges', []):
+        yield 'cidr', item.get('CidrIpv6'), item.get('Description')
+    for item in permission.get('UserIdGroupPairs', []):
+        yield 'security_group', item.get('GroupId') or item.get('GroupName'), item.get('Description')
+    for item in permission.get('PrefixListIds', []):
+        yield 'prefix_list', item.get('PrefixListId'), item.get('Description')
+
+
+class SecurityGroupIndex:
+    """Reglas de todos los security groups indexadas por puertos, CIDR y referencias"""
+
+    def __init__(self, groups: List[Dict[str, Any]]):
+        self.built_at = time.time()
+        self.groups: Dict[str, Dict[str, Any]] = {g['GroupId']: g for g in groups}
+        self.rules: List[Rule] = []
+        self.group_rules: Dict[str, List[int]] = {group_id: [] for group_id in self.groups}
+        self.referenced_by: Dict[str, List[int]] = {}
+        self._cidrs = {direction: CidrTrie() for direction in DIRECTIONS}
+        spans: Dict[Tuple[str, str], List[Tuple[int, int, int]]] = {}
+        # Los mismos CIDRs se repiten en muchos grupos: se parsean una vez
+        nets: Dict[str, Net] = {}
+
+        for group in groups:
+            for direction, field in (('ingress', 'IpPermissions'), ('egress', 'IpPermissionsEgress')):
+                for permission in group.get(field, []):
+                    protocol = normalize_protocol(permission.get('IpProtocol'))
+                    ports = _port_range(protocol, permission.get('FromPort'), permission.get('ToPort'))
+                    for kind, target, description in _expand(permission):
+                        net = None
+                        if kind == 'cidr':
+                            try:
+                                net = nets.get(target) or nets.setdefault(target, Net(target))
+                            except ValueError:
+                                logger.warning(f'Security group {group["GroupId"]}: CIDR no válido {target}')
+                                continue
+                        rule = Rule(len(self.rules), group['GroupId'], direction, protocol, ports,
+                                    kind, target, net, description, permission)
+                        self.rules.append(rule)
+                        self.group_rules[rule.group_id].append(rule.id)
+                        spans.setdefault((direction, protocol), []).append((rule.from_port, rule.to_port, rule.id))
+                        if net is not None:
+                            self._cidrs[direction].insert(net, rule.id)
+                        elif kind == 'security_group':
+                            self.referenced_by.setdefault(target, []).append(rule.id)
+
+        self._ports = {key: IntervalTree(items) for key, items in spans.items()}
+
+    def _group_info(self, group_id: str) -> Dict[str, Any]:
+        group = self.groups.get(group_id, {})
+        return {'group_id': group_id, 'group_name': group.get('GroupName'), 'vpc_id': group.get('VpcId')}
+
+    def _in_vpc(self, rule: Rule, vpc_id: Optional[str]) -> bool:
+        return not vpc_id or self.groups.get(rule.group_id, {}).get('VpcId') == vpc_id
+
+    def group_options(self, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Grupos para desplegables (respuesta describe_security_groups original), por nombre"""
+        return sorted((g for group_id, g in self.groups.items() if group_id != exclude),
+                      key=lambda g: (g.get('VpcId') or '', g.get('GroupName') or ''))
+
+    def rules_in_ports(self, direction: str, protocol: str, from_port: int, to_port: int) -> List[int]:
+        """Reglas cuyo rango se solapa con [from_port, to_port] para ese protocolo"""
+        protocol = normalize_protocol(protocol)
+        if protocol == '-1':
+            keys = [key for key in self._ports if key[0] == direction]
+        else:
+            keys = [(direction, protocol), (direction, '-1')]
+        found = []
+        for key in keys:
+            tree = self._ports.get(key)
+            if tree is not None:
+                found.extend(tree.overlapping(from_port, to_port))
+        return found
+
+    def exposure(self, from_port: int, to_port: Optional[int] = None, protocol: str = 'tcp',
+                 cidr: Optional[str] = None, direction: str = 'ingress', vpc_id: Optional[str] = None,
+                 partial: bool = False) -> List[Dict[str, Any]]:
+        """
+        Reglas que permiten tráfico del protocolo y rango de puertos indicados desde una
+        red que contiene a cidr (por defecto, todo internet: 0.0.0.0/0 o ::/0). Con
+        partial también cuentan las reglas que abren solo una parte de cidr.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f'Dirección no válida: {direction}')
+        to_port = from_port if to_port is None else to_port
+        if from_port > to_port:
+            raise ValueError('El puerto inicial es mayor que el final')
+        by_port = set(self.rules_in_ports(direction, protocol, from_port, to_port))
+        by_cidr = set()
+        for text in ([cidr] if cidr else INTERNET):
+            net = Net(text)
+            by_cidr.update(self._cidrs[direction].covering(net))
+            if partial:
+                by_cidr.update(self._cidrs[direction].within(net))
+        matched = sorted(by_port & by_cidr)
+        return [dict(self.rules[rule_id].to_dict(), **self._group_info(self.rules[rule_id].group_id))
+                for rule_id in matched if self._in_vpc(self.rules[rule_id], vpc_id)]
+
+    def overlaps(self, group_id: Optional[str] = None, vpc_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Pares de reglas del mismo grupo y dirección que se solapan. 'redundant' cuando una
+        regla queda totalmente cubierta por otra (puede eliminarse sin cambiar el efecto);
+        'overlap' cuando comparten puertos y origen solo en parte. Barrido por puerto
+        inicial, así solo se comparan reglas cuyos rangos coinciden.
+        """
+        findings = []
+        group_ids = [group_id] if group_id else list(self.group_rules)
+        for gid in group_ids:
+            if vpc_id and self.groups.get(gid, {}).get('VpcId') != vpc_id:
+                continue
+            for direction in DIRECTIONS:
+                rules = sorted((self.rules[i] for i in self.group_rules.get(gid, [])
+                                if self.rules[i].direction == direction),
+                               key=lambda rule: (rule.from_port, -rule.to_port))
+                active: List[Rule] = []
+                for rule in rules:
+                    active = [other for other in active if other.to_port >= rule.from_port]
+                    for other in active:
+                        finding = self._compare(other, rule)
+                        if finding:
+                            findings.append(dict(finding, **self._group_info(gid), direction=direction))
+                    active.append(rule)
+        return findings
+
+    @staticmethod
+    def _compare(first: Rule, second: Rule) -> Optional[Dict[str, Any]]:
+        if not (first.covers_protocol(second) or second.covers_protocol(first)):
+            return None
+        if not (first.covers_target(second) or second.covers_target(first)):
+            return None
+        if first.covers(second):
+            return {'type': 'redundant', 'rule': second.to_dict(), 'covered_by': first.to_dict()}
+        if second.covers(first):
+            return {'type': 'redundant', 'rule': first.to_dict(), 'covered_by': second.to_dict()}
+        return {'type': 'overlap', 'rule': first.to_dict(), 'covered_by': second.to_dict()}
+
+    def reference_graph(self, vpc_id: Optional[str] = None) -> Dict[str, Any]:
+        """Aristas grupo → grupo referenciado; las referencias a grupos desconocidos se marcan"""
+        edges = []
+        for target, rule_ids in self.referenced_by.items():
+            for rule_id in rule_ids:
+                rule = self.rules[rule_id]
+                if not self._in_vpc(rule, vpc_id):
+                    continue
+                edges.append({'from': rule.group_id, 'to': target, 'direction': rule.direction,
+                              'protocol': rule.protocol, 'ports': rule.ports,
+                              'missing': target not in self.groups})
+        node_ids = {edge['from'] for edge in edges} | {edge['to'] for edge in edges}
+        nodes = [dict(self._group_info(group_id), referenced_by=len({
+                     self.rules[r].group_id for r in self.referenced_by.get(group_id, [])}),
+                      missing=group_id not in self.groups)
+                 for group_id in sorted(node_ids)]
+        return {'nodes': nodes, 'edges': edges}
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'groups': len(self.groups),
+            'rules': len(self.rules),
+            'ingress_rules': sum(1 for rule in self.rules if rule.direction == 'ingress'),
+            'egress_rules': sum(1 for rule in self.rules if rule.direction == 'egress'),
+            'references': sum(len(rule_ids) for rule_ids in self.referenced_by.values())
+        }
+
+
+def build(ec2) -> SecurityGroupIndex:
+    return SecurityGroupIndex(paginate(ec2, 'describe_security_groups', 'SecurityGroups'))
+
+
+def get_index(ec2, scope: Hashable, refresh: bool = False) -> SecurityGroupIndex:
+    return _cache.get_or_load((scope, 'security_groups'), lambda: build(ec2), refresh=refresh)
+
+
+def invalidate(scope: Hashable):
+    _cache.invalidate_prefix(scope)
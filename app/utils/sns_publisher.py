@@ -0,0 +1,186 @@
+"""
+Publicación masiva en SNS
+PublishBatch en lotes de 10 mensajes / 256 KB, fan-out concurrente a varios tópicos
+con un pool acotado y limitador de ritmo, reintento solo de las entradas fallidas y
+estadísticas agregadas en lugar de una respuesta por mensaje.
+"""
+import csv
+import io
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.utils.batching import chunked_by_size, run_bounded, retry_failed_entries, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_BATCH_LIMIT = 10
+PUBLISH_BATCH_MAX_BYTES = 256 * 1024
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_RETRIES = 5
+# Límite de mensajes por publicación masiva lanzada desde la aplicación
+MAX_MESSAGES = 100000
+
+RETRYABLE_CODES = ('Throttling', 'ThrottlingException', 'ThrottledException', 'InternalError',
+                   'InternalErrorException', 'KMSThrottlingException', 'ServiceUnavailable')
+# Campos de una entrada de PublishBatch que se aceptan en ficheros JSONL/CSV
+ENTRY_FIELDS = {
+    'message': 'Message',
+    'subject': 'Subject',
+    'message_group_id': 'MessageGroupId',
+    'message_deduplication_id': 'MessageDeduplicationId',
+    'message_structure': 'MessageStructure'
+}
+
+
+class PublishResult:
+    """Estadísticas agregadas de una publicación masiva (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.published = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.error_codes: Counter = Counter()
+        self.samples: List[Dict[str, Any]] = []
+        self.topics: Dict[str, Dict[str, int]] = {}
+
+    def add_batch(self, topic_arn: str, succeeded: int, retries: int, failed: List[Dict[str, Any]]):
+        with self._lock:
+            self.batches += 1
+            self.published += succeeded
+            self.failed += len(failed)
+            self.retries += retries
+            topic = self.topics.setdefault(topic_arn, {'published': 0, 'failed': 0})
+            topic['published'] += succeeded
+            topic['failed'] += len(failed)
+            for failure in failed:
+                self.error_codes[failure['code'] or 'Unknown'] += 1
+                if len(self.samples) < 20:
+                    self.samples.append({'topic_arn': topic_arn, 'code': failure['code'],
+                                         'message': failure['message'],
+                                         'body': failure['entry']['Message'][:100]})
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'published': self.published,
+                'failed': self.failed,
+                'batches': self.batches,
+                'retries': self.retries,
+                'seconds': round(elapsed, 3),
+                'messages_per_second': round(self.published / elapsed, 1) if elapsed else 0.0,
+                'error_codes': dict(self.error_codes),
+                'failure_samples': list(self.samples),
+                'topics': {arn: dict(stats) for arn, stats in self.topics.items()}
+            }
+
+
+def is_fifo_topic(topic_arn: str) -> bool:
+    return topic_arn.endswith('.fifo')
+
+
+def list_topic_arns(sns) -> List[str]:
+    """ARNs de todos los tópicos (list_topics devuelve 100 por página)"""
+    arns: List[str] = []
+    for page in sns.get_paginator('list_topics').paginate():
+        arns.extend(topic['TopicArn'] for topic in page.get('Topics', []))
+    return arns
+
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    size = len(entry['Message'].encode('utf-8')) + len((entry.get('Subject') or '').encode('utf-8'))
+    for name, value in (entry.get('MessageAttributes') or {}).items():
+        size += len(name) + len(value.get('DataType', '')) + len(value.get('StringValue', '') or '')
+    return size
+
+
+def publish(sns, topic_arns: List[str], entries: Iterable[Dict[str, Any]],
+            max_workers: int = DEFAULT_WORKERS, messages_per_second: Optional[float] = None,
+            max_retries: int = DEFAULT_MAX_RETRIES, result: Optional[PublishResult] = None) -> PublishResult:
+    """
+    Publica entradas {'Message'[, 'Subject', 'MessageGroupId', 'MessageDeduplicationId',
+    'MessageAttributes', 'MessageStructure']} en cada tópico con PublishBatch.
+    Cada (tópico, lote) es una tarea del pool; en tópicos FIFO los lotes de un tópico
+    van en una sola tarea para conservar el orden. messages_per_second limita el ritmo
+    total de todas las tareas. El cliente se comparte entre hilos.
+    """
+    result = result or PublishResult()
+    limiter = RateLimiter(messages_per_second, burst=max(PUBLISH_BATCH_LIMIT, (messages_per_second or 0) / 4))
+    # El mismo lote se publica en todos los tópicos: se trocea una sola vez
+    batches = list(chunked_by_size(entries, PUBLISH_BATCH_LIMIT, PUBLISH_BATCH_MAX_BYTES, _entry_size))
+
+    def _publish(task):
+        topic_arn, topic_batches = task
+        for batch in topic_batches:
+            succeeded, retries, failed = retry_failed_entries(
+                lambda items: sns.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=items),
+                batch, max_retries, RETRYABLE_CODES, limiter)
+            result.add_batch(topic_arn, succeeded, retries, failed)
+
+    def _tasks() -> Iterator:
+        fifo = [arn for arn in topic_arns if is_fifo_topic(arn)]
+        for arn in fifo:
+            yield arn, batches
+        for batch in batches:
+            for arn in topic_arns:
+                if arn not in fifo:
+                    yield arn, [batch]
+
+    run_bounded(_tasks(), _publish, max_workers, 'sns-publish')
+    return result
+
+
+def entry_from_object(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada a partir de un objeto con campo message (y subject, message_group_id...)"""
+    entry = {api: str(obj[field]) for field, api in ENTRY_FIELDS.items() if obj.get(field) not in (None, '')}
+    attributes = obj.get('attributes')
+    if isinstance(attributes, dict) and attributes:
+        entry['MessageAttributes'] = {
+            name: {'DataType': 'Number' if isinstance(value, (int, float)) else 'String', 'StringValue': str(value)}
+            for name, value in attributes.items()
+        }
+    return entry
+
+
+def read_entries(text_stream, fmt: str = 'text') -> Iterator[Dict[str, Any]]:
+    """
+    Entradas de un fichero subido:
+    - text: cada línea no vacía es un mensaje.
+    - jsonl: objetos con campo message (y opcionalmente subject, message_group_id,
+      message_deduplication_id, attributes); cualquier otra línea se publica tal cual.
+    - csv: columna message (y opcionales); sin ella cada fila se publica como JSON.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(text_stream):
+            if row.get('message'):
+                yield entry_from_object(row)
+            else:
+                yield {'Message': json.dumps(row, ensure_ascii=False)}
+        return
+    for line in text_stream:
+        line = line.strip()
+        if not line:
+            continue
+        if fmt == 'jsonl':
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            if isinstance(obj, dict) and obj.get('message') not in (None, ''):
+                yield entry_from_object(obj)
+                continue
+        yield {'Message': line}
+
+
+def read_upload(file_storage, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    filename = (file_storage.filename or '').lower()
+    if not fmt:
+        fmt = 'csv' if filename.endswith('.csv') else 'jsonl' if filename.endswith(('.jsonl', '.ndjson')) else 'text'
+    return read_entries(io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig'), fmt)
@@ -0,0 +1,400 @@
+"""
+Operaciones masivas sobre SQS
+Envío y borrado con las APIs batch (10 mensajes por llamada), receptores concurrentes
+con long polling, movimiento de mensajes entre colas (redrive de DLQ) con un número
+acotado de mensajes en vuelo y métricas de mensajes/segundo por cola.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.utils.batching import chunked_by_size, backoff_delay, run_bounded, retry_failed_entries
+
+logger = logging.getLogger(__name__)
+
+# Límites de las APIs batch de SQS
+SQS_BATCH_LIMIT = 10
+SQS_BATCH_MAX_BYTES = 256 * 1024
+LONG_POLL_SECONDS = 20
+DEFAULT_POLLERS = 4
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_IN_FLIGHT = 100
+# Ventana para calcular mensajes/segundo
+METRICS_WINDOW = 60
+
+RETRYABLE_CODES = ('ThrottlingException', 'RequestThrottled', 'ServiceUnavailable',
+                   'InternalError', 'KmsThrottled')
+
+
+class QueueMetrics:
+    """Contadores y ritmo (mensajes/segundo) de las operaciones hechas sobre una cola"""
+
+    OPERATIONS = ('sent', 'received', 'deleted', 'moved', 'failed')
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+        self.totals = {op: 0 for op in self.OPERATIONS}
+        self.events: deque = deque()
+        self.last_activity: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, operation: str, count: int):
+        if not count:
+            return
+        now = time.time()
+        with self._lock:
+            self.totals[operation] += count
+            self.events.append((now, operation, count))
+            self.last_activity = now
+            self._trim(now)
+
+    def _trim(self, now: float):
+        while self.events and self.events[0][0] < now - METRICS_WINDOW:
+            self.events.popleft()
+
+    def rates(self, window: float = 10.0) -> Dict[str, float]:
+        """Mensajes/segundo por operación en los últimos window segundos"""
+        now = time.time()
+        window = min(window, METRICS_WINDOW)
+        counts = {op: 0 for op in self.OPERATIONS}
+        with self._lock:
+            self._trim(now)
+            for ts, operation, count in self.events:
+                if ts >= now - window:
+                    counts[operation] += count
+        return {op: round(count / window, 2) for op, count in counts.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'queue_url': self.queue_url,
+            'queue_name': self.queue_url.rsplit('/', 1)[-1],
+            'totals': dict(self.totals),
+            'rates': self.rates(),
+            'last_activity': self.last_activity
+        }
+
+
+class MetricsRegistry:
+    """Métricas por URL de cola de las operaciones masivas lanzadas desde la aplicación"""
+
+    def __init__(self):
+        self._queues: Dict[str, QueueMetrics] = {}
+        self._lock = threading.Lock()
+
+    def for_queue(self, queue_url: str) -> QueueMetrics:
+        with self._lock:
+            if queue_url not in self._queues:
+                self._queues[queue_url] = QueueMetrics(queue_url)
+            return self._queues[queue_url]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            queues = list(self._queues.values())
+        return sorted((q.to_dict() for q in queues), key=lambda q: -(q['last_activity'] or 0))
+
+
+metrics = MetricsRegistry()
+
+
+class BatchResult:
+    """Resultado de un envío o borrado masivo (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.succeeded = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed: List[Dict[str, Any]] = []
+
+    def add_batch(self, succeeded: int, retries: int, failed: List[Dict[str, Any]]):
+        with self._lock:
+            self.batches += 1
+            self.succeeded += succeeded
+            self.retries += retries
+            self.failed.extend(failed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'succeeded': self.succeeded,
+                'failed_count': len(self.failed),
+                'failed': self.failed[:100],
+                'batches': self.batches,
+                'retries': self.retries,
+                'seconds': round(elapsed, 3),
+                'messages_per_second': round(self.succeeded / elapsed, 1) if elapsed else 0.0
+            }
+
+
+def is_fifo(queue_url: str) -> bool:
+    return queue_url.endswith('.fifo')
+
+
+def queue_url_for(sqs, queue_name: str) -> str:
+    """URL de una cola por nombre (una llamada en lugar de recorrer list_queues)"""
+    return sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+
+
+def _message_size(entry: Dict[str, Any]) -> int:
+    size = len(entry['MessageBody'].encode('utf-8'))
+    for name, value in (entry.get('MessageAttributes') or {}).items():
+        size += len(name) + len(value.get('DataType', '')) + \
+            len(value.get('StringValue', '') or '') + len(value.get('BinaryValue', b'') or b'')
+    return size
+
+
+def send_messages(sqs, queue_url: str, entries: Iterable[Dict[str, Any]],
+                  max_workers: int = DEFAULT_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES,
+                  result: Optional[BatchResult] = None) -> BatchResult:
+    """
+    Envía entradas {'MessageBody'[, 'MessageGroupId', 'MessageDeduplicationId',
+    'DelaySeconds', 'MessageAttributes']} con send_message_batch en lotes de 10 / 256 KB.
+    En colas FIFO los lotes se envían de uno en uno para conservar el orden por grupo.
+    """
+    result = result or BatchResult()
+    queue_metrics = metrics.for_queue(queue_url)
+    if is_fifo(queue_url):
+        max_workers = 1
+
+    def _send(batch):
+        succeeded, retries, failed = retry_failed_entries(
+            lambda items: sqs.send_message_batch(QueueUrl=queue_url, Entries=items), batch, max_retries,
+            RETRYABLE_CODES)
+        queue_metrics.add('sent', succeeded)
+        queue_metrics.add('failed', len(failed))
+        result.add_batch(succeeded, retries, failed)
+
+    batches = chunked_by_size(entries, SQS_BATCH_LIMIT, SQS_BATCH_MAX_BYTES, _message_size)
+    run_bounded(batches, _send, max_workers, 'sqs-send')
+    return result
+
+
+def delete_messages(sqs, queue_url: str, receipt_handles: Iterable[str],
+                    max_workers: int = DEFAULT_WORKERS, max_retries: int = DEFAULT_MAX_RETRIES,
+                    result: Optional[BatchResult] = None) -> BatchResult:
+    """Borra mensajes por receipt handle con delete_message_batch en lotes de 10"""
+    result = result or BatchResult()
+    queue_metrics = metrics.for_queue(queue_url)
+
+    def _delete(batch):
+        succeeded, retries, failed = retry_failed_entries(
+            lambda items: sqs.delete_message_batch(QueueUrl=queue_url, Entries=items), batch, max_retries,
+            RETRYABLE_CODES)
+        queue_metrics.add('deleted', succeeded)
+        queue_metrics.add('failed', len(failed))
+        result.add_batch(succeeded, retries, failed)
+
+    entries = ({'ReceiptHandle': handle} for handle in receipt_handles)
+    batches = chunked_by_size(entries, SQS_BATCH_LIMIT, SQS_BATCH_MAX_BYTES, lambda e: 0)
+    run_bounded(batches, _delete, max_workers, 'sqs-delete')
+    return result
+
+
+class _Budget:
+    """Reparto thread-safe de un máximo de mensajes entre varios receptores"""
+
+    def __init__(self, total: int):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self, wanted: int) -> int:
+        with self._lock:
+            granted = min(wanted, self.remaining)
+            self.remaining -= granted
+            return granted
+
+    def give_back(self, count: int):
+        if count > 0:
+            with self._lock:
+                self.remaining += count
+
+
+def poll(sqs, queue_url: str, handler: Callable[[List[Dict[str, Any]]], None],
+         max_messages: int = 100, max_seconds: float = 30.0, pollers: int = DEFAULT_POLLERS,
+         wait_time_seconds: int = LONG_POLL_SECONDS, visibility_timeout: Optional[int] = None,
+         stop_when_empty: bool = True) -> Dict[str, Any]:
+    """
+    Receptores concurrentes con long polling. Cada receptor pide hasta 10 mensajes con
+    WaitTimeSeconds (acotado por el tiempo restante) y entrega cada lote a handler desde
+    su propio hilo. Nunca se piden más mensajes que el presupuesto restante, para no dejar
+    mensajes ocultos que luego no se procesan. Con stop_when_empty un receptor termina
+    cuando un long poll vuelve vacío (la cola está vacía).
+    """
+    queue_metrics = metrics.for_queue(queue_url)
+    budget = _Budget(max_messages)
+    deadline = time.monotonic() + max_seconds
+    stats = {'received': 0, 'receives': 0, 'empty_receives': 0, 'errors': [], 'stopped_by': None}
+    lock = threading.Lock()
+
+    def _poller():
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return 'max_seconds'
+            wanted = budget.take(SQS_BATCH_LIMIT)
+            if not wanted:
+                return 'max_messages'
+            params = {
+                'QueueUrl': queue_url,
+                'MaxNumberOfMessages': wanted,
+                'WaitTimeSeconds': max(0, min(wait_time_seconds, int(remaining))),
+                'AttributeNames': ['All'],
+                'MessageAttributeNames': ['All']
+            }
+            if visibility_timeout is not None:
+                params['VisibilityTimeout'] = visibility_timeout
+            try:
+                messages = sqs.receive_message(**params).get('Messages', [])
+                attempt = 0
+            except ClientError as e:
+                budget.give_back(wanted)
+                code = e.response.get('Error', {}).get('Code')
+                if code in RETRYABLE_CODES and attempt < DEFAULT_MAX_RETRIES:
+                    time.sleep(backoff_delay(attempt, base=0.2))
+                    attempt += 1
+                    continue
+                with lock:
+                    stats['errors'].append(str(e))
+                return 'error'
+            budget.give_back(wanted - len(messages))
+            with lock:
+                stats['receives'] += 1
+                stats['received'] += len(messages)
+                if not messages:
+                    stats['empty_receives'] += 1
+            if not messages:
+                if stop_when_empty:
+                    return 'empty'
+                continue
+            queue_metrics.add('received', len(messages))
+            handler(messages)
+
+    reasons: List[str] = []
+
+    def _run():
+        try:
+            reason = _poller()
+        except Exception as e:
+            logger.warning(f'SQS: receptor de {queue_url} detenido: {str(e)}')
+            with lock:
+                stats['errors'].append(str(e))
+            reason = 'error'
+        with lock:
+            reasons.append(reason)
+
+    started = time.monotonic()
+    pollers = max(1, min(pollers, math.ceil(max_messages / SQS_BATCH_LIMIT)))
+    if pollers == 1:
+        _run()
+    else:
+        threads = [threading.Thread(target=_run, name=f'sqs-poller-{i}', daemon=True) for i in range(pollers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    for reason in ('max_messages', 'max_seconds', 'error', 'empty'):
+        if reason in reasons:
+            stats['stopped_by'] = reason
+            break
+    stats['pollers'] = pollers
+    stats['seconds'] = round(time.monotonic() - started, 3)
+    stats['messages_per_second'] = round(stats['received'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+    return stats
+
+
+def receive_messages(sqs, queue_url: str, max_messages: int = 10, max_seconds: float = 10.0,
+                     pollers: int = DEFAULT_POLLERS, wait_time_seconds: int = LONG_POLL_SECONDS,
+                     visibility_timeout: Optional[int] = None, delete: bool = False):
+    """
+    Recibe hasta max_messages con receptores concurrentes. Con delete, cada lote se
+    borra con delete_message_batch nada más recibirse. Devuelve (mensajes, estadísticas).
+    """
+    received: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    deleted = BatchResult()
+
+    def _collect(messages):
+        if delete:
+            delete_messages(sqs, queue_url, [m['ReceiptHandle'] for m in messages],
+                            max_workers=1, result=deleted)
+        with lock:
+            received.extend(messages)
+
+    stats = poll(sqs, queue_url, _collect, max_messages=max_messages, max_seconds=max_seconds,
+                 pollers=pollers, wait_time_seconds=wait_time_seconds,
+                 visibility_timeout=visibility_timeout)
+    if delete:
+        stats['deleted'] = deleted.succeeded
+        stats['delete_failed'] = len(deleted.failed)
+    return received, stats
+
+
+def _move_entry(message: Dict[str, Any], target_fifo: bool) -> Dict[str, Any]:
+    """Entrada de send_message_batch que reproduce un mensaje recibido"""
+    entry: Dict[str, Any] = {'MessageBody': message['Body']}
+    if message.get('MessageAttributes'):
+        entry['MessageAttributes'] = message['MessageAttributes']
+    if target_fifo:
+        attributes = message.get('Attributes', {})
+        entry['MessageGroupId'] = attributes.get('MessageGroupId', 'redrive')
+        entry['MessageDeduplicationId'] = attributes.get('MessageDeduplicationId', message['MessageId'])
+    return entry
+
+
+def move_messages(sqs, source_url: str, target_url: str, max_messages: int = 1000,
+                  max_seconds: float = 60.0, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                  visibility_timeout: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Mueve mensajes de source a target (p. ej. redrive de una DLQ a su cola de origen).
+    Cada receptor recibe un lote, lo reenvía con send_message_batch y borra del origen
+    solo los mensajes enviados correctamente, de modo que nunca hay más de max_in_flight
+    mensajes recibidos sin confirmar. Los que fallan vuelven a ser visibles en el origen
+    cuando expira su visibilidad.
+    """
+    source_metrics = metrics.for_queue(source_url)
+    target_fifo = is_fifo(target_url)
+    # En FIFO un único receptor conserva el orden de cada grupo
+    pollers = 1 if target_fifo else max(1, math.ceil(max_in_flight / SQS_BATCH_LIMIT))
+    sent, deleted = BatchResult(), BatchResult()
+
+    def _forward(messages):
+        by_id = {str(i): message for i, message in enumerate(messages)}
+        entries = [dict(_move_entry(message, target_fifo), Id=entry_id) for entry_id, message in by_id.items()]
+        succeeded, retries, failed = retry_failed_entries(
+            lambda items: sqs.send_message_batch(QueueUrl=target_url, Entries=items),
+            entries, DEFAULT_MAX_RETRIES, RETRYABLE_CODES)
+        failed_ids = {f['entry']['Id'] for f in failed}
+        sent.add_batch(succeeded, retries, failed)
+        metrics.for_queue(target_url).add('sent', succeeded)
+        done = [message['ReceiptHandle'] for entry_id, message in by_id.items() if entry_id not in failed_ids]
+        delete_messages(sqs, source_url, done, max_workers=1, result=deleted)
+        source_metrics.add('moved', len(done))
+
+    stats = poll(sqs, source_url, _forward, max_messages=max_messages, max_seconds=max_seconds,
+                 pollers=pollers, visibility_timeout=visibility_timeout)
+    stats.update({
+        'moved': deleted.succeeded,
+        'send_failed': len(sent.failed),
+        'delete_failed': len(deleted.failed),
+        'errors': stats['errors'] + [f"{f['code']}: {f['message']}" for f in sent.failed[:20]],
+        'messages_per_second': round(deleted.succeeded / stats['seconds'], 1) if stats['seconds'] else 0.0
+    })
+    return stats
+
+
+def dead_letter_sources(sqs, dlq_url: str) -> List[str]:
+    """Colas cuyo RedrivePolicy apunta a esta DLQ (destinos naturales del redrive)"""
+    urls: List[str] = []
+    paginator = sqs.get_paginator('list_dead_letter_source_queues')
+    for page in paginator.paginate(QueueUrl=dlq_url):
+        urls.extend(page.get('queueUrls', []))
+    return urls
@@ -0,0 +1,526 @@
+"""
+Topología de red de una cuenta y región
+Todas las llamadas describe_* de red se lanzan en paralelo (paginadas) y se construye
+un grafo indexado: subred → tabla de rutas → destinos, grupo de seguridad → ENI →
+instancia. El grafo se cachea por ámbito y responde en milisegundos consultas de
+alcanzabilidad entre subredes, ENIs, instancias, IPs e internet siguiendo las rutas
+por prefijo más largo, NAT gateways y peerings (con comprobación de la ruta de vuelta).
+Las reglas de security groups y NACLs no se evalúan aquí.
+"""
+import ipaddress
+import logging
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from app.utils.cache import TTLCache
+from app.utils.fanout import fan_out
+
+logger = logging.getLogger(__name__)
+
+TOPOLOGY_TTL = 300.0
+COLLECT_WORKERS = 10
+COLLECT_TIMEOUT = 120.0
+MAX_HOPS = 8
+
+_cache = TTLCache(ttl=TOPOLOGY_TTL, max_entries=64)
+
+# Campos de una ruta que identifican su destino, en orden de preferencia
+_ROUTE_TARGETS = (
+    ('NatGatewayId', 'nat'),
+    ('VpcPeeringConnectionId', 'pcx'),
+    ('TransitGatewayId', 'tgw'),
+    ('NetworkInterfaceId', 'eni'),
+    ('InstanceId', 'instance'),
+    ('EgressOnlyInternetGatewayId', 'eigw'),
+    ('CarrierGatewayId', 'cagw'),
+    ('LocalGatewayId', 'lgw'),
+    ('CoreNetworkArn', 'core-network'),
+    ('GatewayId', None),
+)
+
+
+def tag_value(tags, key='Name'):
+    """Valor de una etiqueta (por defecto Name) en una lista Tags de EC2/ELB"""
+    for tag in tags or []:
+        if tag.get('Key') == key:
+            return tag.get('Value')
+    return None
+
+
+def paginate(client, operation, result_key, **kwargs):
+    """Todos los elementos de una operación describe_* paginada"""
+    items = []
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        items.extend(page.get(result_key, []))
+    return items
+
+
+def _instances(ec2):
+    return [instance for reservation in paginate(ec2, 'describe_instances', 'Reservations')
+            for instance in reservation.get('Instances', [])]
+
+
+_COLLECTORS: Dict[str, Callable] = {
+    'vpcs': lambda ec2: paginate(ec2, 'describe_vpcs', 'Vpcs'),
+    'subnets': lambda ec2: paginate(ec2, 'describe_subnets', 'Subnets'),
+    'route_tables': lambda ec2: paginate(ec2, 'describe_route_tables', 'RouteTables'),
+    'internet_gateways': lambda ec2: paginate(ec2, 'describe_internet_gateways', 'InternetGateways'),
+    'nat_gateways': lambda ec2: paginate(ec2, 'describe_nat_gateways', 'NatGateways'),
+    'peerings': lambda ec2: paginate(ec2, 'describe_vpc_peering_connections', 'VpcPeeringConnections'),
+    'security_groups': lambda ec2: paginate(ec2, 'describe_security_groups', 'SecurityGroups'),
+    'network_interfaces': lambda ec2: paginate(ec2, 'describe_network_interfaces', 'NetworkInterfaces'),
+    'instances': _instances,
+}
+
+
+class Net:
+    """Red IPv4/IPv6 como (versión, entero, prefijo): comparaciones sin objetos ipaddress"""
+    __slots__ = ('version', 'value', 'prefix', 'text')
+
+    def __init__(self, text: str):
+        network = ipaddress.ip_network(text, strict=False)
+        self.version = network.version
+        self.value = int(network.network_address)
+        self.prefix = network.prefixlen
+        self.text = str(network)
+
+    @property
+    def bits(self) -> int:
+        return 32 if self.version == 4 else 128
+
+    def contains(self, other: 'Net') -> bool:
+        if other.version != self.version or other.prefix < self.prefix:
+            return False
+        shift = self.bits - self.prefix
+        return (other.value >> shift) == (self.value >> shift)
+
+
+def _parse_net(text: Optional[str]) -> Optional[Net]:
+    try:
+        return Net(text) if text else None
+    except ValueError:
+        return None
+
+
+class Topology:
+    """Grafo de red indexado construido a partir de las respuestas describe_*"""
+
+    def __init__(self, raw: Dict[str, List[Dict[str, Any]]], errors: Optional[Dict[str, str]] = None):
+        self.built_at = time.time()
+        self.errors = errors or {}
+        self.vpcs: Dict[str, Dict[str, Any]] = {}
+        self.subnets: Dict[str, Dict[str, Any]] = {}
+        self.route_tables: Dict[str, Dict[str, Any]] = {}
+        self.subnet_route_table: Dict[str, str] = {}
+        self.main_route_table: Dict[str, str] = {}
+        self.internet_gateways: Dict[str, Dict[str, Any]] = {}
+        self.nat_gateways: Dict[str, Dict[str, Any]] = {}
+        self.peerings: Dict[str, Dict[str, Any]] = {}
+        self.security_groups: Dict[str, Dict[str, Any]] = {}
+        self.enis: Dict[str, Dict[str, Any]] = {}
+        self.instances: Dict[str, Dict[str, Any]] = {}
+        # Índices inversos
+        self.vpc_subnets: Dict[str, List[str]] = {}
+        self.subnet_enis: Dict[str, List[str]] = {}
+        self.sg_enis: Dict[str, List[str]] = {}
+        self.instance_enis: Dict[str, List[str]] = {}
+        self._build(raw)
+
+    def _build(self, raw):
+        for vpc in raw.get('vpcs', []):
+            cidrs = [a['CidrBlock'] for a in vpc.get('CidrBlockAssociationSet', [])
+                     if a.get('CidrBlockState', {}).get('State', 'associated') == 'associated'] or [vpc['CidrBlock']]
+            cidrs += [a['Ipv6CidrBlock'] for a in vpc.get('Ipv6CidrBlockAssociationSet', [])
+                      if a.get('Ipv6CidrBlock')]
+            self.vpcs[vpc['VpcId']] = {
+                'id': vpc['VpcId'], 'name': tag_value(vpc.get('Tags')), 'is_default': vpc.get('IsDefault', False),
+                'cidrs': cidrs, 'nets': [n for n in map(_parse_net, cidrs) if n]
+            }
+            self.vpc_subnets.setdefault(vpc['VpcId'], [])
+
+        for subnet in raw.get('subnets', []):
+            nets = [_parse_net(subnet.get('CidrBlock'))]
+            nets += [_parse_net(a.get('Ipv6CidrBlock')) for a in subnet.get('Ipv6CidrBlockAssociationSet', [])]
+            self.subnets[subnet['SubnetId']] = {
+                'id': subnet['SubnetId'], 'vpc_id': subnet['VpcId'], 'name': tag_value(subnet.get('Tags')),
+                'cidr': subnet.get('CidrBlock'), 'availability_zone': subnet.get('AvailabilityZone'),
+                'map_public_ip': subnet.get('MapPublicIpOnLaunch', False), 'nets': [n for n in nets if n]
+            }
+            self.vpc_subnets.setdefault(subnet['VpcId'], []).append(subnet['SubnetId'])
+
+        for table in raw.get('route_tables', []):
+            routes = []
+            for route in table.get('Routes', []):
+                destination = (route.get('DestinationCidrBlock') or route.get('DestinationIpv6CidrBlock')
+                               or route.get('DestinationPrefixListId'))
+                target_type, target_id = 'unknown', None
+                for field, kind in _ROUTE_TARGETS:
+                    if route.get(field):
+                        target_id = route[field]
+                        target_type = kind or ('local' if target_id == 'local' else target_id.split('-')[0])
+                        break
+                routes.append({'destination': destination, 'net': _parse_net(destination),
+                               'target_type': target_type, 'target_id': target_id,
+                               'state': route.get('State', 'active')})
+            # Prefijo más largo primero: la primera coincidencia es la ganadora
+            routes.sort(key=lambda r: -(r['net'].prefix if r['net'] else -1))
+            self.route_tables[table['RouteTableId']] = {
+                'id': table['RouteTableId'], 'vpc_id': table.get('VpcId'), 'name': tag_value(table.get('Tags')),
+                'routes': routes, 'main': False, 'subnets': []
+            }
+            for association in table.get('Associations', []):
+                if association.get('Main'):
+                    self.main_route_table[table.get('VpcId')] = table['RouteTableId']
+                    self.route_tables[table['RouteTableId']]['main'] = True
+                elif association.get('SubnetId'):
+                    self.subnet_route_table[association['SubnetId']] = table['RouteTableId']
+                    self.route_tables[table['RouteTableId']]['subnets'].append(association['SubnetId'])
+
+        for igw in raw.get('internet_gateways', []):
+            attached = [a['VpcId'] for a in igw.get('Attachments', []) if a.get('State') in ('available', 'attached')]
+            self.internet_gateways[igw['InternetGatewayId']] = {
+                'id': igw['InternetGatewayId'], 'name': tag_value(igw.get('Tags')), 'vpc_id': attached[0] if attached else None
+            }
+
+        for nat in raw.get('nat_gateways', []):
+            if nat.get('State') == 'deleted':
+                continue
+            addresses = nat.get('NatGatewayAddresses', [])
+            self.nat_gateways[nat['NatGatewayId']] = {
+                'id': nat['NatGatewayId'], 'name': tag_value(nat.get('Tags')), 'vpc_id': nat.get('VpcId'),
+                'subnet_id': nat.get('SubnetId'), 'state': nat.get('State'),
+                'connectivity': nat.get('ConnectivityType', 'public'),
+                'public_ip': next((a.get('PublicIp') for a in addresses if a.get('PublicIp')), None)
+            }
+
+        for peering in raw.get('peerings', []):
+            status = peering.get('Status', {}).get('Code')
+            if status in ('deleted', 'rejected', 'failed', 'expired'):
+                continue
+            self.peerings[peering['VpcPeeringConnectionId']] = {
+                'id': peering['VpcPeeringConnectionId'], 'name': tag_value(peering.get('Tags')), 'status': status,
+                'requester_vpc': peering.get('RequesterVpcInfo', {}).get('VpcId'),
+                'accepter_vpc': peering.get('AccepterVpcInfo', {}).get('VpcId')
+            }
+
+        for group in raw.get('security_groups', []):
+            self.security_groups[group['GroupId']] = {
+                'id': group['GroupId'], 'name': group.get('GroupName'), 'vpc_id': group.get('VpcId')
+            }
+            self.sg_enis.setdefault(group['GroupId'], [])
+
+        for instance in raw.get('instances', []):
+            self.instances[instance['InstanceId']] = {
+                'id': instance['InstanceId'], 'name': tag_value(instance.get('Tags')),
+                'state': instance.get('State', {}).get('Name'), 'subnet_id': instance.get('SubnetId')
+            }
+
+        for eni in raw.get('network_interfaces', []):
+            attachment = eni.get('Attachment') or {}
+            groups = [g['GroupId'] for g in eni.get('Groups', [])]
+            self.enis[eni['NetworkInterfaceId']] = {
+                'id': eni['NetworkInterfaceId'], 'vpc_id': eni.get('VpcId'), 'subnet_id': eni.get('SubnetId'),
+                'private_ip': eni.get('PrivateIpAddress'),
+                'public_ip': (eni.get('Association') or {}).get('PublicIp'),
+                'security_groups': groups, 'instance_id': attachment.get('InstanceId'),
+                'device_index': attachment.get('DeviceIndex'), 'type': eni.get('InterfaceType'),
+                'description': eni.get('Description')
+            }
+            self.subnet_enis.setdefault(eni.get('SubnetId'), []).append(eni['NetworkInterfaceId'])
+            for group in groups:
+                self.sg_enis.setdefault(group, []).append(eni['NetworkInterfaceId'])
+            if attachment.get('InstanceId'):
+                self.instance_enis.setdefault(attachment['InstanceId'], []).append(eni['NetworkInterfaceId'])
+
+    # --- Consultas -------------------------------------------------------
+
+    def route_table_for(self, subnet_id: str) -> Optional[str]:
+        """Tabla asociada explícitamente o, si no hay, la principal de la VPC"""
+        subnet = self.subnets.get(subnet_id)
+        if subnet is None:
+            return None
+        return self.subnet_route_table.get(subnet_id) or self.main_route_table.get(subnet['vpc_id'])
+
+    def lookup_route(self, route_table_id: str, destination: Net) -> Optional[Dict[str, Any]]:
+        """Ruta de prefijo más largo que cubre el destino"""
+        for route in self.route_tables.get(route_table_id, {}).get('routes', []):
+            if route['net'] is not None and route['net'].contains(destination):
+                return route
+        return None
+
+    def subnet_containing(self, vpc_id: str, destination: Net) -> Optional[str]:
+        for subnet_id in self.vpc_subnets.get(vpc_id, []):
+            if any(net.contains(destination) for net in self.subnets[subnet_id]['nets']):
+                return subnet_id
+        return None
+
+    def vpc_containing(self, destination: Net) -> Optional[str]:
+        for vpc_id, vpc in self.vpcs.items():
+            if any(net.contains(destination) for net in vpc['nets']):
+                return vpc_id
+        return None
+
+    def _primary_eni(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        enis = [self.enis[e] for e in self.instance_enis.get(instance_id, [])]
+        enis.sort(key=lambda eni: eni.get('device_index') or 0)
+        return enis[0] if enis else None
+
+    def resolve_source(self, source: str) -> Dict[str, Any]:
+        """Subred, ENI o instancia de origen"""
+        if source in self.subnets:
+            subnet = self.subnets[source]
+            return {'id': source, 'type': 'subnet', 'subnet_id': source, 'net': subnet['nets'][0] if subnet['nets'] else None,
+                    'public_ip': None, 'security_groups': []}
+        eni = self.enis.get(source)
+        if eni is None and source in self.instances:
+            eni = self._primary_eni(source)
+        if eni is None:
+            raise ValueError(f'Origen desconocido: {source} (usa una subred, ENI o instancia)')
+        return {'id': source, 'type': 'instance' if source in self.instances else 'eni', 'subnet_id': eni['subnet_id'],
+                'net': _parse_net(eni['private_ip']), 'public_ip': eni['public_ip'],
+                'security_groups': eni['security_groups']}
+
+    def resolve_destination(self, destination: str) -> Dict[str, Any]:
+        """IP, CIDR, 'internet', subred, ENI o instancia de destino"""
+        if destination.lower() == 'internet':
+            return {'id': 'internet', 'type': 'internet', 'net': Net('0.0.0.0/0')}
+        if destination in self.subnets:
+            subnet = self.subnets[destination]
+            return {'id': destination, 'type': 'subnet', 'net': subnet['nets'][0] if subnet['nets'] else None}
+        eni = self.enis.get(destination)
+        if eni is None and destination in self.instances:
+            eni = self._primary_eni(destination)
+        if eni is not None:
+            return {'id': destination, 'type': 'instance' if destination in self.instances else 'eni',
+                    'net': _parse_net(eni['private_ip']), 'security_groups': eni['security_groups']}
+        net = _parse_net(destination)
+        if net is None:
+            raise ValueError(f'Destino desconocido: {destination} (usa una IP, CIDR, subred, ENI, instancia o "internet")')
+        return {'id': destination, 'type': 'address', 'net': net}
+
+    def reachability(self, source: str, destination: str) -> Dict[str, Any]:
+        """
+        Camino por tablas de rutas desde el origen hasta el destino. reachable es True,
+        False o None cuando el tráfico sale por un destino no analizable (TGW, VGW...).
+        """
+        started = time.perf_counter()
+        origin = self.resolve_source(source)
+        target = self.resolve_destination(destination)
+        hops: List[Dict[str, Any]] = [{'type': origin['type'], 'id': origin['id']}]
+        if origin['type'] != 'subnet':
+            hops.append({'type': 'subnet', 'id': origin['subnet_id']})
+
+        def _result(reachable, status, reason, **extra):
+            return dict({
+                'source': source, 'destination': destination, 'reachable': reachable, 'status': status,
+                'reason': reason, 'hops': hops, 'source_security_groups': origin['security_groups'],
+                'destination_security_groups': target.get('security_groups', []),
+                'ms': round((time.perf_counter() - started) * 1000, 3)
+            }, **extra)
+
+        if target['net'] is None:
+            # Subred solo IPv6 o ENI sin IP privada
+            return _result(None, 'no_address', f'{destination} no tiene una dirección analizable')
+
+        subnet_id = origin['subnet_id']
+        public_ip = origin['public_ip']
+        visited = set()
+        for _ in range(MAX_HOPS):
+            if subnet_id in visited:
+                return _result(False, 'loop', 'Bucle de rutas')
+            visited.add(subnet_id)
+            vpc_id = self.subnets.get(subnet_id, {}).get('vpc_id')
+            table_id = self.route_table_for(subnet_id)
+            if table_id is None:
+                return _result(False, 'no_route_table', f'La subred {subnet_id} no tiene tabla de rutas')
+            route = self.lookup_route(table_id, target['net'])
+            hops.append({'type': 'route_table', 'id': table_id,
+                         'route': route['destination'] if route else None,
+                         'target': route['target_id'] if route else None})
+            if route is None:
+                return _result(False, 'no_route', f'{table_id} no tiene ruta hacia {target["net"].text}')
+            if route['state'] == 'blackhole':
+                return _result(False, 'blackhole', f'La ruta {route["destination"]} de {table_id} está en blackhole')
+
+            kind = route['target_type']
+            if kind == 'local':
+                dest_subnet = self.subnet_containing(vpc_id, target['net'])
+                if dest_subnet is None:
+                    return _result(False, 'no_subnet', f'Ninguna subred de {vpc_id} contiene {target["net"].text}')
+                hops.append({'type': 'subnet', 'id': dest_subnet})
+                return _result(True, 'local', f'Tráfico local dentro de {vpc_id}')
+            if kind == 'igw':
+                hops.append({'type': 'internet_gateway', 'id': route['target_id']})
+                if public_ip is None and origin['type'] == 'subnet':
+                    public = self.subnets[subnet_id]['map_public_ip']
+                    return _result(True if public else None, 'internet',
+                                   'Sale por el internet gateway' + ('' if public else
+                                   '; la subred no asigna IP pública: depende de cada ENI'))
+                if public_ip is None:
+                    return _result(False, 'no_public_ip', 'La ruta va al internet gateway pero el origen no tiene IP pública')
+                return _result(True, 'internet', f'Sale por el internet gateway con IP pública {public_ip}')
+            if kind == 'nat':
+                nat = self.nat_gateways.get(route['target_id'])
+                hops.append({'type': 'nat_gateway', 'id': route['target_id']})
+                if nat is None or nat['state'] != 'available':
+                    return _result(False, 'nat_unavailable', f'El NAT gateway {route["target_id"]} no está disponible')
+                if nat['connectivity'] == 'private':
+                    public_ip = None
+                else:
+                    public_ip = nat['public_ip']
+                # El tráfico continúa desde la subred del NAT gateway
+                subnet_id = nat['subnet_id']
+                hops.append({'type': 'subnet', 'id': subnet_id})
+                continue
+            if kind == 'pcx':
+                return self._through_peering(route['target_id'], vpc_id, origin, target, hops, _result)
+            hops.append({'type': kind, 'id': route['target_id']})
+            return _result(None, 'exits', f'Sale de la VPC por {route["target_id"]}: no se analiza más allá')
+        return _result(False, 'too_many_hops', f'Más de {MAX_HOPS} saltos')
+
+    def _through_peering(self, peering_id, vpc_id, origin, target, hops, _result):
+        peering = self.peerings.get(peering_id)
+        hops.append({'type': 'peering', 'id': peering_id})
+        if peering is None or peering['status'] != 'active':
+            return _result(False, 'peering_inactive', f'El peering {peering_id} no está activo')
+        peer_vpc = peering['accepter_vpc'] if peering['requester_vpc'] == vpc_id else peering['requester_vpc']
+        hops.append({'type': 'vpc', 'id': peer_vpc})
+        if peer_vpc not in self.vpcs:
+            return _result(None, 'exits', f'La VPC {peer_vpc} es de otra cuenta o región: no se analiza')
+        # El peering no es transitivo: el destino tiene que estar en la VPC par
+        dest_subnet = self.subnet_containing(peer_vpc, target['net'])
+        if dest_subnet is None:
+            return _result(False, 'no_subnet', f'Ninguna subred de {peer_vpc} contiene {target["net"].text}')
+        hops.append({'type': 'subnet', 'id': dest_subnet})
+        back_table = self.route_table_for(dest_subnet)
+        back = self.lookup_route(back_table, origin['net']) if back_table and origin['net'] else None
+        return_ok = bool(back and back['target_id'] == peering_id and back['state'] != 'blackhole')
+        if not return_ok:
+            return _result(False, 'no_return_route',
+                           f'{back_table} no devuelve el tráfico hacia el origen por {peering_id}', return_route=False)
+        return _result(True, 'peering', f'Alcanzable por el peering {peering_id}', return_route=True)
+
+    # --- Serialización ---------------------------------------------------
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'vpcs': len(self.vpcs), 'subnets': len(self.subnets), 'route_tables': len(self.route_tables),
+            'internet_gateways': len(self.internet_gateways), 'nat_gateways': len(self.nat_gateways),
+            'peerings': len(self.peerings), 'security_groups': len(self.security_groups),
+            'network_interfaces': len(self.enis), 'instances': len(self.instances)
+        }
+
+    def to_graph(self, vpc_id: Optional[str] = None) -> Dict[str, Any]:
+        """Nodos y aristas (opcionalmente de una sola VPC) para la vista de topología"""
+        nodes: List[Dict[str, Any]] = []
+        edges: List[Dict[str, Any]] = []
+
+        def _in(item_vpc):
+            return vpc_id is None or item_vpc == vpc_id
+
+        for vpc in self.vpcs.values():
+            if _in(vpc['id']):
+                nodes.append({'id': vpc['id'], 'type': 'vpc', 'label': vpc['name'] or vpc['id'], 'cidrs': vpc['cidrs']})
+        for subnet in self.subnets.values():
+            if _in(subnet['vpc_id']):
+                nodes.append({'id': subnet['id'], 'type': 'subnet', 'label': subnet['name'] or subnet['id'],
+                              'vpc_id': subnet['vpc_id'], 'cidr': subnet['cidr'],
+                              'availability_zone': subnet['availability_zone']})
+                edges.append({'source': subnet['vpc_id'], 'target': subnet['id'], 'type': 'contains'})
+                table_id = self.route_table_for(subnet['id'])
+                if table_id:
+                    edges.append({'source': subnet['id'], 'target': table_id, 'type': 'associated',
+                                  'implicit': subnet['id'] not in self.subnet_route_table})
+        for table in self.route_tables.values():
+            if _in(table['vpc_id']):
+                nodes.append({'id': table['id'], 'type': 'route_table', 'label': table['name'] or table['id'],
+                              'vpc_id': table['vpc_id'], 'main': table['main']})
+                for route in table['routes']:
+                    if route['target_type'] != 'local' and route['target_id']:
+                        edges.append({'source': table['id'], 'target': route['target_id'], 'type': 'route',
+                                      'label': route['destination'], 'state': route['state']})
+        for igw in self.internet_gateways.values():
+            if igw['vpc_id'] and _in(igw['vpc_id']):
+                nodes.append({'id': igw['id'], 'type': 'internet_gateway', 'label': igw['name'] or igw['id'],
+                              'vpc_id': igw['vpc_id']})
+                edges.append({'source': igw['id'], 'target': igw['vpc_id'], 'type': 'attached'})
+        for nat in self.nat_gateways.values():
+            if _in(nat['vpc_id']):
+                nodes.append({'id': nat['id'], 'type': 'nat_gateway', 'label': nat['name'] or nat['id'],
+                              'vpc_id': nat['vpc_id'], 'state': nat['state'], 'public_ip': nat['public_ip']})
+                edges.append({'source': nat['id'], 'target': nat['subnet_id'], 'type': 'in'})
+        for peering in self.peerings.values():
+            if _in(peering['requester_vpc']) or _in(peering['accepter_vpc']):
+                nodes.append({'id': peering['id'], 'type': 'peering', 'label': peering['name'] or peering['id'],
+                              'status': peering['status']})
+                edges.append({'source': peering['requester_vpc'], 'target': peering['id'], 'type': 'peers'})
+                edges.append({'source': peering['id'], 'target': peering['accepter_vpc'], 'type': 'peers'})
+        for eni in self.enis.values():
+            if _in(eni['vpc_id']):
+                nodes.append({'id': eni['id'], 'type': 'eni', 'label': eni['private_ip'], 'vpc_id': eni['vpc_id'],
+                              'public_ip': eni['public_ip'], 'interface_type': eni['type']})
+                edges.append({'source': eni['id'], 'target': eni['subnet_id'], 'type': 'in'})
+                for group in eni['security_groups']:
+                    edges.append({'source': group, 'target': eni['id'], 'type': 'protects'})
+                if eni['instance_id']:
+                    edges.append({'source': eni['id'], 'target': eni['instance_id'], 'type': 'attached'})
+        for group in self.security_groups.values():
+            if _in(group['vpc_id']):
+                nodes.append({'id': group['id'], 'type': 'security_group', 'label': group['name'],
+                              'vpc_id': group['vpc_id'], 'enis': len(self.sg_enis.get(group['id'], []))})
+        for instance_id, enis in self.instance_enis.items():
+            instance = self.instances.get(instance_id, {'id': instance_id})
+            if _in(self.enis[enis[0]]['vpc_id']):
+                nodes.append({'id': instance_id, 'type': 'instance', 'label': instance.get('name') or instance_id,
+                              'state': instance.get('state')})
+        return {'nodes': nodes, 'edges': edges, 'summary': self.summary(), 'errors': self.errors,
+                'built_at': self.built_at}
+
+    def vpc_overview(self, vpc_id: str) -> Dict[str, Any]:
+        """Subredes con su tabla de rutas y rutas, gateways y peerings de una VPC"""
+        if vpc_id not in self.vpcs:
+            raise ValueError(f'VPC desconocida: {vpc_id}')
+        subnets = []
+        for subnet_id in sorted(self.vpc_subnets.get(vpc_id, []), key=lambda s: self.subnets[s]['cidr'] or ''):
+            subnet = self.subnets[subnet_id]
+            table_id = self.route_table_for(subnet_id)
+            routes = self.route_tables.get(table_id, {}).get('routes', [])
+            enis = self.subnet_enis.get(subnet_id, [])
+            subnets.append({
+                'id': subnet_id, 'name': subnet['name'], 'cidr': subnet['cidr'],
+                'availability_zone': subnet['availability_zone'], 'route_table': table_id,
+                'implicit_route_table': subnet_id not in self.subnet_route_table,
+                'routes': [{'destination': r['destination'], 'target': r['target_id'], 'state': r['state']} for r in routes],
+                'public': any(r['target_type'] == 'igw' and r['net'] and r['net'].prefix == 0 for r in routes),
+                'enis': len(enis),
+                'instances': sorted({self.enis[e]['instance_id'] for e in enis if self.enis[e]['instance_id']})
+            })
+        return {
+            'vpc': {k: v for k, v in self.vpcs[vpc_id].items() if k != 'nets'},
+            'subnets': subnets,
+            'internet_gateways': [g for g in self.internet_gateways.values() if g['vpc_id'] == vpc_id],
+            'nat_gateways': [n for n in self.nat_gateways.values() if n['vpc_id'] == vpc_id],
+            'peerings': [p for p in self.peerings.values() if vpc_id in (p['requester_vpc'], p['accepter_vpc'])],
+            'security_groups': len([g for g in self.security_groups.values() if g['vpc_id'] == vpc_id])
+        }
+
+
+def build(factory: Callable) -> Topology:
+    """
+    Recolecta todos los recursos de red en paralelo. factory es una fábrica de clientes
+    (get_client_factory) con un pool de al menos COLLECT_WORKERS conexiones.
+    """
+    ec2 = factory('ec2')
+    result = fan_out(lambda name: _COLLECTORS[name](ec2), list(_COLLECTORS),
+                     max_workers=COLLECT_WORKERS, timeout=COLLECT_TIMEOUT)
+    for name, error in result.errors.items():
+        logger.warning(f'Topología VPC: fallo recolectando {name}: {error}')
+    return Topology({name: result.results.get(name, []) for name in _COLLECTORS}, result.errors)
+
+
+def get_topology(factory: Callable, scope: Hashable, refresh: bool = False) -> Topology:
+    return _cache.get_or_load((scope, 'topology'), lambda: build(factory), refresh=refresh)
+
+
+def invalidate(scope: Hashable):
+    _cache.invalidate_prefix(scope)